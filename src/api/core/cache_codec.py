@@ -0,0 +1,305 @@
+"""
+Cache Codec - Serialización compacta de valores de caché
+========================================================
+
+Capa de codificación común para los valores que las cachés guardan en Redis
+(productos, inventario, respuestas diversificadas, estado conversacional).
+
+Formato binario (versión 1)::
+
+    byte 0   versión del formato (0x01)
+    byte 1   flags: serializador (bits 0-3) | compresión (bits 4-7)
+    resto    payload
+
+- Serializador: msgpack si está instalado, si no JSON compacto (orjson si
+  está instalado, si no ``json`` de la stdlib).
+- Compresión: solo para valores grandes (``min_compress_bytes``) y solo si
+  reduce el tamaño; zstd si está instalado, si no zlib.
+- Los valores sin cabecera (JSON en texto, formato anterior) se siguen
+  leyendo, de modo que durante un despliegue gradual conviven ambos formatos.
+  ``from_env`` usa por defecto ``CACHE_CODEC_SERIALIZER=legacy`` (el JSON en
+  texto de siempre), para que los workers antiguos lean lo que escriben los
+  nuevos; cambiar a ``auto`` cuando todos los workers estén actualizados.
+
+Nota: msgpack conserva las claves no-string de los diccionarios (JSON las
+convierte a string).
+
+Author: Senior Architecture Team
+"""
+
+import json
+import logging
+import os
+import zlib
+from typing import Any, Dict, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+FORMAT_VERSION = 0x01
+
+SERIALIZER_JSON = 0x0
+SERIALIZER_MSGPACK = 0x1
+
+COMPRESSION_NONE = 0x0
+COMPRESSION_ZLIB = 0x1
+COMPRESSION_ZSTD = 0x2
+
+_SERIALIZER_NAMES = {SERIALIZER_JSON: "json", SERIALIZER_MSGPACK: "msgpack"}
+_COMPRESSION_NAMES = {COMPRESSION_NONE: "none", COMPRESSION_ZLIB: "zlib", COMPRESSION_ZSTD: "zstd"}
+
+COMPRESSION_LEVEL = 3
+DEFAULT_MIN_COMPRESS_BYTES = 1024
+DEFAULT_BASELINE_SAMPLE_EVERY = 20
+
+
+class CodecError(ValueError):
+    """Valor de caché que no se puede decodificar"""
+    pass
+
+
+def _dumps_json(value: Any) -> bytes:
+    """JSON compacto en bytes (orjson si está disponible)."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Tipos que orjson no soporta (p. ej. enteros de más de 64 bits)
+            pass
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _loads_json(data: Union[bytes, str]) -> Any:
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # La stdlib acepta NaN/Infinity, que json.dumps sí escribe
+            pass
+    return json.loads(data)
+
+
+class CacheCodec:
+    """
+    Codifica/decodifica valores de caché y lleva estadísticas de tamaño.
+
+    ``get_stats`` reporta bytes por clave escritos y, sobre una muestra de
+    las escrituras, el tamaño que habría tenido el ``json.dumps`` anterior.
+    """
+
+    def __init__(
+        self,
+        serializer: str = "auto",
+        compression: str = "auto",
+        min_compress_bytes: int = DEFAULT_MIN_COMPRESS_BYTES,
+        baseline_sample_every: int = DEFAULT_BASELINE_SAMPLE_EVERY
+    ):
+        """
+        Args:
+            serializer: "auto", "msgpack", "json" o "legacy" (JSON en texto sin cabecera)
+            compression: "auto", "zstd", "zlib" o "none"
+            min_compress_bytes: Tamaño serializado a partir del cual se comprime
+            baseline_sample_every: Cada cuántas escrituras se mide el tamaño JSON anterior (0 = nunca)
+        """
+        self.legacy = serializer == "legacy"
+        self.serializer = self._resolve_serializer(serializer)
+        self.compression = self._resolve_compression(compression)
+        self.min_compress_bytes = min_compress_bytes
+        self.baseline_sample_every = baseline_sample_every
+        self._zstd_compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL) if ZSTD_AVAILABLE else None
+        self._zstd_decompressor = zstandard.ZstdDecompressor() if ZSTD_AVAILABLE else None
+
+        self.stats = {
+            "encoded": 0,
+            "encoded_bytes": 0,
+            "compressed": 0,
+            "baseline_samples": 0,
+            "baseline_json_bytes": 0,
+            "baseline_encoded_bytes": 0,
+            "decoded": 0,
+            "legacy_decoded": 0,
+            "decode_errors": 0
+        }
+
+    @classmethod
+    def from_env(cls) -> "CacheCodec":
+        """
+        Crea el codec según CACHE_CODEC_SERIALIZER / CACHE_CODEC_COMPRESSION / CACHE_CODEC_MIN_COMPRESS_BYTES.
+        
+        El serializador por defecto es ``legacy`` mientras dure el despliegue gradual.
+        """
+        return cls(
+            serializer=os.getenv("CACHE_CODEC_SERIALIZER", "legacy").lower(),
+            compression=os.getenv("CACHE_CODEC_COMPRESSION", "auto").lower(),
+            min_compress_bytes=int(os.getenv("CACHE_CODEC_MIN_COMPRESS_BYTES", str(DEFAULT_MIN_COMPRESS_BYTES)))
+        )
+
+    @staticmethod
+    def _resolve_serializer(name: str) -> int:
+        if name in ("auto", "msgpack") and MSGPACK_AVAILABLE:
+            return SERIALIZER_MSGPACK
+        if name == "msgpack":
+            logger.warning("⚠️ msgpack no instalado: el codec de caché usa JSON")
+        return SERIALIZER_JSON
+
+    @staticmethod
+    def _resolve_compression(name: str) -> int:
+        if name == "none":
+            return COMPRESSION_NONE
+        if name in ("auto", "zstd") and ZSTD_AVAILABLE:
+            return COMPRESSION_ZSTD
+        if name == "zstd":
+            logger.warning("⚠️ zstandard no instalado: el codec de caché comprime con zlib")
+        return COMPRESSION_ZLIB
+
+    # ------------------------------------------------------------------
+    # Encode
+    # ------------------------------------------------------------------
+
+    def encode(self, value: Any) -> Union[bytes, str]:
+        """
+        Codifica ``value`` para guardarlo en Redis.
+
+        Raises:
+            TypeError: Si el valor no es serializable
+        """
+        if self.legacy:
+            encoded = json.dumps(value)
+            self._record_encode(value, len(encoded.encode("utf-8")), compressed=False)
+            return encoded
+
+        serializer, payload = self._serialize(value)
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and len(payload) >= self.min_compress_bytes:
+            compressed = self._compress(payload)
+            if len(compressed) < len(payload):
+                compression, payload = self.compression, compressed
+
+        encoded = bytes((FORMAT_VERSION, serializer | (compression << 4))) + payload
+        self._record_encode(value, len(encoded), compressed=compression != COMPRESSION_NONE)
+        return encoded
+
+    def _serialize(self, value: Any):
+        if self.serializer == SERIALIZER_MSGPACK:
+            try:
+                return SERIALIZER_MSGPACK, msgpack.packb(value, use_bin_type=True)
+            except (TypeError, ValueError, OverflowError):
+                # Tipos que msgpack no soporta: JSON como respaldo
+                pass
+        return SERIALIZER_JSON, _dumps_json(value)
+
+    def _compress(self, payload: bytes) -> bytes:
+        if self.compression == COMPRESSION_ZSTD:
+            return self._zstd_compressor.compress(payload)
+        return zlib.compress(payload, COMPRESSION_LEVEL)
+
+    def _record_encode(self, value: Any, size: int, compressed: bool):
+        self.stats["encoded"] += 1
+        self.stats["encoded_bytes"] += size
+        if compressed:
+            self.stats["compressed"] += 1
+
+        # Muestra del tamaño con el formato anterior (json.dumps) para comparar
+        if self.baseline_sample_every and (self.stats["encoded"] - 1) % self.baseline_sample_every == 0:
+            try:
+                baseline = len(json.dumps(value).encode("utf-8"))
+            except (TypeError, ValueError):
+                return
+            self.stats["baseline_samples"] += 1
+            self.stats["baseline_json_bytes"] += baseline
+            self.stats["baseline_encoded_bytes"] += size
+
+    # ------------------------------------------------------------------
+    # Decode
+    # ------------------------------------------------------------------
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        """
+        Decodifica un valor leído de Redis (formato binario o JSON anterior).
+
+        Raises:
+            CodecError: Si el valor está corrupto o usa un formato desconocido
+        """
+        try:
+            value = self._decode(data)
+        except CodecError:
+            self.stats["decode_errors"] += 1
+            raise
+        except Exception as e:
+            self.stats["decode_errors"] += 1
+            raise CodecError(f"Valor de caché inválido: {e}") from e
+
+        self.stats["decoded"] += 1
+        return value
+
+    def _decode(self, data: Union[bytes, str]) -> Any:
+        if isinstance(data, str) or not data or data[0] != FORMAT_VERSION:
+            self.stats["legacy_decoded"] += 1
+            return _loads_json(data)
+
+        if len(data) < 2:
+            raise CodecError("Cabecera de caché truncada")
+
+        flags = data[1]
+        serializer, compression = flags & 0x0F, flags >> 4
+        payload = memoryview(data)[2:]
+
+        if compression == COMPRESSION_ZLIB:
+            payload = zlib.decompress(payload)
+        elif compression == COMPRESSION_ZSTD:
+            if not ZSTD_AVAILABLE:
+                raise CodecError("Valor comprimido con zstd pero zstandard no está instalado")
+            payload = self._zstd_decompressor.decompress(payload)
+        elif compression != COMPRESSION_NONE:
+            raise CodecError(f"Compresión desconocida: {compression}")
+
+        if serializer == SERIALIZER_JSON:
+            return _loads_json(bytes(payload))
+        if serializer == SERIALIZER_MSGPACK:
+            if not MSGPACK_AVAILABLE:
+                raise CodecError("Valor en msgpack pero msgpack no está instalado")
+            return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        raise CodecError(f"Serializador desconocido: {serializer}")
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas de tamaño: bytes por clave actuales vs. JSON anterior (muestreado)."""
+        stats = self.stats
+        samples = stats["baseline_samples"]
+        baseline_encoded = stats["baseline_encoded_bytes"]
+        return {
+            "format": "legacy-json" if self.legacy else (
+                f"v{FORMAT_VERSION}:{_SERIALIZER_NAMES[self.serializer]}+{_COMPRESSION_NAMES[self.compression]}"
+            ),
+            "encoded": stats["encoded"],
+            "compressed": stats["compressed"],
+            "bytes_per_key": round(stats["encoded_bytes"] / stats["encoded"], 1) if stats["encoded"] else 0.0,
+            "json_bytes_per_key": round(stats["baseline_json_bytes"] / samples, 1) if samples else 0.0,
+            "size_ratio": round(baseline_encoded / stats["baseline_json_bytes"], 3) if stats["baseline_json_bytes"] else 1.0,
+            "decoded": stats["decoded"],
+            "legacy_decoded": stats["legacy_decoded"],
+            "decode_errors": stats["decode_errors"]
+        }
@@ -110,6 +110,33 @@ class RecommenderSettings(BaseSettings):
     # MCP Caching
     mcp_local_cache_enabled: bool = True
     mcp_cache_ttl: int = 300
+    
+    # Estado conversacional en Redis: "snapshot" (contexto completo) o "delta"
+    # (turnos añadidos + cabecera). Activar delta cuando todos los workers lo soporten.
+    conversation_state_storage: str = Field(default="snapshot", env="CONVERSATION_STATE_STORAGE")
+    # Memoria máxima (aprox., bytes) del L1 de sesiones en proceso
+    conversation_session_cache_max_bytes: int = Field(default=64 * 1024 * 1024, env="CONVERSATION_SESSION_CACHE_MAX_BYTES")
+
+    # Ingesta de eventos de usuario: "direct" (Retail API en la request) o
+    # "stream" (XADD en Redis Streams + grupos de consumidores en segundo plano)
+    event_ingestion_mode: str = Field(default="direct", env="EVENT_INGESTION_MODE")
+    event_stream_maxlen: int = Field(default=100000, env="EVENT_STREAM_MAXLEN")
+    # Ejecutar consumidores en este proceso (desactivar en pods que solo sirven la API)
+    event_stream_workers_enabled: bool = Field(default=True, env="EVENT_STREAM_WORKERS_ENABLED")
+    # Eventos hacia Retail API en segundo plano (cola + thread pool + import en bloque)
+    retail_async_event_writes: bool = Field(default=True, env="RETAIL_ASYNC_EVENT_WRITES")
+    # Cache de personalización: servir queries casi duplicadas (similitud TF-IDF)
+    # del mismo usuario y, en el primer turno, respuestas de otros usuarios del mercado.
+    # Desactivado por defecto: el fallback de mercado sirve respuestas entre usuarios
+    personalization_semantic_cache_enabled: bool = Field(default=False, env="PERSONALIZATION_SEMANTIC_CACHE_ENABLED")
+    personalization_market_fallback_threshold: float = Field(default=0.9, env="PERSONALIZATION_MARKET_FALLBACK_THRESHOLD")
+    # Coalescencia de misses (producto, inventario, personalización): además de
+    # deduplicar dentro del worker, tomar un lock corto en Redis entre workers
+    single_flight_redis_lock: bool = Field(default=False, env="SINGLE_FLIGHT_REDIS_LOCK")
+    # Stale-while-revalidate (segundos tras el TTL en que una entrada caducada se
+    # sirve mientras se refresca en segundo plano; 0 = desactivado)
+    product_cache_stale_while_revalidate: int = Field(default=3600, env="PRODUCT_CACHE_STALE_WHILE_REVALIDATE")
+    inventory_stale_while_revalidate: int = Field(default=300, env="INVENTORY_STALE_WHILE_REVALIDATE")
 
     # Configuración para diferentes versiones de Pydantic
     if PYDANTIC_SETTINGS_AVAILABLE:
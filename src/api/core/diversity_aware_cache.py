@@ -15,6 +15,7 @@ Version: 2.0.0 - Diversity-Aware Strategy
 Date: 2025-10-04
 """
 
+import asyncio
 import json
 import time
 import hashlib
@@ -23,8 +24,21 @@ from typing import Dict, List, Optional, Any, Set
 from dataclasses import dataclass
 from datetime import datetime
 
+from src.api.core.cache_codec import CacheCodec
+from src.api.core.keyword_matcher import KeywordMatcher
+from src.api.core.redis_service import RedisService, get_raw, index_key
+
 logger = logging.getLogger(__name__)
 
+# Keywords por defecto cuando no hay categorías inyectadas ni catálogo local
+DEFAULT_PRODUCT_CATEGORIES: Dict[str, List[str]] = {
+    'electronics': ['phone', 'laptop', 'computer', 'tablet', 'headphone', 'speaker', 'electronic'],
+    'sports': ['fitness', 'running', 'yoga', 'gym', 'sport', 'athletic', 'exercise', 'workout'],
+    'fashion': ['shirt', 'pants', 'dress', 'jacket', 'clothing', 'apparel'],
+    'home': ['furniture', 'decor', 'kitchen', 'bedroom', 'living'],
+    'beauty': ['makeup', 'skincare', 'cosmetic', 'beauty', 'hair']
+}
+
 
 @dataclass
 class CacheMetrics:
@@ -77,9 +91,11 @@ class DiversityAwareCache:
         default_ttl: int = 300,
         enable_metrics: bool = True,
         product_categories: Optional[Dict[str, List[str]]] = None,
-        local_catalog: Optional[Any] = None
+        local_catalog: Optional[Any] = None,
+        codec: Optional[CacheCodec] = None
     ):
         self.redis = redis_service
+        self.codec = codec or CacheCodec.from_env()
         self.default_ttl = default_ttl
         self.cache_prefix = "diversity_cache_v2"
         self.enable_metrics = enable_metrics
@@ -87,6 +103,17 @@ class DiversityAwareCache:
         # Allow injecting real product categories or a local_catalog to derive them
         self.product_categories: Optional[Dict[str, List[str]]] = product_categories
         self.local_catalog: Optional[Any] = local_catalog
+        # Autómata de keywords compilado una vez por origen de categorías
+        self._category_matcher: Optional[KeywordMatcher] = None
+        self._category_source: Any = None
+        # Recompilación en segundo plano tras recargar el catálogo
+        self._category_rebuild: Optional[asyncio.Task] = None
+        self._category_generation = 0
+        self._default_category_matcher: Optional[KeywordMatcher] = None
+        
+        # El catálogo avisa de cada recarga: recompilar antes de la siguiente petición
+        if hasattr(local_catalog, 'add_catalog_listener'):
+            local_catalog.add_catalog_listener(self.refresh_categories)
         
         logger.info(f"✅ DiversityAwareCache initialized - TTL: {default_ttl}s, Metrics: {enable_metrics}")
     
@@ -112,26 +139,10 @@ class DiversityAwareCache:
                 return "follow_up_general"
         
         # ✅ NUEVO: Extraer categoría de producto para initial requests
-        # Prefer injected categories, then derive from local_catalog, then fallback to built-in heuristics
-        product_categories = self.product_categories
-        if not product_categories and self.local_catalog:
-            product_categories = self._load_categories_from_catalog()
-
-        if not product_categories:
-            # Built-in fallback keywords (kept for backward compatibility)
-            product_categories = {
-                'electronics': ['phone', 'laptop', 'computer', 'tablet', 'headphone', 'speaker', 'electronic'],
-                'sports': ['fitness', 'running', 'yoga', 'gym', 'sport', 'athletic', 'exercise', 'workout'],
-                'fashion': ['shirt', 'pants', 'dress', 'jacket', 'clothing', 'apparel'],
-                'home': ['furniture', 'decor', 'kitchen', 'bedroom', 'living'],
-                'beauty': ['makeup', 'skincare', 'cosmetic', 'beauty', 'hair']
-            }
-
-        for category, keywords in product_categories.items():
-            # keywords could be a set/list of strings
-            for keyword in keywords:
-                if keyword and keyword in query_lower:
-                    return f"initial_{category}"
+        # Una sola pasada sobre el query con el autómata precompilado
+        category = self._get_category_matcher().match(query_lower)
+        if category is not None:
+            return f"initial_{category}"
         
         # ✅ General recommendations pero con tipo específico
         if any(word in query_lower for word in ['recommend', 'show', 'suggest']):
@@ -165,10 +176,97 @@ class DiversityAwareCache:
         hash_obj = hashlib.md5(products_string.encode())
         return hash_obj.hexdigest()[:12]  # Primeros 12 caracteres suficientes
 
+    def _get_category_matcher(self) -> KeywordMatcher:
+        """
+        Devuelve el autómata de keywords, recompilándolo solo si cambia su origen.
+
+        Prioridad: categorías inyectadas, después las derivadas de local_catalog
+        y por último DEFAULT_PRODUCT_CATEGORIES. Una recarga del catálogo
+        (fit/swap/update_products) sustituye la lista ``product_data``, así que
+        comparar su identidad basta para detectarla sin recorrer el catálogo.
+
+        Con un event loop activo las categorías del catálogo nunca se compilan
+        en el path de la petición: la recompilación va a un thread y mientras
+        tanto se sigue sirviendo el autómata anterior (o el de categorías por
+        defecto si aún no hay ninguno).
+        """
+        source = self._category_origin()
+        if source is not self._category_source:
+            self._rebuild_category_matcher(source)
+
+        if self._category_matcher is None:
+            if self._default_category_matcher is None:
+                self._default_category_matcher = KeywordMatcher(DEFAULT_PRODUCT_CATEGORIES)
+            return self._default_category_matcher
+        return self._category_matcher
+
+    def _category_origin(self) -> Any:
+        if self.product_categories:
+            return self.product_categories
+        if self.local_catalog:
+            products = getattr(self.local_catalog, 'product_data', None)
+            return products if products is not None else self.local_catalog
+        return DEFAULT_PRODUCT_CATEGORIES
+
+    def _rebuild_category_matcher(self, source: Any) -> None:
+        """Compila el autómata para ``source``: en un thread si viene del catálogo y hay event loop."""
+        from_catalog = not self.product_categories and bool(self.local_catalog)
+        try:
+            loop = asyncio.get_running_loop() if from_catalog else None
+        except RuntimeError:
+            loop = None
+
+        if loop is None:
+            # Categorías inyectadas/por defecto (baratas) o sin event loop que bloquear
+            self._category_matcher = self._build_category_matcher()
+            self._category_source = source
+            return
+
+        if self._category_rebuild is not None and not self._category_rebuild.done():
+            return  # Al terminar se vuelve a comparar el origen
+        self._category_rebuild = loop.create_task(self._rebuild_in_background(source))
+
+    async def _rebuild_in_background(self, source: Any) -> None:
+        generation = self._category_generation
+        try:
+            matcher = await asyncio.to_thread(self._build_category_matcher)
+        except Exception as e:
+            logger.error(f"❌ Error recompilando el keyword matcher: {e}")
+            return
+        self._category_matcher = matcher
+        # Un refresh durante la compilación invalida el origen: se recompila en la siguiente petición
+        self._category_source = source if generation == self._category_generation else None
+
+    def _build_category_matcher(self) -> KeywordMatcher:
+        start_time = time.time()
+        product_categories = self.product_categories
+        if not product_categories and self.local_catalog:
+            product_categories = self._load_categories_from_catalog()
+        if not product_categories:
+            product_categories = DEFAULT_PRODUCT_CATEGORIES
+
+        matcher = KeywordMatcher(product_categories)
+        logger.info(
+            f"🔤 Keyword matcher compilado: {len(matcher.categories)} categorías, "
+            f"{len(matcher)} keywords en {(time.time() - start_time) * 1000:.1f}ms"
+        )
+        return matcher
+
+    def refresh_categories(self):
+        """
+        Fuerza recompilar el mapping de categorías (recarga del catálogo o mutación in-place).
+
+        El autómata actual se sigue sirviendo hasta que el nuevo esté listo.
+        """
+        self._category_generation += 1
+        self._category_source = None
+        self._rebuild_category_matcher(self._category_origin())
+
     def _load_categories_from_catalog(self) -> Dict[str, List[str]]:
         """
-        Construye un mapping category -> keywords a partir del catálogo local (lazy).
+        Construye un mapping category -> keywords a partir del catálogo local.
         Espera que local_catalog tenga product_data: List[Dict] con keys 'product_type'/'category' y 'title'.
+        Recorre todo el catálogo: se invoca solo al compilar el matcher.
         """
         categories: Dict[str, Set[str]] = {}
         try:
@@ -217,34 +315,38 @@ class DiversityAwareCache:
         
         Resultado: Keys diferentes para contexts diferentes, preservando diversidad
         """
-        # Extract components
-        semantic_intent = self._extract_semantic_intent(query)
-        turn_number = context.get("turn_number", 1)
-        shown_products = context.get("shown_products", [])
-        excluded_hash = self._hash_product_list(shown_products)
-        market_id = context.get("market_id", "US")
-        
-        # Build key components dict
-        key_components = {
-            "user": user_id,
-            "intent": semantic_intent,
-            "turn": turn_number,
-            "excluded": excluded_hash,
-            "market": market_id
-        }
-        
-        # Generate composite key
-        key_string = json.dumps(key_components, sort_keys=True)
-        key_hash = hashlib.md5(key_string.encode()).hexdigest()[:16]
-        
-        # Full key with prefix
-        cache_key = f"{self.cache_prefix}:{user_id}:{key_hash}"
+        key_components = self.get_key_components(user_id, query, context)
+        cache_key = self.cache_key_from_components(key_components)
         
         logger.debug(f"🔑 Cache key generated: {cache_key}")
-        logger.debug(f"    Components: intent={semantic_intent}, turn={turn_number}, excluded_count={len(shown_products)}")
+        logger.debug(
+            f"    Components: intent={key_components['intent']}, turn={key_components['turn']}, "
+            f"excluded_count={len(context.get('shown_products', []))}"
+        )
         
         return cache_key
     
+    def get_key_components(self, user_id: str, query: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Componentes de la cache key (user, intent, turn, excluded, market).
+
+        Expuestos para que otras capas (p.ej. el índice semántico de
+        IntelligentPersonalizationCache) comparen contextos sin recalcularlos.
+        """
+        return {
+            "user": user_id,
+            "intent": self._extract_semantic_intent(query),
+            "turn": context.get("turn_number", 1),
+            "excluded": self._hash_product_list(context.get("shown_products", [])),
+            "market": context.get("market_id", "US")
+        }
+
+    def cache_key_from_components(self, key_components: Dict[str, Any]) -> str:
+        """Cache key completa a partir de get_key_components()"""
+        key_string = json.dumps(key_components, sort_keys=True)
+        key_hash = hashlib.md5(key_string.encode()).hexdigest()[:16]
+        return f"{self.cache_prefix}:{key_components['user']}:{key_hash}"
+
     def _calculate_dynamic_ttl(self, context: Dict[str, Any]) -> int:
         """
         ✅ TTL dinámico basado en conversation velocity y engagement
@@ -303,7 +405,7 @@ class DiversityAwareCache:
                 logger.info(f"✅ Cache HIT - key: {cache_key[:30]}... ({elapsed_ms:.0f}ms)")
                 
                 # Parse and return
-                response = json.loads(cached_data)
+                response = self.codec.decode(cached_data)
                 response["_cache_hit"] = True
                 response["_cache_key"] = cache_key
                 response["_response_time_ms"] = elapsed_ms
@@ -367,8 +469,10 @@ class DiversityAwareCache:
             }
             
             # Serialize and cache
-            cache_data = json.dumps(cache_entry)
-            success = await self._set_in_redis(cache_key, cache_data, final_ttl)
+            cache_data = self.codec.encode(cache_entry)
+            success = await self._set_in_redis(
+                cache_key, cache_data, final_ttl, index=self._user_index_key(user_id)
+            )
             
             if success:
                 logger.info(f"✅ Cached response - key: {cache_key[:30]}... TTL: {final_ttl}s")
@@ -381,6 +485,22 @@ class DiversityAwareCache:
             logger.error(f"❌ Error caching response: {e}")
             return False
     
+    async def get_cached_by_key(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Lee una entrada por su cache key exacta (sin actualizar métricas).
+
+        Returns:
+            Entrada decodificada o None si no existe / expiró
+        """
+        if not self.redis:
+            return None
+        try:
+            cached_data = await self._get_from_redis(cache_key)
+            return self.codec.decode(cached_data) if cached_data else None
+        except Exception as e:
+            logger.error(f"❌ Error reading cache key {cache_key[:30]}...: {e}")
+            return None
+
     async def invalidate_user_cache(self, user_id: str) -> int:
         """
         Invalida todo el cache de un usuario específico.
@@ -389,7 +509,13 @@ class DiversityAwareCache:
         """
         try:
             pattern = f"{self.cache_prefix}:{user_id}:*"
-            deleted_count = await self._delete_by_pattern(pattern)
+            if isinstance(self.redis, RedisService):
+                # Índice por usuario; SCAN solo para entradas anteriores al índice
+                deleted_count = await self.redis.delete_indexed(
+                    self._user_index_key(user_id), fallback_pattern=pattern
+                )
+            else:
+                deleted_count = await self._delete_by_pattern(pattern)
             
             logger.info(f"✅ Invalidated {deleted_count} cache entries for user {user_id}")
             return deleted_count
@@ -400,7 +526,9 @@ class DiversityAwareCache:
     
     def get_metrics(self) -> Dict[str, Any]:
         """Retorna métricas actuales del cache"""
-        return self.metrics.to_dict()
+        metrics = self.metrics.to_dict()
+        metrics["codec"] = self.codec.get_stats()
+        return metrics
     
     def reset_metrics(self):
         """Reset métricas (útil para testing)"""
@@ -409,13 +537,15 @@ class DiversityAwareCache:
     
     # ========== REDIS HELPER METHODS ==========
     
-    async def _get_from_redis(self, key: str) -> Optional[str]:
-        """Get value from Redis"""
+    async def _get_from_redis(self, key: str) -> Optional[Any]:
+        """Get value from Redis (bytes sin decodificar cuando el cliente lo permite)"""
         try:
-            if hasattr(self.redis, 'get'):
+            if isinstance(self.redis, RedisService):
+                return await self.redis.get(key, raw=True)
+            elif hasattr(self.redis, 'get'):
                 return await self.redis.get(key)
             elif hasattr(self.redis, '_client'):
-                return await self.redis._client.get(key)
+                return await get_raw(self.redis._client, key)
             else:
                 logger.error("❌ Redis client has no get method")
                 return None
@@ -423,10 +553,16 @@ class DiversityAwareCache:
             logger.error(f"❌ Redis GET error: {e}")
             return None
     
-    async def _set_in_redis(self, key: str, value: str, ttl: int) -> bool:
-        """Set value in Redis with TTL"""
+    def _user_index_key(self, user_id: str) -> str:
+        """Índice secundario con las entradas cacheadas de un usuario"""
+        return index_key(f"{self.cache_prefix}:{user_id}")
+    
+    async def _set_in_redis(self, key: str, value: Any, ttl: int, index: Optional[str] = None) -> bool:
+        """Set value in Redis with TTL (registrando la clave en ``index`` si se indica)"""
         try:
-            if hasattr(self.redis, 'setex'):
+            if isinstance(self.redis, RedisService):
+                return await self.redis.set(key, value, ttl=ttl, indexes=[index] if index else None)
+            elif hasattr(self.redis, 'setex'):
                 await self.redis.setex(key, ttl, value)
                 return True
             elif hasattr(self.redis, '_client'):
@@ -442,7 +578,7 @@ class DiversityAwareCache:
     async def _delete_by_pattern(self, pattern: str) -> int:
         """Delete keys matching pattern"""
         try:
-            # Try delete_pattern method first
+            # Try delete_pattern method first (RedisService: SCAN + DELETE por lotes)
             if hasattr(self.redis, 'delete_pattern'):
                 return await self.redis.delete_pattern(pattern)
             
@@ -534,6 +670,10 @@ async def create_diversity_aware_cache(
         product_categories=product_categories,
         local_catalog=lc
     )
+
+    # Compilar el matcher de categorías fuera del event loop (catálogos grandes tardan segundos)
+    if lc is not None and not product_categories:
+        await asyncio.to_thread(cache._get_category_matcher)
     
     logger.info("✅ DiversityAwareCache created successfully")
     return cache
\ No newline at end of file
@@ -13,9 +13,12 @@ from typing import List, Dict, Optional, Set, Any
 from datetime import datetime
 import asyncio
 
+from src.api.core.product_cache import ProductCache
+from src.api.core.hybrid_recommender import BatchRecommendationsMixin
+
 logger = logging.getLogger(__name__)
 
-class EnhancedHybridRecommender:
+class EnhancedHybridRecommender(BatchRecommendationsMixin):
     """
     Versión mejorada del recomendador híbrido con soporte para caché de productos.
     
@@ -293,12 +296,23 @@ class EnhancedHybridRecommender:
         # Extraer IDs de productos
         product_ids = [rec.get("id") for rec in recommendations if rec.get("id")]
         
-        # Opcional: precargar productos en caché para mejorar rendimiento
-        try:
-            await self.product_cache.preload_products(product_ids)
-            self.stats["products_preloaded"] += len(product_ids)
-        except Exception as e:
-            logger.warning(f"Error en precarga de productos: {str(e)}")
+        # Con ProductCache todos los productos se obtienen en una sola llamada
+        # (un MGET + un pipeline para los misses); otras cachés, uno a uno
+        batch_products = None
+        if isinstance(self.product_cache, ProductCache):
+            try:
+                fetched = await self.product_cache.get_products(product_ids)
+                batch_products = {str(pid): product for pid, product in zip(product_ids, fetched)}
+                self.stats["products_preloaded"] += len(product_ids)
+            except Exception as e:
+                logger.error(f"Error obteniendo productos en batch: {str(e)}")
+        else:
+            # Opcional: precargar productos en caché para mejorar rendimiento
+            try:
+                await self.product_cache.preload_products(product_ids)
+                self.stats["products_preloaded"] += len(product_ids)
+            except Exception as e:
+                logger.warning(f"Error en precarga de productos: {str(e)}")
         
         enriched_recommendations = []
         success_count = 0
@@ -314,7 +328,10 @@ class EnhancedHybridRecommender:
             
             try:
                 # Obtener información completa del producto usando la caché
-                product = await self.product_cache.get_product(product_id)
+                if batch_products is not None:
+                    product = batch_products.get(str(product_id))
+                else:
+                    product = await self.product_cache.get_product(product_id)
                 
                 if product:
                     # Enriquecer con datos del producto
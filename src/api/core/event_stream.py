@@ -0,0 +1,441 @@
+"""
+Event Stream - Ingesta de eventos de usuario con Redis Streams
+==============================================================
+
+Registrar un evento es un único XADD (acotado con ``MAXLEN ~``); el trabajo
+posterior lo hacen grupos de consumidores en segundo plano:
+
+- ``profile``: agregados del perfil en UserEventStore
+- ``analytics``: métricas de interacción
+- ``retail``: reenvío a Google Cloud Retail API
+
+Cada grupo recibe todos los eventos y, dentro de un grupo, los workers (uno
+por proceso) se reparten las entradas, así que el procesamiento escala
+horizontalmente añadiendo procesos.
+
+Los grupos se crean desde el inicio del stream (``id="0"``) y los productores
+los crean antes de su primer XADD, así que los eventos añadidos por pods sin
+consumidores (``EVENT_STREAM_WORKERS_ENABLED=false``) no se pierden.
+
+Entrega at-least-once: una entrada se confirma (XACK) solo cuando el handler
+del grupo termina sin error. Las entradas pendientes de un worker caído se
+reclaman (XCLAIM) al superar ``claim_idle_ms``; tras ``max_deliveries``
+entregas se mueven a ``<stream>:dead`` para no bloquear el grupo.
+
+Author: Senior Architecture Team
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from redis.exceptions import ResponseError
+
+from src.api.mcp.user_events.event_schemas import EventType
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM_KEY = "events:user"
+DEFAULT_STREAM_MAXLEN = 100000
+
+GROUP_PROFILE = "profile"
+GROUP_ANALYTICS = "analytics"
+GROUP_RETAIL = "retail"
+CONSUMER_GROUPS = (GROUP_PROFILE, GROUP_ANALYTICS, GROUP_RETAIL)
+
+# Tipos de evento de Retail API -> tipos de UserEventStore
+RETAIL_EVENT_TYPES = {
+    "detail-page-view": EventType.PRODUCT_VIEW.value,
+    "add-to-cart": EventType.CART_ADD.value,
+    "purchase-complete": EventType.PURCHASE.value,
+    "search": EventType.PRODUCT_SEARCH.value,
+}
+
+EventHandler = Callable[[List[Dict[str, Any]]], Awaitable[Any]]
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def build_retail_event(
+    user_id: str,
+    event_type: str,
+    product_id: Optional[str] = None,
+    recommendation_id: Optional[str] = None,
+    purchase_amount: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Evento del endpoint de tracking con el formato de UserEventStore.
+
+    El tipo original de Retail API se conserva en ``data.retail_event_type``
+    para el grupo que reenvía a Retail API.
+    """
+    return {
+        "event_id": f"{user_id}_{uuid.uuid4().hex}",
+        "user_id": user_id,
+        "event_type": RETAIL_EVENT_TYPES.get(event_type, EventType.MCP_EVENT.value),
+        "timestamp": datetime.utcnow().isoformat(),
+        "session_id": None,
+        "market_id": None,
+        "data": {
+            "retail_event_type": event_type,
+            "product_id": product_id,
+            "recommendation_id": recommendation_id,
+            "purchase_amount": purchase_amount
+        }
+    }
+
+
+class EventStream:
+    """
+    Productor: añade eventos al stream y crea los grupos de consumidores.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        stream_key: str = DEFAULT_STREAM_KEY,
+        maxlen: int = DEFAULT_STREAM_MAXLEN
+    ):
+        """
+        Args:
+            redis_client: Cliente redis.asyncio (decode_responses=True)
+            stream_key: Clave del stream
+            maxlen: Longitud aproximada máxima del stream (XADD MAXLEN ~)
+        """
+        self.redis = redis_client
+        self.stream_key = stream_key
+        self.maxlen = maxlen
+        self.stats = {"appended": 0, "append_errors": 0}
+
+    async def append(self, event: Dict[str, Any]) -> str:
+        """
+        Añade un evento al stream con un único XADD.
+
+        Returns:
+            ID de la entrada en el stream
+        """
+        try:
+            entry_id = await self.redis.xadd(
+                self.stream_key,
+                {"event": json.dumps(event, default=_json_default)},
+                maxlen=self.maxlen,
+                approximate=True
+            )
+        except Exception:
+            self.stats["append_errors"] += 1
+            raise
+
+        self.stats["appended"] += 1
+        return entry_id
+
+    async def ensure_group(self, group: str):
+        """
+        Crea el grupo (y el stream) si no existe.
+
+        Empieza desde el inicio del stream: las entradas añadidas antes de que
+        existiera el grupo también se entregan (acotadas por MAXLEN).
+        """
+        try:
+            await self.redis.xgroup_create(self.stream_key, group, id="0", mkstream=True)
+            logger.info(f"✅ Grupo de consumidores '{group}' creado en {self.stream_key}")
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def ensure_groups(self, groups: Tuple[str, ...] = CONSUMER_GROUPS):
+        """Crea todos los grupos de consumidores; los productores lo llaman antes del primer XADD."""
+        for group in groups:
+            await self.ensure_group(group)
+
+    async def get_group_lag(self, group: str) -> Dict[str, Any]:
+        """Entradas pendientes de confirmar por el grupo y longitud del stream."""
+        pending = await self.redis.xpending(self.stream_key, group)
+        return {
+            "group": group,
+            "pending": pending.get("pending", 0) if pending else 0,
+            "stream_length": await self.redis.xlen(self.stream_key)
+        }
+
+    @staticmethod
+    def decode_entry(fields: Optional[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        """Evento de una entrada del stream, o None si falta o es inválido."""
+        if not fields or "event" not in fields:
+            return None
+        try:
+            event = json.loads(fields["event"])
+        except (json.JSONDecodeError, TypeError):
+            return None
+        return event if isinstance(event, dict) else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"stream_key": self.stream_key, "maxlen": self.maxlen, **self.stats}
+
+
+class StreamConsumer:
+    """
+    Worker de un grupo de consumidores: lee batches, ejecuta el handler y
+    confirma con XACK; reclama pendientes de workers caídos.
+    """
+
+    def __init__(
+        self,
+        stream: EventStream,
+        group: str,
+        handler: EventHandler,
+        consumer_name: Optional[str] = None,
+        batch_size: int = 100,
+        block_ms: int = 5000,
+        claim_idle_ms: int = 60000,
+        max_deliveries: int = 5,
+        redis_client=None
+    ):
+        """
+        Args:
+            stream: EventStream del que se consume
+            group: Nombre del grupo de consumidores
+            handler: Corrutina que procesa una lista de eventos; si lanza, el batch se reintenta
+            consumer_name: Nombre del worker dentro del grupo (por defecto host-pid)
+            batch_size: Entradas por XREADGROUP
+            block_ms: Espera máxima de XREADGROUP (se acota por debajo del
+                socket_timeout del cliente)
+            claim_idle_ms: Tiempo sin confirmar tras el que una entrada se reclama
+            max_deliveries: Entregas antes de mover la entrada a dead-letter
+            redis_client: Cliente para las lecturas bloqueantes (por defecto el del
+                stream); uno dedicado sin socket_timeout evita ocupar el pool compartido
+        """
+        self.stream = stream
+        self.redis = redis_client or stream.redis
+        self.group = group
+        self.handler = handler
+        self.consumer_name = consumer_name or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.block_ms = self._block_below_socket_timeout(self.redis, block_ms)
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.dead_letter_key = f"{stream.stream_key}:dead"
+
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "batches": 0,
+            "processed": 0,
+            "acked": 0,
+            "failed_batches": 0,
+            "claimed": 0,
+            "dead_lettered": 0,
+            "invalid": 0,
+            "last_error": None
+        }
+
+    @staticmethod
+    def _block_below_socket_timeout(redis_client, block_ms: int) -> int:
+        """
+        Acota ``block_ms`` a la mitad del socket_timeout del cliente.
+
+        Con un XREADGROUP BLOCK mayor que el socket_timeout cada lectura ociosa
+        terminaría en TimeoutError y pasaría por el loop de error/espera.
+        """
+        pool = getattr(redis_client, "connection_pool", None)
+        socket_timeout = getattr(pool, "connection_kwargs", {}).get("socket_timeout")
+        if not isinstance(socket_timeout, (int, float)) or socket_timeout <= 0:
+            return block_ms
+        limit = int(socket_timeout * 1000 / 2)
+        if block_ms > limit:
+            logger.warning(
+                f"⚠️ block_ms={block_ms} supera el socket_timeout del cliente ({socket_timeout}s); usando {limit}ms"
+            )
+            return limit
+        return block_ms
+
+    async def start(self):
+        """Crea el grupo si hace falta y arranca el loop de consumo."""
+        await self.stream.ensure_group(self.group)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"🔄 Consumidor {self.group}/{self.consumer_name} iniciado")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error en consumidor {self.group}: {e}")
+                self.stats["last_error"] = str(e)
+                await asyncio.sleep(1)
+
+    async def run_once(self) -> int:
+        """
+        Reclama pendientes caducadas y procesa un batch nuevo.
+
+        Returns:
+            Número de eventos procesados con éxito
+        """
+        processed = await self._process(await self._claim_stale())
+
+        response = await self.redis.xreadgroup(
+            self.group,
+            self.consumer_name,
+            {self.stream.stream_key: ">"},
+            count=self.batch_size,
+            block=self.block_ms
+        )
+        entries = response[0][1] if response else []
+
+        return processed + await self._process(entries)
+
+    async def _claim_stale(self) -> List[Tuple[str, Optional[Dict[str, str]]]]:
+        """Reclama entradas de otros workers sin confirmar durante más de claim_idle_ms."""
+        pending = await self.redis.xpending_range(
+            self.stream.stream_key,
+            self.group,
+            min="-",
+            max="+",
+            count=self.batch_size,
+            idle=self.claim_idle_ms
+        )
+        if not pending:
+            return []
+
+        exhausted = {p["message_id"] for p in pending if p["times_delivered"] >= self.max_deliveries}
+        claimed = await self.redis.xclaim(
+            self.stream.stream_key,
+            self.group,
+            self.consumer_name,
+            self.claim_idle_ms,
+            [p["message_id"] for p in pending]
+        )
+
+        if exhausted:
+            await self._dead_letter([entry for entry in claimed if entry[0] in exhausted])
+
+        retry = [entry for entry in claimed if entry[0] not in exhausted]
+        self.stats["claimed"] += len(retry)
+        if retry:
+            logger.info(f"♻️ {self.group}: reclamadas {len(retry)} entradas pendientes")
+        return retry
+
+    async def _dead_letter(self, entries: List[Tuple[str, Optional[Dict[str, str]]]]):
+        """Mueve a dead-letter las entradas que agotaron sus entregas."""
+        if not entries:
+            return
+
+        pipe = self.redis.pipeline(transaction=False)
+        for entry_id, fields in entries:
+            pipe.xadd(
+                self.dead_letter_key,
+                {**(fields or {}), "source_id": entry_id, "group": self.group},
+                maxlen=self.stream.maxlen,
+                approximate=True
+            )
+        pipe.xack(self.stream.stream_key, self.group, *[entry_id for entry_id, _ in entries])
+        await pipe.execute()
+
+        self.stats["dead_lettered"] += len(entries)
+        logger.warning(f"⚠️ {self.group}: {len(entries)} entradas movidas a {self.dead_letter_key}")
+
+    async def _process(self, entries: List[Tuple[str, Optional[Dict[str, str]]]]) -> int:
+        if not entries:
+            return 0
+
+        events = []
+        for _, fields in entries:
+            event = EventStream.decode_entry(fields)
+            if event is None:
+                # Recortada por MAXLEN o inválida: se confirma sin procesar
+                self.stats["invalid"] += 1
+            else:
+                events.append(event)
+
+        self.stats["batches"] += 1
+
+        if events:
+            try:
+                await self.handler(events)
+            except Exception as e:
+                # Sin XACK: el batch se reclamará tras claim_idle_ms
+                self.stats["failed_batches"] += 1
+                self.stats["last_error"] = str(e)
+                logger.warning(f"Handler de {self.group} falló ({len(events)} eventos): {e}")
+                return 0
+
+        await self.redis.xack(self.stream.stream_key, self.group, *[entry_id for entry_id, _ in entries])
+        self.stats["processed"] += len(events)
+        self.stats["acked"] += len(entries)
+        return len(events)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "group": self.group,
+            "consumer": self.consumer_name,
+            "running": bool(self._task and not self._task.done()),
+            **self.stats
+        }
+
+
+# ============================================================================
+# HANDLERS DE LOS GRUPOS
+# ============================================================================
+
+def create_retail_handler(retail_recommender) -> EventHandler:
+    """
+    Reenvía a Retail API los eventos del endpoint de tracking.
+
+    ``record_user_event`` devuelve ``{"status": "error"}`` en lugar de lanzar
+    (incluida la cola del writer llena): se convierte en excepción para que el
+    batch no se confirme y se reintente.
+    """
+
+    async def handle(events: List[Dict[str, Any]]):
+        for event in events:
+            data = event.get("data") or {}
+            if not data.get("retail_event_type"):
+                continue
+            result = await retail_recommender.record_user_event(
+                user_id=event["user_id"],
+                event_type=data["retail_event_type"],
+                product_id=data.get("product_id"),
+                recommendation_id=data.get("recommendation_id"),
+                purchase_amount=data.get("purchase_amount")
+            )
+            if (result or {}).get("status") != "success":
+                raise RuntimeError(f"Retail API rejected event {event.get('event_id')}: {(result or {}).get('error')}")
+
+    return handle
+
+
+def create_analytics_handler(metrics) -> EventHandler:
+    """Registra la interacción en las métricas de recomendación."""
+
+    async def handle(events: List[Dict[str, Any]]):
+        for event in events:
+            data = event.get("data") or {}
+            if not data.get("retail_event_type"):
+                continue
+            metrics.record_user_interaction(
+                user_id=event["user_id"],
+                product_id=data.get("product_id"),
+                event_type=data["retail_event_type"],
+                recommendation_id=data.get("recommendation_id")
+            )
+
+    return handle
@@ -14,9 +14,95 @@ import time
 from typing import List, Dict, Optional, Set, Any
 from datetime import datetime
 
+from src.api.core.product_cache import ProductCache
+
 logger = logging.getLogger(__name__)
 
-class HybridRecommender:
+
+async def get_content_recommendations_batch(
+    content_recommender,
+    product_ids: List[str],
+    n_recommendations: int,
+    exclude_ids: Optional[List[str]] = None
+) -> List[Dict]:
+    """
+    Recomendaciones de contenido para varias semillas, compartidas por los recomendadores híbridos.
+    
+    Usa get_recommendations_batch del recomendador de contenido (una sola
+    pasada sobre el catálogo); si no está disponible, consulta semilla a
+    semilla y conserva el mejor score por producto.
+    
+    Returns:
+        Lista de recomendaciones sin enriquecer (vacía si hay error)
+    """
+    try:
+        if hasattr(content_recommender, 'get_recommendations_batch'):
+            return await content_recommender.get_recommendations_batch(
+                product_ids, n_recommendations, exclude_ids=exclude_ids
+            )
+        
+        excluded = {str(pid) for pid in product_ids} | {str(pid) for pid in exclude_ids or []}
+        best: Dict[str, Dict] = {}
+        for product_id in product_ids:
+            for rec in await content_recommender.get_recommendations(product_id, n_recommendations + len(excluded)):
+                rec_id = str(rec.get("id", ""))
+                if rec_id in excluded:
+                    continue
+                if rec_id not in best or rec.get("similarity_score", 0) > best[rec_id].get("similarity_score", 0):
+                    best[rec_id] = rec
+        return sorted(
+            best.values(), key=lambda r: r.get("similarity_score", 0), reverse=True
+        )[:n_recommendations]
+    except Exception as e:
+        logger.error(f"Error al obtener recomendaciones batch basadas en contenido: {str(e)}")
+        return []
+
+
+class BatchRecommendationsMixin:
+    """
+    get_recommendations_batch común a los recomendadores híbridos.
+    
+    Requiere ``content_recommender``, ``product_cache`` y
+    ``_enrich_recommendations`` en la clase que lo usa.
+    """
+    
+    async def get_recommendations_batch(
+        self,
+        product_ids: List[str],
+        n_recommendations: int = 5,
+        exclude_ids: Optional[List[str]] = None,
+        user_id: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Obtiene recomendaciones "productos como estos" para varias semillas.
+        
+        Las candidatas salen de get_content_recommendations_batch y se
+        enriquecen con la caché de productos si está disponible.
+        
+        Args:
+            product_ids: IDs de los productos semilla (carrito, turno de conversación)
+            n_recommendations: Número de recomendaciones a devolver
+            exclude_ids: IDs a excluir (p.ej. productos ya mostrados)
+            user_id: ID del usuario (para enriquecimiento y logging)
+            
+        Returns:
+            List[Dict]: Lista única de productos recomendados
+        """
+        if not product_ids:
+            return []
+        
+        logger.info(f"Solicitando recomendaciones batch: seeds={len(product_ids)}, n={n_recommendations}, excluidos={len(exclude_ids or [])}")
+        
+        recommendations = await get_content_recommendations_batch(
+            self.content_recommender, product_ids, n_recommendations, exclude_ids
+        )
+        
+        if self.product_cache and recommendations:
+            return await self._enrich_recommendations(recommendations, user_id)
+        return recommendations
+
+
+class HybridRecommender(BatchRecommendationsMixin):
     """
     Versión base del recomendador híbrido que combina recomendaciones
     basadas en contenido y basadas en comportamiento.
@@ -407,11 +493,21 @@ class HybridRecommender:
         # Extraer IDs de productos
         product_ids = [rec.get("id") for rec in recommendations if rec.get("id")]
         
-        # Precargar productos
-        try:
-            await self.product_cache.preload_products(product_ids)
-        except Exception as e:
-            logger.error(f"Error al precargar productos: {str(e)}")
+        # Con ProductCache todos los productos se obtienen en una sola llamada
+        # (un MGET + un pipeline para los misses); otras cachés, uno a uno
+        batch_products = None
+        if isinstance(self.product_cache, ProductCache):
+            try:
+                fetched = await self.product_cache.get_products(product_ids)
+                batch_products = {str(pid): product for pid, product in zip(product_ids, fetched)}
+            except Exception as e:
+                logger.error(f"Error obteniendo productos en batch: {str(e)}")
+        else:
+            # Precargar productos
+            try:
+                await self.product_cache.preload_products(product_ids)
+            except Exception as e:
+                logger.error(f"Error al precargar productos: {str(e)}")
         
         enriched_recommendations = []
         
@@ -425,7 +521,10 @@ class HybridRecommender:
             
             try:
                 # Obtener información completa del producto usando la caché
-                product = await self.product_cache.get_product(product_id)
+                if batch_products is not None:
+                    product = batch_products.get(str(product_id))
+                else:
+                    product = await self.product_cache.get_product(product_id)
                 
                 if product:
                     # Enriquecer con datos del producto
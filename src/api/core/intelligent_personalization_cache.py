@@ -15,10 +15,12 @@ import time
 import hashlib
 import logging
 import asyncio
-from typing import Dict, List, Optional, Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from dataclasses import dataclass
 
 from src.api.core.diversity_aware_cache import DiversityAwareCache, create_diversity_aware_cache
+from src.api.core.semantic_query_index import IndexedQuery, SemanticQueryIndex
+from src.api.core.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +49,9 @@ class IntelligentPersonalizationCache:
     1. Diversity-aware caching: Preserva diversificación conversacional
     2. Dynamic TTL: Ajusta TTL según conversation velocity
     3. Semantic intent extraction: No over-normalization
+    4. Near-duplicate lookup: ante un miss exacto, busca queries parafraseadas
+       (similitud TF-IDF) del mismo usuario y contexto; en el primer turno,
+       respuestas de otros usuarios del mismo mercado con un ajuste ligero
     """
     
     def __init__(
@@ -55,7 +60,11 @@ class IntelligentPersonalizationCache:
         default_ttl: int = 300,
         diversity_cache: Optional[DiversityAwareCache] = None,  # ✅ NEW: Constructor injection
         local_catalog: Optional[Any] = None,  # ✅ NEW: Fallback option
-        product_cache: Optional[Any] = None   # ✅ NEW: Fallback option
+        product_cache: Optional[Any] = None,  # ✅ NEW: Fallback option
+        query_index: Optional[SemanticQueryIndex] = None,
+        enable_semantic_lookup: bool = True,
+        market_fallback_threshold: float = 0.9,
+        single_flight_redis_lock: bool = False
     ):
         """
         Inicializa cache de personalización.
@@ -68,6 +77,12 @@ class IntelligentPersonalizationCache:
             diversity_cache: ✅ PREFERIDO - DiversityAwareCache ya configurado (enterprise)
             local_catalog: Fallback si diversity_cache no provisto
             product_cache: Fallback alternativo
+            query_index: Índice semántico de queries cacheadas; si no se provee se
+                construye con el vectorizador TF-IDF del catálogo local (si existe)
+            enable_semantic_lookup: Buscar near-duplicates tras un miss exacto
+            market_fallback_threshold: Similitud mínima para reutilizar la respuesta
+                de otro usuario del mismo mercado
+            single_flight_redis_lock: Coalescer personalizaciones también entre workers
             
         Constructor Injection Pattern:
             Si diversity_cache es provisto, usa eso (enterprise factory path).
@@ -104,6 +119,19 @@ class IntelligentPersonalizationCache:
             else:
                 logger.warning("   → Categories will use FALLBACK hardcoded (no catalog available)")
         
+        # ✅ Near-duplicate lookup con el vectorizador TF-IDF del catálogo
+        if query_index is None and enable_semantic_lookup:
+            catalog = getattr(self.diversity_cache, "local_catalog", None)
+            if catalog is not None and hasattr(catalog, "vectorizer"):
+                query_index = SemanticQueryIndex(lambda: getattr(catalog, "vectorizer", None))
+        self.query_index = query_index if enable_semantic_lookup else None
+        self.market_fallback_threshold = market_fallback_threshold
+        
+        # Una sola personalización (llamada a Claude) en vuelo por cache key
+        self.personalization_flight = SingleFlight(
+            "personalization", redis_service=redis_service if single_flight_redis_lock else None
+        )
+        
         # Mantener compatibilidad con código existente
         self.redis = redis_service
         self.default_ttl = default_ttl
@@ -114,7 +142,9 @@ class IntelligentPersonalizationCache:
             "cache_hits": 0,
             "cache_misses": 0,
             "time_saved_ms": 0,
-            "cache_operations": 0
+            "cache_operations": 0,
+            "semantic_hits": 0,
+            "market_fallback_hits": 0
         }
         
         logger.info("✅ IntelligentPersonalizationCache initialized successfully")
@@ -164,7 +194,7 @@ class IntelligentPersonalizationCache:
         user_id: str,
         query: str,
         context: Dict[str, Any],
-        similarity_threshold: float = 0.8  # Mantener firma para compatibilidad
+        similarity_threshold: float = 0.8
     ) -> Optional[Dict[str, Any]]:
         """
         ✅ MIGRATED: Usa diversity-aware cache strategy
@@ -173,6 +203,10 @@ class IntelligentPersonalizationCache:
         - Preserva diversificación conversacional (0% overlap)
         - Mejora cache hit rate (target 60-70%)
         - Optimiza performance (<1s en cache hits)
+        
+        Si no hay hit exacto y el índice semántico está activo, prueba una
+        query casi duplicada (similitud >= similarity_threshold) del mismo
+        usuario y contexto y, después, el fallback de mercado.
         """
         start_time = time.time()
         
@@ -193,6 +227,12 @@ class IntelligentPersonalizationCache:
                 logger.debug(f"   Response time: {cached_response.get('_response_time_ms', 0):.0f}ms")
                 
                 return cached_response
+            
+            near_duplicate = await self._get_near_duplicate(user_id, query, context, similarity_threshold)
+            if near_duplicate:
+                self.stats["cache_hits"] += 1
+                self.stats["time_saved_ms"] += (time.time() - start_time) * 1000
+                return near_duplicate
             else:
                 # Cache miss
                 self.stats["cache_misses"] += 1
@@ -232,6 +272,7 @@ class IntelligentPersonalizationCache:
             
             if success:
                 self.stats["cache_operations"] += 1
+                self._index_cached_query(user_id, query, context, ttl)
                 logger.info(f"✅ Cached personalization with diversity-awareness for user {user_id}")
             else:
                 logger.warning(f"⚠️ Failed to cache personalization for user {user_id}")
@@ -242,6 +283,34 @@ class IntelligentPersonalizationCache:
             logger.error(f"❌ Error caching response: {e}")
             return False
     
+    async def coalesce_personalization(
+        self,
+        user_id: str,
+        query: str,
+        context: Dict[str, Any],
+        loader: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Ejecuta ``loader`` (personalizar + cachear) una sola vez por cache key.
+        
+        Requests concurrentes que fallaron en cache para la misma key
+        diversity-aware comparten el resultado en lugar de llamar cada una a
+        Claude. Con lock en Redis, otros workers esperan a que la respuesta se
+        publique en cache y la leen de allí.
+        
+        Returns:
+            Respuesta de personalización (formato de ``loader``)
+        """
+        cache_key = self.diversity_cache.cache_key_from_components(
+            self.diversity_cache.get_key_components(user_id, query, context)
+        )
+        
+        async def recheck() -> Optional[Dict[str, Any]]:
+            entry = await self.diversity_cache.get_cached_by_key(cache_key)
+            return entry.get("response") if entry else None
+        
+        return await self.personalization_flight.do(cache_key, loader, recheck=recheck)
+    
     async def _get_cache_entry(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """Obtiene entrada de cache específica"""
         if not self.redis:
@@ -287,22 +356,155 @@ class IntelligentPersonalizationCache:
             logger.warning(f"⚠️ Cache set error for key {cache_key}: {e}")
             return False
     
-    async def _get_similar_entries(self, pattern: str, query: str, threshold: float) -> List[Dict[str, Any]]:
-        """Encuentra entradas similares usando pattern matching"""
-        # Implementación simplificada - en producción usar similarity search más avanzado
-        return []
+    # ------------------------------------------------------------------
+    # Near-duplicate lookup
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _compatible_intent(candidate: str, intent: str) -> bool:
+        """Un follow-up solo reutiliza el mismo tipo de follow-up; una inicial, cualquier inicial"""
+        if candidate.startswith("follow_up") or intent.startswith("follow_up"):
+            return candidate == intent
+        return True
     
-    async def _get_market_fallback(self, pattern: str, user_id: str) -> List[Dict[str, Any]]:
-        """Obtiene respuestas de otros usuarios del mismo mercado como fallback"""
-        # Implementación simplificada
-        return []
+    def _index_cached_query(self, user_id: str, query: str, context: Dict[str, Any], ttl: Optional[int]):
+        """Registra la query recién cacheada en el índice semántico"""
+        if self.query_index is None:
+            return
+        try:
+            components = self.diversity_cache.get_key_components(user_id, query, context)
+            self.query_index.add(IndexedQuery(
+                cache_key=self.diversity_cache.cache_key_from_components(components),
+                user_id=user_id,
+                market_id=components["market"],
+                query=query,
+                intent=components["intent"],
+                turn_number=components["turn"],
+                excluded_hash=components["excluded"],
+                expires_at=time.time() + (ttl if ttl is not None else self.default_ttl)
+            ))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not index cached query: {e}")
+    
+    async def _get_near_duplicate(
+        self,
+        user_id: str,
+        query: str,
+        context: Dict[str, Any],
+        threshold: float
+    ) -> Optional[Dict[str, Any]]:
+        """Near-duplicate del mismo usuario o, en su defecto, fallback de mercado"""
+        if self.query_index is None:
+            return None
+        try:
+            components = self.diversity_cache.get_key_components(user_id, query, context)
+            
+            similar = await self._get_similar_entries(user_id, query, components, threshold)
+            if similar:
+                self.stats["semantic_hits"] += 1
+                logger.info(f"✅ Near-duplicate cache hit for user {user_id} (similarity {similar[0]['_similarity']:.2f})")
+                return similar[0]
+            
+            market_entries = await self._get_market_fallback(user_id, query, components)
+            if market_entries:
+                self.stats["market_fallback_hits"] += 1
+                logger.info(f"✅ Market fallback cache hit for user {user_id} in {components['market']}")
+                return await self._adapt_market_response(market_entries[0], user_id, context)
+        except Exception as e:
+            logger.warning(f"⚠️ Near-duplicate lookup failed: {e}")
+        return None
+    
+    async def _fetch_indexed_entries(self, matches, limit: int = 1) -> List[Dict[str, Any]]:
+        """Lee de Redis las entradas encontradas en el índice (ignora las ya expiradas)"""
+        entries = []
+        for similarity, indexed in matches:
+            cached = await self.diversity_cache.get_cached_by_key(indexed.cache_key)
+            if not cached:
+                continue
+            cached["_cache_hit"] = True
+            cached["_cache_key"] = indexed.cache_key
+            cached["_semantic_hit"] = True
+            cached["_similarity"] = round(similarity, 4)
+            cached["_matched_query"] = indexed.query
+            entries.append(cached)
+            if len(entries) >= limit:
+                break
+        return entries
+    
+    async def _get_similar_entries(
+        self,
+        user_id: str,
+        query: str,
+        components: Dict[str, Any],
+        threshold: float
+    ) -> List[Dict[str, Any]]:
+        """
+        Respuestas cacheadas del mismo usuario para queries parafraseadas.
+        
+        Solo se reutilizan entradas del mismo turn y mismo set de productos
+        excluidos, para no romper la diversificación conversacional.
+        """
+        def same_context(entry: IndexedQuery) -> bool:
+            return (
+                entry.user_id == user_id
+                and entry.turn_number == components["turn"]
+                and entry.excluded_hash == components["excluded"]
+                and self._compatible_intent(entry.intent, components["intent"])
+            )
+        
+        matches = self.query_index.search(query, components["market"], threshold, predicate=same_context)
+        return await self._fetch_indexed_entries(matches)
+    
+    async def _get_market_fallback(
+        self,
+        user_id: str,
+        query: str,
+        components: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Respuestas de otros usuarios del mismo mercado como fallback.
+        
+        Solo en requests iniciales (turn 1, sin productos mostrados), donde la
+        respuesta no depende del historial conversacional del usuario.
+        """
+        if components["turn"] != 1 or components["excluded"] != "no_exclusions":
+            return []
+        
+        def initial_from_other_user(entry: IndexedQuery) -> bool:
+            return (
+                entry.user_id != user_id
+                and entry.turn_number == 1
+                and entry.excluded_hash == "no_exclusions"
+                and self._compatible_intent(entry.intent, components["intent"])
+            )
+        
+        matches = self.query_index.search(
+            query, components["market"], self.market_fallback_threshold, predicate=initial_from_other_user
+        )
+        return await self._fetch_indexed_entries(matches)
     
     async def _adapt_market_response(self, market_response: Dict[str, Any], user_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
         """Adapta respuesta de mercado para el usuario específico"""
         # Personalización ligera sin llamar a Claude
-        adapted_response = market_response.copy()
-        adapted_response["personalization_metadata"]["adapted_from_market"] = True
-        adapted_response["personalization_metadata"]["adaptation_user"] = user_id
+        # Las entradas de DiversityAwareCache anidan la respuesta en "response"
+        nested = isinstance(market_response.get("response"), dict)
+        payload = dict(market_response["response"] if nested else market_response)
+        shown = {str(pid) for pid in context.get("shown_products", [])}
+        if shown and payload.get("personalized_recommendations"):
+            payload["personalized_recommendations"] = [
+                rec for rec in payload["personalized_recommendations"] if str(rec.get("id")) not in shown
+            ]
+        metadata = dict(payload.get("personalization_metadata") or {})
+        metadata["adapted_from_market"] = True
+        metadata["adaptation_user"] = user_id
+        metadata["cached_response"] = True
+        payload["personalization_metadata"] = metadata
+        
+        if nested:
+            adapted_response = {**market_response, "user_id": user_id, "response": payload}
+        else:
+            adapted_response = payload
+        adapted_response["_adapted_from_market"] = True
         return adapted_response
     
     def _calculate_intelligent_ttl(self, response: Dict[str, Any], context: Dict[str, Any]) -> int:
@@ -343,6 +545,11 @@ class IntelligentPersonalizationCache:
             "total_misses": self.stats["cache_misses"],
             "time_saved_ms": self.stats["time_saved_ms"],
             "cache_operations": self.stats["cache_operations"],
+            "semantic_hits": self.stats["semantic_hits"],
+            "market_fallback_hits": self.stats["market_fallback_hits"],
+            "semantic_index": self.query_index.get_stats() if self.query_index else None,
+            "coalesced_requests": self.personalization_flight.stats["coalesced"] + self.personalization_flight.stats["remote_coalesced"],
+            "single_flight": self.personalization_flight.get_stats(),
             "estimated_performance_improvement": f"{(self.stats['time_saved_ms'] / 3000) * 100:.1f}%",
             
             # ✅ NUEVO: Diversity-aware metrics
@@ -360,6 +567,8 @@ class IntelligentPersonalizationCache:
         """
         try:
             deleted_count = await self.diversity_cache.invalidate_user_cache(user_id)
+            if self.query_index is not None:
+                self.query_index.remove_user(user_id)
             logger.info(f"✅ Invalidated {deleted_count} cache entries for user {user_id}")
             return deleted_count
         except Exception as e:
@@ -0,0 +1,116 @@
+"""
+Keyword Matcher - Búsqueda multi-patrón de keywords (Aho-Corasick)
+==================================================================
+
+Compila un mapping ``categoría -> keywords`` en un autómata Aho-Corasick
+para localizar, en una sola pasada sobre el texto, la categoría con alguna
+keyword contenida como substring.
+
+Semántica equivalente al bucle anidado::
+
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            if keyword and keyword in text:
+                return category
+
+es decir, gana la PRIMERA categoría (en orden del mapping) con alguna
+coincidencia, no la coincidencia más a la izquierda del texto. Cada estado
+del autómata guarda el rango mínimo de categoría de las keywords que
+terminan en él (incluyendo las alcanzables por enlaces de fallo), así que
+``match`` es O(longitud del texto) independientemente del número de keywords.
+
+Author: Senior Architecture Team
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, Optional
+
+_NO_MATCH = -1
+
+
+class KeywordMatcher:
+    """
+    Autómata Aho-Corasick inmutable sobre las keywords de cada categoría.
+    """
+
+    __slots__ = ("categories", "keyword_count", "_goto", "_fail", "_rank")
+
+    def __init__(self, categories: Mapping[str, Iterable[str]]):
+        """
+        Args:
+            categories: Mapping categoría -> keywords (se esperan en minúsculas)
+        """
+        self.categories: List[str] = list(categories.keys())
+        self._goto: List[Dict[str, int]] = [{}]
+        self._rank: List[int] = [_NO_MATCH]
+        self._fail: List[int] = [0]
+
+        seen = set()
+        for rank, keywords in enumerate(categories.values()):
+            for keyword in keywords or ():
+                if keyword:
+                    seen.add(keyword)
+                    self._insert(keyword, rank)
+        self.keyword_count = len(seen)
+
+        self._build_failure_links()
+
+    def _insert(self, keyword: str, rank: int):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._rank.append(_NO_MATCH)
+                self._fail.append(0)
+            state = next_state
+
+        current = self._rank[state]
+        if current == _NO_MATCH or rank < current:
+            self._rank[state] = rank
+
+    def _build_failure_links(self):
+        """BFS estándar; propaga a cada estado el rango mínimo de su cadena de fallo."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+
+                inherited = self._rank[self._fail[child]]
+                if inherited != _NO_MATCH and (self._rank[child] == _NO_MATCH or inherited < self._rank[child]):
+                    self._rank[child] = inherited
+
+    def match(self, text: str) -> Optional[str]:
+        """
+        Categoría de menor rango con alguna keyword contenida en ``text``.
+
+        Returns:
+            Nombre de la categoría o None si ninguna keyword aparece
+        """
+        goto, fail, rank = self._goto, self._fail, self._rank
+        best = _NO_MATCH
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            found = rank[state]
+            if found != _NO_MATCH and (best == _NO_MATCH or found < best):
+                best = found
+                if best == 0:
+                    break
+
+        return self.categories[best] if best != _NO_MATCH else None
+
+    def __len__(self) -> int:
+        return self.keyword_count
@@ -18,6 +18,7 @@ Version: 2.0.0 - Parallel Processing Implementation
 Date: 2025-09-01
 """
 
+import copy
 import os
 import time
 import logging
@@ -34,13 +35,37 @@ from src.api.core.parallel_processor import (
 logger = logging.getLogger(__name__)
 
 
+def _interleave_recommendations(
+    primary: List[Dict[str, Any]],
+    secondary: List[Dict[str, Any]],
+    n: int
+) -> List[Dict[str, Any]]:
+    """
+    Alterna dos listas de recomendaciones sin duplicados, empezando por ``primary``.
+
+    Se usa para combinar las recomendaciones de las semillas con las
+    diversificadas, de modo que ninguna de las dos fuentes desplace a la otra.
+    """
+    merged: List[Dict[str, Any]] = []
+    seen_ids = set()
+    for index in range(max(len(primary), len(secondary))):
+        for source in (primary, secondary):
+            if index < len(source):
+                rec_id = str(source[index].get("id", ""))
+                if rec_id not in seen_ids:
+                    seen_ids.add(rec_id)
+                    merged.append(source[index])
+    return merged[:n]
+
+
 async def get_mcp_conversation_recommendations(
     validated_user_id: str,
     validated_product_id: Optional[str],
     conversation_query: str,
     market_id: str,
     n_recommendations: int = 5,
-    session_id: Optional[str] = None
+    session_id: Optional[str] = None,
+    seed_product_ids: Optional[List[str]] = None
 ) -> Dict[str, Any]:
     """
     ✅ ARQUITECTURA PARALELA: HybridRecommender + MCPPersonalizationEngine + ParallelProcessor
@@ -58,6 +83,8 @@ async def get_mcp_conversation_recommendations(
         market_id: ID del mercado (US, ES, MX, etc.)
         n_recommendations: Número de recomendaciones a obtener
         session_id: ID de sesión opcional
+        seed_product_ids: Productos semilla opcionales ("productos como estos");
+            se resuelven en una sola llamada batch al recomendador
         
     Returns:
         Dict con recommendations, ai_response y metadata (incluyendo parallel metrics)
@@ -129,7 +156,11 @@ async def get_mcp_conversation_recommendations(
             try:
                 from src.api.mcp.conversation_state_manager import get_conversation_state_manager
                 state_manager = await get_conversation_state_manager()
-                fresh_context = await state_manager.load_conversation_state(mcp_context.session_id)
+                # Modo delta: la cabecera dice si hay turnos nuevos sin materializar el historial
+                persisted_turns = await state_manager.get_persisted_turn_count(mcp_context.session_id)
+                fresh_context = None
+                if persisted_turns is None or persisted_turns > mcp_context.total_turns:
+                    fresh_context = await state_manager.load_conversation_state(mcp_context.session_id)
                 if fresh_context and fresh_context.total_turns > mcp_context.total_turns:
                     mcp_context = fresh_context  # Update with fresher context
                     logger.info(f"🔄 Context refreshed: now has {mcp_context.total_turns} turns")
@@ -187,6 +218,20 @@ async def get_mcp_conversation_recommendations(
                 from src.api import main_unified_redis
                 if hasattr(main_unified_redis, 'hybrid_recommender') and main_unified_redis.hybrid_recommender:
                     
+                    # ✅ Semillas múltiples: una sola pasada batch en lugar de una llamada por producto
+                    seed_recommendations = []
+                    if seed_product_ids and hasattr(main_unified_redis.hybrid_recommender, 'get_recommendations_batch'):
+                        seed_recommendations = await main_unified_redis.hybrid_recommender.get_recommendations_batch(
+                            product_ids=seed_product_ids,
+                            n_recommendations=n_recommendations,
+                            exclude_ids=list(shown_products),
+                            user_id=validated_user_id
+                        )
+                        logger.info(f"✅ Batch recommendations obtained: {len(seed_recommendations)} items from {len(seed_product_ids)} seeds")
+                        # Sin historial no hay diversificación: las semillas bastan
+                        if seed_recommendations and not use_diversification:
+                            return seed_recommendations
+                    
                     if use_diversification:
                         # ✅ NUEVO: Usar fallback inteligente con exclusión de productos ya vistos
                         try:
@@ -261,12 +306,20 @@ async def get_mcp_conversation_recommendations(
                             
                             logger.info(f"✅ Diversified recommendations obtained: {len(recommendations)} items")
                             logger.info(f"   Context used: {len(user_events)} historical events, excluded {len(shown_products)} seen products")
+                            if seed_recommendations:
+                                recommendations = _interleave_recommendations(
+                                    seed_recommendations, recommendations, n_recommendations
+                                )
+                                logger.info(f"   Interleaved with {len(seed_recommendations)} seed-based recommendations")
                             return recommendations
                             
                         except Exception as div_e:
                             logger.warning(f"⚠️ Diversification failed, using standard recommendations: {div_e}")
                             # Fallback to standard recommendations
                     
+                    if seed_recommendations:
+                        return seed_recommendations
+                    
                     # Standard recommendations (primera llamada o fallback)
                     recommendations = await main_unified_redis.hybrid_recommender.get_recommendations(
                         user_id=validated_user_id,
@@ -478,44 +531,65 @@ async def get_mcp_conversation_recommendations(
                     # ✅ PASO 2: Cache miss - ejecutar personalización OPTIMIZADA
                     logger.info("🧠 Applying OPTIMIZED MCP personalization (cache miss)...")
                     
-                    try:
-                        # ✅ NUEVA OPTIMIZACIÓN: Usar Claude optimizer
-                        from src.api.core.claude_optimization import get_claude_optimizer
+                    # Una sola personalización en vuelo por cache key: requests
+                    # concurrentes idénticas comparten la llamada a Claude
+                    async def personalize_and_cache():
+                        try:
+                            # ✅ NUEVA OPTIMIZACIÓN: Usar Claude optimizer
+                            from src.api.core.claude_optimization import get_claude_optimizer
                         
-                        claude_optimizer = get_claude_optimizer(mcp_engine.anthropic_client if hasattr(mcp_engine, 'anthropic_client') else None)
+                            claude_optimizer = get_claude_optimizer(mcp_engine.anthropic_client if hasattr(mcp_engine, 'anthropic_client') else None)
                         
-                        # Preparar contexto optimizado
-                        optimized_context = {
-                            "conversation_history": [],  # Simplificado para speed
-                            "market_id": market_id,
-                            "user_preferences": {}  # Simplificado
-                        }
+                            # Preparar contexto optimizado
+                            optimized_context = {
+                                "conversation_history": [],  # Simplificado para speed
+                                "market_id": market_id,
+                                "user_preferences": {}  # Simplificado
+                            }
                         
-                        # Llamada optimizada con múltiples estrategias de speed
-                        personalization_result = await asyncio.wait_for(
-                            claude_optimizer.generate_optimized_personalization(
-                                user_context=optimized_context,
-                                recommendations=base_recommendations,
-                                query=conversation_query,
-                                market_id=market_id
-                            ),
-                            timeout=1.5  # ✅ MÁS AGRESIVO: 2s → 1.5s con optimizaciones
-                        )
+                            # Llamada optimizada con múltiples estrategias de speed
+                            personalization_result = await asyncio.wait_for(
+                                claude_optimizer.generate_optimized_personalization(
+                                    user_context=optimized_context,
+                                    recommendations=base_recommendations,
+                                    query=conversation_query,
+                                    market_id=market_id
+                                ),
+                                timeout=1.5  # ✅ MÁS AGRESIVO: 2s → 1.5s con optimizaciones
+                            )
                         
-                        logger.info("✅ Claude optimization successful")
+                            logger.info("✅ Claude optimization successful")
                         
-                    except (ImportError, AttributeError) as e:
-                        logger.warning(f"⚠️ Claude optimizer not available, using standard approach: {e}")
+                        except (ImportError, AttributeError) as e:
+                            logger.warning(f"⚠️ Claude optimizer not available, using standard approach: {e}")
                         
-                        # Fallback a método original pero con timeout reducido
-                        personalization_result = await asyncio.wait_for(
-                            mcp_engine.generate_personalized_response(
-                                mcp_context=mcp_context,
-                                recommendations=base_recommendations
-                            ),
-                            timeout=1.5  # ✅ TIMEOUT REDUCIDO: 2s → 1.5s
+                            # Fallback a método original pero con timeout reducido
+                            personalization_result = await asyncio.wait_for(
+                                mcp_engine.generate_personalized_response(
+                                    mcp_context=mcp_context,
+                                    recommendations=base_recommendations
+                                ),
+                                timeout=1.5  # ✅ TIMEOUT REDUCIDO: 2s → 1.5s
+                            )
+
+                        # ✅ PASO 3: Cachear resultado para futuras requests
+                        await personalization_cache.cache_personalization_response(
+                            user_id=validated_user_id,
+                            query=conversation_query,
+                            context=cache_context,
+                            response=personalization_result,
+                            ttl=300  # 5 minutos
                         )
-                    
+                        return personalization_result
+
+                    # Las requests coalescidas reciben el mismo dict: copia propia antes de modificarla
+                    personalization_result = copy.deepcopy(await personalization_cache.coalesce_personalization(
+                        user_id=validated_user_id,
+                        query=conversation_query,
+                        context=cache_context,
+                        loader=personalize_and_cache
+                    ))
+
                     # Actualizar respuesta con datos personalizados
                     final_response.update({
                         "recommendations": personalization_result.get("personalized_recommendations", base_recommendations),
@@ -550,16 +624,7 @@ async def get_mcp_conversation_recommendations(
                         except Exception as state_prep_e:
                             logger.warning(f"⚠️ Failed to prepare recommendation IDs for router: {state_prep_e}")
                             final_response["metadata"]["recommendation_ids"] = []
-                    
-                    # ✅ PASO 3: Cachear resultado para futuras requests
-                    await personalization_cache.cache_personalization_response(
-                        user_id=validated_user_id,
-                        query=conversation_query,
-                        context=cache_context,
-                        response=personalization_result,
-                        ttl=300  # 5 minutos
-                    )
-                    
+
                     logger.info("✅ MCP personalization completed and cached successfully")
                     
             except asyncio.TimeoutError:
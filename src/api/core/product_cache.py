@@ -2,10 +2,20 @@
 Sistema de caché híbrido para productos con Redis y fallback a otras fuentes.
 
 Proporciona acceso a información de productos desde múltiples fuentes:
+- L1 en proceso (LRU acotado por tamaño y TTL, para los productos más calientes)
 - Redis (primario para rendimiento)
 - Catálogo local (fallback)
 - Shopify (fallback secundario)
 - Gateway de productos externos (fallback terciario)
+
+Las consultas a fuentes remotas (Shopify/gateway) pasan por un SingleFlight:
+requests concurrentes que fallan en cache para el mismo producto comparten
+una sola llamada.
+
+Con ``stale_while_revalidate_seconds`` > 0, ``ttl_seconds`` pasa a ser el TTL
+soft: los productos más antiguos se siguen sirviendo desde Redis mientras se
+refrescan en segundo plano, y Redis los conserva hasta el TTL hard
+(``ttl_seconds + stale_while_revalidate_seconds``).
 """
 
 import logging
@@ -18,9 +28,20 @@ import os
 from datetime import datetime, timedelta
 from collections import defaultdict
 import random
+import uuid
+
+from cachetools import TTLCache
+
+from src.api.core.cache_codec import CacheCodec, CodecError
+from src.api.core.redis_service import RedisService, index_key
+from src.api.core.single_flight import SingleFlight
+from src.api.core.stale_while_revalidate import StaleWhileRevalidate
 
 logger = logging.getLogger(__name__)
 
+# Marca de escritura guardada junto al producto en Redis (solo con stale-while-revalidate)
+CACHED_AT_FIELD = "_cached_at"
+
 class ProductCache:
     """
     Sistema de caché híbrido para productos con Redis y fallback a otras fuentes.
@@ -33,7 +54,13 @@ class ProductCache:
         shopify_client=None, 
         product_gateway=None,
         ttl_seconds=3600,
-        prefix="product:"
+        prefix="product:",
+        l1_max_size=1000,
+        l1_ttl_seconds=60,
+        invalidation_channel="product_cache:invalidations",
+        codec: Optional[CacheCodec] = None,
+        single_flight_redis_lock: bool = False,
+        stale_while_revalidate_seconds: int = 0
     ):
         """
         Inicializa el sistema de caché de productos.
@@ -45,6 +72,14 @@ class ProductCache:
             product_gateway: Gateway para productos externos (opcional)
             ttl_seconds: Tiempo de vida en caché (segundos)
             prefix: Prefijo para claves en Redis
+            l1_max_size: Productos máximos en la caché L1 en proceso (0 = desactivada)
+            l1_ttl_seconds: Tiempo de vida en L1; acota la obsolescencia si se
+                pierde un mensaje de invalidación
+            invalidation_channel: Canal pub/sub de Redis para invalidar L1 en otros workers
+            codec: Codec de serialización de valores en Redis (por defecto según entorno)
+            single_flight_redis_lock: Coalescer también entre workers con un lock corto en Redis
+            stale_while_revalidate_seconds: Ventana tras ``ttl_seconds`` en la que un
+                producto caducado se sirve mientras se refresca en segundo plano (0 = desactivado)
         """
         self.redis = redis_service
         self.local_catalog = local_catalog
@@ -52,6 +87,17 @@ class ProductCache:
         self.product_gateway = product_gateway
         self.ttl_seconds = ttl_seconds
         self.prefix = prefix
+        # Índice secundario de claves de producto (listado sin KEYS)
+        self._index_key = index_key(prefix)
+        self.codec = codec or CacheCodec.from_env()
+        # Una sola consulta remota en vuelo por producto
+        self._remote_flight = SingleFlight(
+            "product", redis_service=redis_service if single_flight_redis_lock else None
+        )
+        # TTL soft (ttl_seconds) / hard (expiración en Redis)
+        self._revalidation = StaleWhileRevalidate(
+            "product", soft_ttl_seconds=ttl_seconds, stale_ttl_seconds=stale_while_revalidate_seconds
+        )
         
         self.stats = {
             "redis_hits": 0,
@@ -59,9 +105,23 @@ class ProductCache:
             "local_catalog_hits": 0,
             "shopify_hits": 0,
             "gateway_hits": 0,  # Nueva estadística para gateway
+            "l1_hits": 0,
+            "l1_misses": 0,
+            "l1_invalidations_received": 0,
             "total_failures": 0,
             "total_requests": 0
         }
+        
+        # L1 en proceso delante de Redis: evita round-trip + json.loads de los
+        # productos más accedidos. Los productos devueltos desde L1 son
+        # compartidos y deben tratarse como solo lectura.
+        self.l1_ttl_seconds = l1_ttl_seconds
+        self._l1: Optional[TTLCache] = (
+            TTLCache(maxsize=l1_max_size, ttl=l1_ttl_seconds) if l1_max_size > 0 else None
+        )
+        self.invalidation_channel = invalidation_channel
+        self._instance_id = uuid.uuid4().hex  # Para ignorar nuestras propias invalidaciones
+        self.invalidation_task = None
         # Nuevos atributos para warm-up inteligente
         self.access_frequency = defaultdict(int)  # Frecuencia de acceso por producto
         self.last_access = {}  # Último acceso por producto
@@ -87,15 +147,22 @@ class ProductCache:
             if not self.redis:
                 return []
             
-            # Usar pattern o default
-            search_pattern = pattern or f"{self.prefix}*"
+            # Sin patrón: índice secundario (O(productos cacheados), sin KEYS)
+            if not pattern and hasattr(self.redis, 'index_members'):
+                keys = await self.redis.index_members(self._index_key)
+                # Claves anteriores al índice: SCAN (registrándolas en él) hasta
+                # que el namespace quede marcado como migrado
+                legacy_keys = await self.redis.adopt_unindexed(
+                    self._index_key, f"{self.prefix}*", key_filter=self._is_product_key
+                )
+                keys = list(dict.fromkeys([*keys, *legacy_keys]))
             
-            # Get keys usando Redis
-            if hasattr(self.redis, 'keys'):
-                keys = await self.redis.keys(search_pattern)
+            # Patrón explícito: SCAN por cursor
+            elif hasattr(self.redis, 'scan_iter'):
+                search_pattern = pattern or f"{self.prefix}*"
+                keys = [key async for key in self.redis.scan_iter(search_pattern)]
             else:
-                # Fallback si no hay método keys
-                return []
+                keys = []
             
             # Extraer IDs de productos
             product_ids = []
@@ -104,9 +171,7 @@ class ProductCache:
                     key = key.decode('utf-8')
                 
                 # Solo incluir keys de productos, no de metadata
-                if key.startswith(self.prefix) and not any(
-                    exclude in key for exclude in ['recent_products_', 'popular_', 'stats_']
-                ):
+                if self._is_product_key(key):
                     product_id = key.replace(self.prefix, '')
                     if product_id:
                         product_ids.append(product_id)
@@ -117,10 +182,27 @@ class ProductCache:
             logger.error(f"Error obteniendo cached product IDs: {e}")
             return []
 
+    def _is_product_key(self, key: str) -> bool:
+        """Clave de producto del namespace (no de metadata como popular_/stats_)."""
+        return key.startswith(self.prefix) and not any(
+            exclude in key for exclude in ['recent_products_', 'popular_', 'stats_']
+        )
+
     async def start_background_tasks(self):
         """Inicia tareas en segundo plano."""
         self.health_task = asyncio.create_task(self._periodic_health_check())
+        if self._l1 is not None and self.invalidation_channel:
+            self.invalidation_task = asyncio.create_task(self._listen_for_invalidations())
         logger.info("Tareas en segundo plano del sistema de caché iniciadas")
+    
+    async def stop_background_tasks(self):
+        """Cancela las tareas en segundo plano."""
+        tasks = [t for t in (self.health_task, self.invalidation_task) if t and not t.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._revalidation.close()
+        logger.info("Tareas en segundo plano del sistema de caché detenidas")
         
     async def _periodic_health_check(self, interval=300):
         """
@@ -160,6 +242,7 @@ class ProductCache:
             return 0
             
         hits = (
+            self.stats.get("l1_hits", 0) + 
             self.stats["redis_hits"] + 
             self.stats["local_catalog_hits"] + 
             self.stats["shopify_hits"] + 
@@ -187,6 +270,11 @@ class ProductCache:
         self.access_frequency[product_id] += 1
         self.last_access[product_id] = datetime.now()
         
+        # 0. L1 en proceso (sin round-trip ni deserialización)
+        l1_product = self._l1_get(product_id)
+        if l1_product is not None:
+            return l1_product
+        
         # 1. Intentar obtener de Redis
         # if self.redis and self.redis._connected:
         #     redis_key = f"{self.prefix}{product_id}"
@@ -194,30 +282,17 @@ class ProductCache:
         if self.redis and self.redis._connected:
             try:
                 redis_key = f"{self.prefix}{product_id}"
-                cached_data = await self.redis.get(redis_key)
+                cached_data = await self._redis_get(redis_key)
             except Exception as e:
                 logger.error(f"Error getting product {product_id} from Redis: {e}")
                 cached_data = None
                 self.stats["redis_misses"] += 1
             
             if cached_data:
-                try:
-                    self.stats["redis_hits"] += 1
-                    logger.debug(f"Cache hit: producto {product_id} obtenido de Redis")
-                    product_data = json.loads(cached_data)
-                    
-                    # Actualizar estadísticas de mercado si está disponible
-                    market_id = getattr(asyncio.current_task(), 'market_context', {}).get('market_id', 'default')
-                    self.market_popularity[market_id][product_id] += 1
-                    
-                    # Actualizar estadísticas de categoría
-                    category = product_data.get('product_type') or product_data.get('category', 'unknown')
-                    self.category_stats[category] += 1
-                    
+                product_data = self._decode_cached_product(product_id, cached_data)
+                if product_data is not None:
+                    self._l1_put(product_id, product_data)
                     return product_data
-                except json.JSONDecodeError:
-                    logger.warning(f"Datos corruptos en Redis para producto {product_id}")
-                    self.stats["redis_misses"] += 1
             else:
                 self.stats["redis_misses"] += 1
         
@@ -231,6 +306,180 @@ class ProductCache:
                 await self._save_to_redis(product_id, local_product)
                 return local_product
         
+        # 3-5. Shopify, gateway y producto mínimo (una sola carga en vuelo por producto)
+        fetched = await self._remote_flight.do(
+            product_id,
+            lambda: self._load_remote_and_cache(product_id),
+            recheck=lambda: self._recheck_redis(product_id)
+        )
+        if fetched:
+            return fetched[0]
+        
+        # Si llegamos aquí, no se encontró el producto
+        self.stats["total_failures"] += 1
+        logger.warning(f"No se pudo encontrar el producto {product_id} en ninguna fuente")
+        return None
+    
+    async def get_products(self, product_ids: List[str], concurrency: int = 10) -> List[Optional[Dict]]:
+        """
+        Obtiene varios productos con el mínimo de round-trips a Redis.
+        
+        - Todos los hits de Redis se resuelven con un único MGET.
+        - Los misses se buscan en el catálogo local y después, en paralelo
+          (limitado por ``concurrency``), en Shopify/gateway.
+        - Los productos del catálogo local se escriben de vuelta en un solo
+          pipeline (SETEX por clave); los remotos los escribe el líder de su
+          single-flight antes de liberarlo, igual que en ``get_product``.
+        
+        Args:
+            product_ids: IDs de productos (se admiten duplicados)
+            concurrency: Máximo de consultas simultáneas a fuentes remotas
+            
+        Returns:
+            Lista alineada con ``product_ids``: producto o None si no se encontró
+        """
+        requested = [str(pid) if pid else "" for pid in (product_ids or [])]
+        unique_ids = list(dict.fromkeys(pid for pid in requested if pid))
+        if not unique_ids:
+            return [None] * len(requested)
+        
+        self.stats["total_requests"] += len(unique_ids)
+        now = datetime.now()
+        for pid in unique_ids:
+            self.access_frequency[pid] += 1
+            self.last_access[pid] = now
+        
+        found: Dict[str, Dict] = {}
+        
+        # 0. L1 en proceso
+        for pid in unique_ids:
+            l1_product = self._l1_get(pid)
+            if l1_product is not None:
+                found[pid] = l1_product
+        redis_ids = [pid for pid in unique_ids if pid not in found]
+        
+        # 1. Redis: un único MGET para los IDs que no están en L1
+        if redis_ids and self.redis and self.redis._connected:
+            keys = [f"{self.prefix}{pid}" for pid in redis_ids]
+            try:
+                cached_values = await self._redis_mget(keys)
+            except Exception as e:
+                logger.error(f"Error en MGET de {len(keys)} productos en Redis: {e}")
+                cached_values = [None] * len(keys)
+            
+            for pid, cached_data in zip(redis_ids, cached_values):
+                if cached_data:
+                    product_data = self._decode_cached_product(pid, cached_data)
+                    if product_data is not None:
+                        found[pid] = product_data
+                        self._l1_put(pid, product_data)
+                else:
+                    self.stats["redis_misses"] += 1
+        
+        # Productos a escribir de vuelta en Redis: id -> (producto, ttl_override)
+        to_cache: Dict[str, tuple] = {}
+        
+        # 2. Catálogo local (en memoria)
+        if self.local_catalog:
+            for pid in unique_ids:
+                if pid in found:
+                    continue
+                local_product = self._get_from_local_catalog(pid)
+                if local_product:
+                    self.stats["local_catalog_hits"] += 1
+                    found[pid] = local_product
+                    to_cache[pid] = (local_product, None)
+        
+        # 3-5. Fuentes remotas en paralelo para los misses restantes
+        remaining = [pid for pid in unique_ids if pid not in found]
+        if remaining:
+            semaphore = asyncio.Semaphore(max(1, concurrency))
+            
+            async def fetch_remote(pid):
+                async with semaphore:
+                    # Coalescido con get_product/get_products/refrescos del mismo producto:
+                    # mismo loader (con escritura) para que ningún seguidor dependa de otro
+                    return await self._remote_flight.do(
+                        pid,
+                        lambda: self._load_remote_and_cache(pid),
+                        recheck=lambda: self._recheck_redis(pid)
+                    )
+            
+            results = await asyncio.gather(*(fetch_remote(pid) for pid in remaining))
+            for pid, fetched in zip(remaining, results):
+                if fetched:
+                    found[pid] = fetched[0]
+                else:
+                    self.stats["total_failures"] += 1
+                    logger.warning(f"No se pudo encontrar el producto {pid} en ninguna fuente")
+        
+        # Escritura de vuelta en un solo pipeline
+        if to_cache:
+            await self._save_many_to_redis(to_cache)
+        
+        return [found.get(pid) for pid in requested]
+    
+    async def cache_products(self, products: List[Dict], ttl_override: Optional[int] = None) -> int:
+        """
+        Guarda en Redis productos ya obtenidos, en un solo pipeline.
+        
+        Args:
+            products: Productos con campo ``id``
+            ttl_override: Tiempo de vida personalizado (opcional)
+            
+        Returns:
+            int: Número de productos guardados
+        """
+        entries = {
+            str(product["id"]): (product, ttl_override)
+            for product in products or []
+            if product and product.get("id")
+        }
+        if not entries:
+            return 0
+        return await self._save_many_to_redis(entries)
+    
+    def _decode_cached_product(self, product_id: str, cached_data) -> Optional[Dict]:
+        """
+        Deserializa un producto leído de Redis y registra el hit.
+        
+        Returns:
+            Dict con el producto, o None si los datos están corruptos (cuenta como miss)
+        """
+        try:
+            product_data = self.codec.decode(cached_data)
+        except CodecError:
+            logger.warning(f"Datos corruptos en Redis para producto {product_id}")
+            self.stats["redis_misses"] += 1
+            return None
+        
+        self.stats["redis_hits"] += 1
+        logger.debug(f"Cache hit: producto {product_id} obtenido de Redis")
+        
+        # Pasado el TTL soft se sirve igualmente y se refresca en segundo plano
+        cached_at = product_data.pop(CACHED_AT_FIELD, None)
+        self._revalidation.revalidate_if_stale(
+            product_id, cached_at, lambda: self._reload_product(product_id)
+        )
+        
+        # Actualizar estadísticas de mercado si está disponible
+        market_id = getattr(asyncio.current_task(), 'market_context', {}).get('market_id', 'default')
+        self.market_popularity[market_id][product_id] += 1
+        
+        # Actualizar estadísticas de categoría
+        category = product_data.get('product_type') or product_data.get('category', 'unknown')
+        self.category_stats[category] += 1
+        
+        return product_data
+    
+    async def _get_from_remote_sources(self, product_id: str) -> Optional[tuple]:
+        """
+        Busca un producto en Shopify, el gateway y, como último recurso, crea
+        un producto mínimo. No escribe en Redis (lo hace el llamador).
+        
+        Returns:
+            Tupla (producto, ttl_override) o None si no se encontró
+        """
         # 3. Intentar obtener de Shopify
         if self.shopify_client:
             try:
@@ -238,9 +487,7 @@ class ProductCache:
                 if shopify_product:
                     self.stats["shopify_hits"] += 1
                     logger.debug(f"Producto {product_id} obtenido de Shopify")
-                    # Guardar en Redis para futuras consultas
-                    await self._save_to_redis(product_id, shopify_product)
-                    return shopify_product
+                    return shopify_product, None
             except Exception as e:
                 logger.error(f"Error obteniendo producto {product_id} de Shopify: {str(e)}")
                 logger.debug(f"Traceback: {traceback.format_exc()}")
@@ -253,18 +500,14 @@ class ProductCache:
                 if gateway_product:
                     self.stats["gateway_hits"] += 1
                     logger.info(f"Producto {product_id} obtenido de Retail API mediante gateway")
-                    # Guardar en Redis para futuras consultas
-                    await self._save_to_redis(product_id, gateway_product)
-                    return gateway_product
+                    return gateway_product, None
                     
                 # Si no está en Retail API, probar con otras fuentes externas
                 external_product = await self.product_gateway.get_product_from_external_api(product_id)
                 if external_product:
                     self.stats["gateway_hits"] += 1
                     logger.info(f"Producto {product_id} obtenido de API externo mediante gateway")
-                    # Guardar en Redis para futuras consultas
-                    await self._save_to_redis(product_id, external_product)
-                    return external_product
+                    return external_product, None
             except Exception as e:
                 logger.error(f"Error obteniendo producto {product_id} del gateway: {str(e)}")
                 logger.debug(f"Traceback: {traceback.format_exc()}")
@@ -280,15 +523,38 @@ class ProductCache:
                 "variants": [{"price": "0.0"}],
                 "_is_minimal": True  # Marcar como producto mínimo
             }
-            # Guardar en Redis con TTL más corto para forzar actualización pronto
-            await self._save_to_redis(product_id, minimal_product, ttl_override=300)  # 5 minutos
-            return minimal_product
+            # TTL más corto para forzar actualización pronto
+            return minimal_product, 300  # 5 minutos
         
-        # Si llegamos aquí, no se encontró el producto
-        self.stats["total_failures"] += 1
-        logger.warning(f"No se pudo encontrar el producto {product_id} en ninguna fuente")
         return None
     
+    async def _load_remote_and_cache(self, product_id: str) -> Optional[tuple]:
+        """Consulta fuentes remotas y guarda el resultado en Redis antes de liberar el single-flight."""
+        fetched = await self._get_from_remote_sources(product_id)
+        if fetched:
+            remote_product, ttl_override = fetched
+            await self._save_to_redis(product_id, remote_product, ttl_override=ttl_override)
+        return fetched
+    
+    async def _reload_product(self, product_id: str) -> Optional[tuple]:
+        """Refresco en segundo plano: mismas fuentes que un miss, coalescido con cargas en curso."""
+        if self.local_catalog:
+            local_product = self._get_from_local_catalog(product_id)
+            if local_product:
+                await self._save_to_redis(product_id, local_product)
+                return local_product, None
+        return await self._remote_flight.do(product_id, lambda: self._load_remote_and_cache(product_id))
+    
+    async def _recheck_redis(self, product_id: str) -> Optional[tuple]:
+        """Producto publicado en Redis por otro worker mientras se esperaba su lock."""
+        if not (self.redis and self.redis._connected):
+            return None
+        cached_data = await self._redis_get(f"{self.prefix}{product_id}")
+        if not cached_data:
+            return None
+        product_data = self._decode_cached_product(product_id, cached_data)
+        return (product_data, None) if product_data is not None else None
+    
     def _get_from_local_catalog(self, product_id: str) -> Optional[Dict]:
         """
         Obtiene un producto del catálogo local.
@@ -359,62 +625,127 @@ class ProductCache:
         Returns:
             bool: True si la operación fue exitosa, False en caso contrario
         """
+        self._l1_put(product_id, product_data)
+        
         # if not self.redis or not self.redis.is_connected():
         if not self.redis or not self.redis._connected:
             return False
             
         try:
             redis_key = f"{self.prefix}{product_id}"
-            json_data = json.dumps(product_data)
-            ttl = ttl_override if ttl_override is not None else self.ttl_seconds
+            encoded = self.codec.encode(self._with_cache_timestamp(product_data))
+            ttl = ttl_override if ttl_override is not None else self._revalidation.hard_ttl_seconds
             # return await self.redis.set(redis_key, json_data, ex=ttl)
-            return await self.redis.set(redis_key, json_data, ttl=ttl)
+            return await self.redis.set(redis_key, encoded, ttl=ttl, indexes=[self._index_key])
         except Exception as e:
             logger.error(f"Error guardando producto {product_id} en Redis: {str(e)}")
             logger.debug(f"Traceback: {traceback.format_exc()}")
             return False
     
-    async def preload_products(self, product_ids: List[str], concurrency: int = 5):
+    def _with_cache_timestamp(self, product_data: Dict) -> Dict:
+        """Copia del producto con su marca de escritura, si hay stale-while-revalidate."""
+        if not self._revalidation.enabled:
+            return product_data
+        return {**product_data, CACHED_AT_FIELD: time.time()}
+    
+    async def _redis_get(self, key: str):
+        """GET; con RedisService se leen bytes sin decodificar (valores del codec)."""
+        if isinstance(self.redis, RedisService):
+            return await self.redis.get(key, raw=True)
+        return await self.redis.get(key)
+    
+    async def _redis_mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """MGET en un round-trip; degrada a GETs concurrentes si el cliente no lo soporta."""
+        if isinstance(self.redis, RedisService):
+            return await self.redis.mget(keys, raw=True)
+        mget = getattr(self.redis, "mget", None)
+        if mget is not None:
+            return await mget(keys)
+        return await asyncio.gather(*(self._redis_get(key) for key in keys))
+    
+    async def _save_many_to_redis(self, entries: Dict[str, tuple]) -> int:
+        """
+        Guarda varios productos en Redis con un pipeline por TTL.
+        
+        Args:
+            entries: id -> (producto, ttl_override)
+            
+        Returns:
+            int: Número de productos guardados
+        """
+        for product_id, (product_data, _) in entries.items():
+            self._l1_put(product_id, product_data)
+        
+        if not self.redis or not self.redis._connected or not entries:
+            return 0
+        
+        # Agrupar por TTL: normalmente un solo grupo (productos mínimos usan TTL corto)
+        by_ttl: Dict[int, Dict[str, Any]] = defaultdict(dict)
+        for product_id, (product_data, ttl_override) in entries.items():
+            ttl = ttl_override if ttl_override is not None else self._revalidation.hard_ttl_seconds
+            try:
+                by_ttl[ttl][f"{self.prefix}{product_id}"] = self.codec.encode(self._with_cache_timestamp(product_data))
+            except (TypeError, ValueError) as e:
+                logger.error(f"Error serializando producto {product_id}: {str(e)}")
+        
+        saved = 0
+        for ttl, mapping in by_ttl.items():
+            try:
+                if hasattr(self.redis, "mset_with_ttl"):
+                    if await self.redis.mset_with_ttl(mapping, ttl=ttl, indexes=[self._index_key]):
+                        saved += len(mapping)
+                else:
+                    for key, value in mapping.items():
+                        if await self.redis.set(key, value, ttl=ttl):
+                            saved += 1
+            except Exception as e:
+                logger.error(f"Error guardando {len(mapping)} productos en Redis: {str(e)}")
+                logger.debug(f"Traceback: {traceback.format_exc()}")
+        
+        return saved
+    
+    async def preload_products(self, product_ids: List[str], concurrency: int = 5, batch_size: int = 100):
         """
         Precarga múltiples productos en la caché.
         
+        Usa get_products por lotes: un MGET por lote y un pipeline para
+        escribir los misses, en lugar de un GET/SET por producto.
+        
         Args:
             product_ids: Lista de IDs de productos a precargar
-            concurrency: Nivel de concurrencia máximo
+            concurrency: Nivel de concurrencia máximo para fuentes remotas
+            batch_size: Productos por lote (un MGET por lote)
         """
         if not product_ids:
             return
-            
-        # Usar semáforo para limitar concurrencia
-        semaphore = asyncio.Semaphore(concurrency)
         
-        async def load_with_semaphore(pid):
-            async with semaphore:
-                await self.get_product(pid)
-        
-        # Crear y ejecutar tareas en paralelo
-        tasks = [load_with_semaphore(pid) for pid in product_ids]
-        await asyncio.gather(*tasks)
+        for i in range(0, len(product_ids), batch_size):
+            await self.get_products(product_ids[i:i + batch_size], concurrency=concurrency)
         
         logger.info(f"Precargados {len(product_ids)} productos en caché")
     
-    async def invalidate(self, product_id: str) -> bool:
+    async def invalidate(self, product_id: str, publish: bool = True) -> bool:
         """
-        Invalida un producto en la caché.
+        Invalida un producto en la caché (L1 local, Redis y L1 de otros workers).
         
         Args:
             product_id: ID del producto a invalidar
+            publish: Notificar a otros workers por pub/sub
             
         Returns:
             bool: True si se invalidó correctamente, False en caso contrario
         """
+        self._l1_discard([product_id])
+        
         if not self.redis or not self.redis._connected:
             return False
             
         try:
             redis_key = f"{self.prefix}{product_id}"
-            await self.redis.delete(redis_key)
+            await self.redis.delete(redis_key, indexes=[self._index_key])
             logger.debug(f"Producto {product_id} invalidado en caché")
+            if publish:
+                await self._publish_invalidation([product_id])
             return True
         except Exception as e:
             logger.error(f"Error invalidando producto {product_id} en Redis: {str(e)}")
@@ -422,24 +753,126 @@ class ProductCache:
     
     async def invalidate_multiple(self, product_ids: List[str]) -> int:
         """
-        Invalida múltiples productos en la caché.
+        Invalida múltiples productos en la caché con un solo DELETE.
         
         Args:
             product_ids: Lista de IDs de productos a invalidar
             
         Returns:
-            int: Número de productos invalidados correctamente
+            int: Número de productos eliminados de Redis
         """
-        if not self.redis or not self.redis._connected:
+        self._l1_discard(product_ids)
+        
+        if not product_ids or not self.redis or not self.redis._connected:
             return 0
-            
-        success_count = 0
+        
+        deleted = await self.redis.delete_many(
+            [f"{self.prefix}{pid}" for pid in product_ids],
+            indexes=[self._index_key]
+        )
+        
+        # Un único mensaje para todo el lote
+        await self._publish_invalidation(product_ids)
+                
+        logger.info(f"Invalidados {deleted}/{len(product_ids)} productos en caché")
+        return deleted
+    
+    # ===========================================
+    # L1 EN PROCESO + INVALIDACIÓN PUB/SUB
+    # ===========================================
+    
+    def _l1_get(self, product_id: str) -> Optional[Dict]:
+        """Busca en L1 y registra hit/miss (un hit cuenta como acierto de caché)."""
+        if self._l1 is None:
+            return None
+        product = self._l1.get(str(product_id))
+        if product is None:
+            self.stats["l1_misses"] += 1
+            return None
+        self.stats["l1_hits"] += 1
+        return product
+    
+    def _l1_put(self, product_id: str, product_data: Optional[Dict]) -> None:
+        """Guarda un producto en L1 (TTLCache expulsa por LRU al llenarse)."""
+        if self._l1 is not None and product_data:
+            self._l1[str(product_id)] = product_data
+    
+    def _l1_discard(self, product_ids: List[str]) -> int:
+        """Elimina productos de L1. Devuelve cuántos estaban presentes."""
+        if self._l1 is None:
+            return 0
+        removed = 0
         for pid in product_ids:
-            if await self.invalidate(pid):
-                success_count += 1
+            if self._l1.pop(str(pid), None) is not None:
+                removed += 1
+        return removed
+    
+    async def _publish_invalidation(self, product_ids: List[str]) -> None:
+        """Publica una invalidación para que otros workers limpien su L1."""
+        if not product_ids or not self.invalidation_channel or not hasattr(self.redis, "publish"):
+            return
+        try:
+            message = json.dumps({"origin": self._instance_id, "ids": [str(pid) for pid in product_ids]})
+            await self.redis.publish(self.invalidation_channel, message)
+        except Exception as e:
+            # Sin pub/sub el TTL de L1 acota la obsolescencia en otros workers
+            logger.warning(f"No se pudo publicar invalidación de {len(product_ids)} productos: {e}")
+    
+    def _handle_invalidation_message(self, data: Any) -> int:
+        """
+        Aplica un mensaje de invalidación recibido por pub/sub.
+        
+        Returns:
+            int: Productos eliminados de L1
+        """
+        try:
+            if isinstance(data, bytes):
+                data = data.decode("utf-8")
+            payload = json.loads(data)
+        except (ValueError, UnicodeDecodeError):
+            logger.warning(f"Mensaje de invalidación no válido: {str(data)[:100]}")
+            return 0
+        
+        if payload.get("origin") == self._instance_id:
+            return 0
+        
+        self.stats["l1_invalidations_received"] += 1
+        return self._l1_discard(payload.get("ids", []))
+    
+    async def _listen_for_invalidations(self, retry_delay: float = 5.0):
+        """Escucha el canal de invalidaciones y reconecta si se pierde la suscripción."""
+        if not hasattr(self.redis, "pubsub"):
+            logger.info("RedisService sin pub/sub: L1 se invalidará solo por TTL en otros workers")
+            return
+        
+        logger.info(f"Escuchando invalidaciones de L1 en canal {self.invalidation_channel}")
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub()
+                if pubsub is None:
+                    await asyncio.sleep(retry_delay)
+                    continue
                 
-        logger.info(f"Invalidados {success_count}/{len(product_ids)} productos en caché")
-        return success_count
+                await pubsub.subscribe(self.invalidation_channel)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._handle_invalidation_message(message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Suscripción de invalidaciones perdida: {e}")
+                # Lo que se publicó mientras tanto se pierde: vaciar L1 por seguridad
+                if self._l1 is not None:
+                    self._l1.clear()
+                await asyncio.sleep(retry_delay)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.unsubscribe(self.invalidation_channel)
+                        await pubsub.close()
+                    except Exception:
+                        pass
     
     def get_stats(self) -> Dict:
         """
@@ -449,6 +882,7 @@ class ProductCache:
             Dict con estadísticas
         """
         total_hits = (
+            self.stats.get("l1_hits", 0) + 
             self.stats["redis_hits"] + 
             self.stats["local_catalog_hits"] + 
             self.stats["shopify_hits"] + 
@@ -464,6 +898,18 @@ class ProductCache:
             "local_catalog_hits": self.stats["local_catalog_hits"],
             "shopify_hits": self.stats["shopify_hits"],
             "gateway_hits": self.stats["gateway_hits"],  # Incluir hits del gateway
+            "l1": {
+                "enabled": self._l1 is not None,
+                "hits": self.stats.get("l1_hits", 0),
+                "misses": self.stats.get("l1_misses", 0),
+                "size": len(self._l1) if self._l1 is not None else 0,
+                "max_size": self._l1.maxsize if self._l1 is not None else 0,
+                "ttl_seconds": self.l1_ttl_seconds,
+                "invalidations_received": self.stats.get("l1_invalidations_received", 0)
+            },
+            "codec": self.codec.get_stats(),
+            "single_flight": self._remote_flight.get_stats(),
+            "stale_while_revalidate": self._revalidation.get_stats(),
             "total_failures": self.stats["total_failures"],
             "ttl_seconds": self.ttl_seconds,
             "access_frequency_top10": dict(sorted(self.access_frequency.items(), key=lambda x: x[1], reverse=True)[:10]),
@@ -145,9 +145,13 @@ class OptimizedRedisConfig:
 # 🔧 INTEGRATION FUNCTIONS - Para usar en ServiceFactory y RedisService
 # ============================================================================
 
-async def create_optimized_redis_client():
+async def create_optimized_redis_client(**overrides):
     """
     ✅ Factory function para crear cliente Redis optimizado
+    
+    Args:
+        **overrides: kwargs de redis.from_url() que sustituyen a los optimizados
+            (p.ej. ``socket_timeout=None`` para lecturas bloqueantes)
     """
     if not REDIS_AVAILABLE:
         raise ImportError("Redis no disponible - instalar: pip install redis[asyncio]")
@@ -160,6 +164,7 @@ async def create_optimized_redis_client():
     # Construir URL y kwargs optimizados
     redis_url = OptimizedRedisConfig.build_optimized_redis_url(config)
     redis_kwargs = OptimizedRedisConfig.get_optimized_redis_kwargs(config)
+    redis_kwargs.update(overrides)
     
     # Crear cliente con configuración optimizada
     client = await redis.from_url(redis_url, **redis_kwargs)
@@ -5,27 +5,190 @@ Redis Service Layer - Arquitectura Enterprise
 Capa de abstracción para operaciones Redis que proporciona:
 - Connection pooling automático
 - Error handling consistente  
-- Observabilidad integrada
+- Observabilidad integrada (incluye histogramas de latencia por comando)
 - Preparación para microservicios
 
+Los comandos no hacen PING previo: la conexión se da por buena hasta que un
+comando falla o la sonda de salud en segundo plano detecta la caída, y la
+reconexión respeta el circuit breaker de ServiceFactory.
+
+Índices secundarios: las escrituras pueden registrar su clave en uno o más
+sorted sets ``idx:<namespace>`` (score = instante de expiración), de modo que
+listar o invalidar un namespace no necesita KEYS ni recorrer todo el keyspace.
+
 Author: Senior Architecture Team
 """
 
 import asyncio
 import logging
 import json
-from typing import Optional, Any, Dict
+import sys
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from typing import Optional, Any, AsyncIterator, Callable, Dict, List
 from datetime import datetime
 import time
+import uuid
+
+from redis.asyncio import Redis as AsyncRedis
+from redis.client import NEVER_DECODE
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 
 from src.api.core.redis_config_optimized import create_optimized_redis_client
 
 logger = logging.getLogger(__name__)
 
+INDEX_KEY_PREFIX = "idx:"
+# Marcador "namespace sin claves legacy" junto a cada índice (ver delete_indexed)
+INDEX_MIGRATED_SUFFIX = "#migrated"
+
+# Errores que indican que la conexión está caída; cualquier otro (p.ej. un
+# UnicodeDecodeError al decodificar un valor) es un fallo del propio comando
+CONNECTION_ERRORS = (RedisConnectionError, RedisTimeoutError, ConnectionError, asyncio.TimeoutError)
+
+# Borra el lock solo si el valor sigue siendo el token del propietario
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def index_key(namespace: str) -> str:
+    """Clave del índice secundario (sorted set) de un namespace de claves."""
+    return f"{INDEX_KEY_PREFIX}{namespace}"
+
+
+async def get_raw(client: Any, key: str) -> Optional[bytes]:
+    """
+    GET sin decodificar: el cliente usa decode_responses=True y los valores
+    binarios del codec de caché no son UTF-8 válido.
+    """
+    if isinstance(client, AsyncRedis):
+        return await client.execute_command("GET", key, **{NEVER_DECODE: True})
+    return await client.get(key)
+
+
+async def mget_raw(client: Any, keys: List[str]) -> List[Optional[bytes]]:
+    """MGET sin decodificar (ver ``get_raw``)."""
+    if isinstance(client, AsyncRedis):
+        return await client.execute_command("MGET", *keys, **{NEVER_DECODE: True})
+    return await client.mget(keys)
+
+
+async def execute_raw(client: Any, *args) -> Any:
+    """Comando arbitrario (HGET, LRANGE...) con respuesta sin decodificar (ver ``get_raw``)."""
+    if isinstance(client, AsyncRedis):
+        return await client.execute_command(*args, **{NEVER_DECODE: True})
+    return await client.execute_command(*args)
+
+
 class RedisServiceError(Exception):
     """Base exception para errores de Redis Service"""
     pass
 
+
+class LatencyHistogram:
+    """
+    Histograma de latencias con buckets fijos en milisegundos.
+    
+    Los percentiles se estiman con el límite superior del bucket que los
+    contiene (como histogram_quantile de Prometheus, sin interpolar).
+    """
+    
+    BUCKETS_MS = (0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+    
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)  # último bucket: +Inf
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+    
+    def observe(self, elapsed_ms: float):
+        self.counts[bisect_left(self.BUCKETS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+    
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        threshold = q * self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.BUCKETS_MS, self.counts):
+            cumulative += bucket_count
+            if cumulative >= threshold:
+                return float(bound)
+        return self.max_ms
+    
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.BUCKETS_MS, self.counts):
+            cumulative += bucket_count
+            buckets[f"le_{bound}"] = cumulative
+        buckets["le_inf"] = self.count
+        
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": buckets
+        }
+
+class RedisPipeline:
+    """
+    Cola de comandos para ``RedisService.pipeline()``.
+    
+    Acepta los comandos de datos de ``COMMANDS`` (``setex``, ``sadd``,
+    ``expire``...) y los encola; se envían en un solo round-trip al salir
+    del bloque ``async with``. Un nombre desconocido lanza AttributeError al
+    encolarlo, en lugar de fallar en silencio dentro del pipeline. Tras la
+    salida, ``results`` contiene un resultado por comando (``None`` en todos
+    si Redis no estaba disponible) y ``succeeded`` indica si el pipeline
+    llegó a ejecutarse.
+    """
+    
+    COMMANDS = frozenset({
+        # strings y claves
+        "get", "set", "setex", "psetex", "setnx", "mget", "mset", "incr", "incrby",
+        "decr", "decrby", "delete", "unlink", "exists", "expire", "pexpire",
+        "expireat", "persist", "ttl", "pttl",
+        # hashes
+        "hget", "hset", "hmget", "hgetall", "hdel", "hexists", "hincrby", "hlen",
+        # listas
+        "lpush", "rpush", "lrange", "ltrim", "llen", "lrem",
+        # sets y sorted sets
+        "sadd", "srem", "smembers", "scard", "sismember",
+        "zadd", "zrem", "zrange", "zrangebyscore", "zremrangebyscore", "zscore", "zcard",
+        # streams y pub/sub
+        "xadd", "xack", "xtrim", "publish"
+    })
+    
+    def __init__(self, transaction: bool = False):
+        self.transaction = transaction
+        self.commands: List[tuple] = []
+        self.results: List[Any] = []
+        self.succeeded = False
+    
+    def __getattr__(self, command: str):
+        if command not in self.COMMANDS:
+            raise AttributeError(f"Comando no soportado en RedisPipeline: {command}")
+        
+        def enqueue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+        
+        return enqueue
+    
+    def __len__(self) -> int:
+        return len(self.commands)
+
+
 class RedisService:
     """
     🏗️ ENTERPRISE REDIS SERVICE
@@ -37,6 +200,15 @@ class RedisService:
     _instance: Optional['RedisService'] = None
     _connection_lock = asyncio.Lock()
     
+    # Sonda de salud en segundo plano y espera mínima entre reconexiones
+    HEALTH_PROBE_INTERVAL = 10.0
+    RECONNECT_MIN_INTERVAL = 1.0
+    
+    # Vigencia del marcador de migración de un índice (≥ TTL de las claves legacy)
+    INDEX_MIGRATION_MARKER_TTL = 7 * 24 * 3600
+    # Intervalo mínimo entre comprobaciones de las claves sin TTL de un índice
+    INDEX_SWEEP_INTERVAL = 300.0
+    
     def __init__(self):
         self._client: Optional[Any] = None  # Redis standard client
         self._connected = False
@@ -50,6 +222,11 @@ class RedisService:
             "cache_misses": 0,
             "connection_errors": 0
         }
+        self._latency: Dict[str, LatencyHistogram] = {}
+        self._probe_task: Optional[asyncio.Task] = None
+        self._probe_interval = self.HEALTH_PROBE_INTERVAL
+        self._last_probe: Optional[Dict[str, Any]] = None
+        self._index_sweeps: Dict[str, float] = {}
     
     @classmethod
     async def get_instance(cls) -> 'RedisService':
@@ -80,9 +257,10 @@ class RedisService:
             self._client = await create_optimized_redis_client()
             
             # ✅ VALIDATION: Verificar conexión inmediatamente
-            await self._client.ping()
+            await self._timed("ping", self._client.ping())
             self._connected = True
             self._connection_attempts += 1
+            self._last_connection_attempt = time.time()
             
             logger.info("✅ RedisService initialized with optimized Redis client")
             logger.info("   ✅ Connection pooling: Active")
@@ -98,10 +276,11 @@ class RedisService:
     
     async def _ensure_connection(self) -> bool:
         """
-        ✅ OPTIMIZED: Conexión simplificada para cliente optimizado
+        ✅ OPTIMIZED: Comprobación de conexión sin round-trip
         
-        El cliente optimizado maneja connection pooling y reconnections automáticamente.
-        Solo verificamos si el cliente está disponible y responde.
+        Con la conexión marcada como activa no se envía PING: los fallos se
+        detectan en el propio comando (``_on_command_error``) o en la sonda
+        de salud. Solo si está marcada como caída se intenta reconectar.
         
         Returns:
             bool: True si la conexión está activa
@@ -110,28 +289,149 @@ class RedisService:
             logger.warning("⚠️ No Redis client available")
             return False
         
-        try:
-            # ✅ SIMPLE VALIDATION: El cliente optimizado maneja reconexiones
-            await self._client.ping()
-            
-            if not self._connected:
-                self._connected = True
-                logger.debug("✅ Redis connection verified and updated")
-            
+        if self._connected:
             return True
-            
+        
+        return await self._reconnect()
+    
+    async def _reconnect(self) -> bool:
+        """
+        🔄 Reconexión con PING, limitada por el circuit breaker de ServiceFactory
+        y por RECONNECT_MIN_INTERVAL para no martillear un Redis caído.
+        """
+        if self._is_circuit_open():
+            return False
+        
+        now = time.time()
+        if now - self._last_connection_attempt < self.RECONNECT_MIN_INTERVAL:
+            return False
+        self._last_connection_attempt = now
+        
+        try:
+            await self._timed("ping", self._client.ping())
         except Exception as e:
-            logger.warning(f"⚠️ Redis connection lost: {e}")
+            logger.warning(f"⚠️ Redis reconnection failed: {e}")
             self._connected = False
             self._stats["connection_errors"] += 1
+            self._record_circuit_failure()
+            return False
+        
+        self._connected = True
+        self._connection_attempts += 1
+        self._reset_circuit_breaker()
+        logger.info("✅ Redis connection re-established")
+        return True
+    
+    def _on_command_error(self, error: BaseException):
+        """
+        Marca la conexión como caída si el error es de conexión o timeout.
+        
+        El siguiente comando intentará reconectar. Los demás errores (tipos
+        incorrectos, valores no decodificables...) no dicen nada de la
+        conexión y no deben bloquear al resto de comandos.
+        """
+        if isinstance(error, CONNECTION_ERRORS):
+            self._connected = False
+    
+    # ------------------------------------------------------------------
+    # Circuit breaker compartido con ServiceFactory
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _service_factory():
+        """ServiceFactory si ya está cargado (sin importarlo: evita el ciclo de imports)."""
+        module = sys.modules.get("src.api.factories.service_factory")
+        return getattr(module, "ServiceFactory", None) if module else None
+    
+    def _is_circuit_open(self) -> bool:
+        factory = self._service_factory()
+        return bool(factory and factory._is_circuit_open())
+    
+    def _record_circuit_failure(self):
+        factory = self._service_factory()
+        if factory:
+            factory._record_circuit_failure()
+    
+    def _reset_circuit_breaker(self):
+        factory = self._service_factory()
+        if factory:
+            factory._reset_circuit_breaker()
+    
+    # ------------------------------------------------------------------
+    # Sonda de salud en segundo plano
+    # ------------------------------------------------------------------
+    
+    def start_health_probe(self, interval: Optional[float] = None):
+        """
+        Inicia la sonda de salud periódica (idempotente).
+        
+        Args:
+            interval: Segundos entre PINGs (por defecto HEALTH_PROBE_INTERVAL)
+        """
+        if interval is not None:
+            self._probe_interval = interval
+        if self._probe_task and not self._probe_task.done():
+            return
+        self._probe_task = asyncio.create_task(self._health_probe_loop())
+        logger.info(f"✅ Redis health probe started (every {self._probe_interval}s)")
+    
+    async def stop_health_probe(self):
+        """Detiene la sonda de salud."""
+        task, self._probe_task = self._probe_task, None
+        if task and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    
+    async def _health_probe_loop(self):
+        while True:
+            await asyncio.sleep(self._probe_interval)
+            await self._probe_once()
+    
+    async def _probe_once(self) -> bool:
+        """Un PING de la sonda; actualiza el estado de conexión y el breaker."""
+        if not self._client:
             return False
+        
+        if not self._connected:
+            ok = await self._reconnect()
+        else:
+            try:
+                await self._timed("ping", self._client.ping())
+                ok = True
+            except Exception as e:
+                logger.warning(f"⚠️ Redis health probe failed: {e}")
+                self._connected = False
+                self._stats["connection_errors"] += 1
+                self._record_circuit_failure()
+                ok = False
+        
+        self._last_probe = {"ok": ok, "timestamp": datetime.now().isoformat()}
+        return ok
+    
+    # ------------------------------------------------------------------
+    # Latencias
+    # ------------------------------------------------------------------
     
-    async def get(self, key: str) -> Optional[str]:
+    async def _timed(self, command: str, awaitable):
+        """Espera ``awaitable`` y registra su latencia en el histograma de ``command``."""
+        start = time.perf_counter()
+        result = await awaitable
+        self._observe_latency(command, (time.perf_counter() - start) * 1000)
+        return result
+    
+    def _observe_latency(self, command: str, elapsed_ms: float):
+        histogram = self._latency.get(command)
+        if histogram is None:
+            histogram = self._latency[command] = LatencyHistogram()
+        histogram.observe(elapsed_ms)
+    
+    async def get(self, key: str, raw: bool = False) -> Optional[str]:
         """
         🔍 GET operation con error handling robusto
         
         Args:
             key: Redis key
+            raw: Devolver bytes sin decodificar (valores del codec de caché)
             
         Returns:
             Valor o None si no existe/error
@@ -144,7 +444,8 @@ class RedisService:
             return None
         
         try:
-            result = await self._client.get(key)
+            command = get_raw(self._client, key) if raw else self._client.get(key)
+            result = await self._timed("get", command)
             self._stats["operations_successful"] += 1
             
             if result is not None:
@@ -158,11 +459,17 @@ class RedisService:
             
         except Exception as e:
             self._stats["operations_failed"] += 1
-            self._connected = False  # Force reconnection next time
+            self._on_command_error(e)  # Force reconnection next time
             logger.debug(f"Redis GET error for key {key}: {e}")
             return None
     
-    async def set(self, key: str, value: str, ttl: Optional[int] = None) -> bool:
+    async def set(
+        self,
+        key: str,
+        value: str,
+        ttl: Optional[int] = None,
+        indexes: Optional[List[str]] = None
+    ) -> bool:
         """
         🔄 SET operation con TTL opcional
         
@@ -170,10 +477,20 @@ class RedisService:
             key: Redis key
             value: Value to store
             ttl: TTL in seconds (optional)
+            indexes: Índices secundarios donde registrar la clave (mismo round-trip)
             
         Returns:
             bool: True if successful
         """
+        if indexes:
+            async with self.pipeline() as pipe:
+                if ttl:
+                    pipe.setex(key, ttl, value)
+                else:
+                    pipe.set(key, value)
+                self._queue_index_add(pipe, indexes, [key], ttl)
+            return pipe.succeeded and bool(pipe.results[0])
+        
         self._stats["operations_total"] += 1
         
         if not await self._ensure_connection():
@@ -183,9 +500,9 @@ class RedisService:
         
         try:
             if ttl:
-                success = await self._client.setex(key, ttl, value)
+                success = await self._timed("set", self._client.setex(key, ttl, value))
             else:
-                success = await self._client.set(key, value)
+                success = await self._timed("set", self._client.set(key, value))
             
             if success:
                 self._stats["operations_successful"] += 1
@@ -197,20 +514,24 @@ class RedisService:
             
         except Exception as e:
             self._stats["operations_failed"] += 1
-            self._connected = False
+            self._on_command_error(e)
             logger.debug(f"Redis SET error for key {key}: {e}")
             return False
     
-    async def delete(self, key: str) -> bool:
+    async def delete(self, key: str, indexes: Optional[List[str]] = None) -> bool:
         """
         🗑️ DELETE operation
         
         Args:
             key: Redis key to delete
+            indexes: Índices secundarios de los que retirar la clave
             
         Returns:
             bool: True if successful
         """
+        if indexes:
+            return await self.delete_many([key], indexes=indexes) > 0
+        
         self._stats["operations_total"] += 1
         
         if not await self._ensure_connection():
@@ -218,17 +539,555 @@ class RedisService:
             return False
         
         try:
-            result = await self._client.delete(key)
+            result = await self._timed("delete", self._client.delete(key))
             self._stats["operations_successful"] += 1
             logger.debug(f"Cache DELETE: {key}")
             return bool(result)
             
         except Exception as e:
             self._stats["operations_failed"] += 1
-            self._connected = False
+            self._on_command_error(e)
             logger.debug(f"Redis DELETE error for key {key}: {e}")
             return False
     
+    async def delete_many(self, keys: List[str], indexes: Optional[List[str]] = None) -> int:
+        """
+        🗑️ DELETE de varias claves en un solo comando
+        
+        Args:
+            keys: Redis keys to delete
+            indexes: Índices secundarios de los que retirar las claves
+            
+        Returns:
+            int: Número de claves eliminadas (0 si falla)
+        """
+        if not keys:
+            return 0
+        
+        if indexes:
+            async with self.pipeline() as pipe:
+                pipe.delete(*keys)
+                for index in indexes:
+                    pipe.zrem(index, *keys)
+            return int(pipe.results[0] or 0) if pipe.succeeded else 0
+        
+        self._stats["operations_total"] += 1
+        
+        if not await self._ensure_connection():
+            self._stats["operations_failed"] += 1
+            logger.debug(f"Redis not available for DELETE ({len(keys)} keys)")
+            return 0
+        
+        try:
+            result = await self._timed("delete", self._client.delete(*keys))
+            self._stats["operations_successful"] += 1
+            logger.debug(f"Cache DELETE: {result}/{len(keys)} keys")
+            return int(result or 0)
+            
+        except Exception as e:
+            self._stats["operations_failed"] += 1
+            self._on_command_error(e)
+            logger.debug(f"Redis DELETE error ({len(keys)} keys): {e}")
+            return 0
+    
+    async def acquire_lock(self, key: str, ttl_ms: int) -> Optional[str]:
+        """
+        🔒 Lock corto (SET NX PX) con token de propietario
+        
+        Args:
+            key: Clave del lock
+            ttl_ms: Expiración del lock en milisegundos (libera locks huérfanos)
+            
+        Returns:
+            Token para release_lock, o None si otro proceso tiene el lock
+            
+        Raises:
+            RedisServiceError: Si Redis no está disponible (el llamador decide
+                si continuar sin lock)
+        """
+        self._stats["operations_total"] += 1
+        
+        if not await self._ensure_connection():
+            self._stats["operations_failed"] += 1
+            raise RedisServiceError(f"Redis not available for lock: {key}")
+        
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self._timed("set", self._client.set(key, token, nx=True, px=ttl_ms))
+        except Exception as e:
+            self._stats["operations_failed"] += 1
+            self._on_command_error(e)
+            raise RedisServiceError(f"Redis lock error for key {key}: {e}") from e
+        
+        self._stats["operations_successful"] += 1
+        return token if acquired else None
+    
+    async def release_lock(self, key: str, token: str) -> bool:
+        """
+        🔓 Libera un lock solo si sigue perteneciendo a ``token`` (compare-and-delete atómico)
+        
+        Returns:
+            bool: True si se liberó; False si expiró, cambió de dueño o hubo error
+        """
+        self._stats["operations_total"] += 1
+        
+        if not await self._ensure_connection():
+            self._stats["operations_failed"] += 1
+            return False
+        
+        try:
+            released = await self._timed(
+                "eval", self._client.eval(RELEASE_LOCK_SCRIPT, 1, key, token)
+            )
+            self._stats["operations_successful"] += 1
+            return bool(released)
+        except Exception as e:
+            self._stats["operations_failed"] += 1
+            self._on_command_error(e)
+            logger.debug(f"Redis lock release error for key {key}: {e}")
+            return False
+    
+    async def mget(self, keys: List[str], raw: bool = False) -> List[Optional[str]]:
+        """
+        🔍 MGET: varias claves en un solo round-trip
+
+        Args:
+            keys: Redis keys
+            raw: Devolver bytes sin decodificar (valores del codec de caché)
+
+        Returns:
+            Lista alineada con keys (None si no existe/error)
+        """
+        if not keys:
+            return []
+
+        self._stats["operations_total"] += 1
+
+        if not await self._ensure_connection():
+            self._stats["operations_failed"] += 1
+            logger.debug(f"Redis not available for MGET ({len(keys)} keys)")
+            return [None] * len(keys)
+
+        try:
+            command = mget_raw(self._client, keys) if raw else self._client.mget(keys)
+            results = list(await self._timed("mget", command))
+            self._stats["operations_successful"] += 1
+
+            hits = sum(1 for value in results if value is not None)
+            self._stats["cache_hits"] += hits
+            self._stats["cache_misses"] += len(keys) - hits
+            logger.debug(f"Cache MGET: {hits}/{len(keys)} hits")
+
+            return results
+
+        except Exception as e:
+            self._stats["operations_failed"] += 1
+            self._on_command_error(e)
+            logger.debug(f"Redis MGET error ({len(keys)} keys): {e}")
+            return [None] * len(keys)
+
+    async def mset_with_ttl(
+        self,
+        mapping: Dict[str, str],
+        ttl: Optional[int] = None,
+        indexes: Optional[List[str]] = None
+    ) -> bool:
+        """
+        🔄 SET de varias claves en un pipeline (SETEX si hay TTL)
+
+        Args:
+            mapping: key -> value
+            ttl: TTL in seconds (optional), común a todas las claves
+            indexes: Índices secundarios donde registrar las claves
+
+        Returns:
+            bool: True if all writes succeeded
+        """
+        if not mapping:
+            return True
+
+        async with self.pipeline() as pipe:
+            for key, value in mapping.items():
+                if ttl:
+                    pipe.setex(key, ttl, value)
+                else:
+                    pipe.set(key, value)
+            if indexes:
+                self._queue_index_add(pipe, indexes, list(mapping), ttl)
+
+        success = pipe.succeeded and all(pipe.results[:len(mapping)])
+        if success:
+            logger.debug(f"Cache MSET: {len(mapping)} keys (TTL: {ttl})")
+        return success
+
+    async def publish(self, channel: str, message: str) -> int:
+        """
+        📢 PUBLISH en un canal pub/sub
+
+        Args:
+            channel: Canal de destino
+            message: Mensaje (string)
+
+        Returns:
+            int: Número de suscriptores que recibieron el mensaje (0 si falla)
+        """
+        self._stats["operations_total"] += 1
+
+        if not await self._ensure_connection():
+            self._stats["operations_failed"] += 1
+            logger.debug(f"Redis not available for PUBLISH to {channel}")
+            return 0
+
+        try:
+            receivers = await self._timed("publish", self._client.publish(channel, message))
+            self._stats["operations_successful"] += 1
+            logger.debug(f"Published to {channel} ({receivers} receivers)")
+            return receivers
+
+        except Exception as e:
+            self._stats["operations_failed"] += 1
+            self._on_command_error(e)
+            logger.debug(f"Redis PUBLISH error for {channel}: {e}")
+            return 0
+
+    def pubsub(self):
+        """
+        📡 Objeto PubSub del cliente para suscribirse a canales
+
+        Returns:
+            PubSub del cliente redis.asyncio, o None si no hay conexión
+        """
+        if not self._client or not self._connected:
+            return None
+        return self._client.pubsub()
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[RedisPipeline]:
+        """
+        📦 Pipeline (o transacción MULTI/EXEC) como context manager
+        
+        Los comandos encolados dentro del bloque se envían en un solo
+        round-trip al salir. Si Redis no está disponible o el pipeline
+        falla no se lanza excepción: ``succeeded`` queda en False.
+        
+        Example:
+            async with redis_service.pipeline() as pipe:
+                pipe.setex("a", 60, "1")
+                pipe.sadd("index", "a")
+            if pipe.succeeded:
+                ...
+        
+        Args:
+            transaction: Envolver los comandos en MULTI/EXEC
+        """
+        batch = RedisPipeline(transaction=transaction)
+        yield batch
+        
+        if not batch.commands:
+            batch.succeeded = True
+            return
+        
+        batch.results = [None] * len(batch.commands)
+        self._stats["operations_total"] += 1
+        
+        if not await self._ensure_connection():
+            self._stats["operations_failed"] += 1
+            logger.debug(f"Redis not available for PIPELINE ({len(batch)} commands)")
+            return
+        
+        try:
+            pipe = self._client.pipeline(transaction=transaction)
+            for command, args, kwargs in batch.commands:
+                getattr(pipe, command)(*args, **kwargs)
+            batch.results = list(await self._timed("pipeline", pipe.execute()))
+            batch.succeeded = True
+            self._stats["operations_successful"] += 1
+            
+        except Exception as e:
+            self._stats["operations_failed"] += 1
+            self._on_command_error(e)
+            logger.debug(f"Redis PIPELINE error ({len(batch)} commands): {e}")
+    
+    async def scan_iter(self, pattern: str, count: int = 500) -> AsyncIterator[str]:
+        """
+        🔎 Itera claves con SCAN (cursor, no bloquea Redis como KEYS)
+        
+        Args:
+            pattern: Patrón glob de Redis
+            count: Pista de tamaño de lote por iteración de SCAN
+            
+        Yields:
+            Claves que coinciden; se detiene silenciosamente si Redis falla
+        """
+        self._stats["operations_total"] += 1
+        
+        if not await self._ensure_connection():
+            self._stats["operations_failed"] += 1
+            logger.debug(f"Redis not available for SCAN: {pattern}")
+            return
+        
+        try:
+            async for key in self._client.scan_iter(match=pattern, count=count):
+                yield key
+            self._stats["operations_successful"] += 1
+            
+        except Exception as e:
+            self._stats["operations_failed"] += 1
+            self._on_command_error(e)
+            logger.debug(f"Redis SCAN error for pattern {pattern}: {e}")
+    
+    async def delete_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """
+        🗑️ Elimina las claves que coinciden con un patrón (SCAN + DELETE por lotes)
+        
+        Args:
+            pattern: Patrón glob de Redis
+            batch_size: Claves por comando DELETE
+            
+        Returns:
+            int: Número de claves eliminadas
+        """
+        return await self._scan_and_delete(pattern, batch_size) or 0
+    
+    async def _scan_and_delete(self, pattern: str, batch_size: int) -> Optional[int]:
+        """
+        SCAN + DELETE por lotes que distingue un recorrido incompleto.
+        
+        Returns:
+            Número de claves eliminadas, o None si el SCAN no llegó al final
+        """
+        self._stats["operations_total"] += 1
+        
+        if not await self._ensure_connection():
+            self._stats["operations_failed"] += 1
+            logger.debug(f"Redis not available for SCAN: {pattern}")
+            return None
+        
+        deleted = 0
+        batch: List[str] = []
+        try:
+            async for key in self._client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    deleted += await self.delete_many(batch)
+                    batch = []
+            
+            if batch:
+                deleted += await self.delete_many(batch)
+            self._stats["operations_successful"] += 1
+            
+        except Exception as e:
+            self._stats["operations_failed"] += 1
+            self._on_command_error(e)
+            logger.debug(f"Redis SCAN error for pattern {pattern}: {e}")
+            return None
+        
+        logger.debug(f"Cache DELETE pattern {pattern}: {deleted} keys")
+        return deleted
+
+    # ------------------------------------------------------------------
+    # Índices secundarios (sorted sets con score = expiración)
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _queue_index_add(pipe: RedisPipeline, indexes: List[str], keys: List[str], ttl: Optional[int]):
+        """
+        Encola el registro de ``keys`` en los índices y la purga de expirados.
+        
+        Las claves sin TTL se registran con score infinito; index_members
+        comprueba periódicamente que sigan existiendo (ver _sweep_persistent).
+        """
+        now = time.time()
+        score = now + ttl if ttl else float("inf")
+        for index in indexes:
+            pipe.zremrangebyscore(index, "-inf", now)
+            pipe.zadd(index, {key: score for key in keys})
+    
+    async def index_members(self, index: str) -> List[str]:
+        """
+        📇 Claves vivas registradas en un índice secundario
+        
+        Purga las entradas expiradas y devuelve el resto en un round-trip.
+        
+        Args:
+            index: Clave del índice (ver ``index_key``)
+            
+        Returns:
+            Lista de claves (vacía si el índice no existe o Redis no responde)
+        """
+        async with self.pipeline() as pipe:
+            pipe.zremrangebyscore(index, "-inf", time.time())
+            pipe.zrange(index, 0, -1, withscores=True)
+        
+        if not pipe.succeeded:
+            return []
+        
+        members: List[str] = []
+        persistent: List[str] = []
+        for member, score in pipe.results[1] or []:
+            member = member.decode("utf-8") if isinstance(member, bytes) else member
+            members.append(member)
+            if score == float("inf"):
+                persistent.append(member)
+        
+        if persistent:
+            missing = await self._sweep_persistent(index, persistent)
+            if missing:
+                members = [member for member in members if member not in missing]
+        return members
+    
+    async def _sweep_persistent(self, index: str, members: List[str]) -> set:
+        """
+        Retira del índice las claves sin TTL que ya no existen.
+        
+        Su score infinito impide que la purga por expiración las elimine si se
+        borraron por otra vía; como mucho una vez cada INDEX_SWEEP_INTERVAL
+        por índice y proceso.
+        
+        Returns:
+            Claves retiradas del índice
+        """
+        now = time.time()
+        if now - self._index_sweeps.get(index, 0.0) < self.INDEX_SWEEP_INTERVAL:
+            return set()
+        self._index_sweeps[index] = now
+        
+        async with self.pipeline() as pipe:
+            for member in members:
+                pipe.exists(member)
+        if not pipe.succeeded:
+            return set()
+        
+        missing = {member for member, exists in zip(members, pipe.results) if not exists}
+        if missing:
+            async with self.pipeline() as pipe:
+                pipe.zrem(index, *missing)
+            logger.debug(f"Index {index}: {len(missing)} persistent members no longer exist")
+        return missing
+    
+    async def delete_indexed(
+        self,
+        index: str,
+        fallback_pattern: Optional[str] = None,
+        batch_size: int = 500
+    ) -> int:
+        """
+        🗑️ Elimina todas las claves de un índice secundario y el propio índice
+        
+        Con ``fallback_pattern`` también recorre el namespace con SCAN para
+        borrar las claves escritas antes de existir los índices, aunque el
+        índice ya tenga miembros nuevos. Tras un SCAN completo se guarda un
+        marcador de migración (``INDEX_MIGRATION_MARKER_TTL``) y mientras
+        exista no se repite; al expirar se vuelve a recorrer una vez, por si
+        workers sin índices siguieron escribiendo claves durante el despliegue.
+        
+        Args:
+            index: Clave del índice
+            fallback_pattern: Patrón glob para claves sin indexar
+            batch_size: Claves por comando DELETE
+            
+        Returns:
+            int: Número de claves eliminadas
+        """
+        deleted = 0
+        members = await self.index_members(index)
+        if members:
+            async with self.pipeline() as pipe:
+                for start in range(0, len(members), batch_size):
+                    pipe.delete(*members[start:start + batch_size])
+                pipe.delete(index)
+            
+            if pipe.succeeded:
+                deleted = sum(int(result or 0) for result in pipe.results[:-1])
+                logger.debug(f"Cache DELETE index {index}: {deleted} keys")
+        
+        if fallback_pattern and not await self.index_migrated(index):
+            scanned = await self._scan_and_delete(fallback_pattern, batch_size)
+            if scanned is not None:
+                deleted += scanned
+                await self._mark_index_migrated(index)
+        
+        return deleted
+    
+    async def index_migrated(self, index: str) -> bool:
+        """Indica si el namespace del índice está marcado sin claves legacy (ver delete_indexed)."""
+        return await self.get(f"{index}{INDEX_MIGRATED_SUFFIX}") is not None
+    
+    async def _mark_index_migrated(self, index: str) -> bool:
+        return await self.set(f"{index}{INDEX_MIGRATED_SUFFIX}", "1", ttl=self.INDEX_MIGRATION_MARKER_TTL)
+    
+    async def adopt_unindexed(
+        self,
+        index: str,
+        pattern: str,
+        key_filter: Optional[Callable[[str], bool]] = None,
+        count: int = 500
+    ) -> List[str]:
+        """
+        📇 Registra en el índice las claves escritas antes de existir
+        
+        Mientras el namespace no esté marcado como migrado recorre ``pattern``
+        con SCAN y añade al índice las claves encontradas con su TTL restante.
+        Solo tras un SCAN completo y un registro correcto se guarda el
+        marcador de migración, el mismo que usa ``delete_indexed``: hasta
+        entonces cada llamada vuelve a recorrer el namespace.
+        
+        Args:
+            index: Clave del índice
+            pattern: Patrón glob del namespace
+            key_filter: Solo se adoptan las claves para las que devuelve True
+            count: Pista de tamaño de lote por iteración de SCAN
+            
+        Returns:
+            Claves encontradas por el SCAN ([] si el namespace ya está migrado)
+        """
+        if await self.index_migrated(index):
+            return []
+        
+        self._stats["operations_total"] += 1
+        if not await self._ensure_connection():
+            self._stats["operations_failed"] += 1
+            logger.debug(f"Redis not available for SCAN: {pattern}")
+            return []
+        
+        keys: List[str] = []
+        try:
+            async for key in self._client.scan_iter(match=pattern, count=count):
+                key = key.decode("utf-8") if isinstance(key, bytes) else key
+                if key_filter is None or key_filter(key):
+                    keys.append(key)
+            self._stats["operations_successful"] += 1
+            
+        except Exception as e:
+            self._stats["operations_failed"] += 1
+            self._on_command_error(e)
+            logger.debug(f"Redis SCAN error for pattern {pattern}: {e}")
+            return keys
+        
+        if keys:
+            async with self.pipeline() as pipe:
+                for key in keys:
+                    pipe.ttl(key)
+            if not pipe.succeeded:
+                return keys
+            
+            # TTL -1 = sin expiración (score infinito), -2 = ya no existe
+            now = time.time()
+            members = {
+                key: now + ttl if ttl >= 0 else float("inf")
+                for key, ttl in zip(keys, pipe.results)
+                if ttl is not None and ttl != -2
+            }
+            if members:
+                async with self.pipeline() as pipe:
+                    pipe.zadd(index, members)
+                if not pipe.succeeded:
+                    return keys
+            logger.info(f"📇 Index {index}: {len(members)} claves legacy registradas")
+        
+        await self._mark_index_migrated(index)
+        return keys
+
     async def get_json(self, key: str) -> Optional[Dict]:
         """
         📄 GET con deserialización JSON automática
@@ -249,7 +1108,13 @@ class RedisService:
             logger.warning(f"JSON decode error for key {key}: {e}")
             return None
     
-    async def set_json(self, key: str, value: Dict, ttl: Optional[int] = None) -> bool:
+    async def set_json(
+        self,
+        key: str,
+        value: Dict,
+        ttl: Optional[int] = None,
+        indexes: Optional[List[str]] = None
+    ) -> bool:
         """
         📝 SET con serialización JSON automática
         
@@ -257,12 +1122,15 @@ class RedisService:
             key: Redis key
             value: Dict to serialize
             ttl: TTL in seconds (optional)
+            indexes: Índices secundarios donde registrar la clave
             
         Returns:
             bool: True if successful
         """
         try:
             json_value = json.dumps(value)
+            if indexes:
+                return await self.set(key, json_value, ttl, indexes=indexes)
             return await self.set(key, json_value, ttl)
         except (TypeError, ValueError) as e:
             logger.warning(f"JSON encode error for key {key}: {e}")
@@ -282,12 +1150,19 @@ class RedisService:
             "hit_ratio": hit_ratio,
             "client_available": self._client is not None,
             "connection_attempts": self._connection_attempts,
+            "latency_ms": {command: hist.snapshot() for command, hist in self._latency.items()},
+            "health_probe": {
+                "running": bool(self._probe_task and not self._probe_task.done()),
+                "interval_seconds": self._probe_interval,
+                "last_probe": self._last_probe
+            },
             "last_update": datetime.now().isoformat()
         }
     
     def reset_stats(self):
         """Reset statistics (útil para testing)"""
         self._stats = {key: 0 for key in self._stats.keys()}
+        self._latency = {}
     
     async def health_check(self) -> Dict[str, Any]:
             """
@@ -308,7 +1183,7 @@ class RedisService:
                     logger.info("🧪 Health check: Testing real Redis connection...")
                     # Test real con ping
                     ping_start = time.time()
-                    await self._client.ping()
+                    await self._timed("ping", self._client.ping())
                     ping_time = (time.time() - ping_start) * 1000
                     
                     # ✅ UPDATE STATE: Si ping exitoso, actualizar estado interno
@@ -0,0 +1,225 @@
+"""
+Semantic Query Index - Búsqueda de queries casi duplicadas en cache
+===================================================================
+
+Índice vectorial en memoria, por mercado, de las queries cuyas respuestas
+de personalización están cacheadas. Permite servir paráfrasis
+("show me earrings" / "earrings please") desde cache en lugar de pagar una
+nueva llamada a Claude.
+
+- Las queries se vectorizan con el TF-IDF ya entrenado de TFIDFRecommender
+  (vectores normalizados L2, así que el producto escalar es la similitud
+  coseno). Si el recomendador se reentrena, los vectores se recalculan con
+  el vectorizador nuevo en la siguiente operación.
+- Cada mercado guarda como máximo ``max_entries_per_market`` entradas
+  recientes (LRU por inserción); las caducadas se ignoran y se podan.
+- El índice solo guarda la huella (vector + metadatos + clave de Redis): la
+  respuesta sigue en Redis, de modo que TTL e invalidaciones se respetan.
+
+El índice es local al proceso: cada worker indexa lo que él mismo cachea.
+
+Author: Senior Architecture Team
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from scipy import sparse
+
+from src.recommenders.topk import select_top_k
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IndexedQuery:
+    """Huella de una respuesta cacheada"""
+    cache_key: str
+    user_id: str
+    market_id: str
+    query: str
+    intent: str
+    turn_number: int
+    excluded_hash: str
+    expires_at: float
+    vector: Any = None
+
+
+class SemanticQueryIndex:
+    """
+    Índice por mercado de vectores TF-IDF de queries cacheadas.
+    """
+
+    def __init__(
+        self,
+        vectorizer_provider: Callable[[], Any],
+        max_entries_per_market: int = 500
+    ):
+        """
+        Args:
+            vectorizer_provider: Devuelve el TfidfVectorizer actual (o None si
+                no hay modelo cargado, en cuyo caso el índice no opera)
+            max_entries_per_market: Entradas recientes conservadas por mercado
+        """
+        self.vectorizer_provider = vectorizer_provider
+        self.max_entries_per_market = max_entries_per_market
+
+        self._entries: Dict[str, "OrderedDict[str, IndexedQuery]"] = {}
+        self._matrices: Dict[str, Tuple[List[IndexedQuery], Any]] = {}
+        self._vectorizer = None
+
+        self.stats = {"indexed": 0, "evicted": 0, "lookups": 0, "matches": 0, "revectorized": 0}
+
+    # ------------------------------------------------------------------
+    # Vectorización
+    # ------------------------------------------------------------------
+
+    def _current_vectorizer(self):
+        """Vectorizador vigente; si cambió (reentreno), revectoriza el índice."""
+        try:
+            vectorizer = self.vectorizer_provider()
+        except Exception as e:
+            logger.debug(f"Vectorizador TF-IDF no disponible: {e}")
+            return None
+
+        if vectorizer is not None and vectorizer is not self._vectorizer:
+            self._vectorizer = vectorizer
+            entries = [entry for market in self._entries.values() for entry in market.values()]
+            if entries:
+                vectors = vectorizer.transform([entry.query for entry in entries])
+                for i, entry in enumerate(entries):
+                    entry.vector = vectors[i]
+                self.stats["revectorized"] += len(entries)
+                logger.info(f"🔄 Índice semántico revectorizado ({len(entries)} queries)")
+            self._matrices.clear()
+        return vectorizer
+
+    def _vectorize(self, query: str):
+        vectorizer = self._current_vectorizer()
+        if vectorizer is None:
+            return None
+        vector = vectorizer.transform([query])
+        # Sin términos en el vocabulario del catálogo no hay similitud posible
+        return vector if vector.nnz else None
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def add(self, entry: IndexedQuery) -> bool:
+        """Indexa una respuesta cacheada; False si la query no es vectorizable."""
+        vector = self._vectorize(entry.query)
+        if vector is None:
+            return False
+        entry.vector = vector
+
+        market = self._entries.setdefault(entry.market_id, OrderedDict())
+        market.pop(entry.cache_key, None)
+        market[entry.cache_key] = entry
+        self._prune(market)
+        self._matrices.pop(entry.market_id, None)
+
+        self.stats["indexed"] += 1
+        return True
+
+    def _prune(self, market: "OrderedDict[str, IndexedQuery]"):
+        now = time.time()
+        for key in [key for key, entry in market.items() if entry.expires_at <= now]:
+            del market[key]
+            self.stats["evicted"] += 1
+        while len(market) > self.max_entries_per_market:
+            market.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def remove_user(self, user_id: str) -> int:
+        """Elimina las huellas de un usuario (tras invalidar su cache)."""
+        removed = 0
+        for market_id, market in self._entries.items():
+            keys = [key for key, entry in market.items() if entry.user_id == user_id]
+            for key in keys:
+                del market[key]
+            if keys:
+                removed += len(keys)
+                self._matrices.pop(market_id, None)
+        return removed
+
+    # ------------------------------------------------------------------
+    # Búsqueda
+    # ------------------------------------------------------------------
+
+    def search(
+        self,
+        query: str,
+        market_id: str,
+        threshold: float,
+        predicate: Optional[Callable[[IndexedQuery], bool]] = None,
+        limit: int = 3
+    ) -> List[Tuple[float, IndexedQuery]]:
+        """
+        Entradas vigentes del mercado con similitud coseno >= threshold.
+
+        Args:
+            query: Query a buscar
+            market_id: Mercado (cada mercado tiene su propio índice)
+            threshold: Similitud mínima (0-1)
+            predicate: Filtro adicional sobre cada entrada candidata
+            limit: Máximo de resultados
+
+        Returns:
+            Lista (similitud, entrada) ordenada de mayor a menor similitud
+        """
+        self.stats["lookups"] += 1
+        if limit <= 0 or not self._entries.get(market_id):
+            return []
+
+        vector = self._vectorize(query)
+        if vector is None:
+            return []
+
+        entries, matrix = self._market_matrix(market_id)
+        if not entries:
+            return []
+
+        scores = (matrix @ vector.T).toarray().ravel()
+        below_threshold = scores < threshold
+        now = time.time()
+        results = []
+
+        # Selección parcial; se amplía solo si entradas caducadas o filtradas dejan huecos
+        k, seen = limit, 0
+        while True:
+            top = select_top_k(scores, k, exclude_mask=below_threshold)
+            for i in top[seen:]:
+                entry = entries[i]
+                if entry.expires_at <= now or (predicate and not predicate(entry)):
+                    continue
+                results.append((float(scores[i]), entry))
+                if len(results) >= limit:
+                    break
+            if len(results) >= limit or top.size < k:
+                break
+            seen, k = top.size, k * 2
+
+        self.stats["matches"] += len(results)
+        return results
+
+    def _market_matrix(self, market_id: str) -> Tuple[List[IndexedQuery], Any]:
+        cached = self._matrices.get(market_id)
+        if cached is not None:
+            return cached
+
+        entries = list(self._entries.get(market_id, {}).values())
+        matrix = sparse.vstack([entry.vector for entry in entries], format="csr") if entries else None
+        self._matrices[market_id] = (entries, matrix)
+        return entries, matrix
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "markets": len(self._entries),
+            "entries": sum(len(market) for market in self._entries.values()),
+            "vectorizer_available": self._vectorizer is not None,
+            **self.stats
+        }
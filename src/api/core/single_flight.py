@@ -0,0 +1,156 @@
+"""
+Single Flight - Coalescencia de cargas concurrentes por clave
+=============================================================
+
+Ante un pico de tráfico, muchas requests fallan en cache a la vez para la
+misma clave y cada una llamaría por su cuenta a Shopify, Retail API o Claude.
+``SingleFlight`` garantiza una sola carga en vuelo por clave:
+
+- En el worker: la primera request (líder) lanza la carga como tarea propia;
+  las siguientes esperan esa misma tarea. Si el líder se cancela (p.ej. por
+  timeout del cliente), la carga continúa para los demás.
+- Entre workers (opcional, ``redis_service``): el líder toma además un lock
+  corto en Redis (SET NX PX). Los workers que no lo consiguen consultan
+  ``recheck`` (normalmente la cache en Redis) hasta que el líder publica el
+  resultado o expira el lock; si se agota ``wait_timeout`` cargan ellos.
+  Si Redis no está disponible se carga sin lock.
+
+Author: Senior Architecture Team
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.api.core.redis_service import RedisServiceError
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Any]]
+Recheck = Callable[[], Awaitable[Optional[Any]]]
+
+
+class SingleFlight:
+    """
+    Deduplica cargas en vuelo por clave dentro del worker y, opcionalmente,
+    entre workers con un lock corto en Redis.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis_service=None,
+        lock_ttl_ms: int = 5000,
+        wait_timeout: float = 3.0,
+        poll_interval: float = 0.05
+    ):
+        """
+        Args:
+            name: Namespace de las claves (y del lock en Redis)
+            redis_service: RedisService para coalescer entre workers (None = solo en proceso)
+            lock_ttl_ms: Expiración del lock; acota la espera si el líder muere
+            wait_timeout: Espera máxima de un worker sin lock antes de cargar él mismo
+            poll_interval: Intervalo entre comprobaciones de ``recheck``
+        """
+        self.name = name
+        self.redis_service = redis_service
+        self.lock_ttl_ms = lock_ttl_ms
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.stats = {
+            "loads": 0,
+            "coalesced": 0,
+            "remote_coalesced": 0,
+            "lock_waits": 0,
+            "lock_timeouts": 0,
+            "lock_errors": 0
+        }
+
+    async def do(self, key: str, loader: Loader, recheck: Optional[Recheck] = None) -> Any:
+        """
+        Ejecuta ``loader`` una sola vez por clave entre las llamadas concurrentes.
+
+        Args:
+            key: Clave de la carga (p.ej. product_id)
+            loader: Corrutina que carga (y normalmente cachea) el valor
+            recheck: Corrutina que devuelve el valor si otro worker ya lo publicó
+                (solo se usa con redis_service)
+
+        Returns:
+            Resultado de ``loader`` (compartido por todas las llamadas coalescidas);
+            si la carga falla, todas reciben la excepción
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader, recheck))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._on_done(key, t))
+            self.stats["loads"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Evita "exception was never retrieved" si todos los llamadores se cancelaron
+        if not task.cancelled():
+            task.exception()
+
+    async def _load(self, key: str, loader: Loader, recheck: Optional[Recheck]) -> Any:
+        if self.redis_service is None:
+            return await loader()
+
+        lock_key = f"singleflight:{self.name}:{key}"
+        try:
+            token = await self.redis_service.acquire_lock(lock_key, self.lock_ttl_ms)
+        except RedisServiceError as e:
+            self.stats["lock_errors"] += 1
+            logger.debug(f"Single-flight sin lock para {lock_key}: {e}")
+            return await loader()
+
+        if token is None:
+            self.stats["lock_waits"] += 1
+            deadline = time.monotonic() + self.wait_timeout
+            while token is None:
+                if recheck is not None:
+                    value = await recheck()
+                    if value is not None:
+                        self.stats["remote_coalesced"] += 1
+                        return value
+                if time.monotonic() >= deadline:
+                    self.stats["lock_timeouts"] += 1
+                    logger.debug(f"Single-flight: timeout esperando {lock_key}, cargando sin lock")
+                    return await loader()
+                await asyncio.sleep(self.poll_interval)
+                try:
+                    token = await self.redis_service.acquire_lock(lock_key, self.lock_ttl_ms)
+                except RedisServiceError:
+                    self.stats["lock_errors"] += 1
+                    return await loader()
+
+            # El líder anterior pudo publicar justo antes de liberar el lock
+            if recheck is not None:
+                value = await recheck()
+                if value is not None:
+                    await self.redis_service.release_lock(lock_key, token)
+                    self.stats["remote_coalesced"] += 1
+                    return value
+
+        try:
+            return await loader()
+        finally:
+            await self.redis_service.release_lock(lock_key, token)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "cross_worker": self.redis_service is not None,
+            "inflight": len(self._inflight),
+            **self.stats
+        }
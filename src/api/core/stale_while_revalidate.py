@@ -0,0 +1,185 @@
+"""
+Stale-While-Revalidate - TTL soft/hard con refresco en segundo plano
+====================================================================
+
+Sin este mecanismo una entrada caduca de golpe al cumplir su TTL y la
+siguiente request paga la latencia completa de Shopify/gateway.
+``StaleWhileRevalidate`` separa dos TTLs:
+
+- TTL soft (``soft_ttl_seconds``): edad a partir de la cual la entrada se
+  considera obsoleta. Se sigue sirviendo inmediatamente, pero se programa un
+  refresco en segundo plano (uno solo por clave, aunque lleguen muchas
+  lecturas obsoletas a la vez).
+- TTL hard (soft + ``stale_ttl_seconds``): expiración real en Redis. Solo
+  después de él una request bloquea esperando a la fuente.
+
+Con ``stale_ttl_seconds=0`` el mecanismo está desactivado y el TTL hard
+coincide con el soft (comportamiento anterior).
+
+Author: Senior Architecture Team
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Refresher = Callable[[], Awaitable[Any]]
+BulkRefresher = Callable[[List[str]], Awaitable[Any]]
+
+
+class StaleWhileRevalidate:
+    """
+    Detecta entradas obsoletas y deduplica sus refrescos en segundo plano.
+    """
+
+    def __init__(self, name: str, soft_ttl_seconds: int, stale_ttl_seconds: int = 0):
+        """
+        Args:
+            name: Nombre para logs y estadísticas
+            soft_ttl_seconds: Edad a partir de la cual se refresca en segundo plano
+            stale_ttl_seconds: Ventana tras el TTL soft en la que aún se sirve la
+                entrada obsoleta (0 = desactivado)
+        """
+        self.name = name
+        self.soft_ttl_seconds = soft_ttl_seconds
+        self.stale_ttl_seconds = max(0, stale_ttl_seconds)
+
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+        self.stats = {
+            "stale_hits": 0,
+            "stale_age_total": 0.0,
+            "stale_age_max": 0.0,
+            "refreshes_scheduled": 0,
+            "refreshes_deduplicated": 0,
+            "refreshes_completed": 0,
+            "refreshes_failed": 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.stale_ttl_seconds > 0
+
+    @property
+    def hard_ttl_seconds(self) -> int:
+        """TTL con que debe escribirse la entrada en Redis."""
+        return self.soft_ttl_seconds + self.stale_ttl_seconds
+
+    def revalidate_if_stale(self, key: str, cached_at: Optional[float], refresh: Refresher) -> bool:
+        """
+        Programa ``refresh`` en segundo plano si la entrada superó el TTL soft.
+
+        Args:
+            key: Clave de la entrada (deduplica refrescos concurrentes)
+            cached_at: Timestamp de escritura de la entrada (None = desconocido)
+            refresh: Corrutina que recarga y vuelve a cachear la entrada;
+                debe devolver un valor no nulo si tuvo éxito
+
+        Returns:
+            True si la entrada estaba obsoleta (se sirve igualmente)
+        """
+        if not self._record_if_stale(cached_at):
+            return False
+
+        if key in self._refreshing:
+            self.stats["refreshes_deduplicated"] += 1
+            return True
+
+        self._schedule([key], self._refresh(key, refresh))
+        return True
+
+    def revalidate_many_if_stale(
+        self, entries: Dict[str, Optional[float]], refresh: BulkRefresher
+    ) -> List[str]:
+        """
+        Variante por lotes: un único refresco para todas las entradas obsoletas.
+
+        Las claves que ya tienen un refresco en curso (individual o por lotes)
+        se deduplican; el resto se pasa junto a ``refresh`` para que la fuente
+        se consulte en una sola llamada en lugar de una por clave.
+
+        Args:
+            entries: Timestamp de escritura por clave
+            refresh: Corrutina que recibe las claves obsoletas, las recarga y
+                vuelve a cachear; debe devolver un valor no nulo si tuvo éxito
+
+        Returns:
+            Claves obsoletas (se sirven igualmente)
+        """
+        stale_keys = [key for key, cached_at in entries.items() if self._record_if_stale(cached_at)]
+
+        pending = [key for key in stale_keys if key not in self._refreshing]
+        self.stats["refreshes_deduplicated"] += len(stale_keys) - len(pending)
+        if pending:
+            self._schedule(pending, self._refresh_many(pending, refresh))
+        return stale_keys
+
+    def _record_if_stale(self, cached_at: Optional[float]) -> bool:
+        """True si la entrada superó el TTL soft (y la contabiliza)."""
+        if not self.enabled or cached_at is None:
+            return False
+
+        stale_age = time.time() - cached_at - self.soft_ttl_seconds
+        if stale_age < 0:
+            return False
+
+        self.stats["stale_hits"] += 1
+        self.stats["stale_age_total"] += stale_age
+        self.stats["stale_age_max"] = max(self.stats["stale_age_max"], stale_age)
+        return True
+
+    def _schedule(self, keys: List[str], coro: Awaitable[Any]):
+        task = asyncio.ensure_future(coro)
+        for key in keys:
+            self._refreshing[key] = task
+            task.add_done_callback(lambda t, key=key: self._refreshing.pop(key, None))
+        self.stats["refreshes_scheduled"] += len(keys)
+
+    async def _refresh(self, key: str, refresh: Refresher):
+        try:
+            refreshed = await refresh()
+        except Exception as e:
+            refreshed = None
+            logger.warning(f"Error refrescando {self.name} {key} en segundo plano: {e}")
+        self._record_outcome(refreshed, 1)
+
+    async def _refresh_many(self, keys: List[str], refresh: BulkRefresher):
+        try:
+            refreshed = await refresh(keys)
+        except Exception as e:
+            refreshed = None
+            logger.warning(f"Error refrescando {len(keys)} entradas de {self.name} en segundo plano: {e}")
+        self._record_outcome(refreshed, len(keys))
+
+    def _record_outcome(self, refreshed: Any, count: int):
+        if refreshed is None:
+            # La entrada obsoleta se sigue sirviendo hasta el TTL hard
+            self.stats["refreshes_failed"] += count
+        else:
+            self.stats["refreshes_completed"] += count
+
+    async def close(self):
+        """Cancela los refrescos pendientes."""
+        tasks = list(set(self._refreshing.values()))
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stale_hits = self.stats["stale_hits"]
+        return {
+            "enabled": self.enabled,
+            "soft_ttl_seconds": self.soft_ttl_seconds,
+            "hard_ttl_seconds": self.hard_ttl_seconds,
+            "stale_hits": stale_hits,
+            "avg_stale_age_seconds": self.stats["stale_age_total"] / stale_hits if stale_hits else 0.0,
+            "max_stale_age_seconds": self.stats["stale_age_max"],
+            "refreshes_scheduled": self.stats["refreshes_scheduled"],
+            "refreshes_deduplicated": self.stats["refreshes_deduplicated"],
+            "refreshes_completed": self.stats["refreshes_completed"],
+            "refreshes_failed": self.stats["refreshes_failed"],
+            "refreshes_inflight": len(self._refreshing)
+        }
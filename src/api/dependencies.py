@@ -86,7 +86,7 @@ Status: Production Ready
 """
 
 import logging
-from typing import Dict, Any, TYPE_CHECKING
+from typing import Dict, Any, Optional, TYPE_CHECKING
 
 # FastAPI dependency injection
 from fastapi import Depends
@@ -115,6 +115,7 @@ if TYPE_CHECKING:
     from src.api.core.redis_service import RedisService
     from src.api.inventory.inventory_service import InventoryService
     from src.api.inventory.availability_checker import AvailabilityChecker
+    from src.api.core.event_stream import EventStream
 
     # MCP Components
     # from src.api.mcp.mcp_client import MCPClient
@@ -913,6 +914,38 @@ async def get_availability_checker():
         raise
 
 
+async def get_event_stream() -> Optional['EventStream']:
+    """
+    Get EventStream singleton si la ingesta de eventos es por Redis Streams.
+    
+    Returns
+    -------
+    EventStream or None
+        None si ``EVENT_INGESTION_MODE`` no es "stream" o Redis no está
+        disponible; el endpoint usa entonces el registro directo.
+    
+    Examples
+    --------
+    >>> @router.post("/events/user/{user_id}")
+    >>> async def record_event(
+    ...     user_id: str,
+    ...     event_stream: Optional[EventStream] = Depends(get_event_stream)
+    ... ):
+    ...     if event_stream:
+    ...         await event_stream.append(build_retail_event(user_id, "detail-page-view"))
+    """
+    from src.api.core.config import get_settings
+    
+    if get_settings().event_ingestion_mode != "stream":
+        return None
+    
+    try:
+        return await ServiceFactory.get_event_stream()
+    except Exception as e:
+        logger.warning(f"EventStream unavailable, using direct event recording: {e}")
+        return None
+
+
 # ============================================================================
 # COMPOSITE DEPENDENCIES - Bundle Multiple Components
 # ============================================================================
@@ -1039,6 +1072,7 @@ def get_all_dependency_providers() -> Dict[str, Any]:
         "mcp_recommender": get_mcp_recommender,
         "inventory_service": get_inventory_service,
         "availability_checker": get_availability_checker,  # ✅ NEW: Phase 2 Day 3
+        "event_stream": get_event_stream,
         "recommendation_context": get_recommendation_context
     }
 
@@ -1073,6 +1107,7 @@ __all__ = [
     "get_mcp_recommender",
     "get_inventory_service",
     "get_availability_checker",  # ✅ NEW: Phase 2 Day 3
+    "get_event_stream",
     
     # Composite Dependencies
     "get_recommendation_context",
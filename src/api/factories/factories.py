@@ -713,7 +713,9 @@ class RecommenderFactory:
                 cache_size=getattr(settings, 'user_event_cache_size', 1000),
                 local_buffer_size=getattr(settings, 'user_event_buffer_size', 200),
                 flush_interval_seconds=getattr(settings, 'user_event_flush_interval', 30),
-                local_fallback_dir=getattr(settings, 'user_events_fallback_dir', None)
+                local_fallback_dir=getattr(settings, 'user_events_fallback_dir', None),
+                ingestion_mode=settings.event_ingestion_mode,
+                stream_maxlen=settings.event_stream_maxlen
             )
             
             # Conectar en contexto asíncrono
@@ -1075,7 +1077,9 @@ class RecommenderFactory:
                 cache_size=getattr(settings, 'user_event_cache_size', 1000),
                 local_buffer_size=getattr(settings, 'user_event_buffer_size', 200),
                 flush_interval_seconds=getattr(settings, 'user_event_flush_interval', 30),
-                local_fallback_dir=local_fallback_dir
+                local_fallback_dir=local_fallback_dir,
+                ingestion_mode=settings.event_ingestion_mode,
+                stream_maxlen=settings.event_stream_maxlen
             )
             
             # CORREGIDO: Conexión diferida - el UserEventStore se conectará cuando sea necesario
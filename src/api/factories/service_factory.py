@@ -88,6 +88,12 @@ class ServiceFactory:
 
     _conversation_state_manager = None
 
+    # Ingesta de eventos con Redis Streams
+    _event_stream = None
+    _event_consumers: list = []
+    _event_profile_store = None
+    _event_consumer_client = None
+
     # ✅ FASE 1: Recommender singletons
     _tfidf_recommender: Optional['TFIDFRecommender'] = None
     _retail_recommender: Optional['RetailAPIRecommender'] = None
@@ -242,6 +248,8 @@ class ServiceFactory:
                             logger.warning("⚠️ Redis health check timeout - using service anyway")
                         
                         cls._redis_service = redis_service
+                        # Sin PING por comando: la sonda detecta caídas y reconecta
+                        redis_service.start_health_probe()
                         logger.info("✅ RedisService singleton initialized successfully (THREAD-SAFE)")
                         
                     except asyncio.TimeoutError:
@@ -270,6 +278,7 @@ class ServiceFactory:
                                     logger.info("✅ Redis connection AND state successfully synchronized")
                                     cls._redis_service = redis_service
                                     cls._reset_circuit_breaker()
+                                    redis_service.start_health_probe()
                                 else:
                                     logger.error("❌ Redis state synchronization failed")
                                     cls._record_circuit_failure()
@@ -395,8 +404,14 @@ class ServiceFactory:
         ✅ Factory para InventoryService usando Redis singleton fixed
         """
         try:
+            from src.api.core.config import get_settings
             redis_service = await cls.get_redis_service()
-            inventory_service = InventoryService(redis_service=redis_service)
+            settings = get_settings()
+            inventory_service = InventoryService(
+                redis_service=redis_service,
+                single_flight_redis_lock=settings.single_flight_redis_lock,
+                stale_while_revalidate_seconds=settings.inventory_stale_while_revalidate
+            )
             await inventory_service.ensure_ready()
             logger.info("✅ InventoryService created with fixed RedisService singleton")
             return inventory_service
@@ -431,6 +446,7 @@ class ServiceFactory:
             Este método DEBE recibir local_catalog para que DiversityAwareCache
             use categorías dinámicas del catálogo real.
         """
+        from src.api.core.config import get_settings
         try:
             redis_service = await cls.get_redis_service()
             shopify_client = get_shopify_client()
@@ -448,12 +464,15 @@ class ServiceFactory:
                 logger.warning("⚠️ Creating ProductCache WITHOUT local_catalog - will use Redis/Shopify only")
             
             # ✅ MIGRACIÓN: Usar RedisService en lugar de cliente directo
+            settings = get_settings()
             product_cache = ProductCache(
                 redis_service=redis_service,  # ✅ CAMBIO: redis_service en lugar de redis_client
                 local_catalog=local_catalog,  # ✅ CRITICAL: Pass local_catalog parameter
                 shopify_client=shopify_client,
                 ttl_seconds=86400,  # ✅ CACHE INCONSISTENCY FIX: Mismo TTL que main (24h)
-                prefix="product:"  # ✅ CACHE INCONSISTENCY FIX: Usar mismo prefijo que main
+                prefix="product:",  # ✅ CACHE INCONSISTENCY FIX: Usar mismo prefijo que main
+                single_flight_redis_lock=settings.single_flight_redis_lock,
+                stale_while_revalidate_seconds=settings.product_cache_stale_while_revalidate
             )
             
             await product_cache.start_background_tasks()
@@ -535,8 +554,7 @@ class ServiceFactory:
                     # Optional: Auto-load for testing scenarios
                     if auto_load:
                         logger.info("🔄 Auto-loading TF-IDF model...")
-                        import os
-                        if os.path.exists(model_path):
+                        if cls._tfidf_recommender.has_saved_model():
                             success = await cls._tfidf_recommender.load()
                             if success:
                                 product_count = len(cls._tfidf_recommender.product_data) if hasattr(cls._tfidf_recommender, 'product_data') else 0
@@ -586,7 +604,8 @@ class ServiceFactory:
                         project_number=settings.google_project_number,
                         location=settings.google_location,
                         catalog=settings.google_catalog,
-                        serving_config_id=settings.google_serving_config
+                        serving_config_id=settings.google_serving_config,
+                        async_event_writes=settings.retail_async_event_writes
                     )
                     
                     logger.info("✅ Retail API recommender singleton created successfully")
@@ -830,14 +849,22 @@ class ServiceFactory:
                         # ✅ LAZY IMPORT: Avoid circular import issues
                         from src.api.core.intelligent_personalization_cache import IntelligentPersonalizationCache
                         
+                        from src.api.core.config import get_settings
+                        settings = get_settings()
+                        
                         # ✅ CONSTRUCTOR INJECTION: Pass diversity_cache directly
+                        # (el índice semántico usa el vectorizador TF-IDF de local_catalog)
                         cls._personalization_cache = IntelligentPersonalizationCache(
                             redis_service=redis_service,
                             default_ttl=default_ttl,
-                            diversity_cache=diversity_cache  # ✅ CRITICAL: Constructor injection
+                            diversity_cache=diversity_cache,  # ✅ CRITICAL: Constructor injection
+                            enable_semantic_lookup=settings.personalization_semantic_cache_enabled,
+                            market_fallback_threshold=settings.personalization_market_fallback_threshold,
+                            single_flight_redis_lock=settings.single_flight_redis_lock
                         )
                         
                         logger.info("✅ PersonalizationCache singleton created via enterprise factory")
+                        logger.info(f"   - Semantic index: {'Enabled' if cls._personalization_cache.query_index else 'Disabled'}")
                         logger.info(f"   - Redis: {'Connected' if redis_service else 'None'}")
                         logger.info(f"   - ProductCache: {'Available' if product_cache else 'Unavailable'}")
                         logger.info(f"   - LocalCatalog: {'Loaded' if local_catalog else 'Fallback'}")
@@ -899,6 +926,134 @@ class ServiceFactory:
         
         return health_status
     
+    # ============================================================================
+    # 📨 EVENT STREAM - Ingesta de eventos con Redis Streams
+    # ============================================================================
+    
+    @classmethod
+    async def get_event_stream(cls):
+        """
+        Get EventStream singleton sobre el cliente del RedisService compartido.
+        
+        Crea los grupos de consumidores antes del primer XADD, también en pods
+        sin consumidores, para que ningún evento quede sin grupo que lo lea.
+        
+        Raises:
+            RuntimeError: Si Redis no está disponible
+        """
+        if cls._event_stream is None:
+            from src.api.core.config import get_settings
+            from src.api.core.event_stream import EventStream
+            
+            redis_service = await cls.get_redis_service()
+            client = getattr(redis_service, "_client", None)
+            if client is None:
+                raise RuntimeError("Event stream unavailable: Redis client not connected")
+            
+            event_stream = EventStream(client, maxlen=get_settings().event_stream_maxlen)
+            await event_stream.ensure_groups()
+            cls._event_stream = event_stream
+            logger.info("✅ EventStream singleton initialized")
+        return cls._event_stream
+    
+    @classmethod
+    async def start_event_stream_consumers(cls, retail_recommender=None) -> list:
+        """
+        Arranca en este proceso un worker por grupo (profile, analytics, retail).
+        
+        Cada proceso que llama a este método añade un consumidor a cada grupo,
+        así que el procesamiento escala con el número de workers.
+        
+        Las lecturas bloqueantes (XREADGROUP BLOCK) usan un cliente dedicado sin
+        socket_timeout: con el cliente compartido (socket_timeout=2s) cada espera
+        ociosa acabaría en timeout y ocuparía conexiones del pool de la API.
+        """
+        if cls._event_consumers:
+            return cls._event_consumers
+        
+        from src.api.core.event_stream import (
+            GROUP_ANALYTICS, GROUP_PROFILE, GROUP_RETAIL, StreamConsumer,
+            create_analytics_handler, create_retail_handler
+        )
+        from src.api.core.metrics import recommendation_metrics
+        from src.api.mcp.user_events.resilient_user_event_store import UserEventStore
+        
+        stream = await cls.get_event_stream()
+        
+        # UserEventStore solo para agregar perfiles (comparte el cliente Redis)
+        cls._event_profile_store = UserEventStore(redis_client=stream.redis)
+        if not await cls._event_profile_store.connect():
+            raise RuntimeError("Event stream consumers unavailable: UserEventStore not connected")
+        
+        if retail_recommender is None:
+            retail_recommender = await cls.get_retail_recommender()
+        
+        try:
+            from src.api.core.redis_config_optimized import create_optimized_redis_client
+            cls._event_consumer_client = await create_optimized_redis_client(
+                socket_timeout=None, client_name="retail-recommender-v2-event-consumers"
+            )
+        except Exception as e:
+            # El consumidor acota block_ms por debajo del socket_timeout compartido
+            logger.warning(f"⚠️ Dedicated event consumer client unavailable, using shared client: {e}")
+            cls._event_consumer_client = None
+        
+        consumer_client = cls._event_consumer_client
+        cls._event_consumers = [
+            StreamConsumer(stream, GROUP_PROFILE, cls._event_profile_store.persist_stream_events,
+                           redis_client=consumer_client),
+            StreamConsumer(stream, GROUP_ANALYTICS, create_analytics_handler(recommendation_metrics),
+                           redis_client=consumer_client),
+            StreamConsumer(stream, GROUP_RETAIL, create_retail_handler(retail_recommender),
+                           redis_client=consumer_client)
+        ]
+        for consumer in cls._event_consumers:
+            await consumer.start()
+        
+        logger.info(f"✅ Event stream consumers started: {[c.group for c in cls._event_consumers]}")
+        return cls._event_consumers
+    
+    @classmethod
+    async def get_event_pipeline_stats(cls) -> dict:
+        """
+        Estado de la ingesta de eventos en este proceso: writer en segundo plano
+        de Retail API, stream, lag de cada grupo y consumidores locales.
+        """
+        writer_stats = getattr(cls._retail_recommender, "get_event_writer_stats", None)
+        stats = {
+            "retail_event_writer": writer_stats() if writer_stats else {"enabled": False},
+            "event_stream": None,
+            "groups": {},
+            "consumers": [consumer.get_stats() for consumer in cls._event_consumers]
+        }
+        
+        if cls._event_stream is not None:
+            from src.api.core.event_stream import CONSUMER_GROUPS
+            
+            stats["event_stream"] = cls._event_stream.get_stats()
+            for group in CONSUMER_GROUPS:
+                try:
+                    stats["groups"][group] = await cls._event_stream.get_group_lag(group)
+                except Exception as e:
+                    stats["groups"][group] = {"group": group, "error": str(e)}
+        
+        return stats
+    
+    @classmethod
+    async def stop_event_stream_consumers(cls):
+        """Detiene los consumidores de este proceso (las entradas sin XACK quedan pendientes)."""
+        for consumer in cls._event_consumers:
+            await consumer.stop()
+        cls._event_consumers = []
+        
+        if cls._event_profile_store:
+            await cls._event_profile_store.close()
+            cls._event_profile_store = None
+        
+        if cls._event_consumer_client:
+            await cls._event_consumer_client.close()
+            cls._event_consumer_client = None
+    
     @classmethod
     async def shutdown_all_services(cls):
         """
@@ -906,18 +1061,39 @@ class ServiceFactory:
         """
         logger.info("🔄 ServiceFactory shutdown initiated...")
         
+        # Detener consumidores del event stream antes de cerrar Redis
+        if cls._event_consumers or cls._event_profile_store or cls._event_consumer_client:
+            try:
+                await cls.stop_event_stream_consumers()
+                logger.info("✅ Event stream consumers stopped")
+            except Exception as e:
+                logger.warning(f"⚠️ Event stream shutdown error: {e}")
+        
         # Cleanup ProductCache
         if cls._product_cache:
             try:
-                if hasattr(cls._product_cache, 'health_task') and cls._product_cache.health_task:
+                if isinstance(cls._product_cache, ProductCache):
+                    # Health check + suscripción de invalidaciones L1
+                    await cls._product_cache.stop_background_tasks()
+                elif hasattr(cls._product_cache, 'health_task') and cls._product_cache.health_task:
                     cls._product_cache.health_task.cancel()
                 logger.info("✅ ProductCache shutdown completed")
             except Exception as e:
                 logger.warning(f"⚠️ ProductCache shutdown error: {e}")
         
+        # Vaciar la cola de eventos pendientes hacia Retail API
+        if cls._retail_recommender and hasattr(cls._retail_recommender, 'close'):
+            try:
+                await cls._retail_recommender.close()
+                logger.info("✅ Retail API event writer stopped")
+            except Exception as e:
+                logger.warning(f"⚠️ Retail API event writer shutdown error: {e}")
+        
         # ✅ Close Redis connections properly
         if cls._redis_service:
             try:
+                if isinstance(cls._redis_service, RedisService):
+                    await cls._redis_service.stop_health_probe()
                 if hasattr(cls._redis_service, '_client') and cls._redis_service._client:
                     await cls._redis_service._client.close()
                 logger.info("✅ Redis connections closed")
@@ -993,6 +1169,7 @@ class ServiceFactory:
         cls._market_context_manager = None
         cls._market_cache_service = None
         cls._conversation_state_manager = None
+        cls._event_stream = None
         cls._mcp_client_lock = None
         cls._market_manager_lock = None
         cls._market_cache_lock = None
@@ -104,6 +104,31 @@ class ShopifyIntegration:
             logging.error(f"Error fetching products: {str(e)}")
             return []
     
+    def get_products_by_ids(self, product_ids: List[str], fields: str = None) -> List[Dict]:
+        """
+        Obtiene productos concretos con el filtro ``ids`` (hasta 250 por petición).
+        
+        Args:
+            product_ids (List[str]): IDs de productos
+            fields (str, optional): Campos a devolver, separados por comas (p. ej. "id,variants")
+        
+        Returns:
+            List[Dict]: Productos encontrados (los IDs inexistentes se omiten)
+        """
+        products = []
+        for start in range(0, len(product_ids), 250):
+            batch = product_ids[start:start + 250]
+            url = f"{self.api_url}/products.json?ids={','.join(str(pid) for pid in batch)}&limit=250"
+            if fields:
+                url += f"&fields={fields}"
+            try:
+                response = self._make_request_with_retry(url)
+                products.extend(response.json().get('products', []))
+            except Exception as e:
+                logging.error(f"Error fetching {len(batch)} products by ids: {str(e)}")
+        
+        return products
+    
     def _get_next_page_url(self, response):
         """
         Extrae la URL de la siguiente página del header Link de la respuesta.
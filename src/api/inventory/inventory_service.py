@@ -16,11 +16,13 @@ import logging
 from typing import Dict, List, Optional, Any, Union
 from dataclasses import dataclass
 from enum import Enum
-import json
 from datetime import datetime, timedelta
 
 # Imports para integración
+from src.api.core.cache_codec import CacheCodec
 from src.api.core.redis_service import get_redis_service, RedisService
+from src.api.core.single_flight import SingleFlight
+from src.api.core.stale_while_revalidate import StaleWhileRevalidate
 from src.api.core.store import get_shopify_client
 
 logger = logging.getLogger(__name__)
@@ -72,8 +74,21 @@ class InventoryService:
     Servicio principal de gestión de inventario que integra múltiples fuentes
     """
     
-    def __init__(self, redis_service: Optional[RedisService] = None):
+    def __init__(
+        self,
+        redis_service: Optional[RedisService] = None,
+        codec: Optional[CacheCodec] = None,
+        single_flight_redis_lock: bool = False,
+        stale_while_revalidate_seconds: int = 0
+    ):
         self.redis_service = redis_service
+        # Serialización compacta de las entradas de cache (ver cache_codec)
+        self.codec = codec or CacheCodec.from_env()
+        # Una sola consulta a Shopify en vuelo por producto y mercado
+        # (opcionalmente también entre workers con un lock corto en Redis)
+        self._inventory_flight = SingleFlight(
+            "inventory", redis_service=redis_service if single_flight_redis_lock else None
+        )
         self.shopify_client = None
         # ✅ ARCHITECTURAL FIX: No async tasks in __init__
         # Redis service debe estar listo antes de crear el servicio
@@ -84,6 +99,16 @@ class InventoryService:
         self.CACHE_TTL = 300  # 5 minutos para datos de inventario
         self.FALLBACK_TTL = 3600  # 1 hora para fallbacks
         
+        # Stale-while-revalidate: pasado CACHE_TTL (soft) el inventario cacheado se
+        # sirve mientras se refresca en segundo plano; Redis lo conserva hasta el TTL hard
+        self._revalidation = StaleWhileRevalidate(
+            "inventory", soft_ttl_seconds=self.CACHE_TTL, stale_ttl_seconds=stale_while_revalidate_seconds
+        )
+        
+        # Consultas bulk a Shopify: IDs por petición (máximo del filtro ids=) y peticiones simultáneas
+        self.SHOPIFY_BATCH_SIZE = 250
+        self.SHOPIFY_CONCURRENCY = 4
+        
         # Configuración por mercado
         self.market_configs = {
             "US": {
@@ -134,6 +159,9 @@ class InventoryService:
         ✅ Obtener estadísticas del servicio para observabilidad
         """
         stats = self._stats.copy()
+        stats["codec"] = self.codec.get_stats()
+        stats["single_flight"] = self._inventory_flight.get_stats()
+        stats["stale_while_revalidate"] = self._revalidation.get_stats()
         stats["redis_health"] = "unknown"
         
         if self.redis_service:
@@ -167,70 +195,98 @@ class InventoryService:
                 logger.debug(f"Cache hit for product {product_id} in market {market_id}")
                 return cached_info
             
-            # 2. Obtener datos de Shopify
-            shopify_inventory = await self._get_shopify_inventory(product_id)
-            
-            # 3. Construir información de inventario
-            inventory_info = await self._build_inventory_info(
-                product_id, market_id, shopify_inventory
+            # 2-4. Shopify + construcción + cache (coalescido por producto/mercado)
+            return await self._inventory_flight.do(
+                f"{product_id}:{market_id}",
+                lambda: self._load_product_inventory(product_id, market_id),
+                recheck=lambda: self._get_cached_inventory(product_id, market_id)
             )
             
-            # 4. Cachear resultado
-            await self._cache_inventory_info(inventory_info, market_id)
-            
-            logger.info(f"✅ Inventory check for {product_id}: {inventory_info.status.value} ({inventory_info.available_quantity} units)")
-            return inventory_info
-            
         except Exception as e:
             logger.warning(f"Error checking inventory for {product_id}: {e}")
             # Fallback optimista
             return await self._create_fallback_inventory(product_id, market_id)
     
+    async def _load_product_inventory(self, product_id: str, market_id: str) -> InventoryInfo:
+        """Consulta Shopify, construye InventoryInfo y lo cachea (líder del single-flight)"""
+        # 2. Obtener datos de Shopify
+        shopify_inventory = await self._get_shopify_inventory(product_id)
+        
+        # 3. Construir información de inventario
+        inventory_info = await self._build_inventory_info(
+            product_id, market_id, shopify_inventory
+        )
+        
+        # 4. Cachear resultado
+        await self._cache_inventory_info(inventory_info, market_id)
+        
+        logger.info(f"✅ Inventory check for {product_id}: {inventory_info.status.value} ({inventory_info.available_quantity} units)")
+        return inventory_info
+    
     async def check_multiple_products_availability(
         self,
         product_ids: List[str],
-        market_id: str = "US"
+        market_id: str = "US",
+        concurrency: Optional[int] = None
     ) -> Dict[str, InventoryInfo]:
         """
-        Verificar disponibilidad de múltiples productos en paralelo.
+        Verificar disponibilidad de múltiples productos con round-trips constantes.
+        
+        Lee todo el cache con un MGET, consulta los misses a Shopify en lotes
+        (filtro ``ids=``) con concurrencia limitada y escribe los resultados
+        en un único pipeline.
         
         Args:
             product_ids: Lista de IDs de productos
             market_id: Mercado donde verificar
+            concurrency: Peticiones simultáneas a Shopify (por defecto SHOPIFY_CONCURRENCY)
             
         Returns:
             Diccionario con InventoryInfo por producto_id
         """
+        unique_ids = list(dict.fromkeys(pid for pid in product_ids if pid))
+        if not unique_ids:
+            return {}
+        
         try:
-            # Ejecutar verificaciones en paralelo
-            tasks = [
-                self.check_product_availability(product_id, market_id)
-                for product_id in product_ids
-            ]
-            
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            # 1. Cache: un único MGET
+            inventory_results = await self._get_cached_inventory_bulk(unique_ids, market_id)
+            misses = [pid for pid in unique_ids if pid not in inventory_results]
             
-            # Procesar resultados
-            inventory_results = {}
-            for i, result in enumerate(results):
-                product_id = product_ids[i]
+            if misses:
+                # 2. Shopify en lotes
+                shopify_inventory = await self._get_shopify_inventory_bulk(misses, concurrency)
                 
-                if isinstance(result, Exception):
-                    logger.warning(f"Error checking {product_id}: {result}")
-                    inventory_results[product_id] = await self._create_fallback_inventory(product_id, market_id)
-                else:
-                    inventory_results[product_id] = result
-            
-            logger.info(f"✅ Checked inventory for {len(product_ids)} products in market {market_id}")
+                # 3. Construir información (fallback individual si un producto falla)
+                fresh: Dict[str, InventoryInfo] = {}
+                fallbacks: Dict[str, InventoryInfo] = {}
+                for pid in misses:
+                    try:
+                        fresh[pid] = await self._build_inventory_info(
+                            pid, market_id, shopify_inventory.get(str(pid), {})
+                        )
+                    except Exception as e:
+                        logger.warning(f"Error checking {pid}: {e}")
+                        fallbacks[pid] = self._build_fallback_inventory(pid, market_id)
+                
+                # 4. Escritura en un pipeline por TTL
+                await self._cache_inventory_bulk(fresh.values(), market_id)
+                await self._cache_fallback_inventory_bulk(fallbacks.values(), market_id)
+                inventory_results.update(fresh)
+                inventory_results.update(fallbacks)
+            
+            logger.info(
+                f"✅ Checked inventory for {len(unique_ids)} products in market {market_id} "
+                f"({len(unique_ids) - len(misses)} cached)"
+            )
             return inventory_results
             
         except Exception as e:
             logger.error(f"Error in bulk inventory check: {e}")
-            # Fallback para todos los productos
-            return {
-                product_id: await self._create_fallback_inventory(product_id, market_id)
-                for product_id in product_ids
-            }
+            # Fallback para todos los productos, cacheado en un solo pipeline
+            fallbacks = {pid: self._build_fallback_inventory(pid, market_id) for pid in unique_ids}
+            await self._cache_fallback_inventory_bulk(fallbacks.values(), market_id)
+            return fallbacks
     
     async def enrich_products_with_inventory(
         self,
@@ -316,27 +372,111 @@ class InventoryService:
             
         try:
             cache_key = f"{self.CACHE_PREFIX}:{product_id}:{market_id}"
-            cached_data = await self.redis_service.get(cache_key)
+            cached_data = await self.redis_service.get(cache_key, raw=True)
             
             if cached_data:
-                data = json.loads(cached_data)
-                return InventoryInfo(
-                    product_id=data["product_id"],
-                    status=InventoryStatus(data["status"]),
-                    quantity=data["quantity"],
-                    reserved_quantity=data.get("reserved_quantity", 0),
-                    available_quantity=data.get("available_quantity", 0),
-                    low_stock_threshold=data.get("low_stock_threshold", 5),
-                    market_availability=data.get("market_availability", {}),
-                    supplier_info=data.get("supplier_info", {}),
-                    last_updated=data.get("last_updated", time.time()),
-                    estimated_restock_date=data.get("estimated_restock_date")
-                )
+                inventory_info = self._inventory_from_cache_data(self.codec.decode(cached_data))
+                self._revalidate_if_stale(inventory_info, market_id)
+                return inventory_info
         except Exception as e:
             logger.debug(f"Error reading inventory cache: {e}")
         
         return None
     
+    async def _get_cached_inventory_bulk(self, product_ids: List[str], market_id: str) -> Dict[str, InventoryInfo]:
+        """Obtener inventario cacheado de varios productos con un único MGET"""
+        if not self.redis_service:
+            return {}
+        
+        keys = [f"{self.CACHE_PREFIX}:{pid}:{market_id}" for pid in product_ids]
+        try:
+            values = await self.redis_service.mget(keys, raw=True)
+            self._stats["redis_operations"] += 1
+        except Exception as e:
+            logger.debug(f"Error reading inventory cache (bulk): {e}")
+            return {}
+        
+        cached: Dict[str, InventoryInfo] = {}
+        for pid, value in zip(product_ids, values):
+            if not value:
+                continue
+            try:
+                cached[pid] = self._inventory_from_cache_data(self.codec.decode(value))
+            except Exception as e:
+                logger.debug(f"Error decoding inventory cache for {pid}: {e}")
+        
+        # Las entradas obsoletas se refrescan juntas con una consulta bulk
+        flight_keys = {f"{pid}:{market_id}": pid for pid in cached}
+        self._revalidation.revalidate_many_if_stale(
+            {key: cached[pid].last_updated for key, pid in flight_keys.items()},
+            lambda keys: self._refresh_inventory_bulk([flight_keys[key] for key in keys], market_id)
+        )
+        
+        self._stats["cache_hits"] += len(cached)
+        self._stats["cache_misses"] += len(product_ids) - len(cached)
+        return cached
+    
+    def _revalidate_if_stale(self, inventory_info: InventoryInfo, market_id: str):
+        """Programar el refresco en segundo plano de una entrada que superó CACHE_TTL"""
+        product_id = inventory_info.product_id
+        flight_key = f"{product_id}:{market_id}"
+        self._revalidation.revalidate_if_stale(
+            flight_key,
+            inventory_info.last_updated,
+            lambda: self._inventory_flight.do(
+                flight_key, lambda: self._load_product_inventory(product_id, market_id)
+            )
+        )
+    
+    async def _refresh_inventory_bulk(self, product_ids: List[str], market_id: str) -> Dict[str, InventoryInfo]:
+        """Recargar varias entradas obsoletas con una consulta bulk a Shopify y un pipeline"""
+        shopify_inventory = await self._get_shopify_inventory_bulk(product_ids)
+        
+        refreshed: Dict[str, InventoryInfo] = {}
+        for pid in product_ids:
+            try:
+                refreshed[pid] = await self._build_inventory_info(
+                    pid, market_id, shopify_inventory.get(str(pid), {})
+                )
+            except Exception as e:
+                # Se sigue sirviendo la entrada obsoleta hasta el TTL hard
+                logger.debug(f"Error refreshing inventory for {pid}: {e}")
+        
+        await self._cache_inventory_bulk(refreshed.values(), market_id)
+        return refreshed
+    
+    @staticmethod
+    def _inventory_from_cache_data(data: Dict[str, Any]) -> InventoryInfo:
+        """Reconstruir InventoryInfo desde su representación en cache"""
+        return InventoryInfo(
+            product_id=data["product_id"],
+            status=InventoryStatus(data["status"]),
+            quantity=data["quantity"],
+            reserved_quantity=data.get("reserved_quantity", 0),
+            available_quantity=data.get("available_quantity", 0),
+            low_stock_threshold=data.get("low_stock_threshold", 5),
+            market_availability=data.get("market_availability", {}),
+            supplier_info=data.get("supplier_info", {}),
+            last_updated=data.get("last_updated", time.time()),
+            estimated_restock_date=data.get("estimated_restock_date")
+        )
+    
+    @staticmethod
+    def _inventory_to_cache_data(inventory_info: InventoryInfo) -> Dict[str, Any]:
+        """Representación en cache de InventoryInfo"""
+        return {
+            "product_id": inventory_info.product_id,
+            "status": inventory_info.status.value,
+            "quantity": inventory_info.quantity,
+            "reserved_quantity": inventory_info.reserved_quantity,
+            "available_quantity": inventory_info.available_quantity,
+            "low_stock_threshold": inventory_info.low_stock_threshold,
+            "market_availability": inventory_info.market_availability,
+            "supplier_info": inventory_info.supplier_info,
+            "last_updated": inventory_info.last_updated,
+            "estimated_restock_date": inventory_info.estimated_restock_date
+        }
+    
     async def _cache_inventory_info(self, inventory_info: InventoryInfo, market_id: str):
         """Cachear información de inventario"""
         if not self.redis_service:
@@ -344,26 +484,50 @@ class InventoryService:
             
         try:
             cache_key = f"{self.CACHE_PREFIX}:{inventory_info.product_id}:{market_id}"
-            cache_data = {
-                "product_id": inventory_info.product_id,
-                "status": inventory_info.status.value,
-                "quantity": inventory_info.quantity,
-                "reserved_quantity": inventory_info.reserved_quantity,
-                "available_quantity": inventory_info.available_quantity,
-                "low_stock_threshold": inventory_info.low_stock_threshold,
-                "market_availability": inventory_info.market_availability,
-                "supplier_info": inventory_info.supplier_info,
-                "last_updated": inventory_info.last_updated,
-                "estimated_restock_date": inventory_info.estimated_restock_date
-            }
+            cache_data = self._inventory_to_cache_data(inventory_info)
             
-            await self.redis_service.set_json(cache_key, cache_data, self.CACHE_TTL)
+            await self.redis_service.set(cache_key, self.codec.encode(cache_data), self._revalidation.hard_ttl_seconds)
             
         except Exception as e:
             logger.debug(f"Error caching inventory info: {e}")
     
+    async def _cache_inventory_bulk(self, inventory_infos, market_id: str):
+        """Cachear varios InventoryInfo en un único pipeline"""
+        if not self.redis_service:
+            return
+        
+        try:
+            mapping = {
+                f"{self.CACHE_PREFIX}:{info.product_id}:{market_id}": self.codec.encode(self._inventory_to_cache_data(info))
+                for info in inventory_infos
+            }
+            if mapping:
+                await self.redis_service.mset_with_ttl(mapping, ttl=self._revalidation.hard_ttl_seconds)
+                self._stats["redis_operations"] += 1
+        except Exception as e:
+            logger.debug(f"Error caching inventory info (bulk): {e}")
+    
     async def _get_shopify_inventory(self, product_id: str) -> Dict[str, Any]:
-        """Obtener datos de inventario desde Shopify"""
+        """
+        Obtener datos de inventario desde Shopify.
+        
+        Usa la misma consulta real por IDs que el camino bulk; solo los clientes
+        sin ``get_products_by_ids`` recurren a ``_fetch_shopify_product`` (simulado).
+        """
+        inventory = await self._get_shopify_inventory_bulk([product_id])
+        return inventory.get(str(product_id), {})
+    
+    async def _get_shopify_inventory_bulk(
+        self,
+        product_ids: List[str],
+        concurrency: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtener datos de inventario de varios productos desde Shopify.
+        
+        Returns:
+            Diccionario str(product_id) -> datos de inventario (los no encontrados se omiten)
+        """
         try:
             if not self.shopify_client:
                 self.shopify_client = get_shopify_client()
@@ -372,26 +536,77 @@ class InventoryService:
                 logger.warning("Shopify client not available")
                 return {}
             
-            # Intentar obtener información de inventario de Shopify
-            # Nota: Esta implementación depende de la API específica de Shopify
-            product_data = await self._fetch_shopify_product(product_id)
-            
-            if product_data:
-                # Extraer información de inventario de la respuesta de Shopify
-                inventory_data = {
+            products = await self._fetch_shopify_products(product_ids, concurrency)
+            return {
+                pid: {
                     "quantity": product_data.get("inventory_quantity", 0),
                     "tracked": product_data.get("inventory_tracked", True),
                     "policy": product_data.get("inventory_policy", "deny"),
                     "available": product_data.get("available", True)
                 }
-                
-                return inventory_data
+                for pid, product_data in products.items()
+            }
             
         except Exception as e:
-            logger.warning(f"Error fetching Shopify inventory for {product_id}: {e}")
+            logger.warning(f"Error fetching Shopify inventory for {len(product_ids)} products: {e}")
         
         return {}
     
+    async def _fetch_shopify_products(
+        self,
+        product_ids: List[str],
+        concurrency: Optional[int] = None
+    ) -> Dict[str, Dict]:
+        """
+        Obtener productos de Shopify en lotes con el filtro ``ids=``.
+        
+        Si el cliente no soporta consultas por IDs se recurre a
+        ``_fetch_shopify_product`` por producto, con la misma concurrencia.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.SHOPIFY_CONCURRENCY)
+        
+        if not hasattr(self.shopify_client, "get_products_by_ids"):
+            async def fetch_one(pid):
+                async with semaphore:
+                    return pid, await self._fetch_shopify_product(pid)
+            
+            results = await asyncio.gather(*(fetch_one(pid) for pid in product_ids))
+            return {str(pid): data for pid, data in results if data}
+        
+        async def fetch_batch(batch):
+            async with semaphore:
+                # Cliente síncrono (requests): fuera del event loop
+                products = await asyncio.to_thread(
+                    self.shopify_client.get_products_by_ids, [str(pid) for pid in batch], "id,variants"
+                )
+            self._stats["shopify_calls"] += 1
+            return products
+        
+        batches = [
+            product_ids[start:start + self.SHOPIFY_BATCH_SIZE]
+            for start in range(0, len(product_ids), self.SHOPIFY_BATCH_SIZE)
+        ]
+        fetched: Dict[str, Dict] = {}
+        for products in await asyncio.gather(*(fetch_batch(batch) for batch in batches)):
+            for product in products or []:
+                fetched[str(product.get("id"))] = self._flatten_shopify_inventory(product)
+        return fetched
+    
+    @staticmethod
+    def _flatten_shopify_inventory(product: Dict[str, Any]) -> Dict[str, Any]:
+        """Resumir el inventario de las variantes de un producto de Shopify"""
+        variants = product.get("variants") or []
+        quantity = sum(max(0, v.get("inventory_quantity") or 0) for v in variants)
+        continue_selling = any(v.get("inventory_policy") == "continue" for v in variants)
+        
+        return {
+            "id": product.get("id"),
+            "inventory_quantity": quantity,
+            "inventory_tracked": any(v.get("inventory_management") for v in variants),
+            "inventory_policy": "continue" if continue_selling else "deny",
+            "available": quantity > 0 or continue_selling
+        }
+    
     async def _fetch_shopify_product(self, product_id: str) -> Optional[Dict]:
         """Obtener producto desde Shopify de manera async-safe"""
         try:
@@ -453,13 +668,14 @@ class InventoryService:
         
         return inventory_info
     
-    async def _create_fallback_inventory(self, product_id: str, market_id: str) -> InventoryInfo:
-        """Crear información de inventario de fallback optimista"""
+    def _build_fallback_inventory(self, product_id: str, market_id: str) -> InventoryInfo:
+        """Construir información de inventario de fallback optimista (sin cachear)"""
         
         market_config = self.market_configs.get(market_id, self.market_configs["US"])
+        self._stats["fallback_operations"] += 1
         
         # Fallback optimista - asumir disponibilidad
-        fallback_info = InventoryInfo(
+        return InventoryInfo(
             product_id=product_id,
             status=InventoryStatus.AVAILABLE,
             quantity=15,  # Cantidad optimista
@@ -468,26 +684,52 @@ class InventoryService:
             market_availability={market_id: market_config["default_availability"]},
             supplier_info={"source": "fallback", "optimistic": True}
         )
+    
+    def _fallback_cache_entry(self, fallback_info: InventoryInfo, market_id: str) -> tuple:
+        """Clave y datos con que se cachea un fallback"""
+        cache_key = f"{self.CACHE_PREFIX}:fallback:{fallback_info.product_id}:{market_id}"
+        cache_data = {
+            "product_id": fallback_info.product_id,
+            "status": fallback_info.status.value,
+            "quantity": fallback_info.quantity,
+            "market_availability": fallback_info.market_availability,
+            "fallback": True,
+            "created_at": time.time()
+        }
+        return cache_key, cache_data
+    
+    async def _create_fallback_inventory(self, product_id: str, market_id: str) -> InventoryInfo:
+        """Crear información de inventario de fallback optimista"""
+        
+        fallback_info = self._build_fallback_inventory(product_id, market_id)
         
         # Cachear fallback por menos tiempo
         if self.redis_service:
             try:
-                cache_key = f"{self.CACHE_PREFIX}:fallback:{product_id}:{market_id}"
-                cache_data = {
-                    "product_id": product_id,
-                    "status": fallback_info.status.value,
-                    "quantity": fallback_info.quantity,
-                    "market_availability": fallback_info.market_availability,
-                    "fallback": True,
-                    "created_at": time.time()
-                }
-                await self.redis_service.set_json(cache_key, cache_data, self.FALLBACK_TTL)
+                cache_key, cache_data = self._fallback_cache_entry(fallback_info, market_id)
+                await self.redis_service.set(cache_key, self.codec.encode(cache_data), self.FALLBACK_TTL)
             except Exception as e:
                 logger.warning(f"Error caching fallback inventory: {e}")
         
         logger.info(f"🔄 Created fallback inventory for {product_id} in market {market_id}")
         return fallback_info
     
+    async def _cache_fallback_inventory_bulk(self, fallback_infos, market_id: str):
+        """Cachear varios fallbacks en un único pipeline"""
+        if not self.redis_service:
+            return
+        
+        try:
+            mapping = {}
+            for info in fallback_infos:
+                cache_key, cache_data = self._fallback_cache_entry(info, market_id)
+                mapping[cache_key] = self.codec.encode(cache_data)
+            if mapping:
+                await self.redis_service.mset_with_ttl(mapping, ttl=self.FALLBACK_TTL)
+                logger.info(f"🔄 Created fallback inventory for {len(mapping)} products in market {market_id}")
+        except Exception as e:
+            logger.warning(f"Error caching fallback inventory: {e}")
+    
     def get_market_availability_summary(self, products_inventory: Dict[str, InventoryInfo]) -> Dict[str, Any]:
         """Generar resumen de disponibilidad por mercado"""
         
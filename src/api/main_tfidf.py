@@ -108,7 +108,7 @@ async def load_recommender():
     """Carga y entrena el recomendador TF-IDF."""
     try:
         # Intentar cargar modelo pre-entrenado
-        if os.path.exists("data/tfidf_model.pkl"):
+        if recommender.has_saved_model():
             success = await recommender.load()
             if success:
                 return True
@@ -88,6 +88,7 @@ product_cache = None  # Para backward compatibility
 
 from src.api.core.config import get_settings
 from src.api.startup_helper import StartupManager
+from src.recommenders.tfidf_trainer import TFIDFTrainer
 from src.api.core.store import get_shopify_client, init_shopify
 from src.api.security_auth import get_api_key, get_current_user
 
@@ -418,6 +419,19 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"⚠️ InventoryService initialization failed: {e}")
         
+        # ============================================================================
+        # 🎯 PASO 7B: EVENT STREAM CONSUMERS (EVENT_INGESTION_MODE=stream)
+        # ============================================================================
+        
+        if settings.event_ingestion_mode == "stream" and settings.event_stream_workers_enabled:
+            try:
+                consumers = await ServiceFactory.start_event_stream_consumers(
+                    retail_recommender=retail_recommender
+                )
+                logger.info(f"✅ Event stream consumers running: {[c.group for c in consumers]}")
+            except Exception as e:
+                logger.warning(f"⚠️ Event stream consumers not started: {e}")
+        
         # ============================================================================
         # 🎯 PASO 8: MCP RECOMMENDER INITIALIZATION
         # ============================================================================
@@ -547,11 +561,10 @@ async def lifespan(app: FastAPI):
     
     try:
         # ✅ Shutdown ProductCache background tasks
-        if product_cache and hasattr(product_cache, 'health_task'):
+        if product_cache and hasattr(product_cache, 'stop_background_tasks'):
             try:
-                if product_cache.health_task:
-                    product_cache.health_task.cancel()
-                    await asyncio.sleep(0.1)  # Give time for cancellation
+                # Health check + suscripción de invalidaciones L1
+                await product_cache.stop_background_tasks()
                 logger.info("✅ ProductCache background tasks stopped")
             except Exception as e:
                 logger.warning(f"⚠️ ProductCache shutdown warning: {e}")
@@ -1196,8 +1209,8 @@ async def load_recommender():
             logger.warning("⚠️ tfidf_recommender not initialized in load_recommender")
             return False
             
-        # Intentar cargar modelo pre-entrenado
-        if os.path.exists("data/tfidf_model.pkl"):
+        # Intentar cargar modelo pre-entrenado (artefacto mmap o pickle legacy)
+        if tfidf_recommender.has_saved_model():
             success = await tfidf_recommender.load()
             if success:
                 logger.info("Modelo TF-IDF cargado correctamente desde archivo")
@@ -1210,7 +1223,9 @@ async def load_recommender():
             return False
             
         logger.info(f"Entrenando recomendador TF-IDF con {len(products)} productos")
-        success = await tfidf_recommender.fit(products)
+        # Vectorización en proceso separado: la API sigue respondiendo mientras entrena
+        trainer = TFIDFTrainer(tfidf_recommender, startup_manager=startup_manager)
+        success = await trainer.train(products)
         
         if success:
             logger.info("Recomendador TF-IDF entrenado correctamente")
@@ -12,7 +12,9 @@ PRINCIPIO: Extend, don't replace - Agregar funcionalidad, no reemplazar código
 """
 
 import json
+import sys
 import time
+import asyncio
 import logging
 import hashlib
 from typing import Dict, List, Optional, Any, Tuple
@@ -20,10 +22,14 @@ from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from enum import Enum
 
+from cachetools import TTLCache
+
 # Redis connection en state manager
 # from src.api.core.redis_client import RedisClient
 # from src.api.core.redis_config_fix import PatchedRedisClient as RedisClient
 from src.api.factories import ServiceFactory
+from src.api.core.cache_codec import CacheCodec, CodecError
+from src.api.core.redis_service import execute_raw, get_raw
 
 logger = logging.getLogger(__name__)
 
@@ -275,6 +281,66 @@ class MCPConversationContext:
             )
 
 
+def _approx_size(value: Any) -> int:
+    """Tamaño aproximado en memoria (bytes) de un estado serializado."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_approx_size(item) for item in value.values())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_approx_size(item) for item in value)
+    return size
+
+
+class SessionStateCache(TTLCache):
+    """
+    L1 en proceso de estados de sesión: LRU acotado por memoria + TTL.
+    
+    ``maxsize`` se expresa en bytes aproximados (``currsize`` es la memoria
+    contabilizada); al superarlo se expulsan las sesiones menos usadas.
+    """
+    
+    def __init__(self, max_bytes: int, ttl: float, timer=time.monotonic):
+        super().__init__(maxsize=max_bytes, ttl=ttl, timer=timer, getsizeof=_approx_size)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+    
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self.expirations += len(expired or ())
+        return expired
+    
+    def put(self, session_id: str, state: Dict[str, Any]) -> bool:
+        """Guarda un estado; si no cabe en el presupuesto se descarta (y la versión anterior)."""
+        try:
+            self[session_id] = state
+            return True
+        except ValueError:
+            self.pop(session_id, None)
+            logger.warning(f"⚠️ Session {session_id} too large for in-memory cache, skipped")
+            return False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self),
+            "bytes": self.currsize,
+            "max_bytes": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
 class MCPConversationStateManager:
     """
     Gestor avanzado de estado conversacional con capacidades de machine learning
@@ -286,15 +352,28 @@ class MCPConversationStateManager:
     
     Integra con ConversationAIManager existente para proporcionar persistencia
     y análisis avanzado de conversaciones.
+    
+    Modos de almacenamiento en Redis:
+    - ``snapshot``: el contexto completo se reescribe (SETEX) en cada guardado.
+    - ``delta``: los turnos se añaden a listas de Redis y solo se reescribe una
+      cabecera pequeña (hash); el historial se materializa al cargar.
     """
     
+    STORAGE_SNAPSHOT = "snapshot"
+    STORAGE_DELTA = "delta"
+    
+    # Marca en las entradas del L1 cuyo estado coincide con el guardado delta en Redis
+    DELTA_SYNCED_FLAG = "_delta_synced"
+    
     def __init__(
         self, 
         # redis_client: RedisClient,
         redis_client=None,
         state_ttl: int = 86400,  # 24 hours
         conversation_ttl: int = 7 * 24 * 3600,  # 7 days
-        max_turns_per_session: int = 50
+        max_turns_per_session: int = 50,
+        storage_mode: str = STORAGE_SNAPSHOT,
+        session_cache_max_bytes: int = 64 * 1024 * 1024
     ):
         """
         Inicializa el gestor de estado conversacional.
@@ -304,6 +383,8 @@ class MCPConversationStateManager:
             state_ttl: TTL para estado de sesión activa (segundos)
             conversation_ttl: TTL para historial completo (segundos)
             max_turns_per_session: Máximo de turnos por sesión
+            storage_mode: "snapshot" (contexto completo) o "delta" (cabecera + turnos añadidos)
+            session_cache_max_bytes: Memoria máxima (aprox.) del L1 de sesiones en proceso
         """
         # if redis_client is None:
         #     # Usar factory en inicialización async
@@ -319,6 +400,10 @@ class MCPConversationStateManager:
         self.state_ttl = state_ttl
         self.conversation_ttl = conversation_ttl
         self.max_turns_per_session = max_turns_per_session
+        if storage_mode not in (self.STORAGE_SNAPSHOT, self.STORAGE_DELTA):
+            logger.warning(f"⚠️ Unknown conversation storage mode '{storage_mode}', using snapshot")
+            storage_mode = self.STORAGE_SNAPSHOT
+        self.storage_mode = storage_mode
         
         # Prefixes para diferentes tipos de datos
         self.CONVERSATION_PREFIX = "mcp:conversation"
@@ -326,8 +411,11 @@ class MCPConversationStateManager:
         self.MARKET_PREFS_PREFIX = "mcp:market_prefs"
         self.SESSION_INDEX_PREFIX = "mcp:session_index"
         
-        # ✅ ADDED: Cache en memoria para compatibilidad con mcp_conversation_state_fix
-        self.sessions_cache = {}
+        # ✅ L1 en memoria delante de Redis: acotado por memoria, TTL = state_ttl
+        self.sessions_cache = SessionStateCache(max_bytes=session_cache_max_bytes, ttl=state_ttl)
+        
+        # Serialización compacta del estado guardado en Redis
+        self.codec = CacheCodec.from_env()
         
         # Métricas internas
         self.metrics = {
@@ -338,7 +426,7 @@ class MCPConversationStateManager:
             "cache_misses": 0
         }
         
-        logger.info("MCPConversationStateManager initialized (Enterprise + Phase2 Compatible)")
+        logger.info(f"MCPConversationStateManager initialized (Enterprise + Phase2 Compatible, storage: {self.storage_mode})")
     
     async def _get_redis_resources(self):
         """
@@ -557,44 +645,71 @@ class MCPConversationStateManager:
             logger.error(f"Error adding conversation turn: {e}")
             raise
 
-    async def load_conversation_state(
-        self,
-        session_id: str
-    ) -> Optional[MCPConversationContext]:
-        """✅ ENHANCED: Carga simplificada usando Redis directo con logging detallado"""
+    async def load_conversation_state(self, session_id: str) -> Optional[MCPConversationContext]:
+        """
+        ✅ ENHANCED: Carga simplificada usando Redis directo con logging detallado
+        
+        Args:
+            session_id: ID de sesión
+        """
         try:
             context_data = None
+            loaded_from_delta = False
             
             logger.info(f"🔍 LOAD ATTEMPT: Loading session {session_id}")
             
+            # ✅ L1 EN MEMORIA: read-through delante de Redis (solo modo delta;
+            # en modo snapshot Redis manda y el L1 es solo respaldo, ver más abajo)
+            if self.storage_mode == self.STORAGE_DELTA:
+                context_data = await self._get_from_session_cache(session_id)
+                if context_data is not None:
+                    loaded_from_delta = bool(context_data.get(self.DELTA_SYNCED_FLAG))
+                    self.metrics["cache_hits"] += 1
+                    logger.debug(f"✅ Loaded {session_id} from memory")
+            
             # ✅ ENTERPRISE REDIS: Usar enterprise architecture
-            redis_service, redis_client = await self._get_redis_resources()
-            if redis_client:
+            redis_client = None
+            if context_data is None:
+                redis_service, redis_client = await self._get_redis_resources()
+            if redis_client and self.storage_mode == self.STORAGE_DELTA:
+                context_data = await self._load_conversation_delta(redis_client, session_id)
+                loaded_from_delta = context_data is not None
+                if loaded_from_delta:
+                    context_data[self.DELTA_SYNCED_FLAG] = True
+                    self.sessions_cache.put(session_id, context_data)
+            
+            # Snapshot (modo snapshot, o sesiones guardadas antes de activar delta)
+            if redis_client and context_data is None:
                 cache_key = f"conversation_session:{session_id}"
                 logger.info(f"   Redis cache key: {cache_key}")
                 
-                raw_data = await redis_client.get(cache_key)
+                raw_data = await get_raw(redis_client, cache_key)
                 
                 if raw_data:
                     try:
-                        context_data = json.loads(raw_data)
+                        context_data = self.codec.decode(raw_data)
+                        self.sessions_cache.put(session_id, context_data)
                         self.metrics["cache_hits"] += 1
                         logger.info(f"✅ REDIS HIT: Loaded {session_id} from Redis successfully")
                         logger.info(f"   Data keys: {list(context_data.keys()) if isinstance(context_data, dict) else 'non-dict'}")
-                    except json.JSONDecodeError as e:
-                        logger.error(f"❌ JSON DECODE ERROR for {session_id}: {e}")
+                    except CodecError as e:
+                        logger.error(f"❌ DECODE ERROR for {session_id}: {e}")
                         logger.error(f"   Raw data preview: {str(raw_data)[:200]}...")
                 else:
                     logger.warning(f"❌ REDIS MISS: No data found for {session_id}")
                     logger.info(f"   Cache key checked: {cache_key}")
-            else:
+            elif context_data is None:
                 logger.error(f"❌ REDIS CONNECTION FAILED for session {session_id}")
                 logger.error("   Redis client is None")
-            # ✅ FALLBACK MEMORIA: Si no está en Redis
-            if not context_data and session_id in self.sessions_cache:
-                context_data = self.sessions_cache[session_id]
-                self.metrics["cache_hits"] += 1
-                logger.debug(f"✅ Loaded {session_id} from memory")
+            
+            # ✅ FALLBACK MEMORIA: Si no está en Redis (o Redis no responde)
+            if not context_data:
+                context_data = self.sessions_cache.get(session_id)
+                if context_data is not None:
+                    self.sessions_cache.hits += 1
+                    loaded_from_delta = bool(context_data.get(self.DELTA_SYNCED_FLAG))
+                    self.metrics["cache_hits"] += 1
+                    logger.debug(f"✅ Loaded {session_id} from memory")
             
             if not context_data:
                 self.metrics["cache_misses"] += 1
@@ -604,6 +719,9 @@ class MCPConversationStateManager:
             # ✅ DESERIALIZACIÓN: Manejar diferentes formatos
             try:
                 context = self._deserialize_context(context_data)
+                if loaded_from_delta:
+                    # Lo cargado ya está en las listas: el próximo guardado solo añade lo nuevo
+                    self._mark_persisted(context)
                 self.metrics["conversations_loaded"] += 1
                 return context
             except Exception as e:
@@ -896,7 +1014,14 @@ class MCPConversationStateManager:
             
             # ✅ REDIS DIRECTO: Sin ensure_connected, uso directo del ServiceFactory Redis
             redis_success = False
-            if self.redis:
+            if self.redis and self.storage_mode == self.STORAGE_DELTA and isinstance(context, MCPConversationContext):
+                try:
+                    redis_success = await self._save_conversation_delta(session_id, context)
+                    state_data[self.DELTA_SYNCED_FLAG] = True
+                    logger.info(f"✅ REDIS DELTA SAVE SUCCESS: {session_id}")
+                except Exception as redis_error:
+                    logger.error(f"❌ REDIS DELTA SAVE FAILED: {redis_error}")
+            elif self.redis:
                 try:
                     logger.info(f"   Attempting Redis save...")
                     
@@ -905,14 +1030,14 @@ class MCPConversationStateManager:
                     logger.info(f"   Cache key: {cache_key}")
                     logger.info(f"   TTL: {self.state_ttl} seconds")
                     
-                    json_data = json.dumps(state_data)
-                    logger.info(f"   JSON data size: {len(json_data)} bytes")
+                    encoded_data = self.codec.encode(state_data)
+                    logger.info(f"   Encoded data size: {len(encoded_data)} bytes")
 
                     # ✅ CORRECCIÓN: Usar Redis directo sin ensure_connected
                     success = await self.redis.setex(
                         cache_key,
                         self.state_ttl,
-                        json_data
+                        encoded_data
                     )
                     
                     if success:
@@ -927,9 +1052,9 @@ class MCPConversationStateManager:
             else:
                 logger.warning(f"⚠️ REDIS CLIENT NOT AVAILABLE for session {session_id}")
             
-            # ✅ FALLBACK MEMORIA: Siempre guardar en memoria como backup
-            self.sessions_cache[session_id] = state_data
-            logger.info(f"✅ MEMORY FALLBACK: Saved {session_id} to in-memory cache")
+            # ✅ L1 MEMORIA: read-through para la próxima carga y respaldo si Redis falla
+            if self.sessions_cache.put(session_id, state_data):
+                logger.info(f"✅ MEMORY CACHE: Saved {session_id} to in-memory cache")
             
             self.metrics["state_saves"] += 1
             
@@ -940,11 +1065,11 @@ class MCPConversationStateManager:
             logger.error(f"❌ Save conversation state failed: {e}")
             # Garantizar que al menos quede en memoria como último recurso
             try:
-                self.sessions_cache[session_id] = {
+                self.sessions_cache.put(session_id, {
                     "session_id": session_id,
                     "context": context if isinstance(context, dict) else str(context),
                     "timestamp": time.time()
-                }
+                })
                 logger.info(f"✅ EMERGENCY FALLBACK: Saved {session_id} to memory cache")
                 return True
             except Exception as fallback_error:
@@ -1080,6 +1205,8 @@ class MCPConversationStateManager:
         """Retorna métricas del estado conversacional."""
         return {
             "manager_metrics": self.metrics.copy(),
+            "codec": self.codec.get_stats(),
+            "session_cache": self.sessions_cache.get_stats(),
             "cache_hit_ratio": (
                 self.metrics["cache_hits"] / 
                 (self.metrics["cache_hits"] + self.metrics["cache_misses"])
@@ -1092,6 +1219,14 @@ class MCPConversationStateManager:
     
     def _serialize_context(self, context: MCPConversationContext) -> Dict[str, Any]:
         """Serializa el contexto conversacional para almacenamiento."""
+        data = self._serialize_header(context)
+        data["turns"] = [asdict(turn) for turn in context.turns]
+        # Copia: el estado queda en el L1 y el contexto sigue añadiendo intents
+        data["intent_history"] = list(context.intent_history)
+        return data
+    
+    def _serialize_header(self, context: MCPConversationContext) -> Dict[str, Any]:
+        """Campos del contexto sin el historial (turns / intent_history)."""
         return {
             "session_id": context.session_id,
             "user_id": context.user_id,
@@ -1099,8 +1234,6 @@ class MCPConversationStateManager:
             "last_updated": context.last_updated,
             "conversation_stage": context.conversation_stage.value,
             "total_turns": context.total_turns,
-            "turns": [asdict(turn) for turn in context.turns],
-            "intent_history": context.intent_history,
             "primary_intent": context.primary_intent,
             "intent_evolution_pattern": context.intent_evolution_pattern.value,
             "market_preferences": {
@@ -1131,7 +1264,7 @@ class MCPConversationStateManager:
             conversation_stage=ConversationStage(data["conversation_stage"]),
             total_turns=data["total_turns"],
             turns=turns,
-            intent_history=data.get("intent_history", []),
+            intent_history=list(data.get("intent_history", [])),
             primary_intent=data.get("primary_intent", "unknown"),
             intent_evolution_pattern=IntentEvolution(data.get("intent_evolution_pattern", "stable")),
             market_preferences=market_prefs,
@@ -1144,6 +1277,145 @@ class MCPConversationStateManager:
             device_type=data.get("device_type", "unknown")
         )
     
+    # === L1 DE SESIONES ===
+    
+    async def _get_from_session_cache(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Estado de la sesión desde el L1 en modo delta, o None (miss / obsoleto).
+        
+        La cabecera en Redis (un HGET) detecta si otro worker añadió turnos.
+        El modo snapshot no tiene una versión barata con la que validar, así
+        que allí se lee Redis primero y el L1 solo se usa como respaldo.
+        """
+        context_data = self.sessions_cache.get(session_id)
+        if context_data is None:
+            self.sessions_cache.misses += 1
+            return None
+        
+        if self.storage_mode == self.STORAGE_DELTA:
+            persisted_turns = await self.get_persisted_turn_count(session_id)
+            if persisted_turns is not None and persisted_turns != context_data.get("total_turns"):
+                logger.debug(f"Stale in-memory state for {session_id}: reloading from Redis")
+                self.sessions_cache.pop(session_id, None)
+                self.sessions_cache.misses += 1
+                return None
+        
+        self.sessions_cache.hits += 1
+        return context_data
+    
+    # === ALMACENAMIENTO DELTA ===
+    
+    def _delta_keys(self, session_id: str) -> Dict[str, str]:
+        """Claves Redis del modo delta (cabecera + listas de turnos e intents)."""
+        base = f"conversation_session:{session_id}"
+        return {
+            "header": f"{base}:header",
+            "turns": f"{base}:turns",
+            "intents": f"{base}:intents"
+        }
+    
+    @staticmethod
+    def _mark_persisted(context: MCPConversationContext):
+        """Recuerda el último turno/intent ya guardado (por identidad) en el propio contexto."""
+        context._persisted_tail = (
+            context.turns[-1] if context.turns else None,
+            context.intent_history[-1] if context.intent_history else None
+        )
+    
+    @staticmethod
+    def _items_after(items: List[Any], last: Any) -> Optional[List[Any]]:
+        """Elementos posteriores a ``last`` (por identidad); None si ``last`` ya no está."""
+        if last is None:
+            return list(items)
+        for i in range(len(items) - 1, -1, -1):
+            if items[i] is last:
+                return items[i + 1:]
+        return None
+    
+    async def _save_conversation_delta(self, session_id: str, context: MCPConversationContext) -> bool:
+        """
+        Guarda en modo delta: RPUSH de los turnos nuevos y reescritura de la cabecera.
+        
+        Si el contexto no viene de un guardado/carga delta previo, o su historial
+        fue reemplazado, se reescriben las listas completas (y se borra el snapshot).
+        """
+        keys = self._delta_keys(session_id)
+        marker = getattr(context, "_persisted_tail", None)
+        new_turns = new_intents = None
+        if marker is not None:
+            new_turns = self._items_after(context.turns, marker[0])
+            new_intents = self._items_after(context.intent_history, marker[1])
+        rewrite = new_turns is None or new_intents is None
+        if rewrite:
+            new_turns, new_intents = context.turns, context.intent_history
+        
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(keys["header"], mapping={
+            "state": self.codec.encode(self._serialize_header(context)),
+            "total_turns": context.total_turns
+        })
+        if rewrite:
+            pipe.delete(keys["turns"], keys["intents"], f"conversation_session:{session_id}")
+        if new_turns:
+            pipe.rpush(keys["turns"], *[self.codec.encode(asdict(turn)) for turn in new_turns])
+            pipe.ltrim(keys["turns"], -self.max_turns_per_session, -1)
+        if new_intents:
+            pipe.rpush(keys["intents"], *[self.codec.encode(record) for record in new_intents])
+            pipe.ltrim(keys["intents"], -self.max_turns_per_session, -1)
+        for key in keys.values():
+            pipe.expire(key, self.state_ttl)
+        await pipe.execute()
+        
+        self._mark_persisted(context)
+        logger.debug(
+            f"Delta save {session_id}: {len(new_turns)} turns, {len(new_intents)} intents"
+            f"{' (full rewrite)' if rewrite else ''}"
+        )
+        return True
+    
+    async def _load_conversation_delta(self, redis_client, session_id: str) -> Optional[Dict[str, Any]]:
+        """Lee cabecera + listas del modo delta; None si la sesión no está en formato delta."""
+        keys = self._delta_keys(session_id)
+        try:
+            header = await execute_raw(redis_client, "HGET", keys["header"], "state")
+            if not header:
+                return None
+            
+            turns, intents = await asyncio.gather(
+                execute_raw(redis_client, "LRANGE", keys["turns"], 0, -1),
+                execute_raw(redis_client, "LRANGE", keys["intents"], 0, -1)
+            )
+            
+            data = self.codec.decode(header)
+            data["turns"] = [self.codec.decode(turn) for turn in turns or []]
+            data["intent_history"] = [self.codec.decode(record) for record in intents or []]
+        except Exception as e:
+            logger.error(f"❌ DELTA LOAD ERROR for {session_id}: {e}")
+            return None
+        
+        self.metrics["cache_hits"] += 1
+        logger.info(f"✅ REDIS HIT (delta): {session_id} - {len(data['turns'])} turns materialized")
+        return data
+    
+    async def get_persisted_turn_count(self, session_id: str) -> Optional[int]:
+        """
+        Turnos guardados según la cabecera (modo delta), sin materializar el historial.
+        
+        Returns:
+            int, o None si no se puede saber sin cargar el estado completo
+        """
+        if self.storage_mode != self.STORAGE_DELTA:
+            return None
+        try:
+            redis_service, redis_client = await self._get_redis_resources()
+            if not redis_client:
+                return None
+            value = await execute_raw(redis_client, "HGET", self._delta_keys(session_id)["header"], "total_turns")
+            return int(value) if value is not None else None
+        except Exception as e:
+            logger.debug(f"Could not read persisted turn count for {session_id}: {e}")
+            return None
+    
     def _detect_device_type(self, user_agent: str) -> str:
         """Detecta el tipo de dispositivo desde user agent."""
         user_agent_lower = user_agent.lower()
@@ -1412,7 +1684,11 @@ async def get_conversation_state_manager():
                 #     password=settings.redis_password,
                 #     ssl=settings.redis_ssl
                 # )
-                _global_conversation_state_manager = MCPConversationStateManager(redis_service._client if redis_service else None)
+                _global_conversation_state_manager = MCPConversationStateManager(
+                    redis_service._client if redis_service else None,
+                    storage_mode=settings.conversation_state_storage,
+                    session_cache_max_bytes=settings.conversation_session_cache_max_bytes
+                )
             else:
                 # Si no hay Redis disponible, crear sin Redis
                 _global_conversation_state_manager = MCPConversationStateManager(None)
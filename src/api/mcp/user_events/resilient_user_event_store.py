@@ -17,14 +17,16 @@ import json
 import hashlib
 import os
 from typing import Dict, List, Optional, Any, Union, Set
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import random
 import uuid
 import redis.asyncio as aioredis
+from redis.exceptions import WatchError
 
 from cachetools import TTLCache, LRUCache
 
 from ..client.circuit_breaker import CircuitBreaker, CircuitBreakerConfig
+from ...core.event_stream import DEFAULT_STREAM_MAXLEN, EventStream
 from .event_schemas import (
     EventType, UserEvent, UserProfile, IntentData, ProductEventData,
     validate_event_data, create_event_id, calculate_user_activity_level
@@ -32,6 +34,48 @@ from .event_schemas import (
 
 logger = logging.getLogger(__name__)
 
+# TTL de eventos y de los agregados del perfil (30 días)
+EVENTS_TTL_SECONDS = 2592000
+
+# Tamaño de las listas recientes del perfil
+RECENT_INTENTS_LIMIT = 10
+RECENT_SEARCHES_LIMIT = 20
+RECENT_PURCHASES_LIMIT = 10
+
+# Marca en el hash meta: los agregados incluyen todo el historial del usuario
+PROFILE_BACKFILLED_FIELD = "backfilled"
+
+# Reintentos de un batch cuando otro worker persiste a la vez alguno de sus eventos
+PERSIST_WATCH_RETRIES = 3
+
+
+def _json_default(value: Any) -> str:
+    """Serializa datetimes de los eventos (event.dict() los conserva)."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _event_timestamp(event: Dict[str, Any]) -> Optional[float]:
+    """Timestamp del evento en segundos epoch (UTC), o None si no es válido."""
+    value = event.get("timestamp")
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _from_epoch(seconds: float) -> datetime:
+    """Epoch -> datetime UTC naive (mismo formato que datetime.utcnow())."""
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None)
+
+
 class StorageError(Exception):
     """Error en operaciones de almacenamiento"""
     pass
@@ -46,8 +90,15 @@ class UserEventStore:
     - Circuit breaker para proteger contra fallos de Redis
     - Operaciones bulk para rendimiento
     - Métricas de rendimiento detalladas
+    - Modo de ingesta "stream": record_event es un único XADD y la agregación
+      del perfil la hace el grupo de consumidores ``profile``
     """
     
+    INGESTION_BUFFER = "buffer"
+    INGESTION_STREAM = "stream"
+    # Valor de EVENT_INGESTION_MODE sin stream: equivale al buffer local
+    INGESTION_DIRECT = "direct"
+    
     def __init__(
         self,
         redis_url: str = "redis://localhost:6379/0",
@@ -56,7 +107,10 @@ class UserEventStore:
         cache_size: int = 1000,
         local_buffer_size: int = 200,
         flush_interval_seconds: int = 30,
-        local_fallback_dir: Optional[str] = None
+        local_fallback_dir: Optional[str] = None,
+        redis_client=None,
+        ingestion_mode: str = INGESTION_BUFFER,
+        stream_maxlen: int = DEFAULT_STREAM_MAXLEN
     ):
         """
         Inicializa el almacén de eventos de usuario.
@@ -69,10 +123,24 @@ class UserEventStore:
             local_buffer_size: Tamaño de buffer para operaciones bulk
             flush_interval_seconds: Intervalo para flush de buffer
             local_fallback_dir: Directorio para almacenamiento local de fallback
+            redis_client: Cliente redis.asyncio ya creado (si no, se crea desde redis_url)
+            ingestion_mode: "buffer" (buffer local + flush) o "stream" (Redis Streams);
+                "direct" (valor por defecto de EVENT_INGESTION_MODE) equivale a "buffer"
+            stream_maxlen: Longitud aproximada máxima del stream de eventos
         """
         self.redis_url = redis_url
         self.redis = None  # Se inicializa en connect()
         self.connected = False
+        self._redis_client = redis_client
+        
+        if ingestion_mode == self.INGESTION_DIRECT:
+            ingestion_mode = self.INGESTION_BUFFER
+        if ingestion_mode not in (self.INGESTION_BUFFER, self.INGESTION_STREAM):
+            logger.warning(f"⚠️ Modo de ingesta desconocido '{ingestion_mode}', usando '{self.INGESTION_BUFFER}'")
+            ingestion_mode = self.INGESTION_BUFFER
+        self.ingestion_mode = ingestion_mode
+        self.stream_maxlen = stream_maxlen
+        self.event_stream: Optional[EventStream] = None  # Se inicializa en connect()
         
         # Configuración
         self.cache_ttl = cache_ttl
@@ -142,7 +210,8 @@ class UserEventStore:
             "fallbacks_used": 0,
             "circuit_breaker_triggers": 0,
             "recovery_operations": 0,
-            "local_storage_operations": 0
+            "local_storage_operations": 0,
+            "events_streamed": 0
         }
         
         # Iniciar tareas background
@@ -153,13 +222,14 @@ class UserEventStore:
         logger.info(f"Circuit breaker habilitado: {enable_circuit_breaker}")
         logger.info(f"Caché local: tamaño={cache_size}, TTL={cache_ttl}s")
         logger.info(f"Buffer de eventos: tamaño={local_buffer_size}, flush cada {flush_interval_seconds}s")
+        logger.info(f"Modo de ingesta: {self.ingestion_mode}")
     
     async def connect(self):
         """
         Conecta al almacén Redis y inicia tareas background.
         """
         try:
-            self.redis = await aioredis.from_url(
+            self.redis = self._redis_client or await aioredis.from_url(
                 self.redis_url,
                 encoding="utf-8",
                 decode_responses=True
@@ -169,6 +239,11 @@ class UserEventStore:
             await self.redis.ping()
             self.connected = True
             
+            if self.ingestion_mode == self.INGESTION_STREAM:
+                self.event_stream = EventStream(self.redis, maxlen=self.stream_maxlen)
+                # Grupos antes del primer XADD (este proceso puede no tener consumidores)
+                await self.event_stream.ensure_groups()
+            
             # Iniciar tareas background
             self._start_background_tasks()
             
@@ -226,9 +301,10 @@ class UserEventStore:
                     except Exception as disk_e:
                         logger.error(f"Error guardando eventos localmente durante cierre: {disk_e}")
         
-        # Cerrar conexión Redis
+        # Cerrar conexión Redis (solo si la creó este store)
         if self.redis:
-            await self.redis.close()
+            if self._redis_client is None:
+                await self.redis.close()
             self.connected = False
             
         logger.info("UserEventStore cerrado correctamente")
@@ -272,18 +348,21 @@ class UserEventStore:
                 user_agent=user_agent
             )
             
-            # Agregar a buffer con lock para proteger operaciones concurrentes
-            async with self._buffer_lock:
-                self.events_buffer.append(event.dict())
-                self.metrics["events_buffered"] += 1
-                
-                # Si el buffer alcanza el límite, hacer flush
-                if len(self.events_buffer) >= self.local_buffer_size:
-                    await self._flush_events_buffer()
+            event_dict = event.dict()
+            
+            if not await self._append_to_stream(event_dict):
+                # Agregar a buffer con lock para proteger operaciones concurrentes
+                async with self._buffer_lock:
+                    self.events_buffer.append(event_dict)
+                    self.metrics["events_buffered"] += 1
                     
-                # También flush si ha pasado demasiado tiempo desde el último
-                elif time.time() - self.last_flush_time > self.flush_interval_seconds:
-                    await self._flush_events_buffer()
+                    # Si el buffer alcanza el límite, hacer flush
+                    if len(self.events_buffer) >= self.local_buffer_size:
+                        await self._flush_events_buffer()
+                        
+                    # También flush si ha pasado demasiado tiempo desde el último
+                    elif time.time() - self.last_flush_time > self.flush_interval_seconds:
+                        await self._flush_events_buffer()
             
             # Invalidar caché de perfil si existe
             cache_key = f"profile:{user_id}"
@@ -319,6 +398,41 @@ class UserEventStore:
             
             return False
     
+    async def _append_to_stream(self, event: Dict[str, Any]) -> bool:
+        """
+        En modo stream, añade el evento con un único XADD.
+        
+        Returns:
+            bool: False si no hay stream o el XADD falla (el evento va al buffer local)
+        """
+        if not self.event_stream or not self.connected:
+            return False
+        
+        try:
+            await self.event_stream.append(event)
+            self.metrics["events_streamed"] += 1
+            return True
+        except Exception as e:
+            logger.warning(f"XADD de evento falló, usando buffer local: {e}")
+            return False
+    
+    async def persist_stream_events(self, events: List[Dict]) -> bool:
+        """
+        Handler del grupo de consumidores ``profile``: persiste eventos leídos
+        del stream y actualiza los agregados del perfil.
+        
+        Raises:
+            StorageError: Si falla la escritura (el batch se reintenta)
+        """
+        result = await self._persist_events_batch(events)
+        
+        for event in events:
+            cache_key = f"profile:{event.get('user_id')}"
+            if cache_key in self.profile_cache:
+                self.profile_cache[cache_key]["needs_update"] = True
+        
+        return result
+    
     async def record_conversation_intent(self, user_id: str, intent_data: Dict[str, Any]) -> bool:
         """
         🔧 CORRECCIÓN: Registra intención conversacional del usuario con validación robusta.
@@ -510,48 +624,31 @@ class UserEventStore:
     
     async def _fetch_user_profile(self, user_id: str) -> Dict[str, Any]:
         """
-        Obtiene perfil desde Redis y lo genera si no existe.
+        Obtiene perfil desde los agregados incrementales en Redis.
         Protegido por circuit breaker.
+        
+        Los agregados se mantienen al persistir eventos, así que la lectura es
+        un único pipeline de tamaño fijo, independiente del número de eventos.
+        Usuarios sin agregados completos se reconstruyen una sola vez.
         """
         if not self.connected or not self.redis:
             raise StorageError("Redis no está conectado")
         
         start_time = time.time()
-        profile_key = f"user:profile:{user_id}"
         
         try:
-            # Verificar si existe perfil
-            profile_exists = await self.redis.exists(profile_key)
+            profile = await self._read_profile_aggregates(user_id)
             
-            if profile_exists:
-                # Obtener perfil existente
-                profile_json = await self.redis.get(profile_key)
-                profile = json.loads(profile_json)
-                
-                # Actualizar métrica de latencia
-                latency_ms = (time.time() - start_time) * 1000
-                self._update_latency_metric(latency_ms)
-                
-                return profile
-            else:
-                # Generar perfil desde eventos
-                profile = await self._generate_user_profile(user_id)
-                
-                # Guardar perfil generado
-                if profile:
-                    await self.redis.set(
-                        profile_key,
-                        json.dumps(profile),
-                        ex=86400  # 24 horas
-                    )
-                    
-                    self.metrics["profiles_generated"] += 1
-                    
-                # Actualizar métrica de latencia
-                latency_ms = (time.time() - start_time) * 1000
-                self._update_latency_metric(latency_ms)
-                
-                return profile
+            if profile is None:
+                # Eventos anteriores a los agregados o usuario nuevo
+                profile = await self._backfill_profile_aggregates(user_id)
+                self.metrics["profiles_generated"] += 1
+            
+            # Actualizar métrica de latencia
+            latency_ms = (time.time() - start_time) * 1000
+            self._update_latency_metric(latency_ms)
+            
+            return profile
         except Exception as e:
             # Actualizar métrica de latencia en caso de error
             latency_ms = (time.time() - start_time) * 1000
@@ -560,9 +657,214 @@ class UserEventStore:
             logger.error(f"Error en operación Redis para perfil {user_id}: {e}")
             raise StorageError(f"Error al obtener perfil: {str(e)}")
     
+    @staticmethod
+    def _profile_keys(user_id: str) -> Dict[str, str]:
+        """
+        Claves de los agregados del perfil:
+        - meta: hash con total_events y marca de backfill
+        - activity: sorted set con "first"/"last" (epoch de primera/última actividad)
+        - categories / markets: hashes de contadores
+        - sessions: set de session_ids
+        - intents / searches / purchases: listas acotadas, más reciente primero
+        """
+        prefix = f"user:profile:{user_id}"
+        return {
+            name: f"{prefix}:{name}"
+            for name in (
+                "meta", "activity", "categories", "markets",
+                "sessions", "intents", "searches", "purchases"
+            )
+        }
+    
+    def _queue_profile_updates(self, pipe, user_id: str, events: List[Dict]):
+        """
+        Encola en ``pipe`` la actualización incremental de los agregados del perfil.
+        
+        Args:
+            pipe: Pipeline de Redis
+            user_id: ID del usuario
+            events: Eventos del usuario en orden cronológico
+        """
+        keys = self._profile_keys(user_id)
+        
+        category_counts = {}
+        market_counts = {}
+        session_ids = set()
+        intents = []
+        searches = []
+        purchases = []
+        timestamps = []
+        
+        for event in events:
+            event_type = event.get("event_type")
+            data = event.get("data") or {}
+            
+            timestamp = _event_timestamp(event)
+            if timestamp is not None:
+                timestamps.append(timestamp)
+            
+            if event.get("session_id"):
+                session_ids.add(event["session_id"])
+            
+            if event.get("market_id"):
+                market_id = event["market_id"]
+                market_counts[market_id] = market_counts.get(market_id, 0) + 1
+            
+            if event_type == EventType.CONVERSATION_INTENT.value:
+                if data.get("type"):
+                    intents.append(json.dumps(data, default=_json_default))
+            
+            elif event_type == EventType.PRODUCT_VIEW.value:
+                category = data.get("product_category")
+                if category:
+                    category_counts[category] = category_counts.get(category, 0) + 1
+            
+            elif event_type == EventType.PRODUCT_SEARCH.value:
+                query = data.get("query")
+                if query:
+                    searches.append(query)
+            
+            elif event_type == EventType.PURCHASE.value:
+                purchases.append(json.dumps(data, default=_json_default))
+        
+        pipe.hincrby(keys["meta"], "total_events", len(events))
+        
+        # LT/GT: los eventos recuperados de fallback pueden llegar fuera de orden
+        if timestamps:
+            pipe.zadd(keys["activity"], {"first": min(timestamps)}, lt=True)
+            pipe.zadd(keys["activity"], {"last": max(timestamps)}, gt=True)
+        
+        for category, count in category_counts.items():
+            pipe.hincrby(keys["categories"], category, count)
+        
+        for market_id, count in market_counts.items():
+            pipe.hincrby(keys["markets"], market_id, count)
+        
+        if session_ids:
+            pipe.sadd(keys["sessions"], *session_ids)
+        
+        # LPUSH en orden cronológico deja el más reciente en la cabeza
+        for key, items, limit in (
+            (keys["intents"], intents, RECENT_INTENTS_LIMIT),
+            (keys["searches"], searches, RECENT_SEARCHES_LIMIT),
+            (keys["purchases"], purchases, RECENT_PURCHASES_LIMIT)
+        ):
+            if items:
+                pipe.lpush(key, *items)
+                pipe.ltrim(key, 0, limit - 1)
+        
+        for key in keys.values():
+            pipe.expire(key, EVENTS_TTL_SECONDS)
+    
+    async def _read_profile_aggregates(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Construye el perfil desde los agregados con un solo pipeline.
+        
+        Returns:
+            Perfil, o None si el usuario no tiene agregados completos
+        """
+        keys = self._profile_keys(user_id)
+        
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(keys["meta"])
+        pipe.zrange(keys["activity"], 0, -1, withscores=True)
+        pipe.hgetall(keys["categories"])
+        pipe.hgetall(keys["markets"])
+        pipe.scard(keys["sessions"])
+        pipe.lrange(keys["intents"], 0, -1)
+        pipe.lrange(keys["searches"], 0, -1)
+        pipe.lrange(keys["purchases"], 0, -1)
+        
+        (meta, activity, categories, markets, session_count,
+         intents, searches, purchases) = await pipe.execute()
+        
+        if not meta or PROFILE_BACKFILLED_FIELD not in meta:
+            return None
+        
+        total_events = int(meta.get("total_events", 0))
+        if total_events == 0:
+            return self._create_empty_profile(user_id)
+        
+        # Calcular afinidad normalizada (0-1)
+        category_counts = {category: int(count) for category, count in categories.items()}
+        total_category_views = sum(category_counts.values())
+        category_affinity = {
+            category: round(count / total_category_views, 3)
+            for category, count in category_counts.items()
+        } if total_category_views > 0 else {}
+        
+        # Días activos desde primera/última actividad
+        now = datetime.utcnow()
+        bounds = dict(activity)
+        first_activity = _from_epoch(bounds["first"]) if "first" in bounds else now
+        last_activity = _from_epoch(bounds["last"]) if "last" in bounds else now
+        days_active = (last_activity - first_activity).days + 1
+        
+        session_count = int(session_count or 0)
+        activity_level = calculate_user_activity_level(total_events, session_count, days_active)
+        
+        return {
+            "user_id": user_id,
+            "total_events": total_events,
+            "last_activity": last_activity.isoformat(),
+            "first_activity": first_activity.isoformat(),
+            "intent_history": [json.loads(intent) for intent in intents],
+            "category_affinity": category_affinity,
+            "search_patterns": list(searches),
+            "session_count": session_count,
+            "market_preferences": {market_id: int(count) for market_id, count in markets.items()},
+            "purchase_history": [json.loads(purchase) for purchase in purchases],
+            "days_active": days_active,
+            "activity_level": activity_level,
+            "generation_timestamp": now.isoformat(),
+            "source": "aggregated"
+        }
+    
+    async def _backfill_profile_aggregates(self, user_id: str) -> Dict[str, Any]:
+        """
+        Reconstruye los agregados del perfil desde la lista de eventos del usuario.
+        
+        Se ejecuta una vez por usuario (eventos persistidos antes de existir los
+        agregados). WATCH sobre la lista de eventos evita marcar como completos
+        unos agregados a los que les falte un flush concurrente; en ese caso se
+        devuelve el perfil generado y se reintenta en la próxima lectura.
+        """
+        events_key = f"user:events:{user_id}"
+        keys = self._profile_keys(user_id)
+        
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(events_key)
+                
+                events = []
+                event_ids = await pipe.lrange(events_key, 0, -1)
+                if event_ids:
+                    event_jsons = await pipe.mget([f"event:{event_id}" for event_id in event_ids])
+                    for event_json in event_jsons:
+                        if event_json:
+                            try:
+                                events.append(json.loads(event_json))
+                            except (json.JSONDecodeError, TypeError):
+                                continue
+                
+                pipe.multi()
+                pipe.delete(*keys.values())
+                # La lista de eventos está en orden inverso (LPUSH)
+                self._queue_profile_updates(pipe, user_id, list(reversed(events)))
+                pipe.hset(keys["meta"], PROFILE_BACKFILLED_FIELD, 1)
+                await pipe.execute()
+                
+            except WatchError:
+                logger.debug(f"Eventos nuevos durante backfill de perfil {user_id}, se reintentará")
+                return await self._generate_user_profile(user_id)
+        
+        logger.info(f"Agregados de perfil reconstruidos para {user_id} ({len(events)} eventos)")
+        return await self._read_profile_aggregates(user_id) or self._create_empty_profile(user_id)
+    
     async def _generate_user_profile(self, user_id: str) -> Dict[str, Any]:
         """
-        Genera perfil de usuario a partir de sus eventos.
+        Genera perfil de usuario recorriendo todos sus eventos.
+        Solo se usa si el backfill de agregados no se pudo completar.
         """
         if not self.connected or not self.redis:
             raise StorageError("Redis no está conectado")
@@ -753,6 +1055,10 @@ class UserEventStore:
     async def _persist_events_batch(self, events: List[Dict]) -> bool:
         """
         Persiste batch de eventos en Redis con operación pipeline.
+        
+        Idempotente por ``event_id``: la entrega del stream es at-least-once
+        y un batch fallido se reintenta, así que un evento ya persistido no
+        vuelve a sumar en los agregados del perfil (ver _persist_new_events).
         """
         if not events:
             return True
@@ -761,28 +1067,83 @@ class UserEventStore:
             raise StorageError("Redis no está conectado")
         
         start_time = time.time()
-        pipe = self.redis.pipeline()
         
         try:
+            for _ in range(PERSIST_WATCH_RETRIES):
+                try:
+                    stored = await self._persist_new_events(events)
+                    break
+                except WatchError:
+                    # Otro worker persistió alguno de estos eventos: volver a filtrar
+                    continue
+            else:
+                raise StorageError("Conflicto persistente con escrituras concurrentes")
+            
+            # Actualizar métricas
+            self.metrics["events_stored"] += stored
+            self.metrics["bulk_operations"] += 1
+            
+            # Actualizar métrica de latencia
+            latency_ms = (time.time() - start_time) * 1000
+            self._update_latency_metric(latency_ms)
+            
+            return True
+            
+        except Exception as e:
+            # Actualizar métrica de latencia en caso de error
+            latency_ms = (time.time() - start_time) * 1000
+            self._update_latency_metric(latency_ms)
+            
+            logger.error(f"Error en bulk persist: {e}")
+            raise StorageError(f"Error al persistir batch de eventos: {str(e)}")
+    
+    async def _persist_new_events(self, events: List[Dict]) -> int:
+        """
+        Persiste en una transacción los eventos cuyo ``event:<id>`` aún no existe.
+        
+        La clave del evento es la marca de "ya aplicado": se vigila con WATCH,
+        se descartan los eventos existentes y el resto (evento, lista del
+        usuario y agregados) se escribe en un único MULTI/EXEC. Un MULTI no
+        puede condicionar comandos al resultado de un SET NX encolado, de ahí
+        WATCH; si otro worker escribe uno de los eventos entre medias, EXEC
+        lanza WatchError y el llamador reintenta.
+        
+        Returns:
+            int: Número de eventos nuevos persistidos
+        
+        Raises:
+            WatchError: Si alguno de los eventos se escribió concurrentemente
+        """
+        # Un mismo evento puede llegar duplicado dentro del batch (reclamado y reentregado)
+        seen_ids = set()
+        unique_events = []
+        for event in events:
+            if event["event_id"] not in seen_ids:
+                seen_ids.add(event["event_id"])
+                unique_events.append(event)
+        event_keys = [f"event:{event['event_id']}" for event in unique_events]
+        
+        async with self.redis.pipeline(transaction=True) as pipe:
+            await pipe.watch(*event_keys)
+            existing = await pipe.mget(event_keys)
+            new_events = [event for event, stored in zip(unique_events, existing) if stored is None]
+            if not new_events:
+                return 0
+            
             # Agrupar eventos por usuario
             user_events = {}
+            for event in new_events:
+                user_events.setdefault(event["user_id"], []).append(event)
             
-            for event in events:
-                user_id = event["user_id"]
-                if user_id not in user_events:
-                    user_events[user_id] = []
-                user_events[user_id].append(event)
-            
-            # Procesar eventos agrupados por usuario
+            pipe.multi()
             for user_id, user_events_list in user_events.items():
                 user_events_key = f"user:events:{user_id}"
                 
                 for event in user_events_list:
                     event_id = event["event_id"]
-                    event_key = f"event:{event_id}"
                     
-                    # Guardar evento
-                    pipe.set(event_key, json.dumps(event), ex=2592000)  # 30 días TTL
+                    # Guardar evento (marca de evento aplicado)
+                    pipe.set(f"event:{event_id}", json.dumps(event, default=_json_default), ex=EVENTS_TTL_SECONDS)
                     
                     # Agregar a lista de eventos del usuario
                     pipe.lpush(user_events_key, event_id)
@@ -791,32 +1152,14 @@ class UserEventStore:
                 pipe.ltrim(user_events_key, 0, 999)  # Mantener últimos 1000
                 
                 # Set TTL para la lista de eventos
-                pipe.expire(user_events_key, 2592000)  # 30 días
+                pipe.expire(user_events_key, EVENTS_TTL_SECONDS)
                 
-                # Invalidar caché de perfil
-                profile_key = f"user:profile:{user_id}"
-                pipe.delete(profile_key)
+                # Actualizar agregados del perfil en el mismo pipeline
+                self._queue_profile_updates(pipe, user_id, user_events_list)
             
-            # Ejecutar pipeline
             await pipe.execute()
-            
-            # Actualizar métricas
-            self.metrics["events_stored"] += len(events)
-            self.metrics["bulk_operations"] += 1
-            
-            # Actualizar métrica de latencia
-            latency_ms = (time.time() - start_time) * 1000
-            self._update_latency_metric(latency_ms)
-            
-            return True
-            
-        except Exception as e:
-            # Actualizar métrica de latencia en caso de error
-            latency_ms = (time.time() - start_time) * 1000
-            self._update_latency_metric(latency_ms)
-            
-            logger.error(f"Error en bulk persist: {e}")
-            raise StorageError(f"Error al persistir batch de eventos: {str(e)}")
+        
+        return len(new_events)
     
     async def _background_flush(self):
         """
@@ -1059,9 +1402,13 @@ class UserEventStore:
             "cache_size": len(self.profile_cache),
             "events_buffer_size": len(self.events_buffer),
             "failed_buffer_size": len(self.failed_events_buffer),
+            "ingestion_mode": self.ingestion_mode,
             "timestamp": datetime.utcnow().isoformat()
         }
         
+        if self.event_stream:
+            stats["event_stream"] = self.event_stream.get_stats()
+        
         # Estadísticas de circuit breaker
         if self.read_circuit_breaker:
             stats["read_circuit_breaker"] = self.read_circuit_breaker.get_stats()
@@ -153,6 +153,7 @@ class ConversationRequest(BaseModel):
     market_id: str = "default"
     language: str = "en"
     product_id: Optional[str] = None
+    product_ids: Optional[List[str]] = None  # Semillas "productos como estos" (carrito, selección)
     n_recommendations: int = 5
 
 class ConversationResponse(BaseModel):
@@ -625,7 +626,8 @@ async def process_conversation(
                 conversation_query=conversation.query,
                 market_id=conversation.market_id,
                 n_recommendations=conversation.n_recommendations,
-                session_id=real_session_id
+                session_id=real_session_id,
+                seed_product_ids=conversation.product_ids
             )
             
             # ✅ EXTRAER datos del handler
@@ -1307,13 +1309,6 @@ async def process_conversation(
                     else:
                         logger.error(f"❌ STATE SAVE FAILED for session {updated_session.session_id}")
                         
-                    # Test immediate reload to verify persistence
-                    test_reload = await state_manager.load_conversation_state(updated_session.session_id)
-                    if test_reload:
-                        logger.info(f"✅ STATE RELOAD SUCCESSFUL - Turn count: {test_reload.turn_count}")
-                    else:
-                        logger.error(f"❌ STATE RELOAD FAILED for session {updated_session.session_id}")
-                        
                 except Exception as save_error:
                     logger.error(f"❌ SAVE OPERATION EXCEPTION: {save_error}")
                     import traceback
@@ -1936,7 +1931,8 @@ async def process_conversation_fixed(
             conversation_query=conversation.query,
             market_id=conversation.market_id,
             n_recommendations=conversation.n_recommendations,
-            session_id=conversation.session_id
+            session_id=conversation.session_id,
+            seed_product_ids=conversation.product_ids
         )
         
         # Transform to expected ConversationResponse format
@@ -48,6 +48,7 @@ from src.api.dependencies import (
 from src.api.inventory.inventory_service import InventoryService
 from src.api.core.product_cache import ProductCache
 from src.recommenders.tfidf_recommender import TFIDFRecommender
+from src.recommenders.product_search_index import get_search_index
 
 # ✅ CORRECCIÓN CRÍTICA: Dependency injection unificada (ORIGINAL)
 from src.api.core.redis_service import get_redis_service, RedisService
@@ -631,16 +632,22 @@ async def search_products(
     q: str = Query(..., description="Texto a buscar en nombre o descripción"),
     limit: int = Query(default=20, ge=1, le=100, description="Productos por página (máx 100)"),
     offset: int = Query(default=0, ge=0, description="Offset para paginación"),
+    mode: str = Query(default="keyword", pattern="^(keyword|relevance)$", description="Orden: keyword (catálogo) o relevance (TF-IDF)"),
     tfidf_recommender: TFIDFRecommender = Depends(get_tfidf_recommender),
     current_user: str = Depends(get_current_user)
 ):
     """
     Busca productos por nombre o descripción con paginación.
     
+    Usa el índice invertido token/prefijo construido al cargar el catálogo
+    (sin acentos, cada palabra como prefijo, todas requeridas). En modo
+    ``relevance`` las mismas coincidencias se ordenan por similitud TF-IDF.
+    
     Args:
         q: Query string para búsqueda
         limit: Número de productos por página (default: 20, max: 100)
         offset: Offset para paginación (default: 0)
+        mode: "keyword" (orden de catálogo) o "relevance" (ranking TF-IDF)
         tfidf_recommender: Recomendador TF-IDF inyectado
         current_user: Usuario autenticado
     
@@ -661,7 +668,8 @@ async def search_products(
             "metadata": {
                 "query": "aros",
                 "response_time_ms": 25.30,
-                "lookup_method": "TF-IDF search"
+                "lookup_method": "inverted index",
+                "mode": "keyword"
             }
         }
     
@@ -679,19 +687,20 @@ async def search_products(
                 detail="Product catalog not loaded yet. Please wait for system initialization."
             )
         
-        # Realizar la búsqueda (lógica existente)
+        # Búsqueda en el índice invertido (filas en orden de catálogo)
         q = q.lower()
-        matching_products = []
-        for product in tfidf_recommender.product_data:
-            name = str(product.get("title", ""))
-            desc = str(product.get("body_html", ""))
-            if q in name.lower() or q in desc.lower():
-                matching_products.append(product)
-        
-        # Aplicar paginación
-        total_products = len(matching_products)
+        matching_rows = get_search_index(tfidf_recommender).search(q)
+        
+        # Aplicar paginación (total exacto: todas las coincidencias del índice)
+        total_products = int(matching_rows.size)
         end_idx = offset + limit
-        paginated_products = matching_products[offset:end_idx]
+        if mode == "relevance" and offset < total_products:
+            ranked = await tfidf_recommender.search_products(
+                q, n=end_idx, candidate_indices=matching_rows, min_score=None
+            )
+            paginated_products = [r["product_data"] for r in ranked[offset:end_idx]]
+        else:
+            paginated_products = [tfidf_recommender.product_data[i] for i in matching_rows[offset:end_idx]]
         
         # Calcular metadatos de paginación
         has_next = end_idx < total_products
@@ -719,7 +728,8 @@ async def search_products(
             "metadata": {
                 "query": q,
                 "response_time_ms": round(response_time_ms, 2),
-                "lookup_method": "TF-IDF search"
+                "lookup_method": "TF-IDF relevance" if mode == "relevance" else "inverted index",
+                "mode": mode
             }
         }
         
@@ -1272,15 +1282,16 @@ async def _get_shopify_products(
             popular_products = await cache.get_popular_products(market_id, limit * 3)
             if popular_products:
                 cached_products = []
-                for product_id in popular_products:
-                    product = await cache.get_product(product_id)
-                    if product:
+                # Lotes de `limit` IDs: un MGET por lote en lugar de un GET por producto
+                for i in range(0, len(popular_products), limit):
+                    batch = await cache.get_products(popular_products[i:i + limit])
+                    for product in batch:
                         # Filtrar por categoría si se especifica
-                        if not category or product.get("category") == category or product.get("product_type") == category:
+                        if product and (not category or product.get("category") == category or product.get("product_type") == category):
                             cached_products.append(product)
-                        
-                        if len(cached_products) >= limit:
-                            break
+                    
+                    if len(cached_products) >= limit:
+                        break
                 
                 # FIXED: Threshold que requiere productos suficientes o complementa con Shopify
                 if len(cached_products) >= limit:
@@ -1320,24 +1331,10 @@ async def _get_shopify_products(
                 
                 try:
                     # STRATEGY 1: Cache individual products usando datos que ya tenemos
-                    cache_success = 0
-                    cache_failures = 0
-                    
-                    for product in products[:10]:  # Limitar para performance
-                        product_id = str(product.get("id", ""))
-                        if product_id and product:
-                            try:
-                                # Usar método directo de save - NO preload que hace refetch
-                                success = await cache._save_to_redis(product_id, product)
-                                if success:
-                                    cache_success += 1
-                                    logger.debug(f"✅ Cached product {product_id}")
-                                else:
-                                    cache_failures += 1
-                                    logger.debug(f"❌ Failed to cache product {product_id}")
-                            except Exception as e:
-                                cache_failures += 1
-                                logger.debug(f"❌ Exception caching product {product_id}: {e}")
+                    # (un solo pipeline, sin refetch)
+                    to_cache = [p for p in products[:10] if p and p.get("id")]  # Limitar para performance
+                    cache_success = await cache.cache_products(to_cache)
+                    cache_failures = len(to_cache) - cache_success
                     
                     logger.info(f"✅ Individual caching: {cache_success} success, {cache_failures} failures")
                     
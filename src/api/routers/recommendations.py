@@ -35,13 +35,15 @@ from datetime import datetime
 from src.api.dependencies import (
     get_tfidf_recommender,
     get_retail_recommender,
-    get_hybrid_recommender
+    get_hybrid_recommender,
+    get_event_stream
 )
 
 # Type hints for better IDE support
 from src.recommenders.tfidf_recommender import TFIDFRecommender
 from src.recommenders.retail_api import RetailAPIRecommender
 from src.api.core.hybrid_recommender import HybridRecommender
+from src.api.core.event_stream import EventStream, build_retail_event
 
 # ============================================================================
 # LEGACY IMPORTS - KEPT FOR REFERENCE (can be removed after validation)
@@ -270,10 +272,19 @@ async def get_recommendation_metrics(
         except Exception as file_error:
             logger.warning(f"No se pudo analizar el archivo de métricas: {str(file_error)}")
         
+        # Ingesta de eventos: cola hacia Retail API y lag de los grupos del stream
+        event_pipeline = {}
+        try:
+            from src.api.factories.service_factory import ServiceFactory
+            event_pipeline = await ServiceFactory.get_event_pipeline_stats()
+        except Exception as pipeline_error:
+            logger.warning(f"No se pudieron obtener las métricas de eventos: {str(pipeline_error)}")
+        
         return {
             "status": "success",
             "realtime_metrics": metrics,
             "historical_metrics": file_metrics,
+            "event_pipeline": event_pipeline,
             # "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
             "timestamp": datetime.utcnow().isoformat()
         }
@@ -555,7 +566,8 @@ async def record_user_event(
     recommendation_id: Optional[str] = Query(None, description="ID de la recomendación si el producto fue recomendado"),
     current_user: str = Depends(get_current_user),
     # ✅ NEW: FastAPI Dependency Injection
-    hybrid_recommender: HybridRecommender = Depends(get_hybrid_recommender)
+    hybrid_recommender: HybridRecommender = Depends(get_hybrid_recommender),
+    event_stream: Optional[EventStream] = Depends(get_event_stream)
 ):
     """
     Registra eventos de usuario para mejorar las recomendaciones futuras.
@@ -569,6 +581,7 @@ async def record_user_event(
         recommendation_id: ID de recomendación si aplica (opcional)
         current_user: Usuario autenticado (via Depends)
         hybrid_recommender: Hybrid recommender (via Depends) ✅ NEW
+        event_stream: EventStream si EVENT_INGESTION_MODE=stream (via Depends)
     
     Returns:
         Dict con status, message, event details
@@ -585,6 +598,9 @@ async def record_user_event(
         - Acepta tipos alternativos y los mapea a tipos estándar
         - Registra en Google Cloud Retail API
         - Registra métricas locales
+        - En modo stream solo hace un XADD; Retail API, métricas y perfil
+          los procesan los grupos de consumidores. Si el XADD falla se usa
+          la ruta directa
     """
     start_time = time.time()
     try:
@@ -619,22 +635,34 @@ async def record_user_event(
             logger.warning(f"Tipo de evento no válido '{event_type}', usando 'detail-page-view'")
             event_type = "detail-page-view"
         
-        # ✅ UPDATED: Usar hybrid_recommender inyectado
-        # Registrar evento en Retail API
-        result = await hybrid_recommender.record_user_event(
-            user_id=user_id,
-            event_type=event_type,
-            product_id=product_id,
-            recommendation_id=recommendation_id
-        )
-        
-        # Registrar métrica de interacción
-        recommendation_metrics.record_user_interaction(
-            user_id=user_id,
-            product_id=product_id,
-            event_type=event_type,
-            recommendation_id=recommendation_id
-        )
+        stream_id = None
+        if event_stream is not None:
+            # Un único XADD; el resto lo hacen los consumidores
+            try:
+                stream_id = await event_stream.append(
+                    build_retail_event(user_id, event_type, product_id, recommendation_id)
+                )
+            except Exception as e:
+                # Sin stream el evento no se pierde: se registra por la ruta directa
+                logger.warning(f"XADD de evento falló, registrando en línea: {e}")
+        
+        if stream_id is None:
+            # ✅ UPDATED: Usar hybrid_recommender inyectado
+            # Registrar evento en Retail API
+            result = await hybrid_recommender.record_user_event(
+                user_id=user_id,
+                event_type=event_type,
+                product_id=product_id,
+                recommendation_id=recommendation_id
+            )
+            
+            # Registrar métrica de interacción
+            recommendation_metrics.record_user_interaction(
+                user_id=user_id,
+                product_id=product_id,
+                event_type=event_type,
+                recommendation_id=recommendation_id
+            )
         
         # Añadir información útil a la respuesta
         end_time = time.time()
@@ -651,7 +679,9 @@ async def record_user_event(
                 # "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S.%f"),
                 "timestamp": datetime.utcnow().isoformat(),
                 "note": "El evento fue registrado correctamente y ayudará a mejorar las recomendaciones futuras.",
-                "di_migration": "phase2_complete"  # ✅ NEW: Migration flag
+                "di_migration": "phase2_complete",  # ✅ NEW: Migration flag
+                "queued": stream_id is not None,
+                "stream_id": stream_id
             }
         }
         
@@ -62,9 +62,39 @@ class StartupManager:
             "error": None,
             "start_time": None,
             "end_time": None,
-            "duration": None
+            "duration": None,
+            "stage": None,
+            "progress": None,
+            "message": None
         }
     
+    def report_progress(self, 
+                        name: str, 
+                        stage: str, 
+                        progress: Optional[float] = None, 
+                        message: Optional[str] = None):
+        """
+        Registra el progreso de un componente que se está cargando.
+        
+        Pensado para cargas largas (p.ej. entrenamiento de modelos) que quieren
+        exponer su avance en get_status mientras la API sigue respondiendo.
+        
+        Args:
+            name: Nombre del componente registrado
+            stage: Etapa actual (p.ej. "vectorizing", "swapping")
+            progress: Fracción completada entre 0.0 y 1.0, si se conoce
+            message: Texto descriptivo opcional
+        """
+        status = self.loading_status.get(name)
+        if status is None:
+            logger.debug(f"Progreso ignorado para componente no registrado: {name}")
+            return
+        
+        status["stage"] = stage
+        if progress is not None:
+            status["progress"] = max(0.0, min(1.0, progress))
+        status["message"] = message
+    
     async def _load_component(self, name: str, max_retries: int = 3) -> bool:
         """
         Carga un componente y actualiza su estado.
@@ -237,7 +267,10 @@ class StartupManager:
                     "loading": status["loading"],
                     "duration": status["duration"],
                     "error": status["error"],
-                    "required": self.components[name]["required"]
+                    "required": self.components[name]["required"],
+                    "stage": status.get("stage"),
+                    "progress": status.get("progress"),
+                    "message": status.get("message")
                 }
                 for name, status in self.loading_status.items()
             }
@@ -2,14 +2,26 @@
 """
 Market-aware cache implementation para MCP integration.
 Esta implementación proporciona caché segmentada por mercado.
+
+Almacenamiento base + overlay:
+- ``{prefix}product:{id}``: producto independiente del mercado, una sola vez.
+- ``{prefix}{market}:product:{id}``: overlay pequeño con lo que cambia por
+  mercado (precio convertido, moneda, campos traducidos, disponibilidad).
+
+El producto del mercado se ensambla al leer (un solo MGET). Cada overlay
+guarda la versión de la base contra la que se calculó: invalidar la base
+invalida el producto en todos los mercados sin recorrer una lista de mercados.
 """
 
 import logging
 import json
 import asyncio
+import uuid
 from typing import Dict, List, Optional, Any, TYPE_CHECKING
 from datetime import datetime
 
+from src.api.core.redis_service import index_key
+
 
 if TYPE_CHECKING:
     from src.api.core.redis_service import RedisService
@@ -26,6 +38,19 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Campos que dependen del mercado: nunca se guardan en la base
+MARKET_OVERLAY_FIELDS = frozenset({
+    "price", "currency", "original_price", "original_currency",
+    "price_unavailable", "price_special", "price_conversion_failed", "price_original_value",
+    "_price_validation", "_price_error",
+    "availability", "in_stock", "stock_quantity", "inventory_status", "market_availability",
+    "low_stock_warning", "estimated_restock", "inventory_last_updated",
+    "market_id", "market_adapted", "adapted_for_market", "_market_adaptation"
+})
+
+# Versión de la base contra la que se calculó un overlay
+BASE_VERSION_FIELD = "_base_version"
+
 class MarketAwareProductCache:
     """
     Sistema de caché que segmenta datos por mercado.
@@ -65,7 +90,11 @@ class MarketAwareProductCache:
             "hits": 0,
             "misses": 0,
             "market_segments": set(),
-            "total_requests": 0
+            "total_requests": 0,
+            "base_writes": 0,
+            "base_reused": 0,
+            "overlay_writes": 0,
+            "orphaned_overlays": 0
         }
         
         logger.info(
@@ -87,20 +116,25 @@ class MarketAwareProductCache:
         self.stats["total_requests"] += 1
         self.stats["market_segments"].add(market_id)
         
-        cache_key = f"{self.cache_prefix}{market_id}:product:{product_id}"
-        
         try:
-            # cached_data = await self.redis.get(cache_key)
-            cached_data = await self.redis.get_json(cache_key)
+            # Base y overlay en un solo round-trip
+            raw_base, raw_overlay = await self.redis.mget([
+                self._base_key(product_id), self._overlay_key(product_id, market_id)
+            ])
+            base = self._load_json(raw_base)
+            overlay = self._load_json(raw_overlay)
             
-            if cached_data:
-                self.stats["hits"] += 1
-                logger.debug(f"Cache hit para producto {product_id} en mercado {market_id}")
-                return cached_data
-            else:
-                self.stats["misses"] += 1
-                logger.debug(f"Cache miss para producto {product_id} en mercado {market_id}")
-                return None
+            if base and overlay:
+                if overlay.get(BASE_VERSION_FIELD) == base.get(BASE_VERSION_FIELD):
+                    self.stats["hits"] += 1
+                    logger.debug(f"Cache hit para producto {product_id} en mercado {market_id}")
+                    return self._assemble(base, overlay)
+                # La base se invalidó o se reescribió después de calcular el overlay
+                self.stats["orphaned_overlays"] += 1
+            
+            self.stats["misses"] += 1
+            logger.debug(f"Cache miss para producto {product_id} en mercado {market_id}")
+            return None
                 
         except Exception as e:
             logger.error(f"Error obteniendo producto del market cache: {e}")
@@ -110,6 +144,10 @@ class MarketAwareProductCache:
         """
         Guardar producto con contexto de mercado.
         
+        La parte independiente del mercado se guarda una sola vez como base
+        (se reutiliza si ya existe); en la clave del mercado solo se guarda
+        el overlay con las diferencias respecto a esa base.
+        
         Args:
             product_id: ID del producto
             product_data: Datos del producto
@@ -119,23 +157,51 @@ class MarketAwareProductCache:
         Returns:
             bool: True si se guardó correctamente
         """
-        cache_key = f"{self.cache_prefix}{market_id}:product:{product_id}"
         ttl = ttl or self.default_ttl
         
         try:
-            # Agregar metadata de mercado
-            enriched_data = {
-                **product_data,
-                "_market_cache_metadata": {
-                    "market_id": market_id,
-                    "cached_at": datetime.utcnow().isoformat(),
-                    "ttl": ttl
+            base_key = self._base_key(product_id)
+            # Base y su TTL restante en un solo round-trip
+            async with self.redis.pipeline() as pipe:
+                pipe.get(base_key)
+                pipe.ttl(base_key)
+            raw_base, base_ttl = pipe.results
+            base = self._load_json(raw_base)
+            if base and base.get(BASE_VERSION_FIELD):
+                # La base debe vivir al menos lo que el overlay: si expira antes,
+                # el siguiente set crea otra versión y huerfaniza a los demás mercados
+                if base_ttl is not None and 0 <= base_ttl < ttl:
+                    async with self.redis.pipeline() as pipe:
+                        pipe.expire(base_key, ttl)
+                    if not pipe.succeeded:
+                        return False
+                self.stats["base_reused"] += 1
+            else:
+                # Nueva versión: los overlays calculados contra bases anteriores quedan huérfanos
+                base = {
+                    key: value for key, value in product_data.items()
+                    if key not in MARKET_OVERLAY_FIELDS and key != "_market_cache_metadata"
                 }
+                base[BASE_VERSION_FIELD] = uuid.uuid4().hex
+                if not await self.redis.set_json(
+                    base_key, base, ttl=ttl, indexes=[self._base_index_key()]
+                ):
+                    return False
+                self.stats["base_writes"] += 1
+            
+            overlay = self._build_overlay(base, product_data)
+            overlay["_market_cache_metadata"] = {
+                "market_id": market_id,
+                "cached_at": datetime.utcnow().isoformat(),
+                "ttl": ttl
             }
             
-            # success = await self.redis.set(cache_key, enriched_data, expiration=ttl)
-            success = await self.redis.set_json(cache_key, enriched_data, ttl=ttl)
+            success = await self.redis.set_json(
+                self._overlay_key(product_id, market_id), overlay, ttl=ttl,
+                indexes=[self._market_index_key(market_id), self._market_index_key(market_id, "product")]
+            )
             if success:
+                self.stats["overlay_writes"] += 1
                 logger.debug(f"Producto {product_id} guardado en cache para mercado {market_id}")
             
             return success
@@ -148,6 +214,9 @@ class MarketAwareProductCache:
         """
         Invalidar producto en caché.
         
+        Sin ``market_id`` basta con borrar la base: los overlays de todos los
+        mercados dejan de ensamblarse y expiran solos por TTL.
+        
         Args:
             product_id: ID del producto
             market_id: ID del mercado (None para todos los mercados)
@@ -157,23 +226,14 @@ class MarketAwareProductCache:
         """
         if market_id:
             # Invalidar en mercado específico
-            cache_key = f"{self.cache_prefix}{market_id}:product:{product_id}"
-            success = await self.redis.delete(cache_key)
+            success = await self.redis.delete(self._overlay_key(product_id, market_id))
             return 1 if success else 0
-        else:
-            # Invalidar en todos los mercados
-            # En implementación completa, usaríamos patrón de keys
-            # Por ahora, simulamos invalidación en mercados conocidos
-            markets = ["default", "US", "ES", "MX", "CL"]
-            invalidated = 0
-            
-            for market in markets:
-                cache_key = f"{self.cache_prefix}{market}:product:{product_id}"
-                if await self.redis.delete(cache_key):
-                    invalidated += 1
-            
-            logger.info(f"Producto {product_id} invalidado en {invalidated} mercados")
-            return invalidated
+        
+        success = await self.redis.delete(
+            self._base_key(product_id), indexes=[self._base_index_key()]
+        )
+        logger.info(f"Producto {product_id} invalidado en todos los mercados")
+        return 1 if success else 0
     
     async def warm_cache_for_market(self, market_id: str, product_ids: List[str]) -> int:
         """
@@ -223,6 +283,12 @@ class MarketAwareProductCache:
             "misses": self.stats["misses"],
             "hit_ratio": self.stats["hits"] / max(self.stats["total_requests"], 1),
             "market_segments": len(self.stats["market_segments"]),
+            "storage": {
+                "base_writes": self.stats["base_writes"],
+                "base_reused": self.stats["base_reused"],
+                "overlay_writes": self.stats["overlay_writes"],
+                "orphaned_overlays": self.stats["orphaned_overlays"]
+            },
             "timestamp": datetime.utcnow().isoformat()
         }
         
@@ -233,6 +299,61 @@ class MarketAwareProductCache:
         
         return stats
     
+    def _base_key(self, product_id: str) -> str:
+        """Clave del producto independiente del mercado."""
+        return f"{self.cache_prefix}product:{product_id}"
+    
+    def _base_index_key(self) -> str:
+        """Índice secundario de las bases de producto."""
+        return index_key(f"{self.cache_prefix}product")
+    
+    def _overlay_key(self, product_id: str, market_id: str) -> str:
+        """Clave del overlay de un mercado (misma clave que la entrada completa anterior)."""
+        return f"{self.cache_prefix}{market_id}:product:{product_id}"
+    
+    @staticmethod
+    def _build_overlay(base: Dict, product_data: Dict) -> Dict:
+        """Diferencias del producto del mercado respecto a la base."""
+        return {
+            BASE_VERSION_FIELD: base[BASE_VERSION_FIELD],
+            "fields": {
+                key: value for key, value in product_data.items()
+                if key != "_market_cache_metadata" and (key not in base or base[key] != value)
+            },
+            "removed": [
+                key for key in base
+                if key != BASE_VERSION_FIELD and key not in product_data
+            ]
+        }
+    
+    @staticmethod
+    def _assemble(base: Dict, overlay: Dict) -> Dict:
+        """Producto del mercado: base + overlay."""
+        product = {key: value for key, value in base.items() if key != BASE_VERSION_FIELD}
+        for key in overlay.get("removed", []):
+            product.pop(key, None)
+        product.update(overlay.get("fields", {}))
+        if "_market_cache_metadata" in overlay:
+            product["_market_cache_metadata"] = overlay["_market_cache_metadata"]
+        return product
+    
+    @staticmethod
+    def _load_json(raw_value) -> Optional[Dict]:
+        if raw_value is None:
+            return None
+        try:
+            value = json.loads(raw_value)
+        except (TypeError, ValueError):
+            return None
+        return value if isinstance(value, dict) else None
+    
+    def _market_index_key(self, market_id: str, entity_type: Optional[str] = None) -> str:
+        """Índice secundario de las claves de un mercado (opcionalmente por tipo de entidad)."""
+        namespace = f"{self.cache_prefix}{market_id}"
+        if entity_type:
+            namespace = f"{namespace}:{entity_type}"
+        return index_key(namespace)
+    
     async def invalidate_market(self, market_id: str, entity_type: Optional[str] = None) -> bool:
         """
         Invalidar caché completa de un mercado.
@@ -247,14 +368,17 @@ class MarketAwareProductCache:
         logger.info(f"Invalidando caché para mercado {market_id}, tipo: {entity_type or 'all'}")
         
         try:
-            # En implementación completa, esto usaría Redis SCAN con patrón
-            # Por ahora, simulamos la invalidación
             pattern = f"{self.cache_prefix}{market_id}:*"
             
             if entity_type:
                 pattern = f"{self.cache_prefix}{market_id}:{entity_type}:*"
             
-            logger.info(f"Simulando invalidación con patrón: {pattern}")
+            # Índice del mercado (o mercado + tipo); SCAN solo para claves sin indexar
+            deleted = await self.redis.delete_indexed(
+                self._market_index_key(market_id, entity_type),
+                fallback_pattern=pattern
+            )
+            logger.info(f"Invalidadas {deleted} entradas del mercado {market_id}")
             
             # Remover mercado de stats
             if market_id in self.stats["market_segments"]:
@@ -2,6 +2,8 @@ from sentence_transformers import SentenceTransformer
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 
+from .topk import select_top_k
+
 class ContentBasedRecommender:
     def __init__(self):
         self.model = SentenceTransformer('all-MiniLM-L6-v2')
@@ -35,8 +37,8 @@ class ContentBasedRecommender:
             self.product_embeddings
         )[0]
         
-        # Obtener índices de productos más similares (excluyendo el producto actual)
-        similar_indices = np.argsort(similarities)[::-1][1:n_recommendations+1]
+        # Top-N por selección parcial, excluyendo explícitamente el producto actual
+        similar_indices = select_top_k(similarities, n_recommendations, exclude_index=product_idx)
         
         # Devolver productos recomendados con sus scores de similitud
         recommendations = [
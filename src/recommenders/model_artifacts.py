@@ -0,0 +1,515 @@
+"""
+Formato de artefactos de modelo sin pickle y con memory-mapping.
+
+Cada artefacto es un directorio con versiones inmutables y un puntero:
+
+    data/tfidf_model.artifacts/
+        CURRENT              nombre de la versión activa (p.ej. v1730000000000000000-4242)
+        v1730000000000000000-4242/
+            manifest.json        versión de formato, tipo, dimensiones, huella del catálogo
+            csr_data.npy         matriz TF-IDF en formato CSR (data / indices / indptr)
+            csr_indices.npy
+            csr_indptr.npy
+            idf.npy              pesos IDF del vectorizador
+            vocabulary.json      términos ordenados por columna + parámetros del vectorizador
+            product_ids.json     columna de IDs (orden de filas)
+            product_fields.json  nombres de los campos de producto (uno por columna)
+            product_col_<i>.npy          valores JSON concatenados (uint8) del campo i
+            product_col_<i>.offsets.npy  offsets int64 [N + 1]; tramo vacío = campo ausente
+
+    data/embeddings.artifacts/
+        CURRENT
+        v.../
+            manifest.json
+            embeddings.npy       matriz densa [N, D]
+            product_ids.json
+            product_fields.json, product_col_<i>[.offsets].npy
+
+Una escritura crea una versión nueva y después reemplaza ``CURRENT`` con un
+único ``os.replace``; un lector siempre resuelve una versión completa. Los
+artefactos antiguos con los ficheros directamente en el directorio se siguen
+leyendo hasta la siguiente escritura.
+
+Los ``.npy`` se abren con ``mmap_mode='r'``, por lo que N workers de uvicorn
+comparten las mismas páginas a través de la caché del sistema operativo en
+lugar de deserializar cada uno su propia copia. Los documentos de producto
+también son columnas mapeadas (``ProductColumns``): una fila se decodifica al
+accederla, en lugar de parsear el catálogo entero a dicts en cada worker.
+Los artefactos v1 (``products.jsonl``) se siguen leyendo.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from collections.abc import Sequence
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT_VERSION = 2
+# v1 guardaba los productos como products.jsonl
+SUPPORTED_FORMAT_VERSIONS = (1, ARTIFACT_FORMAT_VERSION)
+
+TFIDF_ARTIFACT = "tfidf"
+EMBEDDING_ARTIFACT = "embeddings"
+
+# Puntero a la versión activa dentro del directorio de artefactos
+CURRENT_POINTER = "CURRENT"
+# Versiones conservadas tras publicar una nueva (la anterior puede estar
+# siendo leída por otro worker que resolvió CURRENT justo antes)
+RETAINED_VERSIONS = 2
+
+
+class ArtifactFormatError(Exception):
+    """El artefacto no existe, está incompleto o tiene una versión no soportada."""
+
+
+class ProductColumns(Sequence):
+    """
+    Documentos de producto sobre columnas memory-mapped.
+
+    Cada campo es una columna de valores JSON concatenados con sus offsets.
+    Una fila se decodifica al accederla y se devuelve como un dict nuevo:
+    el catálogo no se materializa en cada worker y mutar el resultado no
+    altera el artefacto. Los slices devuelven una lista de dicts y
+    ``take`` una vista sobre un subconjunto de filas.
+    """
+
+    def __init__(self, fields: List[str], columns: List[tuple], n_rows: int, rows: Optional[np.ndarray] = None):
+        self.fields = fields
+        self.columns = columns
+        self.n_rows = n_rows
+        # Filas del artefacto que expone esta vista (None = todas, en orden)
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(self.n_rows))]
+        if index < 0:
+            index += self.n_rows
+        if not 0 <= index < self.n_rows:
+            raise IndexError("ProductColumns index out of range")
+        return self._row(index)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def take(self, indices: List[int]) -> "ProductColumns":
+        """Vista sobre las filas ``indices`` de esta secuencia (sin decodificarlas)."""
+        rows = np.asarray(indices, dtype=np.int64)
+        if self.rows is not None:
+            rows = self.rows[rows]
+        return ProductColumns(self.fields, self.columns, len(rows), rows)
+
+    def column(self, field: str):
+        """Itera los valores de un solo campo (None si falta), sin decodificar el resto."""
+        try:
+            values, offsets = self.columns[self.fields.index(field)]
+        except ValueError:
+            yield from (None for _ in range(self.n_rows))
+            return
+        for index in range(self.n_rows):
+            yield self._value(values, offsets, self._artifact_row(index))
+
+    def _artifact_row(self, index: int) -> int:
+        return index if self.rows is None else int(self.rows[index])
+
+    @staticmethod
+    def _value(values, offsets, row: int) -> Any:
+        start, end = int(offsets[row]), int(offsets[row + 1])
+        return json.loads(values[start:end].tobytes()) if end > start else None
+
+    def _row(self, index: int) -> Dict[str, Any]:
+        row = self._artifact_row(index)
+        product = {}
+        for field, (values, offsets) in zip(self.fields, self.columns):
+            start, end = int(offsets[row]), int(offsets[row + 1])
+            if end > start:
+                product[field] = json.loads(values[start:end].tobytes())
+        return product
+
+
+def artifact_dir_for(model_path: str) -> str:
+    """
+    Directorio de artefactos asociado a una ruta de modelo legacy.
+
+    ``data/tfidf_model.pkl`` → ``data/tfidf_model.artifacts``
+    """
+    return f"{os.path.splitext(model_path)[0]}.artifacts"
+
+
+def resolve_artifact_dir(artifact_dir: str) -> str:
+    """
+    Directorio de la versión activa del artefacto.
+
+    Sigue el puntero ``CURRENT``; sin puntero devuelve ``artifact_dir``
+    (artefactos escritos antes de introducir las versiones).
+    """
+    try:
+        with open(os.path.join(artifact_dir, CURRENT_POINTER), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return artifact_dir
+    return os.path.join(artifact_dir, version) if version else artifact_dir
+
+
+def artifact_exists(artifact_dir: str) -> bool:
+    """Indica si hay un artefacto (de cualquier versión) en el directorio."""
+    return os.path.exists(os.path.join(resolve_artifact_dir(artifact_dir), "manifest.json"))
+
+
+def artifact_is_stale(artifact_dir: str, *source_paths: Optional[str]) -> bool:
+    """
+    Indica si alguno de los ficheros legacy es posterior al artefacto.
+
+    Los scripts de regeneración siguen escribiendo los ``.pkl``; un artefacto
+    migrado de una versión anterior no debe ocultarlos.
+
+    Args:
+        artifact_dir: Directorio del artefacto
+        source_paths: Ficheros legacy de los que se deriva (los que no existen se ignoran)
+    """
+    try:
+        artifact_mtime = os.path.getmtime(os.path.join(resolve_artifact_dir(artifact_dir), "manifest.json"))
+    except OSError:
+        return True
+    return any(
+        path and os.path.exists(path) and os.path.getmtime(path) > artifact_mtime
+        for path in source_paths
+    )
+
+
+def catalog_fingerprint(product_ids: List[str]) -> str:
+    """Huella del orden de product_ids para validar artefactos derivados."""
+    return hashlib.sha1("\n".join(product_ids).encode("utf-8")).hexdigest()
+
+
+# ============================================================================
+# ESCRITURA
+# ============================================================================
+
+def save_tfidf_artifact(
+    artifact_dir: str,
+    vectorizer: TfidfVectorizer,
+    product_vectors,
+    product_data: List[Dict[str, Any]],
+    product_ids: List[str]
+) -> None:
+    """
+    Guarda un modelo TF-IDF en formato de artefacto.
+
+    Args:
+        artifact_dir: Directorio destino (se reemplaza de forma atómica)
+        vectorizer: Vectorizador entrenado
+        product_vectors: Matriz dispersa [N, F]
+        product_data: Documentos de producto alineados con las filas
+        product_ids: IDs alineados con las filas
+    """
+    matrix = sparse.csr_matrix(product_vectors)
+    terms = [None] * len(vectorizer.vocabulary_)
+    for term, column in vectorizer.vocabulary_.items():
+        terms[int(column)] = term
+
+    def write(tmp_dir: str) -> None:
+        np.save(os.path.join(tmp_dir, "csr_data.npy"), matrix.data)
+        np.save(os.path.join(tmp_dir, "csr_indices.npy"), matrix.indices)
+        np.save(os.path.join(tmp_dir, "csr_indptr.npy"), matrix.indptr)
+        np.save(os.path.join(tmp_dir, "idf.npy"), np.asarray(vectorizer.idf_))
+        _write_json(os.path.join(tmp_dir, "vocabulary.json"), {
+            "terms": terms,
+            "params": _vectorizer_params(vectorizer)
+        })
+        _write_products(tmp_dir, product_data, product_ids)
+        _write_json(os.path.join(tmp_dir, "manifest.json"), {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "kind": TFIDF_ARTIFACT,
+            "n_products": matrix.shape[0],
+            "n_features": matrix.shape[1],
+            "fingerprint": catalog_fingerprint(product_ids)
+        })
+
+    _atomic_write_dir(artifact_dir, write)
+    logger.info(f"Artefacto TF-IDF v{ARTIFACT_FORMAT_VERSION} guardado en {artifact_dir}: {matrix.shape[0]} productos")
+
+
+def save_embedding_artifact(
+    artifact_dir: str,
+    embeddings: np.ndarray,
+    product_data: List[Dict[str, Any]],
+    product_ids: List[str]
+) -> None:
+    """
+    Guarda embeddings densos en formato de artefacto.
+
+    Args:
+        artifact_dir: Directorio destino (se reemplaza de forma atómica)
+        embeddings: Matriz densa [N, D]
+        product_data: Documentos de producto alineados con las filas
+        product_ids: IDs alineados con las filas
+    """
+    embeddings = np.ascontiguousarray(embeddings)
+
+    def write(tmp_dir: str) -> None:
+        np.save(os.path.join(tmp_dir, "embeddings.npy"), embeddings)
+        _write_products(tmp_dir, product_data, product_ids)
+        _write_json(os.path.join(tmp_dir, "manifest.json"), {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "kind": EMBEDDING_ARTIFACT,
+            "n_products": embeddings.shape[0],
+            "dimensions": embeddings.shape[1] if embeddings.ndim > 1 else 0,
+            "fingerprint": catalog_fingerprint(product_ids)
+        })
+
+    _atomic_write_dir(artifact_dir, write)
+    logger.info(f"Artefacto de embeddings v{ARTIFACT_FORMAT_VERSION} guardado en {artifact_dir}: {embeddings.shape[0]} productos")
+
+
+# ============================================================================
+# LECTURA
+# ============================================================================
+
+def load_tfidf_artifact(artifact_dir: str, mmap_mode: Optional[str] = "r") -> Dict[str, Any]:
+    """
+    Carga un artefacto TF-IDF.
+
+    Args:
+        artifact_dir: Directorio del artefacto
+        mmap_mode: Modo de memory-mapping para los ``.npy`` (None = leer en memoria)
+
+    Returns:
+        Dict con vectorizer, product_vectors, product_data, product_ids y manifest
+
+    Raises:
+        ArtifactFormatError: Si el artefacto falta o la versión no es soportada
+    """
+    artifact_dir = resolve_artifact_dir(artifact_dir)
+    manifest = _read_manifest(artifact_dir, TFIDF_ARTIFACT)
+
+    data = np.load(os.path.join(artifact_dir, "csr_data.npy"), mmap_mode=mmap_mode)
+    indices = np.load(os.path.join(artifact_dir, "csr_indices.npy"), mmap_mode=mmap_mode)
+    indptr = np.load(os.path.join(artifact_dir, "csr_indptr.npy"), mmap_mode=mmap_mode)
+    product_vectors = sparse.csr_matrix(
+        (data, indices, indptr),
+        shape=(manifest["n_products"], manifest["n_features"]),
+        copy=False
+    )
+
+    vocabulary = _read_json(os.path.join(artifact_dir, "vocabulary.json"))
+    vectorizer = _restore_vectorizer(
+        vocabulary["params"],
+        vocabulary["terms"],
+        np.load(os.path.join(artifact_dir, "idf.npy"))
+    )
+
+    product_ids, product_data = _read_products(artifact_dir, mmap_mode)
+    if len(product_ids) != manifest["n_products"] or len(product_data) != manifest["n_products"]:
+        raise ArtifactFormatError(f"Artefacto inconsistente en {artifact_dir}")
+
+    return {
+        "vectorizer": vectorizer,
+        "product_vectors": product_vectors,
+        "product_data": product_data,
+        "product_ids": product_ids,
+        "manifest": manifest
+    }
+
+
+def load_embedding_artifact(artifact_dir: str, mmap_mode: Optional[str] = "r") -> Dict[str, Any]:
+    """
+    Carga un artefacto de embeddings.
+
+    Args:
+        artifact_dir: Directorio del artefacto
+        mmap_mode: Modo de memory-mapping para ``embeddings.npy``
+
+    Returns:
+        Dict con embeddings, product_data, product_ids y manifest
+
+    Raises:
+        ArtifactFormatError: Si el artefacto falta o la versión no es soportada
+    """
+    artifact_dir = resolve_artifact_dir(artifact_dir)
+    manifest = _read_manifest(artifact_dir, EMBEDDING_ARTIFACT)
+    embeddings = np.load(os.path.join(artifact_dir, "embeddings.npy"), mmap_mode=mmap_mode)
+    product_ids, product_data = _read_products(artifact_dir, mmap_mode)
+    if len(product_ids) != manifest["n_products"] or embeddings.shape[0] != manifest["n_products"]:
+        raise ArtifactFormatError(f"Artefacto inconsistente en {artifact_dir}")
+
+    return {
+        "embeddings": embeddings,
+        "product_data": product_data,
+        "product_ids": product_ids,
+        "manifest": manifest
+    }
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def _vectorizer_params(vectorizer: TfidfVectorizer) -> Dict[str, Any]:
+    """Parámetros serializables del vectorizador (callables no soportados)."""
+    params = {}
+    for name, value in vectorizer.get_params().items():
+        if name == "vocabulary":
+            continue
+        if name == "dtype":
+            params[name] = np.dtype(value).name
+        elif isinstance(value, tuple):
+            params[name] = list(value)
+        elif value is None or isinstance(value, (str, int, float, bool, list)):
+            params[name] = value
+        else:
+            raise ArtifactFormatError(f"Parámetro de vectorizador no serializable: {name}={value!r}")
+    return params
+
+
+def _restore_vectorizer(params: Dict[str, Any], terms: List[str], idf: np.ndarray) -> TfidfVectorizer:
+    """Reconstruye un TfidfVectorizer ajustado a partir de vocabulario e IDF."""
+    params = dict(params)
+    if "dtype" in params:
+        params["dtype"] = np.dtype(params["dtype"]).type
+    if "ngram_range" in params:
+        params["ngram_range"] = tuple(params["ngram_range"])
+
+    vectorizer = TfidfVectorizer(**params)
+    vectorizer.vocabulary_ = {term: column for column, term in enumerate(terms)}
+    vectorizer.idf_ = idf
+    return vectorizer
+
+
+def _write_products(directory: str, product_data: List[Dict[str, Any]], product_ids: List[str]) -> None:
+    """Escribe los documentos de producto como columnas (ver ``ProductColumns``)."""
+    _write_json(os.path.join(directory, "product_ids.json"), list(product_ids))
+
+    fields: Dict[str, int] = {}
+    chunks: List[List[bytes]] = []
+    for row, product in enumerate(product_data):
+        for key, value in product.items():
+            column = fields.get(str(key))
+            if column is None:
+                column = fields[str(key)] = len(chunks)
+                chunks.append([b""] * row)
+            chunks[column].append(
+                json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+            )
+        # Campo ausente en esta fila: tramo vacío
+        for column_chunks in chunks:
+            if len(column_chunks) == row:
+                column_chunks.append(b"")
+
+    _write_json(os.path.join(directory, "product_fields.json"), list(fields))
+    for column, column_chunks in enumerate(chunks):
+        offsets = np.zeros(len(column_chunks) + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in column_chunks], out=offsets[1:])
+        np.save(os.path.join(directory, f"product_col_{column}.npy"), np.frombuffer(b"".join(column_chunks), dtype=np.uint8))
+        np.save(os.path.join(directory, f"product_col_{column}.offsets.npy"), offsets)
+
+
+def _read_products(directory: str, mmap_mode: Optional[str] = "r"):
+    product_ids = _read_json(os.path.join(directory, "product_ids.json"))
+    fields_path = os.path.join(directory, "product_fields.json")
+    if not os.path.exists(fields_path):
+        # Formato v1: un documento JSON por línea
+        with open(os.path.join(directory, "products.jsonl"), "r", encoding="utf-8") as f:
+            product_data = [json.loads(line) for line in f if line.strip()]
+        return product_ids, product_data
+
+    fields = _read_json(fields_path)
+    columns = []
+    for column in range(len(fields)):
+        values = np.load(os.path.join(directory, f"product_col_{column}.npy"), mmap_mode=mmap_mode)
+        offsets = np.load(os.path.join(directory, f"product_col_{column}.offsets.npy"), mmap_mode=mmap_mode)
+        if len(offsets) != len(product_ids) + 1:
+            raise ArtifactFormatError(f"Columna de producto inconsistente en {directory}: {fields[column]}")
+        columns.append((values, offsets))
+    return product_ids, ProductColumns(fields, columns, len(product_ids))
+
+
+def _read_manifest(artifact_dir: str, kind: str) -> Dict[str, Any]:
+    path = os.path.join(artifact_dir, "manifest.json")
+    if not os.path.exists(path):
+        raise ArtifactFormatError(f"No existe artefacto en {artifact_dir}")
+
+    manifest = _read_json(path)
+    if manifest.get("format_version") not in SUPPORTED_FORMAT_VERSIONS:
+        raise ArtifactFormatError(
+            f"Versión de artefacto no soportada: {manifest.get('format_version')} "
+            f"(soportadas {SUPPORTED_FORMAT_VERSIONS})"
+        )
+    if manifest.get("kind") != kind:
+        raise ArtifactFormatError(f"Tipo de artefacto inesperado: {manifest.get('kind')} (esperado {kind})")
+    return manifest
+
+
+def _write_json(path: str, payload: Any) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def _read_json(path: str) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _atomic_write_dir(artifact_dir: str, write) -> None:
+    """
+    Escribe una versión nueva del artefacto y la publica moviendo ``CURRENT``.
+
+    La versión se escribe completa en su propio directorio y el puntero se
+    reemplaza con ``os.replace``, así que en ningún momento falta un
+    artefacto: un lector ve la versión anterior o la nueva. Se conservan las
+    ``RETAINED_VERSIONS`` más recientes para no borrar ficheros que otro
+    worker esté abriendo; los procesos que ya tienen mapeados ``.npy``
+    borrados conservan sus páginas hasta cerrarlos.
+    """
+    os.makedirs(artifact_dir, exist_ok=True)
+    legacy_layout = os.path.exists(os.path.join(artifact_dir, "manifest.json"))
+
+    version = f"v{time.time_ns()}-{os.getpid()}"
+    version_dir = os.path.join(artifact_dir, version)
+    pointer_tmp = os.path.join(artifact_dir, f"{CURRENT_POINTER}.tmp-{os.getpid()}")
+    os.makedirs(version_dir)
+
+    try:
+        write(version_dir)
+        with open(pointer_tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(pointer_tmp, os.path.join(artifact_dir, CURRENT_POINTER))
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        if os.path.exists(pointer_tmp):
+            os.remove(pointer_tmp)
+        raise
+
+    _prune_versions(artifact_dir, keep=version)
+    if legacy_layout:
+        # Ficheros del formato sin versiones: CURRENT ya tiene prioridad sobre ellos
+        for entry in os.scandir(artifact_dir):
+            if entry.is_file() and not entry.name.startswith(CURRENT_POINTER):
+                os.remove(entry.path)
+
+
+def _prune_versions(artifact_dir: str, keep: str) -> None:
+    """Elimina las versiones más antiguas que las RETAINED_VERSIONS recientes."""
+    versions = sorted(
+        (entry.name for entry in os.scandir(artifact_dir) if entry.is_dir() and entry.name.startswith("v")),
+        key=lambda name: int(name[1:].split("-")[0]) if name[1:].split("-")[0].isdigit() else 0
+    )
+    for name in versions[:-RETAINED_VERSIONS]:
+        if name != keep:
+            shutil.rmtree(os.path.join(artifact_dir, name), ignore_errors=True)
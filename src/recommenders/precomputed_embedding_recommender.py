@@ -14,6 +14,16 @@ from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from sklearn.metrics.pairwise import cosine_similarity
 
+from .topk import select_top_k
+from .model_artifacts import (
+    ArtifactFormatError,
+    artifact_dir_for,
+    artifact_exists,
+    artifact_is_stale,
+    load_embedding_artifact,
+    save_embedding_artifact
+)
+
 logger = logging.getLogger(__name__)
 
 class PrecomputedEmbeddingRecommender:
@@ -22,19 +32,22 @@ class PrecomputedEmbeddingRecommender:
     basadas en similitud de contenido, sin necesidad de cargar modelos ML en runtime.
     """
     
-    def __init__(self, embeddings_path: str = None, products_path: str = None):
+    def __init__(self, embeddings_path: str = None, products_path: str = None, mmap_mode: Optional[str] = "r"):
         """
         Inicializar el recomendador con rutas a los archivos de embeddings y productos.
         
         Args:
             embeddings_path: Ruta al archivo de embeddings pre-computados (.pkl)
             products_path: Ruta al archivo de datos de productos (.pkl)
+            mmap_mode: Modo de memory-mapping del artefacto (None = en memoria)
         """
         self.embeddings_path = embeddings_path or "data/embeddings.pkl"
         self.products_path = products_path or "data/product_data.pkl"
+        self.mmap_mode = mmap_mode
         self.product_embeddings = None
         self.product_data = None
         self.product_ids = None
+        self.id_to_index: Dict[str, int] = {}
         self.loaded = False
         
         # Variables para fallback
@@ -82,6 +95,20 @@ class PrecomputedEmbeddingRecommender:
             embeddings_file = self._find_embedding_file()
             products_file = self._find_products_file()
             
+            # Preferir el artefacto versionado (memory-mapped, sin pickle),
+            # salvo que los pickles se hayan regenerado después de migrarlo
+            artifact_dir = artifact_dir_for(self.embeddings_path)
+            if artifact_exists(artifact_dir) and not artifact_is_stale(artifact_dir, embeddings_file, products_file):
+                logger.info(f"Cargando artefacto de embeddings desde {artifact_dir}...")
+                data = load_embedding_artifact(artifact_dir, mmap_mode=self.mmap_mode)
+                self.product_embeddings = data['embeddings']
+                self.product_data = data['product_data']
+                self.product_ids = data['product_ids']
+                self._build_id_index()
+                self.loaded = True
+                logger.info(f"✓ Recomendador cargado desde artefacto con {len(self.product_data)} productos")
+                return True
+            
             if not embeddings_file:
                 logger.warning(f"No se encontró archivo de embeddings en {self.embeddings_path} ni en rutas alternativas")
                 return False
@@ -102,20 +129,45 @@ class PrecomputedEmbeddingRecommender:
             
             # Extraer IDs de productos
             self.product_ids = [str(p.get('id', i)) for i, p in enumerate(self.product_data)]
+            self._build_id_index()
             
             # Verificar integridad
             if len(self.product_embeddings) != len(self.product_data):
                 logger.error(f"Inconsistencia: {len(self.product_embeddings)} embeddings vs {len(self.product_data)} productos")
                 return False
             
+            # Migrar los pickles legacy al formato de artefacto para los próximos arranques
+            try:
+                self.save_artifact()
+            except Exception as e:
+                logger.warning(f"No se pudo migrar embeddings legacy a {artifact_dir}: {e}")
+            
             self.loaded = True
             logger.info(f"✓ Recomendador cargado exitosamente con {len(self.product_data)} productos")
             return True
             
+        except ArtifactFormatError as e:
+            logger.error(f"Artefacto de embeddings no válido: {e}")
+            return False
         except Exception as e:
             logger.error(f"Error cargando embeddings pre-computados: {e}")
             return False
     
+    def save_artifact(self) -> None:
+        """Guarda embeddings y productos en el formato de artefacto versionado."""
+        save_embedding_artifact(
+            artifact_dir_for(self.embeddings_path),
+            np.asarray(self.product_embeddings),
+            self.product_data,
+            self.product_ids
+        )
+    
+    def _build_id_index(self) -> None:
+        """Construye el índice id → fila (conserva la primera aparición)."""
+        self.id_to_index = {}
+        for i, pid in enumerate(self.product_ids):
+            self.id_to_index.setdefault(pid, i)
+    
     async def get_recommendations(self, product_id: str, n: int = 5) -> List[Dict[str, Any]]:
         """
         Obtiene recomendaciones basadas en un producto utilizando embeddings pre-computados.
@@ -136,12 +188,11 @@ class PrecomputedEmbeddingRecommender:
         
         try:
             # Encontrar índice del producto
-            if product_id not in self.product_ids:
+            product_index = self.id_to_index.get(str(product_id))
+            if product_index is None:
                 logger.warning(f"Producto ID {product_id} no encontrado")
                 return []
             
-            product_index = self.product_ids.index(product_id)
-            
             # Obtener embedding del producto
             product_embedding = self.product_embeddings[product_index]
             
@@ -151,8 +202,8 @@ class PrecomputedEmbeddingRecommender:
             # Calcular similitud con todos los productos
             similarities = cosine_similarity(product_embedding_reshaped, self.product_embeddings)[0]
             
-            # Obtener índices ordenados por similitud (excluyendo el propio producto)
-            similar_indices = similarities.argsort()[::-1][1:n+1]
+            # Top-N por selección parcial, excluyendo explícitamente el propio producto
+            similar_indices = select_top_k(similarities, n, exclude_index=product_index)
             
             # Construir lista de recomendaciones
             recommendations = []
@@ -171,6 +222,70 @@ class PrecomputedEmbeddingRecommender:
             logger.error(f"Error generando recomendaciones: {e}")
             return []
     
+    async def get_recommendations_batch(
+        self,
+        product_ids: List[str],
+        n: int = 5,
+        exclude_ids: Optional[List[str]] = None,
+        aggregation: str = "max"
+    ) -> List[Dict[str, Any]]:
+        """
+        Obtiene recomendaciones para varios productos semilla en una sola pasada.
+        
+        Args:
+            product_ids: IDs de los productos semilla
+            n: Número de recomendaciones a devolver
+            exclude_ids: IDs a excluir del resultado (p.ej. ya mostrados)
+            aggregation: "max" o "mean" de la similitud entre semillas
+            
+        Returns:
+            Lista única de productos recomendados, ordenada por score agregado
+        """
+        if aggregation not in ("max", "mean"):
+            raise ValueError(f"aggregation debe ser 'max' o 'mean', recibido: {aggregation}")
+        
+        if not self.loaded:
+            success = await self.load()
+            if not success:
+                logger.error("No se pudieron cargar los embeddings pre-computados")
+                return []
+        
+        try:
+            seed_rows = [
+                self.id_to_index[pid]
+                for pid in dict.fromkeys(str(p) for p in product_ids)
+                if pid in self.id_to_index
+            ]
+            if not seed_rows:
+                return []
+            
+            # Una sola multiplicación densa: [semillas × N]
+            similarities = cosine_similarity(self.product_embeddings[seed_rows], self.product_embeddings)
+            scores = similarities.max(axis=0) if aggregation == "max" else similarities.mean(axis=0)
+            
+            exclude_mask = np.zeros(len(self.product_ids), dtype=bool)
+            exclude_mask[seed_rows] = True
+            for exclude_id in exclude_ids or []:
+                index = self.id_to_index.get(str(exclude_id))
+                if index is not None:
+                    exclude_mask[index] = True
+            
+            recommendations = []
+            for index in select_top_k(scores, n, exclude_mask=exclude_mask):
+                product = self.product_data[index]
+                recommendations.append({
+                    "id": self.product_ids[index],
+                    "title": product.get("title", ""),
+                    "similarity_score": float(scores[index]),
+                    "product_data": product
+                })
+            
+            return recommendations
+            
+        except Exception as e:
+            logger.error(f"Error generando recomendaciones batch: {e}")
+            return []
+    
     async def search_products(self, query: str, n: int = 10) -> List[Dict[str, Any]]:
         """
         Busca productos por texto utilizando similitud de embeddings pre-computados.
@@ -5,6 +5,8 @@ from sklearn.metrics.pairwise import cosine_similarity
 import logging
 import os
 
+from .topk import select_top_k
+
 class PrecomputedEmbeddingRecommender:
     """
     Recomendador que utiliza embeddings pre-computados para generar recomendaciones,
@@ -118,8 +120,8 @@ class PrecomputedEmbeddingRecommender:
                 self.embeddings
             )[0]
             
-            # Obtener índices de productos más similares (excluyendo el producto actual)
-            similar_indices = np.argsort(similarities)[::-1][1:n_recommendations+1]
+            # Top-N por selección parcial, excluyendo explícitamente el producto actual
+            similar_indices = select_top_k(similarities, n_recommendations, exclude_index=product_idx)
             
             # Preparar recomendaciones
             recommendations = []
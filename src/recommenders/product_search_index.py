@@ -0,0 +1,145 @@
+"""
+Índice invertido de tokens/prefijos para la búsqueda de productos.
+
+Sustituye el escaneo lineal por subcadena de ``/v1/products/search/`` (que
+recorría y pasaba a minúsculas el texto de todo el catálogo en cada petición)
+por un índice token → filas construido una vez al cargar el catálogo.
+
+- Normalización: minúsculas y plegado de acentos igual que
+  ``extract_categories_from_query`` (á→a, é→e, í→i, ó→o, ú→u, ñ→n).
+- Cada token de la consulta se busca como prefijo (búsqueda mientras se
+  escribe) y los tokens se combinan con AND.
+- Los resultados son filas de ``product_data`` en orden de catálogo, por lo
+  que el total es exacto y la paginación estable.
+"""
+
+import re
+import time
+import logging
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Mismo plegado de acentos que extract_categories_from_query
+_ACCENT_FOLD = str.maketrans("áéíóúñ", "aeioun")
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_text(text: Any) -> str:
+    """Pasa a minúsculas y pliega acentos."""
+    return str(text or "").lower().translate(_ACCENT_FOLD)
+
+
+def tokenize(text: Any) -> List[str]:
+    """Tokeniza texto (descartando etiquetas HTML) en palabras normalizadas."""
+    return _TOKEN_RE.findall(normalize_text(_HTML_TAG_RE.sub(" ", str(text or ""))))
+
+
+class ProductSearchIndex:
+    """
+    Índice invertido token → filas de producto con búsqueda por prefijo.
+
+    ``source`` guarda la lista de productos indexada para detectar cuándo el
+    catálogo del recomendador fue reemplazado y el índice quedó obsoleto.
+    """
+
+    # Campos indexados (los mismos que comparaba el escaneo lineal)
+    SEARCH_FIELDS = ("title", "body_html")
+
+    def __init__(self, postings: Dict[str, np.ndarray], source: Optional[List[Dict[str, Any]]] = None):
+        self.postings = postings
+        self.terms = sorted(postings)
+        self.source = source
+
+    @classmethod
+    def build(cls, products: List[Dict[str, Any]]) -> "ProductSearchIndex":
+        """
+        Construye el índice a partir de ``product_data``.
+
+        Performance: O(texto del catálogo) una sola vez; las listas de filas
+        quedan ordenadas porque se recorren los productos en orden.
+        """
+        start_time = time.time()
+        rows_by_term: Dict[str, List[int]] = {}
+
+        for row, product in enumerate(products or []):
+            terms = set()
+            for field in cls.SEARCH_FIELDS:
+                terms.update(tokenize(product.get(field, "")))
+            for term in terms:
+                rows_by_term.setdefault(term, []).append(row)
+
+        postings = {term: np.asarray(rows, dtype=np.int32) for term, rows in rows_by_term.items()}
+        index = cls(postings, source=products)
+        logger.info(
+            f"✅ Search index built: {len(postings)} terms, {len(products or [])} products "
+            f"in {(time.time() - start_time) * 1000:.0f}ms"
+        )
+        return index
+
+    def is_current(self, products: Optional[List[Dict[str, Any]]]) -> bool:
+        """Indica si el índice corresponde a esta lista de productos."""
+        return self.source is products
+
+    def _rows_for_prefix(self, prefix: str) -> np.ndarray:
+        """Filas con algún término que empieza por ``prefix`` (ordenadas, sin duplicados)."""
+        matches = []
+        for i in range(bisect_left(self.terms, prefix), len(self.terms)):
+            term = self.terms[i]
+            if not term.startswith(prefix):
+                break
+            matches.append(self.postings[term])
+
+        if not matches:
+            return np.empty(0, dtype=np.int32)
+        if len(matches) == 1:
+            return matches[0]
+        return np.unique(np.concatenate(matches))
+
+    def search(self, query: str) -> np.ndarray:
+        """
+        Devuelve las filas que contienen todos los tokens de la consulta como prefijo.
+
+        Args:
+            query: Texto de búsqueda
+
+        Returns:
+            Array int32 ordenado de filas de ``product_data``
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return np.empty(0, dtype=np.int32)
+
+        result: Optional[np.ndarray] = None
+        # Tokens más largos primero: listas más cortas, intersección más barata
+        for token in sorted(set(tokens), key=len, reverse=True):
+            rows = self._rows_for_prefix(token)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if result.size == 0:
+                break
+
+        return result
+
+
+def get_search_index(recommender: Any) -> ProductSearchIndex:
+    """
+    Devuelve el índice de búsqueda vigente del recomendador.
+
+    Normalmente se construye al cargar el catálogo; si falta o está obsoleto
+    (catálogo reemplazado), se reconstruye y se guarda en el recomendador.
+    """
+    products = getattr(recommender, "product_data", None) or []
+    index = getattr(recommender, "search_index", None)
+    if isinstance(index, ProductSearchIndex) and index.is_current(products):
+        return index
+
+    index = ProductSearchIndex.build(products)
+    try:
+        recommender.search_index = index
+    except AttributeError:
+        pass
+    return index
@@ -13,6 +13,8 @@ import json
 import tempfile
 import traceback
 
+from src.recommenders.retail_event_writer import RetailEventWriter
+
 # Importar el gestor de catálogos (si existe)
 try:
     from src.api.core.catalog_manager_ import CatalogManager
@@ -28,7 +30,8 @@ class RetailAPIRecommender:
         project_number: str,
         location: str,
         catalog: str = "default_catalog",
-        serving_config_id: str = "default_config"
+        serving_config_id: str = "default_config",
+        async_event_writes: bool = True
     ):
         self.project_number = project_number
         self.location = location
@@ -45,6 +48,14 @@ class RetailAPIRecommender:
             f"/catalogs/{catalog}/servingConfigs/{serving_config_id}"
         )
         
+        # Escritura de eventos en segundo plano (cola + thread pool + import en bloque)
+        self.event_writer = None
+        if async_event_writes:
+            self.event_writer = RetailEventWriter(
+                self.user_event_client,
+                parent=f"projects/{project_number}/locations/{location}/catalogs/{catalog}"
+            )
+        
         # Inicializar gestor de catálogos si está disponible
         self.catalog_manager = None
         if CATALOG_MANAGER_AVAILABLE:
@@ -1246,20 +1257,29 @@ class RetailAPIRecommender:
             # Registrar el evento
             logging.info(f"Registrando evento: usuario={user_id}, tipo={event_type}, producto={product_id or 'N/A'}")
             
-            # Crear el request para write_user_event
-            request = retail_v2.WriteUserEventRequest(
-                parent=parent,
-                user_event=user_event
-            )
-            
-            # Usar el cliente correcto (UserEventServiceClient) para registrar eventos
-            response = self.user_event_client.write_user_event(request=request)
+            if self.event_writer is not None:
+                # En segundo plano: la request no espera a Retail API
+                if not self.event_writer.submit(user_event):
+                    return {
+                        "status": "error",
+                        "error": "Retail API event queue is full"
+                    }
+            else:
+                # Crear el request para write_user_event
+                request = retail_v2.WriteUserEventRequest(
+                    parent=parent,
+                    user_event=user_event
+                )
+                
+                # Cliente gRPC síncrono: fuera del event loop
+                await asyncio.to_thread(self.user_event_client.write_user_event, request=request)
             
             response = {
                 "status": "success", 
-                "message": "Event recorded", 
+                "message": "Event queued" if self.event_writer is not None else "Event recorded", 
                 "event_type": event_type,
-                "recommendation_tracked": recommendation_id is not None
+                "recommendation_tracked": recommendation_id is not None,
+                "queued": self.event_writer is not None
             }
             
             # Añadir información de moneda si es un evento de compra
@@ -1275,4 +1295,15 @@ class RetailAPIRecommender:
             return {
                 "status": "error",
                 "error": str(e)
-            }
\ No newline at end of file
+            }
+    
+    def get_event_writer_stats(self) -> Dict[str, Any]:
+        """Profundidad de cola, lag y contadores del writer de eventos."""
+        if self.event_writer is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.event_writer.get_stats()}
+    
+    async def close(self):
+        """Vacía la cola de eventos pendientes y detiene el writer."""
+        if self.event_writer is not None:
+            await self.event_writer.stop()
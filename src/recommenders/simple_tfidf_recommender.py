@@ -7,6 +7,8 @@ import json
 import os
 from typing import List, Dict, Optional
 
+from .topk import select_top_k
+
 class SimpleTFIDFRecommender:
     """
     Recomendador simple basado en TF-IDF, que no requiere modelos pre-entrenados.
@@ -116,8 +118,8 @@ class SimpleTFIDFRecommender:
             product_vector = self.tfidf_matrix[product_idx:product_idx+1]
             similarities = cosine_similarity(product_vector, self.tfidf_matrix)[0]
             
-            # Obtener índices de productos más similares (excluyendo el producto actual)
-            similar_indices = np.argsort(similarities)[::-1][1:n_recommendations+1]
+            # Top-N por selección parcial, excluyendo explícitamente el producto actual
+            similar_indices = select_top_k(similarities, n_recommendations, exclude_index=product_idx)
             
             # Preparar recomendaciones
             recommendations = []
@@ -10,35 +10,146 @@ import os
 import pickle
 import logging
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import asyncio
+import time
 from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy import sparse
 from sklearn.metrics.pairwise import cosine_similarity
 
+from .topk import select_top_k
+from .product_search_index import ProductSearchIndex
+from .model_artifacts import (
+    ArtifactFormatError,
+    ProductColumns,
+    artifact_dir_for,
+    artifact_exists,
+    artifact_is_stale,
+    catalog_fingerprint,
+    load_tfidf_artifact,
+    save_tfidf_artifact
+)
+
 
 logger = logging.getLogger(__name__)
 
+
+def build_product_text(product: Dict[str, Any]) -> str:
+    """
+    Construye el texto de un producto que se vectoriza con TF-IDF.
+    
+    Compartido por fit() y por el entrenador en proceso separado
+    (``tfidf_trainer``) para que ambos produzcan el mismo modelo.
+    """
+    title = product.get('title', '') or product.get('name', '')
+    description = (
+        product.get('body_html', '') or 
+        product.get('description', '') or 
+        product.get('body', '')
+    )
+    category = (
+        product.get('product_type', '') or 
+        product.get('category', '') or 
+        product.get('type', '')
+    )
+    tags = product.get('tags', '') or ''
+    
+    if isinstance(tags, list):
+        tags = ' '.join(tags)
+    
+    return f"{title}. {description}. Categoría: {category}. Tags: {tags}".strip()
+
+
+def create_vectorizer() -> TfidfVectorizer:
+    """Crea el vectorizador TF-IDF con la configuración del recomendador."""
+    return TfidfVectorizer(
+        max_features=5000,    # Limitar características para mejorar rendimiento
+        stop_words='english',  # Eliminar palabras comunes
+        min_df=2,             # Término debe aparecer en al menos 2 documentos
+        ngram_range=(1, 2)    # Usar unigramas y bigramas
+    )
+
+
 class TFIDFRecommender:
     """
     Recomendador que utiliza vectorización TF-IDF para generar recomendaciones
     basadas en similitud de contenido, sin necesidad de cargar modelos ML pesados.
     """
     
-    def __init__(self, model_path: str = None):
+    # Vecinos precalculados por producto en la tabla top-K
+    DEFAULT_NEIGHBOR_K = 50
+    # Filas procesadas por lote al construir la tabla (limita memoria a ~lote × N)
+    NEIGHBOR_BATCH_SIZE = 256
+    # Deriva de vocabulario (exceso de términos fuera de vocabulario en las
+    # actualizaciones incrementales) a partir de la cual se reentrena completo
+    DEFAULT_REFIT_DRIFT = 0.15
+    # Términos mínimos acumulados antes de evaluar la deriva (evita ruido)
+    REFIT_MIN_TERMS = 200
+    # Productos muestreados para estimar la tasa base de términos fuera de vocabulario
+    DRIFT_BASELINE_SAMPLE = 500
+    # Espera antes de persistir el artefacto tras actualizaciones incrementales
+    # (las ráfagas de webhooks se agrupan en una sola escritura)
+    PERSIST_DEBOUNCE_SECONDS = 30.0
+    # Fracción máxima de filas de la tabla top-K que se recalculan al aplicar
+    # un delta; por encima se reconstruye la tabla completa
+    NEIGHBOR_PATCH_MAX_FRACTION = 0.1
+    
+    def __init__(
+        self,
+        model_path: str = None,
+        neighbor_k: int = DEFAULT_NEIGHBOR_K,
+        precompute_neighbors: bool = True,
+        mmap_mode: Optional[str] = "r"
+    ):
         """
         Inicializar el recomendador TF-IDF.
         
         Args:
             model_path: Ruta al archivo de modelo TF-IDF pre-entrenado (.pkl), si existe
+            neighbor_k: Número de vecinos a precalcular por producto
+            precompute_neighbors: Construir la tabla top-K en segundo plano tras fit()/load()
+            mmap_mode: Modo de memory-mapping de las matrices del artefacto (None = en memoria)
         """
         self.model_path = model_path
+        self.mmap_mode = mmap_mode
         self.vectorizer = None
         self.product_vectors = None
         self.product_data = None
         self.product_ids = None
         self.loaded = False
         
+        # Índice id → fila para búsquedas O(1) (se reconstruye si cambia product_ids)
+        self.id_to_index: Dict[str, int] = {}
+        self._indexed_product_ids = None
+        
+        # Tabla top-K de vecinos (filas alineadas con product_ids, -1 = relleno)
+        self.neighbor_k = neighbor_k
+        self.precompute_neighbors = precompute_neighbors
+        self.neighbor_indices: Optional[np.ndarray] = None
+        self.neighbor_scores: Optional[np.ndarray] = None
+        self._neighbor_product_ids = None
+        self._neighbor_task: Optional[asyncio.Task] = None
+        
+        # Índice invertido para búsqueda por palabras/prefijos (ver product_search_index)
+        self.search_index: Optional[ProductSearchIndex] = None
+        
+        # Actualizaciones incrementales del catálogo (ver update_products)
+        self.refit_drift_threshold = self.DEFAULT_REFIT_DRIFT
+        self.persist_debounce_seconds = self.PERSIST_DEBOUNCE_SECONDS
+        self._update_lock = asyncio.Lock()
+        # Serializa los entrenamientos de TFIDFTrainer sobre este recomendador
+        # (cada llamador crea su propio entrenador)
+        self.training_lock = asyncio.Lock()
+        self._refit_task: Optional[asyncio.Task] = None
+        # Deltas aplicados desde la instantánea de un refit en curso (None = sin refit)
+        self._refit_journal: Optional[List[Tuple[Dict[str, Dict[str, Any]], set]]] = None
+        self._persist_task: Optional[asyncio.Task] = None
+        self._persist_pending = False
+        self._reset_drift()
+        # Callbacks síncronos invocados cada vez que se reemplaza product_data
+        self._catalog_listeners: List[Callable[[], None]] = []
+        
         # Variables para fallback
         self.fallback_active = False
     
@@ -58,58 +169,32 @@ class TFIDFRecommender:
             # Guardar datos de productos
             self.product_data = products
             self.product_ids = [str(p.get('id', i)) for i, p in enumerate(products)]
+            self._build_id_index()
             
-            # Extraer textos para vectorización
-            texts = []
-            for product in products:
-                title = product.get('title', '') or product.get('name', '')
-                description = (
-                    product.get('body_html', '') or 
-                    product.get('description', '') or 
-                    product.get('body', '')
-                )
-                category = (
-                    product.get('product_type', '') or 
-                    product.get('category', '') or 
-                    product.get('type', '')
-                )
-                tags = product.get('tags', '') or ''
-                
-                if isinstance(tags, list):
-                    tags = ' '.join(tags)
-                
-                text = f"{title}. {description}. Categoría: {category}. Tags: {tags}".strip()
-                texts.append(text)
-            
-            # Crear y entrenar vectorizador TF-IDF
-            self.vectorizer = TfidfVectorizer(
-                max_features=5000,    # Limitar características para mejorar rendimiento
-                stop_words='english',  # Eliminar palabras comunes
-                min_df=2,             # Término debe aparecer en al menos 2 documentos
-                ngram_range=(1, 2)    # Usar unigramas y bigramas
-            )
+            # Extraer textos y entrenar vectorizador TF-IDF
+            texts = [build_product_text(product) for product in products]
+            self.vectorizer = create_vectorizer()
             
             # Transformar textos a vectores TF-IDF
             self.product_vectors = self.vectorizer.fit_transform(texts)
             
-            # Guardar modelo si se especificó ruta
+            # Guardar modelo si se especificó ruta (artefacto mmap, sin pickle)
             if self.model_path:
-                model_dir = os.path.dirname(self.model_path)
-                if model_dir and not os.path.exists(model_dir):
-                    os.makedirs(model_dir, exist_ok=True)
-                
-                # CORRECCIÓN: Guardar también los datos de productos y IDs
-                with open(self.model_path, 'wb') as f:
-                    pickle.dump({
-                        'vectorizer': self.vectorizer,
-                        'product_vectors': self.product_vectors,
-                        'product_data': self.product_data,  # Añadir datos de productos
-                        'product_ids': self.product_ids     # Añadir IDs de productos
-                    }, f)
-                logger.info(f"Modelo TF-IDF guardado en {self.model_path} con {len(self.product_data)} productos")
+                save_tfidf_artifact(
+                    artifact_dir_for(self.model_path),
+                    self.vectorizer,
+                    self.product_vectors,
+                    self.product_data,
+                    self.product_ids
+                )
+                logger.info(f"Modelo TF-IDF guardado en {artifact_dir_for(self.model_path)} con {len(self.product_data)} productos")
             
             self.loaded = True
+            self._reset_drift()
             await self._build_category_index()
+            self.search_index = await asyncio.to_thread(ProductSearchIndex.build, self.product_data)
+            self._schedule_neighbor_table(reuse_persisted=False)
+            self._notify_catalog_listeners()
             logger.info(f"Recomendador TF-IDF entrenado exitosamente")
             return True
             
@@ -117,12 +202,29 @@ class TFIDFRecommender:
             logger.error(f"Error entrenando recomendador TF-IDF: {e}")
             return False
     
+    def has_saved_model(self, model_path: str = None) -> bool:
+        """
+        Indica si existe un modelo guardado (artefacto mmap o pickle legacy).
+        
+        Args:
+            model_path: Ruta del modelo (por defecto model_path del recomendador)
+        """
+        path = model_path or self.model_path
+        if not path:
+            return False
+        return artifact_exists(artifact_dir_for(path)) or os.path.exists(path)
+    
     async def load(self, model_path: str = None) -> bool:
         """
         Carga un modelo TF-IDF pre-entrenado.
         
+        Prefiere el artefacto versionado (``<modelo>.artifacts/``), cuyas
+        matrices se abren con memory-mapping y se comparten entre workers.
+        Si solo existe el pickle legacy, o es posterior al artefacto (p.ej.
+        regenerado por un script), lo carga y lo migra al nuevo formato.
+        
         Args:
-            model_path: Ruta al archivo de modelo TF-IDF (.pkl)
+            model_path: Ruta al modelo TF-IDF (.pkl legacy; el artefacto se deriva de ella)
             
         Returns:
             True si la carga fue exitosa, False en caso contrario
@@ -134,10 +236,19 @@ class TFIDFRecommender:
             return False
         
         try:
-            logger.info(f"Cargando modelo TF-IDF desde {path}")
+            artifact_dir = artifact_dir_for(path)
+            migrate_legacy = False
             
-            with open(path, 'rb') as f:
-                data = pickle.load(f)
+            if artifact_exists(artifact_dir) and not artifact_is_stale(artifact_dir, path):
+                logger.info(f"Cargando artefacto TF-IDF desde {artifact_dir}")
+                start_time = time.time()
+                data = load_tfidf_artifact(artifact_dir, mmap_mode=self.mmap_mode)
+                logger.info(f"Artefacto TF-IDF abierto en {(time.time() - start_time) * 1000:.0f}ms")
+            else:
+                logger.info(f"Cargando modelo TF-IDF legacy (pickle) desde {path}")
+                with open(path, 'rb') as f:
+                    data = pickle.load(f)
+                migrate_legacy = True
                 
             self.vectorizer = data['vectorizer']
             self.product_vectors = data['product_vectors']
@@ -146,21 +257,519 @@ class TFIDFRecommender:
             if 'product_data' in data:
                 self.product_data = data['product_data']
                 self.product_ids = data.get('product_ids', [str(p.get('id', i)) for i, p in enumerate(self.product_data)])
+                self._build_id_index()
                 logger.info(f"Datos de productos cargados desde modelo: {len(self.product_data)} productos")
             else:
                 logger.warning("El modelo no contiene datos de productos. Necesitará reentrenar o cargar productos.")
                 # IMPORTANTE: No marcar como loaded si no hay product_data
                 return False
             
+            # Migrar pickle legacy al formato de artefacto para los próximos arranques
+            if migrate_legacy:
+                try:
+                    save_tfidf_artifact(artifact_dir, self.vectorizer, self.product_vectors, self.product_data, self.product_ids)
+                except Exception as e:
+                    logger.warning(f"No se pudo migrar el modelo legacy a {artifact_dir}: {e}")
+            
             self.loaded = True
+            self._reset_drift()
             await self._build_category_index()
+            self.search_index = await asyncio.to_thread(ProductSearchIndex.build, self.product_data)
+            self._schedule_neighbor_table(reuse_persisted=True)
+            self._notify_catalog_listeners()
             logger.info(f"Modelo TF-IDF cargado exitosamente con {len(self.product_data) if self.product_data else 0} productos")
             return True
             
+        except ArtifactFormatError as e:
+            logger.error(f"Artefacto TF-IDF no válido: {e}")
+            return False
         except Exception as e:
             logger.error(f"Error cargando modelo TF-IDF: {e}")
             return False
-    
+
+    def swap_model(self, other: "TFIDFRecommender") -> None:
+        """
+        Sustituye el modelo activo por el de otro recomendador ya cargado.
+
+        Es síncrono a propósito: al no ceder el control al event loop, ninguna
+        petición puede observar un estado mezclado (vectores nuevos con
+        product_ids antiguos). Hasta la llamada se sigue sirviendo el modelo
+        anterior.
+
+        Args:
+            other: Recomendador cargado con el modelo nuevo
+        """
+        if not other.loaded or other.product_vectors is None:
+            raise ValueError("El modelo a intercambiar no está cargado")
+
+        if self._neighbor_task and not self._neighbor_task.done():
+            self._neighbor_task.cancel()
+
+        self.vectorizer = other.vectorizer
+        self.product_vectors = other.product_vectors
+        self.product_data = other.product_data
+        self.product_ids = other.product_ids
+        self.id_to_index = other.id_to_index
+        self._indexed_product_ids = other._indexed_product_ids
+        self.category_index = getattr(other, 'category_index', {})
+        self.search_index = other.search_index
+        self.neighbor_indices = None
+        self.neighbor_scores = None
+        self._neighbor_product_ids = None
+        self._neighbor_task = None
+        self.loaded = True
+        self.fallback_active = False
+        self._reset_drift()
+
+        self._schedule_neighbor_table(reuse_persisted=True)
+        self._notify_catalog_listeners()
+
+    async def update_products(
+        self,
+        upserts: Optional[List[Dict[str, Any]]] = None,
+        removed_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Aplica cambios del catálogo sin reentrenar el modelo completo.
+
+        Solo se vectorizan los productos añadidos o modificados, con el
+        vectorizador existente; la matriz CSR, el índice id → fila y
+        category_index se parchean y la tabla top-K se recalcula en segundo
+        plano. Los términos nuevos no existen en el vocabulario actual, así
+        que se mide la deriva y, si supera ``refit_drift_threshold``, se
+        programa un reentrenamiento completo con TFIDFTrainer.
+
+        La tabla top-K se parchea recalculando solo las filas afectadas y el
+        artefacto se persiste con retardo (``persist_debounce_seconds``), de
+        modo que un delta pequeño no reescribe todo el modelo. Si hay un
+        refit en curso, el delta se registra y se reaplica sobre el modelo
+        reentrenado antes del intercambio.
+
+        Args:
+            upserts: Productos nuevos o modificados (deben tener ``id``)
+            removed_ids: IDs de productos eliminados; una eliminación prevalece
+                sobre un upsert del mismo ID en la misma llamada
+
+        Returns:
+            Resumen con added/updated/removed, deriva y si se programó refit
+        """
+        if not self.loaded or self.vectorizer is None or self.product_vectors is None:
+            logger.warning("Actualización incremental ignorada: recomendador TF-IDF no cargado")
+            return {"applied": False, "reason": "not_loaded"}
+
+        removed = {str(pid) for pid in (removed_ids or [])}
+        upsert_by_id: Dict[str, Dict[str, Any]] = {}
+        for product in upserts or []:
+            if product.get('id') is None:
+                logger.warning("Producto sin ID ignorado en actualización incremental")
+                continue
+            pid = str(product['id'])
+            if pid not in removed:
+                upsert_by_id[pid] = product
+
+        if not upsert_by_id and not removed:
+            return {"applied": False, "reason": "empty"}
+
+        async with self._update_lock:
+            start_time = time.time()
+            if self._indexed_product_ids is not self.product_ids:
+                self._build_id_index()
+            snapshot = (self.vectorizer, self.product_vectors, self.product_data, self.product_ids, self.id_to_index)
+            neighbor_table = None
+            if self._neighbor_table_ready():
+                neighbor_table = (self.neighbor_indices, self.neighbor_scores)
+
+            patched = await asyncio.to_thread(
+                self._apply_catalog_delta, *snapshot, upsert_by_id, removed, neighbor_table
+            )
+
+            # Un swap/fit concurrente reemplazó el catálogo: el delta ya no aplica
+            if self.product_ids is not snapshot[3]:
+                logger.warning("Catálogo reemplazado durante la actualización incremental; se descarta el delta")
+                return {"applied": False, "reason": "catalog_replaced"}
+
+            self._install_delta(patched, upsert_by_id)
+            if self._refit_journal is not None:
+                self._refit_journal.append((upsert_by_id, removed))
+
+            drift = self._vocabulary_drift()
+            self._schedule_persist()
+
+            refit_scheduled = drift > self.refit_drift_threshold and self._schedule_refit()
+
+            summary = {
+                "applied": True,
+                "added": patched["added"],
+                "updated": patched["updated"],
+                "removed": patched["removed"],
+                "total_products": len(self.product_ids),
+                "vocabulary_drift": round(drift, 4),
+                "refit_scheduled": refit_scheduled,
+                "duration_ms": round((time.time() - start_time) * 1000, 2)
+            }
+            logger.info(
+                f"🔄 Catálogo TF-IDF actualizado: +{summary['added']} ~{summary['updated']} "
+                f"-{summary['removed']} (deriva {drift:.3f}) en {summary['duration_ms']}ms"
+            )
+            return summary
+
+    def _install_delta(self, patched: Dict[str, Any], upsert_by_id: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Publica un catálogo parcheado por _apply_catalog_delta.
+
+        Síncrono: ninguna petición ve un estado intermedio.
+        """
+        old_products = [self.product_data[self.id_to_index[pid]] for pid in patched["touched_ids"]]
+        self.product_vectors = patched["product_vectors"]
+        self.product_data = patched["product_data"]
+        self.product_ids = patched["product_ids"]
+        self._build_id_index()
+        self.search_index = patched["search_index"]
+        self._patch_category_index(old_products, list(upsert_by_id.values()))
+
+        self._drift_terms += patched["terms"]
+        self._drift_oov_terms += patched["oov_terms"]
+
+        if patched["neighbor_table"] is not None:
+            self.neighbor_indices, self.neighbor_scores = patched["neighbor_table"]
+            self._neighbor_product_ids = self.product_ids
+        else:
+            self._schedule_neighbor_table(reuse_persisted=False)
+        self._notify_catalog_listeners()
+
+    async def install_trained_model(self, candidate: "TFIDFRecommender") -> None:
+        """
+        Activa un modelo reentrenado sin perder los deltas aplicados mientras tanto.
+
+        Los deltas registrados desde la instantánea del refit se reaplican
+        sobre ``candidate`` bajo ``_update_lock``, así que ninguna
+        actualización puede colarse entre la reaplicación y el intercambio.
+
+        Args:
+            candidate: Recomendador cargado con el modelo reentrenado
+        """
+        async with self._update_lock:
+            journal = self._refit_journal or []
+            self._refit_journal = None
+
+            for upsert_by_id, removed in journal:
+                if candidate._indexed_product_ids is not candidate.product_ids:
+                    candidate._build_id_index()
+                patched = await asyncio.to_thread(
+                    self._apply_catalog_delta,
+                    candidate.vectorizer,
+                    candidate.product_vectors,
+                    candidate.product_data,
+                    candidate.product_ids,
+                    candidate.id_to_index,
+                    upsert_by_id,
+                    removed
+                )
+                candidate._install_delta(patched, upsert_by_id)
+
+            self.swap_model(candidate)
+            if journal:
+                logger.info(f"🔁 {len(journal)} actualizaciones incrementales reaplicadas sobre el modelo reentrenado")
+                self._schedule_persist()
+
+    def _schedule_persist(self) -> None:
+        """Programa la escritura del artefacto; las llamadas seguidas se agrupan."""
+        if not self.model_path:
+            return
+
+        self._persist_pending = True
+        if self._persist_task and not self._persist_task.done():
+            return
+
+        try:
+            self._persist_task = asyncio.get_running_loop().create_task(self._persist_when_idle())
+        except RuntimeError:
+            logger.warning("Sin event loop activo: persistencia del artefacto no programada")
+
+    async def _persist_when_idle(self) -> None:
+        """Persiste el catálogo actual tras el retardo, repitiendo si llegan más cambios."""
+        while self._persist_pending:
+            await asyncio.sleep(self.persist_debounce_seconds)
+            self._persist_pending = False
+
+            # Referencias tomadas de forma síncrona: el catálogo se reemplaza, no se muta
+            vectorizer, product_vectors = self.vectorizer, self.product_vectors
+            product_data, product_ids = self.product_data, self.product_ids
+            try:
+                await asyncio.to_thread(
+                    save_tfidf_artifact,
+                    artifact_dir_for(self.model_path),
+                    vectorizer,
+                    product_vectors,
+                    product_data,
+                    product_ids
+                )
+                self._save_neighbor_table()
+                logger.info(f"Actualizaciones incrementales persistidas en {artifact_dir_for(self.model_path)}")
+            except Exception as e:
+                logger.warning(f"No se pudo persistir la actualización incremental: {e}")
+
+    @classmethod
+    def _apply_catalog_delta(
+        cls,
+        vectorizer,
+        product_vectors,
+        product_data: List[Dict[str, Any]],
+        product_ids: List[str],
+        id_to_index: Dict[str, int],
+        upsert_by_id: Dict[str, Dict[str, Any]],
+        removed: set,
+        neighbor_table: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    ) -> Dict[str, Any]:
+        """
+        Calcula el catálogo parcheado sin modificar el estado actual.
+
+        Las filas modificadas se sustituyen en su posición, las eliminadas se
+        descartan y las nuevas se añaden al final, conservando el orden del
+        resto. Si se pasa la tabla top-K actual, también se parchea (ver
+        _patch_neighbor_table). Se ejecuta en un hilo (``asyncio.to_thread``).
+        """
+        n_rows = product_vectors.shape[0]
+        upsert_ids = list(upsert_by_id)
+        texts = [build_product_text(upsert_by_id[pid]) for pid in upsert_ids]
+
+        # Filas nuevas apiladas tras las existentes: fila n_rows + j ↔ upsert_ids[j]
+        stacked = product_vectors
+        if texts:
+            stacked = sparse.vstack([product_vectors, vectorizer.transform(texts)], format='csr')
+        upsert_row = {pid: n_rows + j for j, pid in enumerate(upsert_ids)}
+
+        order: List[int] = []
+        new_data: List[Dict[str, Any]] = []
+        new_ids: List[str] = []
+        touched_ids: List[str] = []
+        for i, pid in enumerate(product_ids):
+            is_primary_row = id_to_index.get(pid) == i
+            if pid in removed:
+                if is_primary_row:
+                    touched_ids.append(pid)
+                continue
+            if pid in upsert_by_id and is_primary_row:
+                order.append(upsert_row[pid])
+                new_data.append(upsert_by_id[pid])
+                touched_ids.append(pid)
+            else:
+                order.append(i)
+                new_data.append(product_data[i])
+            new_ids.append(pid)
+
+        added = [pid for pid in upsert_ids if pid not in id_to_index]
+        for pid in added:
+            order.append(upsert_row[pid])
+            new_data.append(upsert_by_id[pid])
+            new_ids.append(pid)
+
+        # Términos fuera de vocabulario de los textos actualizados (deriva)
+        analyzer = vectorizer.build_analyzer()
+        vocabulary = vectorizer.vocabulary_
+        terms = oov_terms = 0
+        for text in texts:
+            for term in analyzer(text):
+                terms += 1
+                if term not in vocabulary:
+                    oov_terms += 1
+
+        new_vectors = sparse.csr_matrix(stacked[order])
+        patched_table = None
+        if neighbor_table is not None:
+            patched_table = cls._patch_neighbor_table(*neighbor_table, new_vectors, order, n_rows)
+
+        return {
+            "product_vectors": new_vectors,
+            "neighbor_table": patched_table,
+            "product_data": new_data,
+            "product_ids": new_ids,
+            "search_index": ProductSearchIndex.build(new_data),
+            "touched_ids": touched_ids,
+            "added": len(added),
+            "updated": len(upsert_ids) - len(added),
+            "removed": sum(1 for pid in removed if pid in id_to_index),
+            "terms": terms,
+            "oov_terms": oov_terms
+        }
+
+    @classmethod
+    def _patch_neighbor_table(
+        cls,
+        neighbor_indices: np.ndarray,
+        neighbor_scores: np.ndarray,
+        product_vectors,
+        source_rows: List[int],
+        n_old_rows: int
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Adapta la tabla top-K a un catálogo parcheado sin recalcularla entera.
+
+        Solo se recalculan contra todo el catálogo las filas de productos
+        nuevos o modificados y las que tenían entre sus vecinos un producto
+        modificado o eliminado; el resto reindexa sus vecinos y los compara
+        únicamente con los vectores nuevos.
+
+        Args:
+            neighbor_indices: Tabla de índices del catálogo anterior
+            neighbor_scores: Tabla de scores del catálogo anterior
+            product_vectors: Matriz del catálogo parcheado
+            source_rows: Fila de origen de cada fila nueva (>= n_old_rows = vector nuevo)
+            n_old_rows: Filas del catálogo anterior
+
+        Returns:
+            (indices, scores) del catálogo parcheado, o None si el delta afecta
+            a demasiadas filas y conviene reconstruir la tabla completa
+        """
+        k = neighbor_indices.shape[1]
+        n_products = len(source_rows)
+        source = np.asarray(source_rows, dtype=np.int64)
+
+        old_to_new = np.full(n_old_rows + 1, -1, dtype=np.int64)
+        kept = source < n_old_rows
+        old_to_new[source[kept]] = np.flatnonzero(kept)
+        fresh_rows = np.flatnonzero(~kept)
+
+        # Vecinos de las filas conservadas traducidos a las posiciones nuevas
+        # (el relleno -1 apunta a la última celda de old_to_new, que vale -1)
+        kept_rows = np.flatnonzero(kept)
+        old_neighbors = neighbor_indices[source[kept_rows]]
+        remapped = old_to_new[old_neighbors]
+        lost_neighbor = ((old_neighbors >= 0) & (remapped < 0)).any(axis=1)
+
+        dirty_rows = np.concatenate([fresh_rows, kept_rows[lost_neighbor]])
+        if dirty_rows.size > max(cls.NEIGHBOR_BATCH_SIZE, cls.NEIGHBOR_PATCH_MAX_FRACTION * n_products):
+            return None
+
+        indices = np.full((n_products, k), -1, dtype=np.int32)
+        scores = np.zeros((n_products, k), dtype=np.float32)
+
+        # Filas limpias: fusionar sus K vecinos con los productos nuevos
+        clean_rows = kept_rows[~lost_neighbor]
+        clean_indices = remapped[~lost_neighbor]
+        clean_scores = np.where(
+            clean_indices >= 0, neighbor_scores[source[clean_rows]], -np.inf
+        ).astype(np.float64)
+        if fresh_rows.size and clean_rows.size:
+            fresh_similarities = cosine_similarity(product_vectors[clean_rows], product_vectors[fresh_rows])
+            clean_indices = np.hstack([clean_indices, np.broadcast_to(fresh_rows, fresh_similarities.shape)])
+            clean_scores = np.hstack([clean_scores, fresh_similarities])
+        top = np.argsort(-clean_scores, axis=1, kind='stable')[:, :k]
+        top_scores = np.take_along_axis(clean_scores, top, axis=1)
+        valid = np.isfinite(top_scores)
+        indices[clean_rows, :top.shape[1]] = np.where(valid, np.take_along_axis(clean_indices, top, axis=1), -1)
+        scores[clean_rows, :top.shape[1]] = np.where(valid, top_scores, 0.0)
+
+        # Filas sucias: recalcular contra todo el catálogo
+        k_eff = max(0, min(k, n_products - 1))
+        for start in range(0, dirty_rows.size, cls.NEIGHBOR_BATCH_SIZE):
+            batch = dirty_rows[start:start + cls.NEIGHBOR_BATCH_SIZE]
+            similarities = cosine_similarity(product_vectors[batch], product_vectors)
+            for row, product_index in enumerate(batch):
+                neighbors = select_top_k(similarities[row], k_eff, exclude_index=int(product_index))
+                indices[product_index, :neighbors.size] = neighbors
+                scores[product_index, :neighbors.size] = similarities[row][neighbors]
+
+        return indices, scores
+
+    @staticmethod
+    def _category_views(product_data: ProductColumns) -> Dict[str, ProductColumns]:
+        rows_by_category: Dict[str, List[int]] = {}
+        for row, product_type in enumerate(product_data.column("product_type")):
+            category = (product_type or "").upper()
+            if category:
+                rows_by_category.setdefault(category, []).append(row)
+        return {category: product_data.take(rows) for category, rows in rows_by_category.items()}
+
+    def _patch_category_index(
+        self,
+        old_products: List[Dict[str, Any]],
+        new_products: List[Dict[str, Any]]
+    ) -> None:
+        """Actualiza category_index quitando las versiones antiguas y añadiendo las nuevas."""
+        category_index = getattr(self, 'category_index', None)
+        if category_index is None:
+            return
+
+        stale_by_category: Dict[str, set] = {}
+        for product in old_products:
+            category = product.get("product_type", "").upper()
+            if category:
+                stale_by_category.setdefault(category, set()).add(str(product.get('id')))
+
+        for category, stale_ids in stale_by_category.items():
+            remaining = [p for p in category_index.get(category, []) if str(p.get('id')) not in stale_ids]
+            if remaining:
+                category_index[category] = remaining
+            else:
+                category_index.pop(category, None)
+
+        for product in new_products:
+            category = product.get("product_type", "").upper()
+            if category:
+                products = category_index.setdefault(category, [])
+                if not isinstance(products, list):
+                    # Vista de filas del artefacto: se materializa al modificarla
+                    products = category_index[category] = list(products)
+                products.append(product)
+
+    def _reset_drift(self) -> None:
+        """Reinicia los contadores de deriva tras un entrenamiento o carga completa."""
+        self._drift_terms = 0
+        self._drift_oov_terms = 0
+        self._baseline_oov_rate: Optional[float] = None
+
+    def _vocabulary_drift(self) -> float:
+        """
+        Exceso de términos fuera de vocabulario en las actualizaciones incrementales.
+
+        Con min_df/max_features parte del texto ya queda fuera del vocabulario
+        al entrenar, así que se resta la tasa base medida sobre una muestra del
+        catálogo actual.
+        """
+        if self._drift_terms < self.REFIT_MIN_TERMS:
+            return 0.0
+
+        if self._baseline_oov_rate is None:
+            analyzer = self.vectorizer.build_analyzer()
+            vocabulary = self.vectorizer.vocabulary_
+            sample = self.product_data[:self.DRIFT_BASELINE_SAMPLE]
+            terms = oov_terms = 0
+            for product in sample:
+                for term in analyzer(build_product_text(product)):
+                    terms += 1
+                    if term not in vocabulary:
+                        oov_terms += 1
+            self._baseline_oov_rate = oov_terms / terms if terms else 0.0
+
+        update_oov_rate = self._drift_oov_terms / self._drift_terms
+        return max(0.0, update_oov_rate - self._baseline_oov_rate)
+
+    def _schedule_refit(self) -> bool:
+        """Programa un reentrenamiento completo en proceso separado (uno a la vez)."""
+        if self._refit_task and not self._refit_task.done():
+            return False
+
+        logger.info("📈 Deriva de vocabulario por encima del umbral: programando reentrenamiento completo")
+        # La instantánea y el registro de deltas empiezan a la vez: todo delta
+        # posterior se reaplica en install_trained_model antes del intercambio
+        self._refit_journal = []
+        self._refit_task = asyncio.get_running_loop().create_task(
+            self._run_refit(list(self.product_data))
+        )
+        return True
+
+    async def _run_refit(self, products: List[Dict[str, Any]]) -> bool:
+        """Ejecuta el reentrenamiento programado por _schedule_refit."""
+        # Import diferido: tfidf_trainer depende de este módulo
+        from .tfidf_trainer import TFIDFTrainer
+
+        try:
+            return await TFIDFTrainer(self).train(products)
+        finally:
+            # Si el refit falló, los deltas ya están aplicados al modelo activo
+            self._refit_journal = None
+
     async def get_recommendations(self, product_id: str, n: int = 5) -> List[Dict[str, Any]]:
         """
         Obtiene recomendaciones basadas en un producto utilizando TF-IDF.
@@ -178,21 +787,26 @@ class TFIDFRecommender:
             return []
         
         try:
-            # Encontrar índice del producto
-            if product_id not in self.product_ids:
+            # Encontrar índice del producto (O(1) vía id_to_index)
+            product_index = self.get_product_index(product_id)
+            if product_index is None:
                 logger.warning(f"Producto ID {product_id} no encontrado")
                 return []
             
-            product_index = self.product_ids.index(product_id)
+            # Ruta rápida: servir desde la tabla top-K precalculada (O(K))
+            precomputed = self._get_precomputed_neighbors(product_index, n)
+            if precomputed is not None:
+                return precomputed
             
+            # Fallback: scoring en vivo contra todo el catálogo
             # Obtener vector del producto
             product_vector = self.product_vectors[product_index]
             
             # Calcular similitud con todos los productos
             similarities = cosine_similarity(product_vector, self.product_vectors)[0]
             
-            # Obtener índices ordenados por similitud (excluyendo el propio producto)
-            similar_indices = similarities.argsort()[::-1][1:n+1]
+            # Top-N por selección parcial, excluyendo explícitamente el propio producto
+            similar_indices = select_top_k(similarities, n, exclude_index=product_index)
             
             # Construir lista de recomendaciones
             recommendations = []
@@ -211,13 +825,93 @@ class TFIDFRecommender:
             logger.error(f"Error generando recomendaciones: {e}")
             return []
     
-    async def search_products(self, query: str, n: int = 10) -> List[Dict[str, Any]]:
+    async def get_recommendations_batch(
+        self,
+        product_ids: List[str],
+        n: int = 5,
+        exclude_ids: Optional[List[str]] = None,
+        aggregation: str = "max"
+    ) -> List[Dict[str, Any]]:
+        """
+        Obtiene recomendaciones para varios productos semilla en una sola pasada.
+        
+        Todas las semillas se puntúan con una única multiplicación de la matriz
+        dispersa (semillas × catálogo) y los scores se agregan por producto.
+        
+        Args:
+            product_ids: IDs de los productos semilla ("productos como estos")
+            n: Número de recomendaciones a devolver
+            exclude_ids: IDs a excluir del resultado (p.ej. ya mostrados)
+            aggregation: "max" (similar a alguna semilla) o "mean" (similar al conjunto)
+            
+        Returns:
+            Lista única de productos recomendados, ordenada por score agregado
+        """
+        if aggregation not in ("max", "mean"):
+            raise ValueError(f"aggregation debe ser 'max' o 'mean', recibido: {aggregation}")
+        
+        if not self.loaded or self.product_vectors is None:
+            logger.error("El recomendador TF-IDF no está cargado o entrenado")
+            return []
+        
+        try:
+            seed_rows = []
+            for product_id in dict.fromkeys(str(pid) for pid in product_ids):
+                index = self.get_product_index(product_id)
+                if index is None:
+                    logger.warning(f"Producto semilla {product_id} no encontrado")
+                    continue
+                seed_rows.append(index)
+            
+            if not seed_rows:
+                return []
+            
+            # Una sola multiplicación: [semillas × N]
+            similarities = cosine_similarity(self.product_vectors[seed_rows], self.product_vectors)
+            scores = similarities.max(axis=0) if aggregation == "max" else similarities.mean(axis=0)
+            
+            # Excluir semillas y productos indicados por el llamador
+            exclude_mask = np.zeros(len(self.product_ids), dtype=bool)
+            exclude_mask[seed_rows] = True
+            for exclude_id in exclude_ids or []:
+                index = self.get_product_index(exclude_id)
+                if index is not None:
+                    exclude_mask[index] = True
+            
+            similar_indices = select_top_k(scores, n, exclude_mask=exclude_mask)
+            
+            recommendations = []
+            for index in similar_indices:
+                product = self.product_data[index]
+                recommendations.append({
+                    "id": self.product_ids[index],
+                    "title": product.get("title", ""),
+                    "similarity_score": float(scores[index]),
+                    "product_data": product
+                })
+            
+            return recommendations
+            
+        except Exception as e:
+            logger.error(f"Error generando recomendaciones batch: {e}")
+            return []
+    
+    async def search_products(
+        self,
+        query: str,
+        n: int = 10,
+        candidate_indices: Optional[np.ndarray] = None,
+        min_score: Optional[float] = 0.1
+    ) -> List[Dict[str, Any]]:
         """
         Busca productos por texto utilizando similitud TF-IDF.
         
         Args:
             query: Texto de búsqueda
             n: Número máximo de resultados
+            candidate_indices: Filas candidatas (p.ej. coincidencias del índice
+                invertido); si se indican solo se puntúan y ordenan esas filas
+            min_score: Score mínimo para incluir un resultado (None = sin filtro)
             
         Returns:
             Lista de productos que coinciden con la búsqueda
@@ -231,24 +925,31 @@ class TFIDFRecommender:
             # Convertir consulta a vector TF-IDF
             query_vector = self.vectorizer.transform([query])
             
-            # Calcular similitud con todos los productos
-            similarities = cosine_similarity(query_vector, self.product_vectors)[0]
+            # Calcular similitud con todos los productos (o solo con los candidatos)
+            if candidate_indices is not None:
+                candidate_indices = np.asarray(candidate_indices, dtype=np.int64)
+                if candidate_indices.size == 0:
+                    return []
+                similarities = cosine_similarity(query_vector, self.product_vectors[candidate_indices])[0]
+            else:
+                similarities = cosine_similarity(query_vector, self.product_vectors)[0]
             
-            # Obtener índices ordenados por similitud
-            similar_indices = similarities.argsort()[::-1][:n]
+            # Top-N por selección parcial
+            similar_indices = select_top_k(similarities, n)
             
             # Filtrar resultados con score muy bajo
-            threshold = 0.1
-            filtered_indices = [i for i in similar_indices if similarities[i] > threshold]
+            if min_score is not None:
+                similar_indices = [i for i in similar_indices if similarities[i] > min_score]
             
             # Construir lista de resultados
             results = []
-            for index in filtered_indices:
+            for position in similar_indices:
+                index = candidate_indices[position] if candidate_indices is not None else position
                 product = self.product_data[index]
                 results.append({
                     "id": self.product_ids[index],
                     "title": product.get("title", ""),
-                    "similarity_score": float(similarities[index]),
+                    "similarity_score": float(similarities[position]),
                     "product_data": product
                 })
             
@@ -273,10 +974,10 @@ class TFIDFRecommender:
             return None
             
         try:
-            # Buscar producto por ID
-            for product in self.product_data:
-                if str(product.get('id', '')) == str(product_id):
-                    return product
+            # Buscar producto por ID usando el índice id → fila
+            index = self.get_product_index(product_id)
+            if index is not None:
+                return self.product_data[index]
             
             logger.warning(f"Producto con ID {product_id} no encontrado en el catálogo local")
             return None
@@ -284,6 +985,257 @@ class TFIDFRecommender:
             logger.error(f"Error al buscar producto por ID: {e}")
             return None
 
+    def get_product_index(self, product_id: str) -> Optional[int]:
+        """
+        Obtiene la fila de la matriz TF-IDF correspondiente a un producto.
+        
+        Args:
+            product_id: ID del producto
+            
+        Returns:
+            Índice de fila, o None si el producto no está en el catálogo
+        """
+        if not self.product_ids:
+            return None
+        
+        # Reconstruir si product_ids fue reemplazado (refresh de catálogo)
+        if self._indexed_product_ids is not self.product_ids:
+            self._build_id_index()
+        
+        return self.id_to_index.get(str(product_id))
+    
+    def _build_id_index(self) -> Dict[str, int]:
+        """
+        Construye el índice id → fila a partir de product_ids.
+        
+        Performance: O(n) una sola vez, O(1) por búsqueda después. No se
+        persiste: reconstruirlo cuesta lo mismo que validar uno guardado.
+                
+        Returns:
+            El índice construido
+        """
+        index: Dict[str, int] = {}
+        for i, pid in enumerate(self.product_ids or []):
+            # Conservar la primera aparición, igual que list.index()
+            index.setdefault(pid, i)
+        self.id_to_index = index
+        
+        self._indexed_product_ids = self.product_ids
+        logger.debug(f"Índice id → fila construido: {len(self.id_to_index)} productos")
+        return self.id_to_index
+
+    def _neighbor_table_ready(self) -> bool:
+        """Indica si la tabla top-K corresponde al catálogo actual."""
+        return (
+            self.neighbor_indices is not None
+            and self._neighbor_product_ids is self.product_ids
+        )
+    
+    def _get_precomputed_neighbors(self, product_index: int, n: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Construye recomendaciones desde la tabla top-K precalculada.
+        
+        Args:
+            product_index: Fila del producto consultado
+            n: Número de recomendaciones
+            
+        Returns:
+            Lista de recomendaciones, o None si la tabla no puede atender la
+            petición (no construida, desactualizada o n > K)
+        """
+        if not self._neighbor_table_ready() or n > self.neighbor_indices.shape[1]:
+            return None
+        
+        recommendations = []
+        row_indices = self.neighbor_indices[product_index]
+        row_scores = self.neighbor_scores[product_index]
+        for index, score in zip(row_indices[:n], row_scores[:n]):
+            if index < 0:
+                break
+            product = self.product_data[index]
+            recommendations.append({
+                "id": self.product_ids[index],
+                "title": product.get("title", ""),
+                "similarity_score": float(score),
+                "product_data": product
+            })
+        
+        return recommendations
+    
+    def add_catalog_listener(self, callback: Callable[[], None]) -> None:
+        """
+        Registra un callback para cada recarga del catálogo (fit/load/swap/delta).
+
+        Se invoca de forma síncrona justo después de publicar el catálogo
+        nuevo, así que debe ser barato: el trabajo pesado se programa aparte.
+        """
+        self._catalog_listeners.append(callback)
+
+    def _notify_catalog_listeners(self) -> None:
+        for callback in self._catalog_listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Listener de recarga del catálogo falló: {e}")
+
+    def _neighbor_table_path(self) -> Optional[str]:
+        """Ruta de la tabla top-K, junto al modelo (p.ej. data/tfidf_model.neighbors.npz)."""
+        if not self.model_path:
+            return None
+        return f"{os.path.splitext(self.model_path)[0]}.neighbors.npz"
+    
+    def _schedule_neighbor_table(self, reuse_persisted: bool) -> None:
+        """
+        Carga la tabla top-K persistida o programa su construcción en segundo plano.
+        
+        Mientras la tabla no está lista, get_recommendations usa scoring en vivo.
+        """
+        if not self.precompute_neighbors:
+            return
+        
+        if reuse_persisted and self._load_neighbor_table():
+            return
+        
+        if self._neighbor_task and not self._neighbor_task.done():
+            self._neighbor_task.cancel()
+        
+        try:
+            self._neighbor_task = asyncio.get_running_loop().create_task(self.build_neighbor_table())
+        except RuntimeError:
+            logger.warning("Sin event loop activo: tabla top-K no programada")
+    
+    async def build_neighbor_table(self, k: Optional[int] = None) -> bool:
+        """
+        Precalcula los K vecinos más similares de cada producto.
+        
+        El cálculo se ejecuta en un thread para no bloquear el event loop y el
+        resultado se publica de forma atómica al terminar.
+        
+        Args:
+            k: Número de vecinos (por defecto neighbor_k)
+            
+        Returns:
+            True si la tabla se construyó correctamente
+        """
+        if not self.loaded or self.product_vectors is None:
+            logger.warning("No se puede construir la tabla top-K: modelo no cargado")
+            return False
+        
+        k = k or self.neighbor_k
+        product_ids = self.product_ids
+        product_vectors = self.product_vectors
+        
+        try:
+            start_time = time.time()
+            indices, scores = await asyncio.to_thread(
+                self._compute_neighbor_table, product_vectors, k
+            )
+            
+            # Descartar si el catálogo cambió durante el cálculo
+            if product_ids is not self.product_ids:
+                logger.info("Catálogo actualizado durante el cálculo; tabla top-K descartada")
+                return False
+            
+            self.neighbor_indices = indices
+            self.neighbor_scores = scores
+            self._neighbor_product_ids = product_ids
+            logger.info(
+                f"✅ Tabla top-K construida: {indices.shape[0]} productos × {indices.shape[1]} vecinos "
+                f"en {(time.time() - start_time) * 1000:.0f}ms"
+            )
+            
+            self._save_neighbor_table()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error construyendo tabla top-K: {e}")
+            return False
+    
+    @classmethod
+    def _compute_neighbor_table(cls, product_vectors, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calcula la tabla top-K por lotes de filas.
+        
+        Returns:
+            (indices int32 [N, K], scores float32 [N, K]); las posiciones sin
+            vecino (catálogos con N - 1 < K) se rellenan con -1 / 0.0
+        """
+        n_products = product_vectors.shape[0]
+        k_eff = max(0, min(k, n_products - 1))
+        
+        indices = np.full((n_products, k), -1, dtype=np.int32)
+        scores = np.zeros((n_products, k), dtype=np.float32)
+        if k_eff == 0:
+            return indices, scores
+        
+        for start in range(0, n_products, cls.NEIGHBOR_BATCH_SIZE):
+            end = min(start + cls.NEIGHBOR_BATCH_SIZE, n_products)
+            similarities = cosine_similarity(product_vectors[start:end], product_vectors)
+            
+            for row in range(end - start):
+                neighbors = select_top_k(similarities[row], k_eff, exclude_index=start + row)
+                indices[start + row, :neighbors.size] = neighbors
+                scores[start + row, :neighbors.size] = similarities[row][neighbors]
+        
+        return indices, scores
+    
+    def _save_neighbor_table(self) -> bool:
+        """Persiste la tabla top-K junto al modelo TF-IDF."""
+        path = self._neighbor_table_path()
+        if not path or not self._neighbor_table_ready():
+            return False
+        
+        try:
+            model_dir = os.path.dirname(path)
+            if model_dir and not os.path.exists(model_dir):
+                os.makedirs(model_dir, exist_ok=True)
+            
+            with open(path, 'wb') as f:
+                np.savez(
+                    f,
+                    indices=self.neighbor_indices,
+                    scores=self.neighbor_scores,
+                    fingerprint=np.array(catalog_fingerprint(self.product_ids))
+                )
+            logger.info(f"Tabla top-K guardada en {path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error guardando tabla top-K: {e}")
+            return False
+    
+    def _load_neighbor_table(self) -> bool:
+        """
+        Carga la tabla top-K persistida si corresponde al catálogo actual.
+        
+        Returns:
+            True si la tabla se cargó y es válida
+        """
+        path = self._neighbor_table_path()
+        if not path or not os.path.exists(path) or not self.product_ids:
+            return False
+        
+        try:
+            with np.load(path) as data:
+                fingerprint = str(data['fingerprint'])
+                if fingerprint != catalog_fingerprint(self.product_ids):
+                    logger.info("Tabla top-K persistida no coincide con el catálogo; se reconstruirá")
+                    return False
+                indices = data['indices']
+                scores = data['scores']
+            
+            if indices.shape[1] < self.neighbor_k:
+                logger.info("Tabla top-K persistida con K insuficiente; se reconstruirá")
+                return False
+            
+            self.neighbor_indices = indices
+            self.neighbor_scores = scores
+            self._neighbor_product_ids = self.product_ids
+            logger.info(f"Tabla top-K cargada desde {path}: {indices.shape[0]} × {indices.shape[1]}")
+            return True
+        except Exception as e:
+            logger.error(f"Error cargando tabla top-K: {e}")
+            return False
+
     async def health_check(self) -> Dict[str, Any]:
         """
         Verifica el estado del recomendador.
@@ -313,7 +1265,10 @@ class TFIDFRecommender:
             "fallback_active": self.fallback_active,
             "has_product_data": self.product_data is not None,
             "has_vectorizer": self.vectorizer is not None,
-            "has_vectors": self.product_vectors is not None
+            "has_vectors": self.product_vectors is not None,
+            "indexed_products": len(self.id_to_index),
+            "neighbor_table_ready": self._neighbor_table_ready(),
+            "neighbor_k": self.neighbor_k
         }
         return status
     
@@ -325,6 +1280,13 @@ class TFIDFRecommender:
         Performance: O(n) one-time cost, O(1) lookups después
         Async: Allows event loop to process other requests during indexing
         """
+        if isinstance(self.product_data, ProductColumns):
+            # Catálogo mapeado: solo se decodifica la columna product_type y
+            # cada categoría es una vista de filas, no una copia de los dicts
+            self.category_index = await asyncio.to_thread(self._category_views, self.product_data)
+            logger.info(f"✅ Category index built: {len(self.category_index)} categories")
+            return self.category_index
+        
         self.category_index = {}
         
         # Process products in batches to avoid blocking
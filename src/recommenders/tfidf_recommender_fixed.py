@@ -21,6 +21,8 @@ from sklearn.metrics.pairwise import cosine_similarity
 import json
 from datetime import datetime
 
+from .topk import select_top_k
+
 logger = logging.getLogger(__name__)
 
 class TFIDFRecommender:
@@ -409,8 +411,8 @@ class TFIDFRecommender:
             # Calcular similitud con todos los productos
             similarities = cosine_similarity(product_vector, self.product_vectors)[0]
             
-            # Obtener índices ordenados por similitud (excluyendo el propio producto)
-            similar_indices = similarities.argsort()[::-1][1:n+1]
+            # Top-N por selección parcial, excluyendo explícitamente el propio producto
+            similar_indices = select_top_k(similarities, n, exclude_index=product_index)
             
             # Construir lista de recomendaciones
             recommendations = []
@@ -453,8 +455,8 @@ class TFIDFRecommender:
             # Calcular similitud con todos los productos
             similarities = cosine_similarity(query_vector, self.product_vectors)[0]
             
-            # Obtener índices ordenados por similitud
-            similar_indices = similarities.argsort()[::-1][:n]
+            # Top-N por selección parcial
+            similar_indices = select_top_k(similarities, n)
             
             # Filtrar resultados con score muy bajo
             threshold = 0.1
@@ -0,0 +1,153 @@
+"""
+Entrenamiento del recomendador TF-IDF fuera del event loop.
+
+``TFIDFRecommender.fit()`` vectoriza de forma síncrona, por lo que con
+catálogos grandes bloquea la API entera durante el entrenamiento. Este
+módulo ejecuta la vectorización y la escritura del artefacto en un
+``ProcessPoolExecutor``, informa del progreso al ``StartupManager`` y, al
+terminar, intercambia el modelo nuevo en el recomendador activo de forma
+atómica: mientras tanto se sigue sirviendo el modelo anterior.
+"""
+
+import os
+import time
+import shutil
+import asyncio
+import logging
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from .tfidf_recommender import TFIDFRecommender, build_product_text, create_vectorizer
+from .model_artifacts import artifact_dir_for, save_tfidf_artifact
+
+logger = logging.getLogger(__name__)
+
+
+def _train_tfidf_artifact(products: List[Dict[str, Any]], artifact_dir: str) -> Dict[str, Any]:
+    """
+    Vectoriza el catálogo y escribe el artefacto (se ejecuta en el proceso hijo).
+
+    Solo devuelve un resumen: el modelo viaja al proceso principal a través
+    del artefacto en disco, no serializado por el pipe del executor.
+    """
+    start_time = time.time()
+    product_ids = [str(p.get('id', i)) for i, p in enumerate(products)]
+    texts = [build_product_text(product) for product in products]
+
+    vectorizer = create_vectorizer()
+    product_vectors = vectorizer.fit_transform(texts)
+    save_tfidf_artifact(artifact_dir, vectorizer, product_vectors, products, product_ids)
+
+    return {
+        "products": len(product_ids),
+        "features": len(vectorizer.vocabulary_),
+        "duration": time.time() - start_time
+    }
+
+
+class TFIDFTrainer:
+    """
+    Entrena un TFIDFRecommender en un proceso separado y lo activa sin cortes.
+
+    Etapas reportadas al StartupManager: ``queued`` → ``vectorizing`` →
+    ``loading_artifact`` → ``swapping`` → ``done`` (o ``failed``).
+    """
+
+    def __init__(
+        self,
+        recommender: TFIDFRecommender,
+        startup_manager=None,
+        component_name: str = "recommender",
+        mp_start_method: str = "spawn"
+    ):
+        """
+        Inicializa el entrenador.
+
+        Args:
+            recommender: Recomendador activo que recibirá el modelo nuevo
+            startup_manager: StartupManager al que reportar progreso (opcional)
+            component_name: Nombre del componente en el StartupManager
+            mp_start_method: Método de arranque del proceso hijo ("spawn" evita
+                heredar el event loop y los sockets del proceso principal)
+        """
+        self.recommender = recommender
+        self.startup_manager = startup_manager
+        self.component_name = component_name
+        self.mp_start_method = mp_start_method
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    def _report(self, stage: str, progress: Optional[float] = None, message: Optional[str] = None):
+        """Reporta una etapa al StartupManager, si hay uno configurado."""
+        logger.info(f"🧠 Entrenamiento TF-IDF [{stage}] {message or ''}".rstrip())
+        if self.startup_manager:
+            self.startup_manager.report_progress(self.component_name, stage, progress, message)
+
+    async def train(self, products: List[Dict[str, Any]]) -> bool:
+        """
+        Entrena un modelo nuevo con ``products`` y lo intercambia en el recomendador.
+
+        Los entrenamientos concurrentes sobre el mismo recomendador se
+        serializan con su ``training_lock`` aunque usen entrenadores
+        distintos; el último en terminar gana.
+
+        Args:
+            products: Lista de productos (diccionarios)
+
+        Returns:
+            True si el modelo nuevo quedó activo, False en caso contrario
+        """
+        if not products:
+            logger.error("No hay productos para entrenar el recomendador TF-IDF")
+            return False
+
+        async with self.recommender.training_lock:
+            self._report("queued", 0.0, f"{len(products)} productos")
+
+            # Sin model_path el artefacto es temporal y se carga en memoria
+            model_path = self.recommender.model_path
+            temp_dir = None
+            mmap_mode = self.recommender.mmap_mode
+            if not model_path:
+                temp_dir = tempfile.mkdtemp(prefix="tfidf_trainer_")
+                model_path = os.path.join(temp_dir, "tfidf_model.pkl")
+                mmap_mode = None
+
+            try:
+                self._report("vectorizing", 0.1, f"Vectorizando {len(products)} productos")
+                loop = asyncio.get_running_loop()
+                with ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context(self.mp_start_method)
+                ) as executor:
+                    result = await loop.run_in_executor(
+                        executor, _train_tfidf_artifact, products, artifact_dir_for(model_path)
+                    )
+
+                self._report("loading_artifact", 0.8, f"{result['features']} términos en {result['duration']:.1f}s")
+                candidate = TFIDFRecommender(
+                    model_path=model_path,
+                    neighbor_k=self.recommender.neighbor_k,
+                    precompute_neighbors=False,
+                    mmap_mode=mmap_mode
+                )
+                if not await candidate.load():
+                    self._report("failed", message="No se pudo cargar el artefacto entrenado")
+                    return False
+
+                self._report("swapping", 0.95)
+                await self.recommender.install_trained_model(candidate)
+
+                self.last_result = result
+                self._report("done", 1.0, f"Modelo activo con {result['products']} productos")
+                return True
+
+            except Exception as e:
+                logger.error(f"Error entrenando recomendador TF-IDF en proceso separado: {e}")
+                self._report("failed", message=str(e))
+                return False
+
+            finally:
+                if temp_dir:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
@@ -0,0 +1,65 @@
+"""
+Selección top-K compartida por los recomendadores.
+
+Sustituye el patrón ``similarities.argsort()[::-1][1:n+1]`` (orden completo
+O(N log N) que además asume que el producto consultado ocupa la posición 0)
+por una selección parcial O(N + K log K) con exclusión explícita.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+
+def select_top_k(
+    scores: np.ndarray,
+    k: int,
+    exclude_index: Optional[int] = None,
+    exclude_mask: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Devuelve los índices de los K scores más altos, ordenados de mayor a menor.
+
+    - Selección parcial con ``np.partition`` (no ordena todo el vector).
+    - Desempate estable: a igual score gana el índice menor, de modo que el
+      resultado es determinista aunque haya empates en el corte K.
+    - Los NaN y los elementos excluidos nunca se devuelven; si quedan menos
+      de K candidatos válidos se devuelven solo esos.
+
+    Args:
+        scores: Vector 1-D de similitudes
+        k: Número de índices a devolver
+        exclude_index: Índice a excluir (normalmente el propio producto)
+        exclude_mask: Máscara booleana del tamaño de ``scores``; True excluye
+            el elemento (p.ej. productos ya vistos)
+
+    Returns:
+        Array int64 con hasta K índices
+    """
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Trabajar sobre una copia para no alterar los scores del llamador
+    candidate_scores = np.where(np.isnan(scores), -np.inf, scores)
+    if exclude_mask is not None:
+        candidate_scores[np.asarray(exclude_mask, dtype=bool)] = -np.inf
+    if exclude_index is not None and 0 <= exclude_index < candidate_scores.size:
+        candidate_scores[exclude_index] = -np.inf
+
+    k = min(k, candidate_scores.size)
+
+    # Valor del K-ésimo mayor score en O(N)
+    kth_score = -np.partition(-candidate_scores, k - 1)[k - 1]
+
+    if kth_score == -np.inf:
+        # Menos de K candidatos válidos: devolver todos los válidos
+        selected = np.flatnonzero(candidate_scores > -np.inf)
+    else:
+        above = np.flatnonzero(candidate_scores > kth_score)
+        ties = np.flatnonzero(candidate_scores == kth_score)[: k - above.size]
+        selected = np.concatenate((above, ties))
+
+    # Ordenar solo los K seleccionados: score descendente, índice ascendente
+    order = np.lexsort((selected, -candidate_scores[selected]))
+    return selected[order]
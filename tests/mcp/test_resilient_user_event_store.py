@@ -1,11 +1,119 @@
 # tests/test_resilient_user_event_store.py
 import pytest
 import asyncio
+import json
 import time
+from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock, AsyncMock
+from redis.exceptions import WatchError
 from src.api.mcp.user_events.resilient_user_event_store import UserEventStore, StorageError
+from src.api.mcp.user_events.event_schemas import EventType
 from src.api.mcp.client.circuit_breaker import CircuitState
 
+
+class FakePipeline:
+    """Pipeline en memoria: encola comandos, o los ejecuta al momento tras WATCH."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+        self.watched = False
+        self.watching = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def watch(self, *keys):
+        self.watched = self.watching = True
+
+    def multi(self):
+        self.watching = False
+
+    def __getattr__(self, name):
+        method = getattr(self.redis, f"_{name}")
+
+        if self.watching:
+            async def immediate(*args, **kwargs):
+                return method(*args, **kwargs)
+            return immediate
+
+        def queue(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        if self.watched and self.redis.conflict_on_execute:
+            self.redis.conflict_on_execute = False
+            raise WatchError("Watched variable changed")
+        self.redis.executed += 1
+        return [method(*args, **kwargs) for method, args, kwargs in self.commands]
+
+
+class FakeProfileRedis:
+    """Redis mínimo en memoria para eventos y agregados del perfil."""
+
+    def __init__(self):
+        self.data = {}
+        self.executed = 0
+        self.conflict_on_execute = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def _set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def _mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def _delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def _expire(self, key, seconds):
+        return key in self.data
+
+    def _hincrby(self, key, field, amount):
+        hash_ = self.data.setdefault(key, {})
+        hash_[field] = str(int(hash_.get(field, 0)) + amount)
+
+    def _hset(self, key, field, value):
+        self.data.setdefault(key, {})[field] = str(value)
+
+    def _hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def _zadd(self, key, mapping, lt=False, gt=False):
+        zset = self.data.setdefault(key, {})
+        for member, score in mapping.items():
+            current = zset.get(member)
+            if current is None or (lt and score < current) or (gt and score > current):
+                zset[member] = score
+
+    def _zrange(self, key, start, end, withscores=False):
+        return sorted(self.data.get(key, {}).items(), key=lambda item: item[1])
+
+    def _sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(members)
+
+    def _scard(self, key):
+        return len(self.data.get(key, set()))
+
+    def _lpush(self, key, *values):
+        self.data.setdefault(key, [])[:0] = list(reversed(values))
+
+    def _ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start:end + 1]
+
+    def _lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+
 @pytest.fixture
 async def event_store():
     """Fixture para proporcionar un UserEventStore con mocks"""
@@ -88,10 +196,8 @@ async def test_get_user_profile_cache_hit(event_store):
 @pytest.mark.asyncio
 async def test_get_user_profile_generate_new(event_store):
     """Test para generar nuevo perfil cuando no existe en caché ni Redis"""
-    # Configurar mocks
-    event_store.redis.exists = AsyncMock(return_value=0)
-    event_store.redis.lrange = AsyncMock(return_value=[])
-    event_store.redis.set = AsyncMock()
+    # Configurar Redis sin eventos ni agregados
+    event_store.redis = FakeProfileRedis()
     
     # Ejecutar
     profile = await event_store.get_user_profile("new_user")
@@ -134,4 +240,134 @@ async def test_bulk_operations(event_store):
     
     # Verificar que se haya llamado a _persist_events_batch
     event_store._persist_events_batch.assert_called_once()
-    assert event_store.metrics["events_buffered"] == event_store.local_buffer_size
\ No newline at end of file
+    assert event_store.metrics["events_buffered"] == event_store.local_buffer_size
+
+
+def _event(user_id, event_type, data, minutes_ago=0, **kwargs):
+    return {
+        "event_id": f"{user_id}_{event_type.value}_{minutes_ago}_{len(json.dumps(data))}",
+        "user_id": user_id,
+        "event_type": event_type.value,
+        "timestamp": datetime.utcnow() - timedelta(minutes=minutes_ago),
+        "data": data,
+        **kwargs
+    }
+
+@pytest.mark.asyncio
+async def test_profile_aggregates_updated_on_persist(event_store):
+    """El perfil se construye desde agregados mantenidos al persistir eventos"""
+    redis = FakeProfileRedis()
+    event_store.redis = redis
+    await event_store._persist_events_batch([
+        _event("u1", EventType.PRODUCT_VIEW, {"product_category": "Ropa"}, 30, session_id="s1", market_id="ES"),
+        _event("u1", EventType.PRODUCT_VIEW, {"product_category": "Ropa"}, 20, session_id="s1", market_id="ES"),
+        _event("u1", EventType.PRODUCT_VIEW, {"product_category": "Joyas"}, 10, session_id="s2", market_id="US"),
+        _event("u1", EventType.PRODUCT_SEARCH, {"query": "aros"}, 5, session_id="s2"),
+        _event("u1", EventType.PRODUCT_SEARCH, {"query": "collar"}, 1, session_id="s2"),
+    ])
+    
+    profile = await event_store.get_user_profile("u1")
+    
+    assert profile["total_events"] == 5
+    assert profile["category_affinity"] == {"Ropa": 0.667, "Joyas": 0.333}
+    assert profile["market_preferences"] == {"ES": 2, "US": 1}
+    assert profile["session_count"] == 2
+    assert profile["search_patterns"] == ["collar", "aros"]
+    assert profile["source"] == "aggregated"
+    # Primera lectura: backfill único sobre la lista de eventos
+    assert event_store.metrics["profiles_generated"] == 1
+    
+    event_store.clear_cache()
+    await event_store._persist_events_batch([
+        _event("u1", EventType.PRODUCT_VIEW, {"product_category": "Joyas"}, 0, session_id="s3")
+    ])
+    profile = await event_store.get_user_profile("u1")
+    
+    assert profile["total_events"] == 6
+    assert profile["category_affinity"] == {"Ropa": 0.5, "Joyas": 0.5}
+    assert profile["session_count"] == 3
+    # Lecturas posteriores: sin backfill
+    assert event_store.metrics["profiles_generated"] == 1
+
+@pytest.mark.asyncio
+async def test_profile_recent_lists_capped(event_store):
+    """Intenciones y búsquedas recientes en listas acotadas, más reciente primero"""
+    event_store.redis = FakeProfileRedis()
+    events = [
+        _event("u2", EventType.PRODUCT_SEARCH, {"query": f"q{i}"}, 100 - i) for i in range(25)
+    ] + [
+        _event("u2", EventType.CONVERSATION_INTENT, {"type": "search", "query": f"i{i}"}, 50 - i) for i in range(12)
+    ]
+    await event_store._persist_events_batch(events)
+    
+    profile = await event_store.get_user_profile("u2")
+    
+    assert len(profile["search_patterns"]) == 20
+    assert profile["search_patterns"][0] == "q24"
+    assert [intent["query"] for intent in profile["intent_history"]][:2] == ["i11", "i10"]
+    assert len(profile["intent_history"]) == 10
+
+@pytest.mark.asyncio
+async def test_profile_backfill_from_legacy_events(event_store):
+    """Usuarios con eventos anteriores a los agregados se reconstruyen una vez"""
+    redis = FakeProfileRedis()
+    event_store.redis = redis
+    for i, category in enumerate(["Ropa", "Ropa", "Joyas"]):
+        event = _event("u3", EventType.PRODUCT_VIEW, {"product_category": category}, 10 - i)
+        event["timestamp"] = event["timestamp"].isoformat()
+        redis.data[f"event:{event['event_id']}"] = json.dumps(event)
+        redis._lpush("user:events:u3", event["event_id"])
+    
+    profile = await event_store.get_user_profile("u3")
+    
+    assert profile["total_events"] == 3
+    assert profile["category_affinity"] == {"Ropa": 0.667, "Joyas": 0.333}
+    assert redis.data["user:profile:u3:meta"]["backfilled"] == "1"
+
+@pytest.mark.asyncio
+async def test_profile_backfill_conflict_falls_back_to_full_scan(event_store):
+    """Si llegan eventos durante el backfill no se marcan agregados incompletos"""
+    redis = FakeProfileRedis()
+    event_store.redis = redis
+    event_store._generate_user_profile = AsyncMock(return_value={"user_id": "u4", "source": "generated"})
+    redis.conflict_on_execute = True
+    
+    profile = await event_store.get_user_profile("u4")
+    
+    assert profile["source"] == "generated"
+    assert "user:profile:u4:meta" not in redis.data
+
+@pytest.mark.asyncio
+async def test_redelivered_stream_events_not_double_counted(event_store):
+    """Un batch reentregado por el stream (at-least-once) no vuelve a sumar en el perfil"""
+    redis = FakeProfileRedis()
+    event_store.redis = redis
+    view = _event("u5", EventType.PRODUCT_VIEW, {"product_category": "Ropa"}, 10, session_id="s1")
+    search = _event("u5", EventType.PRODUCT_SEARCH, {"query": "aros"}, 5, session_id="s1")
+    
+    await event_store.persist_stream_events([view, search])
+    # Reentrega del mismo batch, con un evento nuevo y otro duplicado dentro del batch
+    purchase = _event("u5", EventType.PRODUCT_VIEW, {"product_category": "Joyas"}, 1, session_id="s1")
+    await event_store.persist_stream_events([view, search, purchase, purchase])
+    
+    profile = await event_store.get_user_profile("u5")
+    
+    assert profile["total_events"] == 3
+    assert profile["category_affinity"] == {"Ropa": 0.5, "Joyas": 0.5}
+    assert profile["search_patterns"] == ["aros"]
+    assert redis.data["user:events:u5"].count(view["event_id"]) == 1
+    assert event_store.metrics["events_stored"] == 3
+
+@pytest.mark.asyncio
+async def test_concurrent_persist_conflict_is_retried(event_store):
+    """Si otro worker escribe uno de los eventos durante el batch, se reintenta filtrando"""
+    redis = FakeProfileRedis()
+    event_store.redis = redis
+    redis.conflict_on_execute = True
+    
+    assert await event_store.persist_stream_events([
+        _event("u6", EventType.PRODUCT_VIEW, {"product_category": "Ropa"}, 1)
+    ])
+    
+    assert redis.executed == 1
+    assert redis.data["user:profile:u6:categories"] == {"Ropa": "1"}
@@ -0,0 +1,96 @@
+# tests/performance/benchmark_intent_extraction.py
+"""
+Benchmark de generación de cache keys en DiversityAwareCache con local_catalog.
+
+Compara la estrategia anterior (reconstruir category -> keywords recorriendo
+el catálogo en cada lookup + bucle anidado ``keyword in query``) con el
+autómata KeywordMatcher compilado una sola vez.
+
+Uso:
+    python tests/performance/benchmark_intent_extraction.py
+"""
+
+import os
+import random
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.api.core.diversity_aware_cache import DiversityAwareCache
+
+CATALOG_SIZES = [1_000, 10_000, 100_000]
+QUERIES = [
+    "zapatillas para correr",
+    "busco un regalo para mi madre",
+    "conjunto de encaje negro talla m",
+    "algo para la cocina",
+    "show me something nice",
+]
+CONTEXT = {"turn_number": 1, "shown_products": [], "market_id": "US"}
+
+
+class Catalog:
+    def __init__(self, products):
+        self.product_data = products
+
+
+def build_products(count, seed=42):
+    rng = random.Random(seed)
+    categories = [f"categoria{i:03d}" for i in range(200)]
+    vocabulary = [f"termino{i:05d}" for i in range(count // 2 + 100)]
+    return [
+        {
+            "id": str(i),
+            "product_type": rng.choice(categories),
+            "title": " ".join(rng.sample(vocabulary, 6)),
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_intent(cache, query):
+    """Ruta anterior: mapping reconstruido en cada lookup + bucle anidado."""
+    query_lower = query.lower().strip()
+    for category, keywords in cache._load_categories_from_catalog().items():
+        for keyword in keywords:
+            if keyword and keyword in query_lower:
+                return f"initial_{category}"
+    return None
+
+
+def benchmark(count, rounds):
+    cache = DiversityAwareCache(local_catalog=Catalog(build_products(count)))
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        legacy_intent(cache, QUERIES[i % len(QUERIES)])
+    legacy_ms = (time.perf_counter() - start) * 1000 / rounds
+
+    start = time.perf_counter()
+    cache._get_category_matcher()
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    lookups = 10_000
+    start = time.perf_counter()
+    for i in range(lookups):
+        cache._generate_diversity_aware_key("user", QUERIES[i % len(QUERIES)], CONTEXT)
+    key_ms = (time.perf_counter() - start) * 1000 / lookups
+
+    print(
+        f"{count:>7} productos | anterior: {legacy_ms:9.2f} ms/lookup | "
+        f"compilación única: {compile_ms:8.1f} ms | key generation: {key_ms:.4f} ms | "
+        f"speedup: {legacy_ms / key_ms:,.0f}x"
+    )
+
+
+if __name__ == "__main__":
+    for size in CATALOG_SIZES:
+        benchmark(size, rounds=max(3, 20_000 // size))
+
+# Resultado de referencia (CPython 3.11, 1 core):
+#    1000 productos | anterior:      1.93 ms/lookup | compilación única:      7.0 ms | key generation: 0.0139 ms | speedup: 138x
+#   10000 productos | anterior:     25.46 ms/lookup | compilación única:     83.9 ms | key generation: 0.0127 ms | speedup: 2,003x
+#  100000 productos | anterior:    412.65 ms/lookup | compilación única:   1575.5 ms | key generation: 0.0200 ms | speedup: 20,675x
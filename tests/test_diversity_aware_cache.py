@@ -19,8 +19,11 @@ if project_root not in sys.path:
 
 import pytest
 import asyncio
+import threading
 import time
+from unittest.mock import AsyncMock, MagicMock
 from src.api.core.diversity_aware_cache import DiversityAwareCache, create_diversity_aware_cache
+from src.api.core.redis_service import RedisService
 
 
 class MockRedisService:
@@ -345,6 +348,157 @@ async def test_cache_invalidation(cache):
     print(f"   Deleted {deleted_count} entries")
 
 
+@pytest.mark.asyncio
+async def test_user_index_with_redis_service():
+    """
+    Test 6b: Índice secundario por usuario con RedisService
+    
+    Valida que las escrituras registran la clave en el índice del usuario
+    y que la invalidación usa ese índice (SCAN solo como respaldo).
+    """
+    redis_service = MagicMock(spec=RedisService)
+    redis_service.set = AsyncMock(return_value=True)
+    redis_service.delete_indexed = AsyncMock(return_value=2)
+    cache = DiversityAwareCache(redis_service=redis_service, default_ttl=300)
+    
+    await cache.cache_response(
+        user_id="u7",
+        query="regalos",
+        context={"turn_number": 1, "shown_products": [], "market_id": "US"},
+        response={"recommendations": []}
+    )
+    assert redis_service.set.call_args.kwargs["indexes"] == [f"idx:{cache.cache_prefix}:u7"]
+    
+    assert await cache.invalidate_user_cache("u7") == 2
+    redis_service.delete_indexed.assert_awaited_once_with(
+        f"idx:{cache.cache_prefix}:u7", fallback_pattern=f"{cache.cache_prefix}:u7:*"
+    )
+
+
+class FakeCatalog:
+    """Catálogo local mínimo: product_data se reemplaza al recargar"""
+
+    def __init__(self, products):
+        self.product_data = products
+        self.listeners = []
+
+    def add_catalog_listener(self, callback):
+        self.listeners.append(callback)
+
+    def reload(self, products):
+        self.product_data = products
+        for callback in self.listeners:
+            callback()
+
+
+def _naive_intent_category(categories, query):
+    """Bucle anidado original: primera categoría con keyword contenida en el query"""
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            if keyword and keyword in query:
+                return category
+    return None
+
+
+def test_keyword_matcher_matches_nested_loop_semantics():
+    """
+    Test 5b: El autómata Aho-Corasick equivale al bucle anidado
+    
+    Gana la primera categoría del mapping, no la coincidencia más a la izquierda,
+    y las keywords solapadas ("headphone"/"phone", "sportswear"/"sport") cuentan.
+    """
+    from src.api.core.keyword_matcher import KeywordMatcher
+
+    categories = {
+        "fashion": ["sportswear", "dress", "wear"],
+        "sports": ["sport", "running", "gym"],
+        "electronics": ["headphone", "phone", "hone"],
+        "empty": ["", None],
+    }
+    matcher = KeywordMatcher(categories)
+    queries = [
+        "running sportswear", "sport gym", "headphones", "smartphone case",
+        "a dress for the gym", "honest review", "nothing here", "", "rrunningg", "sportswea",
+    ]
+    for query in queries:
+        expected = _naive_intent_category({k: [w for w in v if w] for k, v in categories.items()}, query)
+        assert matcher.match(query) == expected, query
+    assert len(matcher) == 9
+
+
+def test_catalog_categories_compiled_once_and_refreshed_on_reload():
+    """
+    Test 5c: Las categorías del catálogo se compilan una vez y se recompilan al recargarlo
+    """
+    catalog = FakeCatalog([
+        {"product_type": "Lenceria", "title": "Conjunto encaje negro"},
+        {"category": "Calzado", "title": "Zapatillas running"},
+    ])
+    cache = DiversityAwareCache(redis_service=MockRedisService(), local_catalog=catalog)
+
+    loads = 0
+    original_load = cache._load_categories_from_catalog
+
+    def counting_load():
+        nonlocal loads
+        loads += 1
+        return original_load()
+
+    cache._load_categories_from_catalog = counting_load
+
+    assert cache._extract_semantic_intent("conjunto de encaje") == "initial_lenceria"
+    assert cache._extract_semantic_intent("zapatillas para correr") == "initial_calzado"
+    assert loads == 1
+
+    # Recarga del catálogo (fit/swap reemplazan product_data)
+    catalog.product_data = [{"product_type": "Hogar", "title": "Lampara mesa"}]
+    assert cache._extract_semantic_intent("una lampara") == "initial_hogar"
+    assert cache._extract_semantic_intent("zapatillas") != "initial_calzado"
+    assert loads == 2
+
+    cache.refresh_categories()
+    cache._extract_semantic_intent("lampara")
+    assert loads == 3
+
+
+@pytest.mark.asyncio
+async def test_catalog_reload_recompiles_off_the_event_loop():
+    """
+    Test 5d: Con event loop, la recarga del catálogo recompila en un thread
+
+    Mientras compila se sigue sirviendo el autómata anterior.
+    """
+    catalog = FakeCatalog([{"product_type": "Lenceria", "title": "Conjunto encaje negro"}])
+    cache = await create_diversity_aware_cache(redis_service=MockRedisService(), local_catalog=catalog)
+    assert cache._extract_semantic_intent("conjunto de encaje") == "initial_lenceria"
+
+    build_threads = []
+    original_build = cache._build_category_matcher
+
+    def recording_build():
+        build_threads.append(threading.get_ident())
+        return original_build()
+
+    cache._build_category_matcher = recording_build
+
+    catalog.reload([{"product_type": "Hogar", "title": "Lampara mesa"}])
+    # Todavía el autómata anterior: la petición no compila
+    assert cache._extract_semantic_intent("conjunto de encaje") == "initial_lenceria"
+
+    await cache._category_rebuild
+    assert cache._extract_semantic_intent("una lampara") == "initial_hogar"
+    assert cache._extract_semantic_intent("conjunto de encaje") != "initial_lenceria"
+    assert len(build_threads) == 1
+    assert build_threads[0] != threading.get_ident()
+
+    # Sin aviso del catálogo (reemplazo directo) también se detecta, sin compilar en la petición
+    catalog.product_data = [{"product_type": "Calzado", "title": "Zapatillas running"}]
+    assert cache._extract_semantic_intent("una lampara") == "initial_hogar"
+    await cache._category_rebuild
+    assert cache._extract_semantic_intent("zapatillas") == "initial_calzado"
+    assert len(build_threads) == 2
+
+
 @pytest.mark.asyncio
 async def test_performance_improvement(cache):
     """
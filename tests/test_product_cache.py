@@ -152,15 +152,65 @@ async def test_product_not_found(product_cache, mock_redis_service, mock_local_c
 
 @pytest.mark.asyncio
 async def test_preload_products(product_cache, mock_redis_service):
-    """Prueba la precarga de múltiples productos."""
-    # Configurar product_cache para espiar el método get_product
-    product_cache.get_product = AsyncMock(return_value={"id": "test", "title": "Test"})
+    """Prueba la precarga de múltiples productos (por lotes, vía get_products)."""
+    # Configurar product_cache para espiar el método get_products
+    product_cache.get_products = AsyncMock(return_value=[{"id": "test", "title": "Test"}])
     
     # Llamar a preload_products
-    await product_cache.preload_products(["1", "2", "3"])
+    await product_cache.preload_products(["1", "2", "3"], batch_size=2)
     
-    # Verificar que se llamó a get_product para cada ID
-    assert product_cache.get_product.call_count == 3
+    # Verificar que se pidieron todos los IDs en dos lotes
+    assert product_cache.get_products.call_count == 2
+    requested = [pid for c in product_cache.get_products.call_args_list for pid in c.args[0]]
+    assert requested == ["1", "2", "3"]
+
+@pytest.mark.asyncio
+async def test_get_products_single_mget_in_request_order(product_cache, mock_redis_service, mock_local_catalog):
+    """get_products resuelve los hits con un MGET y los misses en un pipeline."""
+    mock_redis_service.mget = AsyncMock(return_value=[
+        None, json.dumps({"id": "2", "title": "Redis 2"})
+    ])
+    mock_redis_service.mset_with_ttl = AsyncMock(return_value=True)
+    mock_local_catalog.get_product_by_id = MagicMock(
+        side_effect=lambda pid: {"id": pid, "title": f"Local {pid}"} if pid == "1" else None
+    )
+    
+    products = await product_cache.get_products(["1", "2", "1"])
+    
+    # Resultados alineados con la petición (duplicados incluidos)
+    assert [p["title"] for p in products] == ["Local 1", "Redis 2", "Local 1"]
+    mock_redis_service.mget.assert_awaited_once_with(["product:1", "product:2"])
+    mock_redis_service.get.assert_not_called()
+    
+    # Un solo pipeline de escritura para el miss resuelto en el catálogo local
+    mock_redis_service.mset_with_ttl.assert_awaited_once()
+    mapping = mock_redis_service.mset_with_ttl.call_args.args[0]
+    assert list(mapping) == ["product:1"]
+    assert mock_redis_service.mset_with_ttl.call_args.kwargs["ttl"] == 3600
+    
+    assert product_cache.stats["redis_hits"] == 1
+    assert product_cache.stats["local_catalog_hits"] == 1
+    assert product_cache.stats["total_requests"] == 2
+
+@pytest.mark.asyncio
+async def test_get_products_remote_misses_and_failures(product_cache, mock_redis_service, mock_local_catalog, mock_shopify_client):
+    """Los misses restantes van a Shopify; los no encontrados devuelven None."""
+    mock_redis_service.mget = AsyncMock(return_value=[None, None])
+    mock_redis_service.mset_with_ttl = AsyncMock(return_value=True)
+    mock_local_catalog.get_product_by_id = MagicMock(return_value=None)
+    mock_shopify_client.get_product_async = AsyncMock(
+        side_effect=lambda pid: {"id": pid, "title": "Shopify"} if pid == "7" else None
+    )
+    
+    products = await product_cache.get_products(["7", "8"])
+    
+    assert products[0]["title"] == "Shopify"
+    assert products[1] is None
+    assert product_cache.stats["shopify_hits"] == 1
+    assert product_cache.stats["total_failures"] == 1
+    # El líder del single-flight escribe antes de liberarlo (no en el pipeline final)
+    mock_redis_service.mset_with_ttl.assert_not_awaited()
+    assert [c.args[0] for c in mock_redis_service.set.call_args_list] == ["product:7"]
 
 @pytest.mark.asyncio
 async def test_invalidate_product(product_cache, mock_redis_service):
@@ -173,21 +223,163 @@ async def test_invalidate_product(product_cache, mock_redis_service):
     mock_redis_service.delete.assert_called_once()
 
 @pytest.mark.asyncio
-async def test_invalidate_multiple_products(product_cache):
-    """Prueba la invalidación de múltiples productos."""
-    # Configurar para espiar el método invalidate
-    original_invalidate = product_cache.invalidate
-    product_cache.invalidate = AsyncMock(return_value=True)
+async def test_invalidate_multiple_products(product_cache, mock_redis_service):
+    """Prueba la invalidación de múltiples productos en un solo DELETE."""
+    mock_redis_service.delete_many = AsyncMock(return_value=3)
     
     # Invalidar múltiples productos
     result = await product_cache.invalidate_multiple(["1", "2", "3"])
     
     # Verificar
     assert result == 3
-    assert product_cache.invalidate.call_count == 3
+    mock_redis_service.delete_many.assert_awaited_once_with(
+        [f"{product_cache.prefix}{pid}" for pid in ["1", "2", "3"]],
+        indexes=[product_cache._index_key]
+    )
+    mock_redis_service.delete.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_l1_hit_skips_redis(product_cache, mock_redis_service):
+    """Un segundo acceso se sirve desde L1 sin ir a Redis."""
+    mock_redis_service.get = AsyncMock(return_value=json.dumps({"id": "123", "title": "Redis Product"}))
+    
+    first = await product_cache.get_product("123")
+    second = await product_cache.get_product("123")
+    
+    assert second is first
+    mock_redis_service.get.assert_awaited_once()
+    assert product_cache.stats["l1_hits"] == 1
+    assert product_cache.stats["l1_misses"] == 1
+    
+    l1_stats = product_cache.get_stats()["l1"]
+    assert l1_stats["hits"] == 1
+    assert l1_stats["size"] == 1
+
+@pytest.mark.asyncio
+async def test_l1_bounded_by_size(mock_redis_service, mock_local_catalog, mock_shopify_client):
+    """L1 expulsa por LRU al superar su tamaño máximo."""
+    cache = ProductCache(
+        redis_service=mock_redis_service,
+        local_catalog=mock_local_catalog,
+        shopify_client=mock_shopify_client,
+        l1_max_size=2
+    )
+    for pid in ["1", "2", "3"]:
+        cache._l1_put(pid, {"id": pid})
+    
+    assert cache._l1_get("1") is None
+    assert cache._l1_get("3") == {"id": "3"}
+    assert cache.get_stats()["l1"]["size"] == 2
+
+@pytest.mark.asyncio
+async def test_l1_disabled(mock_redis_service, mock_local_catalog, mock_shopify_client):
+    """Con l1_max_size=0 todas las lecturas van a Redis."""
+    mock_redis_service.get = AsyncMock(return_value=json.dumps({"id": "123", "title": "Redis Product"}))
+    cache = ProductCache(
+        redis_service=mock_redis_service,
+        local_catalog=mock_local_catalog,
+        shopify_client=mock_shopify_client,
+        l1_max_size=0
+    )
+    
+    await cache.get_product("123")
+    await cache.get_product("123")
+    
+    assert mock_redis_service.get.await_count == 2
+    assert cache.get_stats()["l1"]["enabled"] is False
+
+@pytest.mark.asyncio
+async def test_get_products_served_from_l1(product_cache, mock_redis_service):
+    """get_products solo pide a Redis los IDs que no están en L1."""
+    product_cache._l1_put("1", {"id": "1", "title": "L1"})
+    mock_redis_service.mget = AsyncMock(return_value=[json.dumps({"id": "2", "title": "Redis 2"})])
+    
+    products = await product_cache.get_products(["1", "2"])
+    
+    assert [p["title"] for p in products] == ["L1", "Redis 2"]
+    mock_redis_service.mget.assert_awaited_once_with(["product:2"])
+    assert product_cache._l1_get("2")["title"] == "Redis 2"
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_l1_and_publishes(product_cache, mock_redis_service):
+    """invalidate() limpia L1 y notifica a los demás workers."""
+    product_cache._l1_put("123", {"id": "123"})
+    mock_redis_service.publish = AsyncMock(return_value=1)
+    
+    assert await product_cache.invalidate("123")
+    
+    assert product_cache._l1_get("123") is None
+    channel, message = mock_redis_service.publish.call_args.args
+    assert channel == product_cache.invalidation_channel
+    assert json.loads(message)["ids"] == ["123"]
+
+@pytest.mark.asyncio
+async def test_invalidate_multiple_publishes_once(product_cache, mock_redis_service):
+    """invalidate_multiple() publica un único mensaje para el lote."""
+    mock_redis_service.publish = AsyncMock(return_value=1)
+    mock_redis_service.delete_many = AsyncMock(return_value=2)
+    
+    assert await product_cache.invalidate_multiple(["1", "2"]) == 2
+    
+    mock_redis_service.publish.assert_awaited_once()
+    assert json.loads(mock_redis_service.publish.call_args.args[1])["ids"] == ["1", "2"]
+
+def test_remote_invalidation_message(product_cache):
+    """Un mensaje de otro worker elimina la entrada; los propios se ignoran."""
+    product_cache._l1_put("1", {"id": "1"})
+    
+    own = json.dumps({"origin": product_cache._instance_id, "ids": ["1"]})
+    assert product_cache._handle_invalidation_message(own) == 0
+    assert product_cache._l1_get("1") is not None
+    
+    remote = json.dumps({"origin": "other-worker", "ids": ["1"]}).encode()
+    assert product_cache._handle_invalidation_message(remote) == 1
+    assert product_cache._l1_get("1") is None
+    assert product_cache.stats["l1_invalidations_received"] == 1
+    
+    assert product_cache._handle_invalidation_message(b"{invalid") == 0
+
+@pytest.mark.asyncio
+async def test_get_cached_product_ids_uses_index(product_cache, mock_redis_service):
+    """Sin patrón, los IDs salen del índice secundario (nunca KEYS)."""
+    mock_redis_service.index_members = AsyncMock(return_value=["product:1", "product:2"])
+    mock_redis_service.adopt_unindexed = AsyncMock(return_value=[])
+    
+    assert await product_cache.get_cached_product_ids() == ["1", "2"]
+    mock_redis_service.index_members.assert_awaited_once_with("idx:product:")
+    mock_redis_service.keys.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_cached_product_ids_scans_until_migrated(product_cache, mock_redis_service):
+    """Aunque el índice tenga miembros, las claves legacy se listan hasta marcar la migración."""
+    mock_redis_service.index_members = AsyncMock(return_value=["product:1", "product:7"])
+    mock_redis_service.adopt_unindexed = AsyncMock(return_value=["product:7", "product:9"])
+    
+    assert await product_cache.get_cached_product_ids() == ["1", "7", "9"]
+    index, pattern = mock_redis_service.adopt_unindexed.await_args.args
+    assert (index, pattern) == ("idx:product:", "product:*")
+    key_filter = mock_redis_service.adopt_unindexed.await_args.kwargs["key_filter"]
+    assert key_filter("product:7") and not key_filter("product:popular_x")
+
+@pytest.mark.asyncio
+async def test_get_cached_product_ids_pattern_uses_scan(product_cache, mock_redis_service):
+    """Con patrón explícito se recorren las claves con SCAN."""
+    async def scan_iter(pattern):
+        for key in [b"product:7", b"product:popular_x"]:
+            yield key
+    
+    mock_redis_service.scan_iter = scan_iter
+    
+    assert await product_cache.get_cached_product_ids("product:7*") == ["7"]
+
+@pytest.mark.asyncio
+async def test_writes_maintain_index(product_cache, mock_redis_service):
+    """Guardar e invalidar mantienen el índice de claves de producto."""
+    await product_cache._save_to_redis("1", {"id": "1"})
+    assert mock_redis_service.set.call_args.kwargs["indexes"] == ["idx:product:"]
     
-    # Restaurar método original para las siguientes pruebas
-    product_cache.invalidate = original_invalidate
+    await product_cache.invalidate("1")
+    mock_redis_service.delete.assert_awaited_once_with("product:1", indexes=["idx:product:"])
 
 @pytest.mark.asyncio
 async def test_redis_connection_failure(mock_local_catalog, mock_shopify_client):
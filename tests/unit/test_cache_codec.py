@@ -0,0 +1,189 @@
+"""
+Test Suite for CacheCodec
+=========================
+
+Tests para src/api/core/cache_codec.py validando:
+- Ida y vuelta en formato binario versionado
+- Compresión solo de valores grandes
+- Lectura transparente del JSON en texto anterior (despliegue gradual)
+- Modo legacy y estadísticas de bytes por clave
+- Integración con ProductCache, InventoryService y el estado conversacional
+
+Author: Senior Architecture Team
+Version: 1.0.0
+"""
+
+import json
+import zlib
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.api.core.cache_codec import (
+    FORMAT_VERSION,
+    CacheCodec,
+    CodecError
+)
+from src.api.core.product_cache import ProductCache
+from src.api.core.redis_service import RedisService
+from src.api.inventory.inventory_service import InventoryService, InventoryStatus
+from src.api.mcp.conversation_state_manager import MCPConversationStateManager
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def product():
+    """Producto Shopify con body_html largo (comprimible)."""
+    return {
+        "id": "123",
+        "title": "Vestido de seda",
+        "body_html": "<p>Vestido de seda natural, ideal para eventos de noche.</p>" * 40,
+        "variants": [{"id": i, "price": "49.90", "inventory_quantity": i} for i in range(5)],
+        "tags": ["seda", "noche"]
+    }
+
+
+# ============================================================================
+# TEST CLASS: ENCODE / DECODE
+# ============================================================================
+
+class TestCacheCodec:
+    """Tests del formato binario versionado."""
+
+    def test_round_trip_with_header(self, product):
+        """El valor codificado lleva byte de versión y se decodifica igual."""
+        codec = CacheCodec()
+        encoded = codec.encode(product)
+
+        assert isinstance(encoded, bytes)
+        assert encoded[0] == FORMAT_VERSION
+        assert codec.decode(encoded) == product
+
+    def test_large_values_compressed_small_not(self, product):
+        """Solo se comprimen los valores por encima del umbral."""
+        codec = CacheCodec(compression="zlib")
+
+        large = codec.encode(product)
+        small = codec.encode({"id": "1"})
+
+        assert large[1] >> 4 != 0
+        assert small[1] >> 4 == 0
+        assert len(large) < len(json.dumps(product)) / 2
+        assert codec.decode(large) == product
+        assert codec.get_stats()["compressed"] == 1
+
+    def test_reads_legacy_json_text_and_bytes(self, product):
+        """Los valores escritos con json.dumps (formato anterior) se siguen leyendo."""
+        codec = CacheCodec()
+
+        assert codec.decode(json.dumps(product)) == product
+        assert codec.decode(json.dumps(product).encode("utf-8")) == product
+        assert codec.get_stats()["legacy_decoded"] == 2
+
+    def test_legacy_mode_writes_plain_json(self, product):
+        """Con serializer=legacy se escribe el JSON de siempre (workers antiguos)."""
+        codec = CacheCodec(serializer="legacy")
+        encoded = codec.encode(product)
+
+        assert encoded == json.dumps(product)
+        assert CacheCodec().decode(encoded) == product
+
+    def test_from_env_defaults_to_legacy(self, product, monkeypatch):
+        """Sin CACHE_CODEC_SERIALIZER se escribe JSON legacy (despliegue gradual)."""
+        monkeypatch.delenv("CACHE_CODEC_SERIALIZER", raising=False)
+        assert CacheCodec.from_env().encode(product) == json.dumps(product)
+
+        monkeypatch.setenv("CACHE_CODEC_SERIALIZER", "auto")
+        assert CacheCodec.from_env().encode(product) != json.dumps(product)
+
+    def test_corrupt_and_unknown_values_raise_codec_error(self):
+        """Datos corruptos o flags desconocidos -> CodecError (se tratan como miss)."""
+        codec = CacheCodec()
+
+        with pytest.raises(CodecError):
+            codec.decode("{invalid json")
+        with pytest.raises(CodecError):
+            codec.decode(bytes((FORMAT_VERSION, 0x0F)) + b"{}")
+        assert codec.get_stats()["decode_errors"] == 2
+
+    def test_zlib_values_readable_by_any_codec(self, product):
+        """Un valor zlib se lee aunque el lector prefiera otra compresión."""
+        payload = json.dumps(product).encode("utf-8")
+        encoded = bytes((FORMAT_VERSION, 0x10)) + zlib.compress(payload)
+
+        assert CacheCodec(compression="none").decode(encoded) == product
+
+    def test_stats_report_bytes_per_key_vs_json(self, product):
+        """get_stats compara bytes por clave con el tamaño JSON anterior."""
+        codec = CacheCodec(compression="zlib", baseline_sample_every=1)
+        for _ in range(3):
+            codec.encode(product)
+
+        stats = codec.get_stats()
+        assert stats["encoded"] == 3
+        assert stats["json_bytes_per_key"] == len(json.dumps(product))
+        assert stats["bytes_per_key"] < stats["json_bytes_per_key"]
+        assert stats["size_ratio"] < 1
+
+
+# ============================================================================
+# TEST CLASS: CACHE INTEGRATION
+# ============================================================================
+
+class TestCodecIntegration:
+    """Tests de las cachés que usan el codec."""
+
+    async def test_product_cache_writes_encoded_and_reads_raw(self, product):
+        """ProductCache escribe bytes del codec y lee sin decodificar de RedisService."""
+        redis = MagicMock(spec=RedisService)
+        redis._connected = True
+        redis.set = AsyncMock(return_value=True)
+        cache = ProductCache(redis_service=redis, codec=CacheCodec(), l1_max_size=0)
+
+        assert await cache._save_to_redis("123", product)
+        stored = redis.set.call_args.args[1]
+        assert stored[0] == FORMAT_VERSION
+
+        redis.get = AsyncMock(return_value=stored)
+        assert await cache.get_product("123") == product
+        redis.get.assert_awaited_once_with("product:123", raw=True)
+        assert cache.get_stats()["codec"]["encoded"] == 1
+
+    async def test_inventory_round_trip_through_codec(self):
+        """El inventario cacheado con el codec se recupera con un MGET raw."""
+        redis = AsyncMock()
+        redis.mset_with_ttl = AsyncMock(return_value=True)
+        service = InventoryService(redis_service=redis)
+        info = service._build_fallback_inventory("7", "US")
+
+        await service._cache_inventory_bulk([info], "US")
+        stored = redis.mset_with_ttl.call_args.args[0]["inventory:product:7:US"]
+
+        redis.mget = AsyncMock(return_value=[stored])
+        cached = await service._get_cached_inventory_bulk(["7"], "US")
+        assert cached["7"].status == InventoryStatus.AVAILABLE
+        assert service.codec.get_stats()["decoded"] == 1
+
+    async def test_conversation_state_round_trip_through_codec(self, monkeypatch):
+        """El estado conversacional se guarda con el codec y se vuelve a cargar."""
+        monkeypatch.setenv("CACHE_CODEC_SERIALIZER", "auto")
+        client = AsyncMock()
+        client.setex = AsyncMock(return_value=True)
+        manager = MCPConversationStateManager(redis_client=client)
+        manager._redis_service = MagicMock()
+        context = await manager.create_conversation_context(
+            session_id="s1", user_id="u1", initial_query="vestidos", market_context={"market_id": "ES"}
+        )
+
+        assert await manager.save_conversation_state(context)
+        stored = client.setex.call_args.args[2]
+        assert stored[0] == FORMAT_VERSION
+
+        manager.sessions_cache.clear()
+        client.get = AsyncMock(return_value=stored)
+        loaded = await manager.load_conversation_state("s1")
+        assert loaded.user_id == "u1"
+        assert manager.get_metrics()["codec"]["decoded"] == 1
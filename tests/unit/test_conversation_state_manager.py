@@ -30,6 +30,7 @@ from src.api.mcp.conversation_state_manager import (
     ConversationStage,
     IntentEvolution,
     UserMarketPreferences,
+    SessionStateCache,
     get_conversation_state_manager
 )
 
@@ -724,6 +725,260 @@ class TestGetOrCreateSession:
         assert loaded_context.session_id == "session_existing"
 
 
+# ============================================================================
+# TEST CLASS 9: DELTA STORAGE
+# ============================================================================
+
+class FakeDeltaRedis:
+    """Redis mínimo en memoria: hashes, listas y pipeline (para el modo delta)."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.lists = {}
+        self.pipelines = []
+
+    def pipeline(self, transaction=True):
+        pipe = MagicMock()
+        pipe.commands = []
+        for name in ("hset", "delete", "rpush", "ltrim", "expire"):
+            setattr(pipe, name, lambda *args, _name=name, **kwargs: pipe.commands.append((_name, args, kwargs)))
+        pipe.execute = AsyncMock(side_effect=lambda: self._apply(pipe.commands))
+        self.pipelines.append(pipe)
+        return pipe
+
+    def _apply(self, commands):
+        for name, args, kwargs in commands:
+            if name == "hset":
+                self.hashes.setdefault(args[0], {}).update(kwargs["mapping"])
+            elif name == "delete":
+                for key in args:
+                    self.hashes.pop(key, None)
+                    self.lists.pop(key, None)
+            elif name == "rpush":
+                self.lists.setdefault(args[0], []).extend(args[1:])
+            elif name == "ltrim":
+                self.lists[args[0]] = self.lists.get(args[0], [])[args[1]:]
+        return [True] * len(commands)
+
+    async def execute_command(self, command, key, *args):
+        if command == "HGET":
+            return self.hashes.get(key, {}).get(args[0])
+        if command == "LRANGE":
+            return self.lists.get(key, [])[args[0]:]
+        raise NotImplementedError(command)
+
+    async def get(self, key):
+        return None
+
+    async def zadd(self, *args, **kwargs):
+        return 1
+
+    async def expire(self, *args, **kwargs):
+        return True
+
+
+class TestDeltaStorage:
+    """
+    Tests del modo de almacenamiento delta (turnos añadidos + cabecera).
+    """
+
+    @pytest.fixture
+    def fake_redis(self):
+        return FakeDeltaRedis()
+
+    @pytest.fixture
+    def delta_manager(self, fake_redis):
+        manager = MCPConversationStateManager(
+            redis_client=fake_redis, storage_mode="delta", max_turns_per_session=3
+        )
+        manager._redis_service = MagicMock()
+        return manager
+
+    async def _add_turn(self, manager, context, query):
+        return await manager.add_conversation_turn(
+            context=context,
+            user_query=query,
+            intent_analysis={"intent": "search", "confidence": 0.8},
+            ai_response="ok"
+        )
+
+    @pytest.mark.asyncio
+    async def test_only_new_turns_appended(self, delta_manager, fake_redis, sample_market_context):
+        """
+        Tras el primer guardado, cada turno añade un elemento y reescribe solo la cabecera.
+        """
+        context = await delta_manager.create_conversation_context(
+            session_id="delta1", user_id="u1", initial_query="hola", market_context=sample_market_context
+        )
+        await self._add_turn(delta_manager, context, "vestidos rojos")
+        await self._add_turn(delta_manager, context, "en talla M")
+
+        last_commands = [name for name, _, _ in fake_redis.pipelines[-1].commands]
+        assert "delete" not in last_commands
+        rpushes = [args for name, args, _ in fake_redis.pipelines[-1].commands if name == "rpush"]
+        assert [len(args) - 1 for args in rpushes] == [1, 1]  # un turno + un intent
+        assert len(fake_redis.lists["conversation_session:delta1:turns"]) == 2
+        assert fake_redis.hashes["conversation_session:delta1:header"]["total_turns"] == 2
+
+    @pytest.mark.asyncio
+    async def test_load_materializes_history(self, delta_manager, sample_market_context):
+        """
+        La carga reconstruye el contexto desde la cabecera y las listas.
+        """
+        context = await delta_manager.create_conversation_context(
+            session_id="delta2", user_id="u2", initial_query="hola", market_context=sample_market_context
+        )
+        await self._add_turn(delta_manager, context, "zapatos")
+        delta_manager.sessions_cache.clear()
+
+        loaded = await delta_manager.load_conversation_state("delta2")
+        assert loaded.user_id == "u2"
+        assert [turn.user_query for turn in loaded.turns] == ["zapatos"]
+        assert loaded.intent_history[0]["intent"] == "search"
+
+        assert await delta_manager.get_persisted_turn_count("delta2") == 1
+
+    @pytest.mark.asyncio
+    async def test_loaded_context_appends_and_trims(self, delta_manager, fake_redis, sample_market_context):
+        """
+        Un contexto cargado solo añade lo nuevo; la lista se recorta a max_turns_per_session.
+        """
+        context = await delta_manager.create_conversation_context(
+            session_id="delta3", user_id="u3", initial_query="hola", market_context=sample_market_context
+        )
+        for query in ("uno", "dos", "tres"):
+            await self._add_turn(delta_manager, context, query)
+
+        loaded = await delta_manager.load_conversation_state("delta3")
+        await self._add_turn(delta_manager, loaded, "cuatro")
+
+        assert "delete" not in [name for name, _, _ in fake_redis.pipelines[-1].commands]
+        reloaded = await delta_manager.load_conversation_state("delta3")
+        assert [turn.user_query for turn in reloaded.turns] == ["dos", "tres", "cuatro"]
+        assert len(fake_redis.lists["conversation_session:delta3:intents"]) == 3
+
+    @pytest.mark.asyncio
+    async def test_snapshot_sessions_migrated_on_first_save(self, delta_manager, fake_redis, sample_market_context):
+        """
+        Una sesión guardada en modo snapshot se carga y se reescribe completa en formato delta.
+        """
+        snapshot_manager = MCPConversationStateManager(redis_client=AsyncMock())
+        context = await snapshot_manager.create_conversation_context(
+            session_id="legacy", user_id="u4", initial_query="hola", market_context=sample_market_context
+        )
+        snapshot = snapshot_manager.codec.encode(snapshot_manager._serialize_context(context))
+        fake_redis.get = AsyncMock(return_value=snapshot)
+
+        loaded = await delta_manager.load_conversation_state("legacy")
+        assert loaded.user_id == "u4"
+
+        await self._add_turn(delta_manager, loaded, "primer turno")
+        deletes = [args for name, args, _ in fake_redis.pipelines[-1].commands if name == "delete"]
+        assert "conversation_session:legacy" in deletes[0]
+
+
+# ============================================================================
+# TEST CLASS 10: IN-MEMORY SESSION CACHE
+# ============================================================================
+
+class TestSessionCache:
+    """
+    Tests del L1 de sesiones (acotado por memoria, TTL, read-through).
+    """
+
+    def test_evicts_least_recently_used_by_memory(self):
+        """
+        Al superar el presupuesto de bytes se expulsa la sesión menos usada.
+        """
+        state = {"session_id": "s", "turns": [{"user_query": "x" * 200}]}
+        cache = SessionStateCache(max_bytes=SessionStateCache(1, 60).getsizeof(state) * 2 + 10, ttl=60)
+
+        cache.put("a", dict(state))
+        cache.put("b", dict(state))
+        cache.get("a")
+        cache.put("c", dict(state))
+
+        assert set(cache) == {"a", "c"}
+        stats = cache.get_stats()
+        assert stats["evictions"] == 1
+        assert 0 < stats["bytes"] <= stats["max_bytes"]
+
+    def test_oversized_state_skipped(self):
+        """
+        Un estado mayor que el presupuesto no se guarda ni deja la versión anterior.
+        """
+        cache = SessionStateCache(max_bytes=1000, ttl=60)
+        cache.put("a", {"n": 1})
+
+        assert not cache.put("a", {"turns": ["x" * 5000]})
+        assert "a" not in cache
+
+    def test_entries_expire_with_ttl(self):
+        """
+        Las entradas caducan con el TTL y se cuentan como expiradas.
+        """
+        clock = [0.0]
+        cache = SessionStateCache(max_bytes=10_000, ttl=10, timer=lambda: clock[0])
+
+        cache.put("a", {"n": 1})
+        clock[0] = 11
+        cache.expire()
+
+        assert "a" not in cache
+        assert cache.get_stats()["expirations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_snapshot_load_prefers_redis_over_memory(self, state_manager, sample_market_context):
+        """
+        En modo snapshot Redis manda: una copia en memoria obsoleta no tapa turnos de otro worker.
+        """
+        context = await state_manager.create_conversation_context(
+            session_id="l1_session", user_id="u1", initial_query="Test", market_context=sample_market_context
+        )
+        context.total_turns = 3
+        state_manager._redis_client.get = AsyncMock(
+            return_value=json.dumps(state_manager._serialize_context(context))
+        )
+
+        loaded = await state_manager.load_conversation_state("l1_session")
+
+        assert loaded.total_turns == 3
+        state_manager._redis_client.get.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_snapshot_load_falls_back_to_memory(self, state_manager, sample_market_context):
+        """
+        Si Redis no tiene la sesión, se sirve la copia en memoria.
+        """
+        await state_manager.create_conversation_context(
+            session_id="l1_session", user_id="u1", initial_query="Test", market_context=sample_market_context
+        )
+        state_manager._redis_client.get = AsyncMock(return_value=None)
+
+        loaded = await state_manager.load_conversation_state("l1_session")
+
+        assert loaded.user_id == "u1"
+        state_manager._redis_client.get.assert_awaited_once()
+        session_stats = state_manager.get_metrics()["session_cache"]
+        assert session_stats["hits"] == 1
+        assert session_stats["sessions"] == 1
+
+    @pytest.mark.asyncio
+    async def test_loaded_context_does_not_alias_cached_state(self, state_manager, sample_market_context):
+        """
+        Modificar el contexto cargado no altera el estado cacheado hasta que se guarda.
+        """
+        context = await state_manager.create_conversation_context(
+            session_id="alias", user_id="u2", initial_query="Test", market_context=sample_market_context
+        )
+        context.intent_history.append({"intent": "search"})
+
+        loaded = await state_manager.load_conversation_state("alias")
+        loaded.intent_history.append({"intent": "browse"})
+
+        assert state_manager.sessions_cache["alias"]["intent_history"] == []
+
+
 # ============================================================================
 # RUNNER CONFIGURATION
 # ============================================================================
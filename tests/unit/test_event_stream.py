@@ -0,0 +1,368 @@
+"""
+Test Suite for EventStream
+==========================
+
+Tests para src/api/core/event_stream.py validando:
+- XADD acotado y formato de las entradas
+- Grupos de consumidores con XACK tras procesar (at-least-once)
+- Recuperación de pendientes de un worker caído y dead-letter
+- Modo de ingesta "stream" de UserEventStore
+- Handlers de reenvío a Retail API y métricas
+- Fallback del endpoint de eventos cuando el XADD falla
+
+Author: Senior Architecture Team
+Version: 1.0.0
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis.exceptions import ResponseError
+
+from src.api.core.event_stream import (
+    EventStream,
+    StreamConsumer,
+    build_retail_event,
+    create_analytics_handler,
+    create_retail_handler
+)
+from src.api.mcp.user_events.event_schemas import EventType
+from src.api.mcp.user_events.resilient_user_event_store import UserEventStore
+
+
+class FakeStreamRedis:
+    """Redis Streams mínimo en memoria (un stream, varios grupos)."""
+
+    def __init__(self):
+        self.streams = {}
+        self.groups = {}
+        self.now_ms = 0
+        self.xadd_calls = []
+        self.fail_xadd = False
+
+    async def ping(self):
+        return True
+
+    async def xadd(self, key, fields, maxlen=None, approximate=True):
+        if self.fail_xadd:
+            raise ConnectionError("redis down")
+        self.xadd_calls.append({"key": key, "maxlen": maxlen, "approximate": approximate})
+        entries = self.streams.setdefault(key, [])
+        entry_id = f"{len(entries) + 1}-0"
+        entries.append((entry_id, dict(fields)))
+        return entry_id
+
+    async def xgroup_create(self, key, group, id="$", mkstream=False):
+        if (key, group) in self.groups:
+            raise ResponseError("BUSYGROUP Consumer Group name already exists")
+        self.streams.setdefault(key, [])
+        start = len(self.streams[key]) if id == "$" else 0
+        self.groups[(key, group)] = {"next": start, "pending": {}}
+
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        (key, _), = streams.items()
+        state = self.groups[(key, group)]
+        entries = self.streams[key][state["next"]:state["next"] + count]
+        state["next"] += len(entries)
+        for entry_id, _ in entries:
+            state["pending"][entry_id] = {"consumer": consumer, "delivered": self.now_ms, "times": 1}
+        return [[key, entries]] if entries else []
+
+    async def xack(self, key, group, *ids):
+        pending = self.groups[(key, group)]["pending"]
+        return sum(1 for entry_id in ids if pending.pop(entry_id, None))
+
+    async def xpending(self, key, group):
+        return {"pending": len(self.groups[(key, group)]["pending"])}
+
+    async def xpending_range(self, key, group, min, max, count, idle=None):
+        pending = self.groups[(key, group)]["pending"]
+        return [
+            {"message_id": entry_id, "consumer": info["consumer"],
+             "time_since_delivered": self.now_ms - info["delivered"], "times_delivered": info["times"]}
+            for entry_id, info in pending.items()
+            if idle is None or self.now_ms - info["delivered"] >= idle
+        ][:count]
+
+    async def xclaim(self, key, group, consumer, min_idle_time, ids):
+        pending = self.groups[(key, group)]["pending"]
+        fields_by_id = dict(self.streams[key])
+        claimed = []
+        for entry_id in ids:
+            info = pending[entry_id]
+            info.update(consumer=consumer, delivered=self.now_ms, times=info["times"] + 1)
+            claimed.append((entry_id, fields_by_id.get(entry_id)))
+        return claimed
+
+    async def xlen(self, key):
+        return len(self.streams.get(key, []))
+
+    def pipeline(self, transaction=True):
+        pipe = MagicMock()
+        calls = []
+        pipe.xadd = lambda *args, **kwargs: calls.append(self.xadd(*args, **kwargs))
+        pipe.xack = lambda *args: calls.append(self.xack(*args))
+
+        async def execute():
+            return [await call for call in calls]
+
+        pipe.execute = execute
+        return pipe
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def redis():
+    return FakeStreamRedis()
+
+
+@pytest.fixture
+def stream(redis):
+    return EventStream(redis, maxlen=1000)
+
+
+# ============================================================================
+# TEST CLASS: PRODUCER
+# ============================================================================
+
+class TestEventStream:
+    """Tests del productor."""
+
+    async def test_append_is_single_bounded_xadd(self, stream, redis):
+        """Cada evento es un XADD con MAXLEN aproximado."""
+        entry_id = await stream.append(build_retail_event("u1", "detail-page-view", "p1"))
+
+        assert entry_id == "1-0"
+        assert redis.xadd_calls == [{"key": "events:user", "maxlen": 1000, "approximate": True}]
+        event = EventStream.decode_entry(redis.streams["events:user"][0][1])
+        assert event["event_type"] == EventType.PRODUCT_VIEW.value
+        assert event["data"]["retail_event_type"] == "detail-page-view"
+
+    async def test_ensure_group_is_idempotent(self, stream):
+        """Crear un grupo existente no es un error."""
+        await stream.ensure_group("profile")
+        await stream.ensure_group("profile")
+
+        assert (await stream.get_group_lag("profile"))["pending"] == 0
+
+    async def test_group_created_after_append_sees_earlier_events(self, stream):
+        """Eventos añadidos antes de crear el grupo (pod sin consumidores) se entregan."""
+        await stream.append(build_retail_event("u1", "search"))
+        await stream.ensure_groups()
+
+        consumer = StreamConsumer(stream, "retail", AsyncMock(), consumer_name="w1")
+        assert await consumer.run_once() == 1
+
+
+# ============================================================================
+# TEST CLASS: CONSUMER GROUPS
+# ============================================================================
+
+class TestStreamConsumer:
+    """Tests de los grupos de consumidores."""
+
+    async def test_each_group_receives_every_event_and_acks(self, stream):
+        """Cada grupo procesa todos los eventos y confirma con XACK."""
+        profile_handler, retail_handler = AsyncMock(), AsyncMock()
+        profile = StreamConsumer(stream, "profile", profile_handler, consumer_name="w1")
+        retail = StreamConsumer(stream, "retail", retail_handler, consumer_name="w1")
+        await stream.ensure_group("profile")
+        await stream.ensure_group("retail")
+
+        for i in range(3):
+            await stream.append(build_retail_event("u1", "add-to-cart", f"p{i}"))
+
+        assert await profile.run_once() == 3
+        assert await retail.run_once() == 3
+        assert len(profile_handler.call_args.args[0]) == 3
+        assert (await stream.get_group_lag("profile"))["pending"] == 0
+        assert profile.get_stats()["acked"] == 3
+
+    async def test_workers_in_group_share_entries(self, stream):
+        """Dos workers del mismo grupo se reparten las entradas."""
+        handler = AsyncMock()
+        first = StreamConsumer(stream, "profile", handler, consumer_name="w1", batch_size=2)
+        second = StreamConsumer(stream, "profile", handler, consumer_name="w2", batch_size=2)
+        await stream.ensure_group("profile")
+        for i in range(4):
+            await stream.append(build_retail_event("u1", "search"))
+
+        assert await first.run_once() == 2
+        assert await second.run_once() == 2
+        assert await first.run_once() == 0
+
+    async def test_failed_batch_is_reclaimed_after_idle(self, stream, redis):
+        """Sin XACK, otro worker reclama las entradas de un worker caído."""
+        failing = StreamConsumer(
+            stream, "retail", AsyncMock(side_effect=RuntimeError("retail down")),
+            consumer_name="w1", claim_idle_ms=1000
+        )
+        recovered = AsyncMock()
+        healthy = StreamConsumer(stream, "retail", recovered, consumer_name="w2", claim_idle_ms=1000)
+        await stream.ensure_group("retail")
+        await stream.append(build_retail_event("u1", "purchase-complete", "p1"))
+
+        assert await failing.run_once() == 0
+        assert await healthy.run_once() == 0  # aún no supera claim_idle_ms
+
+        redis.now_ms += 1000
+        assert await healthy.run_once() == 1
+        assert recovered.call_args.args[0][0]["data"]["product_id"] == "p1"
+        assert healthy.get_stats()["claimed"] == 1
+        assert (await stream.get_group_lag("retail"))["pending"] == 0
+
+    async def test_exhausted_entries_go_to_dead_letter(self, stream, redis):
+        """Tras max_deliveries entregas la entrada pasa a dead-letter."""
+        consumer = StreamConsumer(
+            stream, "retail", AsyncMock(side_effect=RuntimeError("bad event")),
+            consumer_name="w1", claim_idle_ms=10, max_deliveries=2
+        )
+        await stream.ensure_group("retail")
+        await stream.append(build_retail_event("u1", "detail-page-view"))
+
+        await consumer.run_once()  # 1ª entrega
+        redis.now_ms += 10
+        await consumer.run_once()  # 2ª entrega (reclamada)
+        redis.now_ms += 10
+        await consumer.run_once()  # agotada -> dead-letter
+
+        assert consumer.get_stats()["dead_lettered"] == 1
+        assert redis.streams["events:user:dead"][0][1]["group"] == "retail"
+        assert (await stream.get_group_lag("retail"))["pending"] == 0
+
+    async def test_block_ms_kept_below_socket_timeout(self, stream):
+        """Un cliente con socket_timeout acota el BLOCK; uno dedicado sin timeout no."""
+        shared = MagicMock()
+        shared.connection_pool.connection_kwargs = {"socket_timeout": 2.0}
+        dedicated = MagicMock()
+        dedicated.connection_pool.connection_kwargs = {"socket_timeout": None}
+
+        assert StreamConsumer(stream, "retail", AsyncMock(), redis_client=shared).block_ms == 1000
+        consumer = StreamConsumer(stream, "retail", AsyncMock(), redis_client=dedicated)
+        assert consumer.block_ms == 5000
+        assert consumer.redis is dedicated
+
+    async def test_retail_error_status_leaves_batch_pending(self, stream):
+        """Un {"status": "error"} de Retail API (p.ej. cola llena) no se confirma."""
+        retail = MagicMock()
+        retail.record_user_event = AsyncMock(return_value={"status": "error", "error": "queue is full"})
+        consumer = StreamConsumer(stream, "retail", create_retail_handler(retail), consumer_name="w1")
+        await stream.ensure_group("retail")
+        await stream.append(build_retail_event("u1", "add-to-cart", "p1"))
+
+        assert await consumer.run_once() == 0
+        assert consumer.get_stats()["failed_batches"] == 1
+        assert (await stream.get_group_lag("retail"))["pending"] == 1
+
+    async def test_handlers_forward_only_tracking_events(self):
+        """Retail y analytics ignoran eventos sin tipo de Retail API."""
+        retail = MagicMock()
+        retail.record_user_event = AsyncMock(return_value={"status": "success"})
+        metrics = MagicMock()
+        events = [
+            build_retail_event("u1", "add-to-cart", "p1", recommendation_id="r1"),
+            {"user_id": "u1", "event_type": "conversation_intent", "data": {"type": "search"}}
+        ]
+
+        await create_retail_handler(retail)(events)
+        await create_analytics_handler(metrics)(events)
+
+        retail.record_user_event.assert_awaited_once_with(
+            user_id="u1", event_type="add-to-cart", product_id="p1",
+            recommendation_id="r1", purchase_amount=None
+        )
+        metrics.record_user_interaction.assert_called_once()
+
+
+# ============================================================================
+# TEST CLASS: USER EVENT STORE STREAM MODE
+# ============================================================================
+
+class TestUserEventStoreStreamMode:
+    """Tests del modo de ingesta stream en UserEventStore."""
+
+    @pytest.fixture
+    async def store(self, redis):
+        store = UserEventStore(redis_client=redis, ingestion_mode="stream", enable_circuit_breaker=False)
+        await store.connect()
+        yield store
+        await store.close()
+
+    async def test_record_event_is_single_append(self, store, redis):
+        """record_event hace un XADD y no usa el buffer local."""
+        assert await store.record_event("u1", EventType.PRODUCT_VIEW, {"product_id": "p1"})
+
+        assert len(redis.xadd_calls) == 1
+        assert store.events_buffer == []
+        assert store.metrics["events_streamed"] == 1
+
+    async def test_falls_back_to_buffer_when_xadd_fails(self, store, redis):
+        """Si el XADD falla el evento va al buffer local."""
+        redis.fail_xadd = True
+
+        assert await store.record_event("u1", EventType.PRODUCT_VIEW, {"product_id": "p1"})
+        assert len(store.events_buffer) == 1
+
+    async def test_connect_creates_consumer_groups(self, store, redis):
+        """El productor crea los grupos antes de su primer XADD."""
+        assert {group for _, group in redis.groups} == {"profile", "analytics", "retail"}
+
+    async def test_direct_setting_uses_local_buffer(self, redis):
+        """EVENT_INGESTION_MODE=direct equivale al modo buffer del store."""
+        store = UserEventStore(redis_client=redis, ingestion_mode="direct")
+
+        assert store.ingestion_mode == UserEventStore.INGESTION_BUFFER
+
+    async def test_close_keeps_injected_client_open(self, redis):
+        """Un cliente Redis inyectado no se cierra con el store."""
+        redis.close = AsyncMock()
+        store = UserEventStore(redis_client=redis, ingestion_mode="stream")
+        await store.connect()
+        await store.close()
+
+        redis.close.assert_not_awaited()
+
+
+# ============================================================================
+# TEST CLASS: RECORD USER EVENT ENDPOINT
+# ============================================================================
+
+class TestRecordUserEventEndpoint:
+    """Tests del endpoint /events/user/{user_id} en modo stream."""
+
+    async def test_falls_back_to_direct_path_when_xadd_fails(self, stream, redis):
+        """Si el XADD falla el evento se registra en línea en lugar de devolver 500."""
+        from src.api.routers.recommendations import record_user_event
+
+        redis.fail_xadd = True
+        hybrid = MagicMock()
+        hybrid.record_user_event = AsyncMock(return_value={"status": "success"})
+
+        response = await record_user_event(
+            user_id="u1", event_type="view", product_id="p1", recommendation_id=None,
+            current_user="u1", hybrid_recommender=hybrid, event_stream=stream
+        )
+
+        assert response["status"] == "success"
+        assert response["detail"]["queued"] is False
+        hybrid.record_user_event.assert_awaited_once_with(
+            user_id="u1", event_type="detail-page-view", product_id="p1", recommendation_id=None
+        )
+
+    async def test_stream_mode_skips_direct_path(self, stream, redis):
+        """Con el XADD aceptado no se llama a la ruta directa."""
+        from src.api.routers.recommendations import record_user_event
+
+        hybrid = MagicMock()
+        hybrid.record_user_event = AsyncMock()
+
+        response = await record_user_event(
+            user_id="u1", event_type="purchase", product_id="p1", recommendation_id=None,
+            current_user="u1", hybrid_recommender=hybrid, event_stream=stream
+        )
+
+        assert response["detail"]["queued"] is True
+        hybrid.record_user_event.assert_not_awaited()
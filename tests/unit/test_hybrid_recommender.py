@@ -14,7 +14,11 @@ from unittest.mock import patch, MagicMock, AsyncMock
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from src.api.core.hybrid_recommender import HybridRecommender, HybridRecommenderWithExclusion
+from src.api.core.hybrid_recommender import (
+    HybridRecommender,
+    HybridRecommenderWithExclusion,
+    get_content_recommendations_batch
+)
 from tests.data.sample_products import SAMPLE_PRODUCTS
 from tests.data.sample_events import SAMPLE_USER_EVENTS, get_events_for_user
 
@@ -153,6 +157,69 @@ class TestHybridRecommender:
 
 
 # Pruebas para el recomendador híbrido con exclusión de productos vistos
+    @pytest.mark.asyncio
+    async def test_batch_recommendations_delegate_to_content(self, hybrid_recommender, content_recommender):
+        """Verifica que las semillas múltiples usan una sola llamada batch."""
+        content_recommender.get_recommendations_batch.return_value = SAMPLE_PRODUCTS[:2]
+
+        recommendations = await hybrid_recommender.get_recommendations_batch(
+            product_ids=["test_prod_1", "test_prod_2"],
+            n_recommendations=2,
+            exclude_ids=["test_prod_3"]
+        )
+
+        assert recommendations == SAMPLE_PRODUCTS[:2]
+        content_recommender.get_recommendations_batch.assert_awaited_once_with(
+            ["test_prod_1", "test_prod_2"], 2, exclude_ids=["test_prod_3"]
+        )
+        content_recommender.get_recommendations.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_batch_recommendations_fallback_per_seed(self, hybrid_recommender, content_recommender):
+        """Sin API batch se consulta cada semilla y se excluyen semillas y vistos."""
+        del content_recommender.get_recommendations_batch
+        content_recommender.get_recommendations.side_effect = [
+            [{"id": "a", "similarity_score": 0.4}, {"id": "seed_2", "similarity_score": 0.9}],
+            [{"id": "a", "similarity_score": 0.7}, {"id": "b", "similarity_score": 0.5}, {"id": "seen", "similarity_score": 0.8}],
+        ]
+
+        recommendations = await hybrid_recommender.get_recommendations_batch(
+            product_ids=["seed_1", "seed_2"],
+            n_recommendations=5,
+            exclude_ids=["seen"]
+        )
+
+        assert [r["id"] for r in recommendations] == ["a", "b"]
+        assert recommendations[0]["similarity_score"] == 0.7
+
+    @pytest.mark.asyncio
+    async def test_enhanced_batch_shares_implementation(self, content_recommender, retail_recommender):
+        """El recomendador mejorado hereda el mismo get_recommendations_batch que el básico."""
+        from src.api.core.enhanced_hybrid_recommender import EnhancedHybridRecommender
+        assert EnhancedHybridRecommender.get_recommendations_batch is HybridRecommender.get_recommendations_batch
+        content_recommender.get_recommendations_batch.return_value = SAMPLE_PRODUCTS[:2]
+        enhanced = EnhancedHybridRecommender(content_recommender, retail_recommender)
+
+        with patch(
+            "src.api.core.hybrid_recommender.get_content_recommendations_batch",
+            wraps=get_content_recommendations_batch
+        ) as helper:
+            recommendations = await enhanced.get_recommendations_batch(["test_prod_1"], 2)
+
+        assert recommendations == SAMPLE_PRODUCTS[:2]
+        helper.assert_awaited_once_with(content_recommender, ["test_prod_1"], 2, None)
+
+    def test_interleave_seed_and_diversified(self):
+        """Las recomendaciones de semillas se alternan con las diversificadas sin duplicados."""
+        from src.api.core.mcp_conversation_handler import _interleave_recommendations
+        seeds = [{"id": "s1"}, {"id": "shared"}, {"id": "s3"}]
+        diversified = [{"id": "shared"}, {"id": "d2"}]
+
+        merged = _interleave_recommendations(seeds, diversified, 4)
+
+        assert [r["id"] for r in merged] == ["s1", "shared", "d2", "s3"]
+
+
 class TestHybridRecommenderWithExclusion:
     
     @pytest.fixture
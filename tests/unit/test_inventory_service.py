@@ -0,0 +1,217 @@
+"""
+Test Suite for InventoryService
+===============================
+
+Tests para src/api/inventory/inventory_service.py validando:
+- Lectura bulk del cache con un único MGET
+- Consulta de misses a Shopify en lotes (filtro ids=)
+- Escritura de resultados en un único pipeline
+- Fallback optimista cuando falla la verificación
+
+Author: Senior Architecture Team
+Version: 1.0.0
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.api.inventory.inventory_service import InventoryService, InventoryStatus
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def mock_redis_service():
+    """RedisService con operaciones multi-clave."""
+    mock = AsyncMock()
+    mock.mget = AsyncMock(return_value=[])
+    mock.mset_with_ttl = AsyncMock(return_value=True)
+    return mock
+
+
+@pytest.fixture
+def mock_shopify_client():
+    """Cliente Shopify con consulta por IDs (síncrono, como ShopifyIntegration)."""
+    client = MagicMock()
+    client.get_products_by_ids = MagicMock(side_effect=lambda ids, fields=None: [
+        {"id": int(pid), "variants": [
+            {"inventory_quantity": 20, "inventory_policy": "deny", "inventory_management": "shopify"}
+        ]}
+        for pid in ids
+    ])
+    return client
+
+
+@pytest.fixture
+def service(mock_redis_service, mock_shopify_client):
+    service = InventoryService(redis_service=mock_redis_service)
+    service.shopify_client = mock_shopify_client
+    return service
+
+
+def cached_entry(product_id, quantity=30):
+    return json.dumps({
+        "product_id": product_id,
+        "status": "available",
+        "quantity": quantity,
+        "low_stock_threshold": 10
+    })
+
+
+# ============================================================================
+# TEST CLASS: BULK AVAILABILITY
+# ============================================================================
+
+class TestBulkAvailability:
+    """Tests de check_multiple_products_availability."""
+
+    async def test_cache_hits_single_mget(self, service, mock_redis_service, mock_shopify_client):
+        """Todo en cache: un MGET, sin Shopify ni escrituras."""
+        mock_redis_service.mget = AsyncMock(return_value=[cached_entry("1"), cached_entry("2")])
+
+        result = await service.check_multiple_products_availability(["1", "2"], "US")
+
+        assert set(result) == {"1", "2"}
+        mock_redis_service.mget.assert_awaited_once_with([
+            "inventory:product:1:US", "inventory:product:2:US"
+        ], raw=True)
+        mock_redis_service.get.assert_not_called()
+        mock_shopify_client.get_products_by_ids.assert_not_called()
+        mock_redis_service.mset_with_ttl.assert_not_called()
+
+    async def test_stale_entries_refreshed_with_one_bulk_call(
+        self, mock_redis_service, mock_shopify_client
+    ):
+        """Las entradas obsoletas de un lote se refrescan con una sola consulta bulk."""
+        service = InventoryService(redis_service=mock_redis_service, stale_while_revalidate_seconds=120)
+        service.shopify_client = mock_shopify_client
+        stale_at = time.time() - service.CACHE_TTL - 5
+
+        def stale_entry(product_id):
+            data = json.loads(cached_entry(product_id))
+            data["last_updated"] = stale_at
+            return json.dumps(data)
+
+        ids = [str(i) for i in range(50)]
+        mock_redis_service.mget = AsyncMock(return_value=[stale_entry(pid) for pid in ids])
+
+        result = await service.check_multiple_products_availability(ids, "US")
+        assert result["7"].quantity == 30
+        while service._revalidation.get_stats()["refreshes_inflight"]:
+            await asyncio.sleep(0.01)
+
+        mock_shopify_client.get_products_by_ids.assert_called_once()
+        assert sorted(mock_shopify_client.get_products_by_ids.call_args.args[0]) == sorted(ids)
+        mock_redis_service.mset_with_ttl.assert_awaited_once()
+        assert len(mock_redis_service.mset_with_ttl.call_args.args[0]) == 50
+        assert service._revalidation.get_stats()["refreshes_completed"] == 50
+
+    async def test_misses_batched_and_written_in_one_pipeline(
+        self, service, mock_redis_service, mock_shopify_client
+    ):
+        """Los misses van a Shopify por lotes y se escriben juntos."""
+        service.SHOPIFY_BATCH_SIZE = 2
+        mock_redis_service.mget = AsyncMock(return_value=[cached_entry("1"), None, None, None])
+
+        result = await service.check_multiple_products_availability(["1", "2", "3", "4"], "US")
+
+        assert result["3"].available_quantity == 20
+        assert result["3"].status == InventoryStatus.AVAILABLE
+        batches = [c.args[0] for c in mock_shopify_client.get_products_by_ids.call_args_list]
+        assert sorted(batches) == [["2", "3"], ["4"]]
+
+        mock_redis_service.mset_with_ttl.assert_awaited_once()
+        mapping = mock_redis_service.mset_with_ttl.call_args.args[0]
+        assert sorted(mapping) == [
+            "inventory:product:2:US", "inventory:product:3:US", "inventory:product:4:US"
+        ]
+        assert mock_redis_service.mset_with_ttl.call_args.kwargs["ttl"] == service.CACHE_TTL
+
+    async def test_keys_preserve_caller_id_type(self, service, mock_redis_service):
+        """Los resultados usan los mismos IDs que recibe (enrich compara por igualdad)."""
+        mock_redis_service.mget = AsyncMock(return_value=[None])
+
+        result = await service.check_multiple_products_availability([42], "ES")
+
+        assert list(result) == [42]
+
+    async def test_build_error_falls_back_for_that_product(self, service, mock_redis_service):
+        """Un producto que falla recibe fallback optimista sin afectar al resto."""
+        mock_redis_service.mget = AsyncMock(return_value=[None, None])
+        original_build = service._build_inventory_info
+
+        async def build(pid, market_id, data):
+            if pid == "bad":
+                raise ValueError("boom")
+            return await original_build(pid, market_id, data)
+
+        service._build_inventory_info = build
+
+        result = await service.check_multiple_products_availability(["ok", "bad"], "US")
+
+        assert result["bad"].supplier_info["source"] == "fallback"
+        assert result["ok"].supplier_info.get("source") != "fallback"
+        assert mock_redis_service.mset_with_ttl.await_count == 2  # resultados + fallbacks
+
+
+# ============================================================================
+# TEST CLASS: SINGLE PRODUCT
+# ============================================================================
+
+class TestSingleProductAvailability:
+    """Tests de check_product_availability contra Shopify."""
+
+    async def test_single_product_queries_shopify_by_id(self, service, mock_redis_service, mock_shopify_client):
+        """Un miss individual consulta Shopify de verdad (ids=[id]) y suma las variantes."""
+        mock_redis_service.get = AsyncMock(return_value=None)
+        mock_shopify_client.get_products_by_ids = MagicMock(return_value=[
+            {"id": 42, "variants": [
+                {"inventory_quantity": 3, "inventory_policy": "deny", "inventory_management": "shopify"},
+                {"inventory_quantity": 4, "inventory_policy": "deny", "inventory_management": "shopify"}
+            ]}
+        ])
+
+        info = await service.check_product_availability("42", "US")
+
+        mock_shopify_client.get_products_by_ids.assert_called_once_with(["42"], "id,variants")
+        assert info.quantity == 7
+        assert info.status == InventoryStatus.LOW_STOCK
+
+    async def test_single_product_without_ids_query_uses_simulated_fetch(self, service, mock_redis_service):
+        """Clientes sin get_products_by_ids mantienen el _fetch_shopify_product simulado."""
+        mock_redis_service.get = AsyncMock(return_value=None)
+        service.shopify_client = object()
+        service._fetch_shopify_product = AsyncMock(return_value={"inventory_quantity": 25})
+
+        info = await service.check_product_availability("42", "US")
+
+        service._fetch_shopify_product.assert_awaited_once_with("42")
+        assert info.quantity == 25
+
+
+# ============================================================================
+# TEST CLASS: ENRICHMENT
+# ============================================================================
+
+class TestEnrichProducts:
+    """Tests de enrich_products_with_inventory."""
+
+    async def test_enrich_constant_round_trips(self, service, mock_redis_service):
+        """100 productos: un MGET y un pipeline."""
+        products = [{"id": str(i), "title": f"P{i}"} for i in range(100)]
+        mock_redis_service.mget = AsyncMock(return_value=[None] * 100)
+
+        enriched = await service.enrich_products_with_inventory(products, "US")
+
+        assert len(enriched) == 100
+        assert all(p["in_stock"] for p in enriched)
+        assert mock_redis_service.mget.await_count == 1
+        assert mock_redis_service.mset_with_ttl.await_count == 1
+        mock_redis_service.get.assert_not_called()
+        mock_redis_service.set_json.assert_not_called()
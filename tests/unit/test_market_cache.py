@@ -0,0 +1,221 @@
+"""
+Test Suite for MarketAwareProductCache
+======================================
+
+Tests para src/cache/market_aware/market_cache.py validando:
+- Base independiente del mercado guardada una sola vez
+- Overlays por mercado con solo las diferencias (precio, moneda, traducciones)
+- Ensamblado base + overlay en lectura
+- Invalidación de la base propagada a todos los mercados
+
+Author: Senior Architecture Team
+Version: 1.0.0
+"""
+
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+
+from src.cache.market_aware.market_cache import BASE_VERSION_FIELD, MarketAwareProductCache
+
+
+class FakePipeline:
+    """Cola de comandos de ``FakeRedisService.pipeline()``."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.results = []
+        self.succeeded = True
+
+    def get(self, key):
+        self.results.append(self.redis._get(key))
+
+    def ttl(self, key):
+        if self.redis._get(key) is None:
+            self.results.append(-2)
+        elif key not in self.redis.expires:
+            self.results.append(-1)
+        else:
+            self.results.append(int(self.redis.expires[key] - self.redis.now))
+
+    def expire(self, key, seconds):
+        exists = self.redis._get(key) is not None
+        if exists:
+            self.redis.expires[key] = self.redis.now + seconds
+        self.results.append(exists)
+
+
+class FakeRedisService:
+    """RedisService mínimo en memoria (JSON como string) con TTL sobre un reloj manual."""
+
+    def __init__(self):
+        self.storage = {}
+        self.expires = {}
+        self.now = 0.0
+
+    def _get(self, key):
+        if key in self.expires and self.expires[key] <= self.now:
+            self.storage.pop(key, None)
+            self.expires.pop(key, None)
+        return self.storage.get(key)
+
+    async def get_json(self, key):
+        value = self._get(key)
+        return json.loads(value) if value is not None else None
+
+    async def set_json(self, key, value, ttl=None, indexes=None):
+        self.storage[key] = json.dumps(value)
+        if ttl:
+            self.expires[key] = self.now + ttl
+        else:
+            self.expires.pop(key, None)
+        return True
+
+    async def mget(self, keys, raw=False):
+        return [self._get(key) for key in keys]
+
+    async def delete(self, key, indexes=None):
+        self.expires.pop(key, None)
+        return self.storage.pop(key, None) is not None
+
+    @asynccontextmanager
+    async def pipeline(self, transaction=False):
+        yield FakePipeline(self)
+
+
+PRODUCT = {
+    "id": "42",
+    "title": "Aros de oro",
+    "description": "Aros dorados con cierre de presión",
+    "images": ["a.jpg", "b.jpg"],
+    "tags": ["joyeria", "oro"],
+}
+
+
+def adapted(market_id, price, currency, **fields):
+    return {
+        **PRODUCT,
+        "price": price,
+        "currency": currency,
+        "market_id": market_id,
+        "in_stock": True,
+        **fields,
+    }
+
+
+# ============================================================================
+# TEST CLASS: BASE + OVERLAY
+# ============================================================================
+
+class TestMarketCacheOverlayStorage:
+    """Tests del almacenamiento base + overlay."""
+
+    @pytest.fixture
+    def redis(self):
+        return FakeRedisService()
+
+    @pytest.fixture
+    def cache(self, redis):
+        return MarketAwareProductCache(redis_service=redis)
+
+    async def test_roundtrip_per_market(self, cache):
+        """Cada mercado recupera exactamente el producto que guardó."""
+        us = adapted("US", 25.0, "USD", title="Gold earrings")
+        es = adapted("ES", 23.0, "EUR")
+
+        assert await cache.set_product("42", us, "US")
+        assert await cache.set_product("42", es, "ES")
+
+        got_us = await cache.get_product("42", "US")
+        got_es = await cache.get_product("42", "ES")
+
+        assert {k: v for k, v in got_us.items() if k != "_market_cache_metadata"} == us
+        assert {k: v for k, v in got_es.items() if k != "_market_cache_metadata"} == es
+        assert got_es["_market_cache_metadata"]["market_id"] == "ES"
+
+    async def test_base_stored_once_and_overlays_are_small(self, cache, redis):
+        """La base no tiene campos de mercado y los overlays solo guardan diferencias."""
+        await cache.set_product("42", adapted("ES", 23.0, "EUR"), "ES")
+        await cache.set_product("42", adapted("US", 25.0, "USD", title="Gold earrings"), "US")
+
+        base = json.loads(redis.storage["market_cache:product:42"])
+        assert "price" not in base and "currency" not in base
+        assert base["images"] == PRODUCT["images"]
+
+        es_overlay = json.loads(redis.storage["market_cache:ES:product:42"])
+        assert set(es_overlay["fields"]) == {"price", "currency", "market_id", "in_stock"}
+        us_overlay = json.loads(redis.storage["market_cache:US:product:42"])
+        assert us_overlay["fields"]["title"] == "Gold earrings"
+        assert "images" not in us_overlay["fields"]
+
+        stats = (await cache.get_cache_stats())["storage"]
+        assert stats["base_writes"] == 1
+        assert stats["base_reused"] == 1
+        assert stats["overlay_writes"] == 2
+
+    async def test_reused_base_outlives_longer_overlay(self, cache, redis):
+        """Reutilizar la base extiende su TTL: no expira antes que el overlay."""
+        await cache.set_product("42", adapted("ES", 23.0, "EUR"), "ES", ttl=60)
+        await cache.set_product("42", adapted("US", 25.0, "USD"), "US", ttl=3600)
+
+        # Pasado el TTL original de la base, el overlay de US sigue ensamblándose
+        redis.now += 120
+        assert (await cache.get_product("42", "US"))["price"] == 25.0
+
+        # y un mercado nuevo reutiliza la misma versión en lugar de crear otra
+        await cache.set_product("42", adapted("MX", 400.0, "MXN"), "MX", ttl=60)
+        assert (await cache.get_product("42", "US"))["price"] == 25.0
+
+        stats = (await cache.get_cache_stats())["storage"]
+        assert stats["base_writes"] == 1
+        assert stats["base_reused"] == 2
+        assert stats["orphaned_overlays"] == 0
+
+    async def test_reused_base_ttl_is_never_shortened(self, cache, redis):
+        """Un overlay con TTL menor no acorta la base compartida."""
+        await cache.set_product("42", adapted("ES", 23.0, "EUR"), "ES", ttl=3600)
+        await cache.set_product("42", adapted("US", 25.0, "USD"), "US", ttl=60)
+
+        assert redis.expires["market_cache:product:42"] == 3600
+
+    async def test_invalidating_base_fans_out_to_all_markets(self, cache):
+        """Borrar la base invalida el producto en cualquier mercado, incluso uno nuevo."""
+        for market_id in ("US", "ES", "MX", "BR"):
+            await cache.set_product("42", adapted(market_id, 10.0, "USD"), market_id)
+
+        assert await cache.invalidate_product("42") == 1
+
+        for market_id in ("US", "ES", "MX", "BR"):
+            assert await cache.get_product("42", market_id) is None
+
+    async def test_overlays_from_previous_base_are_not_reused(self, cache):
+        """Tras reescribir la base, un overlay antiguo no se ensambla con ella."""
+        await cache.set_product("42", adapted("US", 25.0, "USD"), "US")
+        await cache.invalidate_product("42")
+        await cache.set_product("42", adapted("ES", 23.0, "EUR"), "ES")
+
+        assert await cache.get_product("42", "US") is None
+        assert (await cache.get_product("42", "ES"))["currency"] == "EUR"
+        assert cache.stats["orphaned_overlays"] == 1
+
+    async def test_invalidating_single_market_keeps_others(self, cache):
+        """Invalidar un mercado solo borra su overlay."""
+        await cache.set_product("42", adapted("US", 25.0, "USD"), "US")
+        await cache.set_product("42", adapted("ES", 23.0, "EUR"), "ES")
+
+        assert await cache.invalidate_product("42", "US") == 1
+
+        assert await cache.get_product("42", "US") is None
+        assert await cache.get_product("42", "ES") is not None
+
+    async def test_fields_missing_in_market_are_removed(self, cache, redis):
+        """Campos de la base ausentes en el producto del mercado no reaparecen al leer."""
+        await cache.set_product("42", adapted("US", 25.0, "USD"), "US")
+        trimmed = adapted("ES", 23.0, "EUR")
+        del trimmed["tags"]
+
+        await cache.set_product("42", trimmed, "ES")
+
+        assert "tags" not in await cache.get_product("42", "ES")
+        assert json.loads(redis.storage["market_cache:product:42"])[BASE_VERSION_FIELD]
@@ -17,6 +17,8 @@ Version: 1.0.0 - Fase 3A Day 3 (Parte 1 de 2)
 
 import pytest
 import asyncio
+import json
+from contextlib import asynccontextmanager
 from unittest.mock import AsyncMock, MagicMock, patch, call
 from typing import Dict, Any, List, Optional
 from datetime import datetime
@@ -42,11 +44,34 @@ def mock_redis_service():
     mock.set = AsyncMock(return_value=True)
     mock.get_json = AsyncMock(return_value=None)
     mock.set_json = AsyncMock(return_value=True)
+    mock.mget = AsyncMock(return_value=[None, None])
     mock.delete = AsyncMock(return_value=True)
     
+    # pipeline(): GET + TTL de la base en set_product (sin base por defecto)
+    mock.pipe = MagicMock()
+    mock.pipe.results = [None, -2]
+    mock.pipe.succeeded = True
+    
+    @asynccontextmanager
+    async def pipeline(transaction=False):
+        yield mock.pipe
+    
+    mock.pipeline = MagicMock(side_effect=pipeline)
+    
     return mock
 
 
+def stored_entries(product: Dict[str, Any], version: str = "v1") -> List[str]:
+    """
+    Respuesta de MGET [base, overlay] para un producto cacheado.
+    
+    La base lleva todo el producto y el overlay solo su metadata.
+    """
+    base = {**product, "_base_version": version}
+    overlay = {"_base_version": version, "fields": {}, "removed": []}
+    return [json.dumps(base), json.dumps(overlay)]
+
+
 @pytest.fixture
 def mock_base_product_cache():
     """
@@ -213,8 +238,8 @@ class TestGetProductOperations:
         When: Se solicita el producto
         Then: Retorna el producto y incrementa hits
         """
-        # Simular cache hit
-        mock_redis_service.get_json = AsyncMock(return_value=sample_product)
+        # Simular cache hit (base + overlay del mercado)
+        mock_redis_service.mget = AsyncMock(return_value=stored_entries(sample_product))
         
         result = await market_cache_instance.get_product("prod_123", "US")
         
@@ -242,7 +267,7 @@ class TestGetProductOperations:
         Then: Retorna None y incrementa misses
         """
         # Simular cache miss
-        mock_redis_service.get_json = AsyncMock(return_value=None)
+        mock_redis_service.mget = AsyncMock(return_value=[None, None])
         
         result = await market_cache_instance.get_product("prod_999", "ES")
         
@@ -270,9 +295,11 @@ class TestGetProductOperations:
         """
         await market_cache_instance.get_product("prod_456", "MX")
         
-        # Verificar que se llamó get_json con la key correcta
-        expected_key = "market_cache:MX:product:prod_456"
-        mock_redis_service.get_json.assert_called_once_with(expected_key)
+        # Base y overlay del mercado en un solo MGET
+        mock_redis_service.mget.assert_called_once_with([
+            "market_cache:product:prod_456",
+            "market_cache:MX:product:prod_456"
+        ])
     
     @pytest.mark.asyncio
     async def test_get_product_with_default_market(
@@ -290,8 +317,10 @@ class TestGetProductOperations:
         await market_cache_instance.get_product("prod_789")
         
         # Verificar que usó "default" como market
-        expected_key = "market_cache:default:product:prod_789"
-        mock_redis_service.get_json.assert_called_once_with(expected_key)
+        mock_redis_service.mget.assert_called_once_with([
+            "market_cache:product:prod_789",
+            "market_cache:default:product:prod_789"
+        ])
     
     @pytest.mark.asyncio
     async def test_get_product_handles_redis_error(
@@ -307,7 +336,7 @@ class TestGetProductOperations:
         Then: Retorna None sin propagar error
         """
         # Simular error de Redis
-        mock_redis_service.get_json = AsyncMock(side_effect=Exception("Redis error"))
+        mock_redis_service.mget = AsyncMock(side_effect=Exception("Redis error"))
         
         result = await market_cache_instance.get_product("prod_error", "US")
         
@@ -347,8 +376,41 @@ class TestSetProductOperations:
             "US"
         )
         
+        assert result is True
+        # Sin base previa: se escriben la base y el overlay del mercado
+        assert mock_redis_service.set_json.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_set_product_reuses_existing_base(
+        self,
+        market_cache_instance,
+        mock_redis_service,
+        sample_product
+    ):
+        """
+        Verifica que la base se guarda una sola vez entre mercados.
+        
+        Given: Una base ya cacheada por otro mercado
+        When: Se guarda el producto en un mercado nuevo
+        Then: Solo se escribe el overlay, con las diferencias respecto a la base
+        """
+        mock_redis_service.pipe.results = [json.dumps({
+            "id": "prod_123", "title": "Test Product", "description": "A test product",
+            "_base_version": "v1"
+        }), 3600]
+        
+        result = await market_cache_instance.set_product(
+            "prod_123",
+            {**sample_product, "price": 85.0, "currency": "EUR"},
+            "ES"
+        )
+        
         assert result is True
         mock_redis_service.set_json.assert_called_once()
+        key, overlay = mock_redis_service.set_json.call_args[0][:2]
+        assert key == "market_cache:ES:product:prod_123"
+        assert overlay["_base_version"] == "v1"
+        assert set(overlay["fields"]) == {"price", "currency", "availability"}
     
     @pytest.mark.asyncio
     async def test_set_product_adds_market_metadata(
@@ -515,10 +577,10 @@ class TestCacheStatistics:
         Then: Reflejan las operaciones realizadas
         """
         # Simular operaciones
-        mock_redis_service.get_json = AsyncMock(side_effect=[
-            sample_product,  # Hit
-            None,            # Miss
-            sample_product   # Hit
+        mock_redis_service.mget = AsyncMock(side_effect=[
+            stored_entries(sample_product),  # Hit
+            [None, None],                    # Miss
+            stored_entries(sample_product)   # Hit
         ])
         
         await market_cache_instance.get_product("prod_1", "US")
@@ -664,24 +726,16 @@ class TestProductInvalidation:
         
         Given: Un product_id sin market_id específico
         When: Se invalida el producto
-        Then: Se elimina de todos los mercados conocidos
-        """
-        # Simular que se eliminaron 3 de 5 mercados (algunos no tenían el producto)
-        mock_redis_service.delete = AsyncMock(side_effect=[
-            True,   # default
-            True,   # US
-            False,  # ES (no existía)
-            True,   # MX
-            False   # CL (no existía)
-        ])
-        
+        Then: Se elimina solo la base; los overlays de todos los mercados dejan de ensamblarse
+        """
         result = await market_cache_instance.invalidate_product("prod_123")
         
-        # Verificar que se invalidaron 3 mercados
-        assert result == 3
+        assert result == 1
         
-        # Verificar que se llamó delete 5 veces (todos los mercados conocidos)
-        assert mock_redis_service.delete.call_count == 5
+        # Un solo DELETE, sin recorrer una lista de mercados
+        mock_redis_service.delete.assert_called_once_with(
+            "market_cache:product:prod_123", indexes=["idx:market_cache:product"]
+        )
     
     @pytest.mark.asyncio
     async def test_invalidate_product_failed_deletion(
@@ -738,8 +792,8 @@ class TestWarmCache:
         # Verificar que se cargaron todos
         assert result == 3
         
-        # Verificar que se llamó set_json 3 veces
-        assert mock_redis_service.set_json.call_count == 3
+        # Verificar que se llamó set_json 6 veces (base + overlay por producto)
+        assert mock_redis_service.set_json.call_count == 6
     
     @pytest.mark.asyncio
     async def test_warm_cache_creates_mock_products(
@@ -758,16 +812,17 @@ class TestWarmCache:
         
         await market_cache_instance.warm_cache_for_market("MX", product_ids)
         
-        # Obtener el producto que se guardó
-        call_args = mock_redis_service.set_json.call_args
-        saved_product = call_args[0][1]  # Segundo argumento
+        # Obtener la base y el overlay que se guardaron
+        calls = mock_redis_service.set_json.call_args_list
+        saved_base = calls[0][0][1]
+        saved_overlay = calls[1][0][1]
         
         # Verificar estructura del mock product
-        assert saved_product["id"] == "prod_warmup"
-        assert saved_product["market_id"] == "MX"
-        assert saved_product["warmup_data"] is True
-        assert "warmed_at" in saved_product
-        assert "_market_cache_metadata" in saved_product
+        assert saved_base["id"] == "prod_warmup"
+        assert saved_base["warmup_data"] is True
+        assert "warmed_at" in saved_base
+        assert saved_overlay["fields"]["market_id"] == "MX"
+        assert "_market_cache_metadata" in saved_overlay
     
     @pytest.mark.asyncio
     async def test_warm_cache_with_empty_list(
@@ -804,9 +859,9 @@ class TestWarmCache:
         
         # Simular que solo 2 de 3 se guardan exitosamente
         mock_redis_service.set_json = AsyncMock(side_effect=[
-            True,   # prod_1 OK
-            False,  # prod_2 FAIL
-            True    # prod_3 OK
+            True, True,   # prod_1 OK (base + overlay)
+            False,        # prod_2 FAIL (base)
+            True, True    # prod_3 OK (base + overlay)
         ])
         
         result = await market_cache_instance.warm_cache_for_market(
@@ -887,6 +942,57 @@ class TestMarketInvalidation:
         
         # Debería completarse sin errores
         assert result is True
+    
+    @pytest.mark.asyncio
+    async def test_invalidate_market_uses_index_with_scan_fallback(
+        self,
+        market_cache_instance,
+        mock_redis_service
+    ):
+        """
+        Verifica que la invalidación usa el índice del mercado (sin KEYS).
+        
+        Given: Un market_id y entity_type
+        When: Se invalida
+        Then: Se llama delete_indexed con el índice y el patrón de respaldo
+        """
+        mock_redis_service.delete_indexed = AsyncMock(return_value=4)
+        
+        assert await market_cache_instance.invalidate_market("US", entity_type="product") is True
+        
+        mock_redis_service.delete_indexed.assert_awaited_once_with(
+            "idx:market_cache:US:product",
+            fallback_pattern="market_cache:US:product:*"
+        )
+    
+    @pytest.mark.asyncio
+    async def test_invalidate_market_redis_error_returns_false(
+        self,
+        market_cache_instance,
+        mock_redis_service
+    ):
+        """
+        Verifica que un error de Redis no se propaga.
+        """
+        mock_redis_service.delete_indexed = AsyncMock(side_effect=Exception("boom"))
+        
+        assert await market_cache_instance.invalidate_market("MX") is False
+    
+    @pytest.mark.asyncio
+    async def test_set_product_registers_market_indexes(
+        self,
+        market_cache_instance,
+        mock_redis_service,
+        sample_product
+    ):
+        """
+        Verifica que set_product registra la clave en los índices del mercado.
+        """
+        await market_cache_instance.set_product("prod_1", sample_product, "ES")
+        
+        assert mock_redis_service.set_json.call_args.kwargs["indexes"] == [
+            "idx:market_cache:ES", "idx:market_cache:ES:product"
+        ]
 
 
 # ============================================================================
@@ -926,16 +1032,21 @@ class TestIntegrationAndEdgeCases:
             "ES"
         )
         
-        # Verificar que se llamó set_json con keys diferentes
-        assert mock_redis_service.set_json.call_count == 2
+        # Verificar que cada mercado tiene su propio overlay
+        calls = [
+            c for c in mock_redis_service.set_json.call_args_list
+            if c[0][0] != "market_cache:product:prod_123"
+        ]
+        assert len(calls) == 2
         
-        calls = mock_redis_service.set_json.call_args_list
-        us_key = calls[0][0][0]
-        es_key = calls[1][0][0]
+        us_key, us_overlay = calls[0][0][:2]
+        es_key, es_overlay = calls[1][0][:2]
         
         assert "US" in us_key
         assert "ES" in es_key
         assert us_key != es_key
+        assert us_overlay["fields"]["price"] == 100.0
+        assert es_overlay["fields"]["price"] == 85.0
     
     @pytest.mark.asyncio
     async def test_stats_track_multiple_markets(
@@ -976,12 +1087,12 @@ class TestIntegrationAndEdgeCases:
         Then: Hit ratio es correcto
         """
         # 3 hits, 2 misses = 60% hit ratio
-        mock_redis_service.get_json = AsyncMock(side_effect=[
-            {"id": "1"},  # Hit
-            {"id": "2"},  # Hit
-            None,         # Miss
-            {"id": "3"},  # Hit
-            None          # Miss
+        mock_redis_service.mget = AsyncMock(side_effect=[
+            stored_entries({"id": "1"}),  # Hit
+            stored_entries({"id": "2"}),  # Hit
+            [None, None],                 # Miss
+            stored_entries({"id": "3"}),  # Hit
+            [None, None]                  # Miss
         ])
         
         for i in range(5):
@@ -0,0 +1,136 @@
+"""
+Test Suite for ProductSearchIndex
+=================================
+
+Tests para src/recommenders/product_search_index.py validando:
+- Normalización (minúsculas, acentos, HTML)
+- Búsqueda por tokens y prefijos con AND
+- Orden de catálogo y total exacto
+- Detección de índice obsoleto y reconstrucción
+- Ranking por relevancia TF-IDF sobre las coincidencias
+
+Author: Senior Architecture Team
+Version: 1.0.0
+"""
+
+import pytest
+
+from src.recommenders.product_search_index import (
+    ProductSearchIndex,
+    get_search_index,
+    tokenize
+)
+from src.recommenders.tfidf_recommender import TFIDFRecommender
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def catalog():
+    """Catálogo con acentos y HTML en las descripciones."""
+    return [
+        {"id": "1", "title": "Aros dorados", "body_html": "<p>Aros de <strong>oro</strong></p>", "product_type": "Aros"},
+        {"id": "2", "title": "Camiseta básica", "body_html": "Camiseta de algodón", "product_type": "Ropa"},
+        {"id": "3", "title": "Collar dorado", "body_html": "Collar con baño de oro", "product_type": "Collares"},
+        {"id": "4", "title": "Camiseta estampada", "body_html": "Algodón orgánico", "product_type": "Ropa"},
+    ]
+
+
+@pytest.fixture
+def index(catalog):
+    return ProductSearchIndex.build(catalog)
+
+
+# ============================================================================
+# TEST CLASS: TOKENIZATION
+# ============================================================================
+
+class TestTokenize:
+    """Tests de normalización de texto."""
+
+    def test_folds_accents_like_category_extraction(self):
+        """Los acentos y la ñ se pliegan igual que extract_categories_from_query."""
+        assert tokenize("Básica ALGODÓN Niño") == ["basica", "algodon", "nino"]
+
+    def test_strips_html_tags(self):
+        """Las etiquetas HTML no generan tokens."""
+        assert tokenize("<p>Aros de <strong>oro</strong></p>") == ["aros", "de", "oro"]
+
+
+# ============================================================================
+# TEST CLASS: SEARCH
+# ============================================================================
+
+class TestProductSearchIndex:
+    """Tests de búsqueda en el índice invertido."""
+
+    def test_token_match_in_catalog_order(self, index):
+        """Coincidencias en título o descripción, en orden de catálogo."""
+        assert index.search("camiseta").tolist() == [1, 3]
+
+    def test_prefix_match(self, index):
+        """Cada token se busca como prefijo (búsqueda mientras se escribe)."""
+        assert index.search("dora").tolist() == [0, 2]
+        assert index.search("cam").tolist() == [1, 3]
+
+    def test_accent_insensitive(self, index):
+        """Consultas con o sin acentos devuelven lo mismo."""
+        assert index.search("algodón").tolist() == index.search("algodon").tolist() == [1, 3]
+
+    def test_all_tokens_required(self, index):
+        """Varios tokens se combinan con AND."""
+        assert index.search("camiseta organico").tolist() == [3]
+        assert index.search("oro collar").tolist() == [2]
+        assert index.search("camiseta oro").size == 0
+
+    def test_no_tokens_no_results(self, index):
+        """Una consulta sin palabras no devuelve resultados."""
+        assert index.search("  ¿? ").size == 0
+
+    def test_get_search_index_rebuilds_when_stale(self, catalog):
+        """El índice se reconstruye si el catálogo del recomendador cambia."""
+        recommender = TFIDFRecommender()
+        recommender.product_data = catalog
+        first = get_search_index(recommender)
+        assert get_search_index(recommender) is first
+
+        recommender.product_data = catalog[:1]
+        rebuilt = get_search_index(recommender)
+        assert rebuilt is not first
+        assert rebuilt.search("camiseta").size == 0
+
+
+# ============================================================================
+# TEST CLASS: RECOMMENDER INTEGRATION
+# ============================================================================
+
+class TestRecommenderSearchIndex:
+    """Tests del índice mantenido por TFIDFRecommender."""
+
+    async def test_built_on_fit_and_update(self, catalog):
+        """fit() y update_products() dejan el índice sincronizado."""
+        recommender = TFIDFRecommender(precompute_neighbors=False)
+        assert await recommender.fit(catalog)
+        assert recommender.search_index.is_current(recommender.product_data)
+
+        await recommender.update_products(
+            upserts=[{"id": "5", "title": "Camiseta dorada", "body_html": "Algodón", "product_type": "Ropa"}],
+            removed_ids=["2"]
+        )
+        assert recommender.search_index.is_current(recommender.product_data)
+        ids = [recommender.product_data[i]["id"] for i in recommender.search_index.search("camiseta")]
+        assert ids == ["4", "5"]
+
+    async def test_relevance_ranking_restricted_to_candidates(self, catalog):
+        """search_products con candidatos solo ordena esas filas, sin umbral."""
+        recommender = TFIDFRecommender(precompute_neighbors=False)
+        assert await recommender.fit(catalog)
+
+        candidates = recommender.search_index.search("camiseta")
+        ranked = await recommender.search_products(
+            "camiseta algodon", n=10, candidate_indices=candidates, min_score=None
+        )
+        assert sorted(r["id"] for r in ranked) == ["2", "4"]
+        assert ranked[0]["similarity_score"] >= ranked[1]["similarity_score"]
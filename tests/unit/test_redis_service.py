@@ -18,16 +18,20 @@ Version: 1.0.0 - Fase 3A Day 1
 import pytest
 import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch, call
+from redis.exceptions import ConnectionError as RedisConnectionError
 from typing import Dict, Any
 import json
+import time
 
 # Module under test
 from src.api.core.redis_service import (
+    LatencyHistogram,
     RedisService,
     RedisServiceError,
     get_redis_service,
     get_redis_health,
-    get_redis_stats
+    get_redis_stats,
+    index_key
 )
 
 # ============================================================================
@@ -303,9 +307,9 @@ class TestRedisServiceInitialization:
         """
         Verifica que _ensure_connection() valida disponibilidad del cliente.
         
-        Given: Un RedisService inicializado
+        Given: Un RedisService inicializado y conectado
         When: Se llama _ensure_connection()
-        Then: Se verifica la conexión con ping
+        Then: Retorna True sin PING adicional (la sonda vigila la conexión)
         """
         mock_client = mock_optimized_client.return_value
         mock_client.ping = AsyncMock(return_value=True)
@@ -315,7 +319,7 @@ class TestRedisServiceInitialization:
         
         # Verificar resultado
         assert result is True, "Should return True when client is available"
-        mock_client.ping.assert_called()
+        mock_client.ping.assert_not_called()
         
         # Verificar estado interno
         assert redis_service_instance._connected is True
@@ -724,7 +728,7 @@ class TestRedisServiceErrorHandling:
         """
         # Configurar mock para lanzar excepción
         mock_client = mock_optimized_client.return_value
-        mock_client.get = AsyncMock(side_effect=Exception("Redis error"))
+        mock_client.get = AsyncMock(side_effect=RedisConnectionError("Redis error"))
         
         redis_service_instance.reset_stats()
         
@@ -741,6 +745,23 @@ class TestRedisServiceErrorHandling:
         # Verificar que se marcó como desconectado
         assert redis_service_instance._connected is False, \
             "Should mark as disconnected after error"
+    
+    @pytest.mark.asyncio
+    async def test_non_connection_errors_keep_connection(
+        self,
+        redis_service_instance,
+        mock_optimized_client
+    ):
+        """
+        Given: Un comando falla por un error que no es de conexión
+        When: Se ejecuta el comando
+        Then: Devuelve el valor por defecto pero la conexión sigue activa
+        """
+        mock_client = mock_optimized_client.return_value
+        mock_client.get = AsyncMock(side_effect=UnicodeDecodeError("utf-8", b"\x93", 0, 1, "invalid start byte"))
+        
+        assert await redis_service_instance.get("binary") is None
+        assert redis_service_instance._connected is True
 
 
 # ============================================================================
@@ -1001,6 +1022,548 @@ class TestRedisServiceConvenienceFunctions:
         RedisService._instance = None
 
 
+# ============================================================================
+# TEST CLASS 8: BATCH OPERATIONS
+# ============================================================================
+
+class TestRedisServiceBatchOperations:
+    """
+    Tests de operaciones multi-clave.
+    
+    Verifica:
+    - MGET en un solo round-trip, alineado con las claves
+    - MSET con TTL vía pipeline
+    - DELETE de varias claves, pipeline genérico y borrado por patrón con SCAN
+    - Degradación cuando Redis no está disponible
+    """
+    
+    @pytest.mark.asyncio
+    async def test_mget_single_round_trip(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Dos de tres claves existen en Redis
+        When: Se ejecuta mget(keys)
+        Then: Una sola llamada al cliente y resultados en orden de las claves
+        """
+        mock_client = mock_optimized_client.return_value
+        mock_client.mget = AsyncMock(return_value=["a", None, "c"])
+        
+        result = await redis_service_instance.mget(["k1", "k2", "k3"])
+        
+        assert result == ["a", None, "c"]
+        mock_client.mget.assert_called_once_with(["k1", "k2", "k3"])
+        stats = redis_service_instance.get_stats()
+        assert stats["cache_hits"] == 2
+        assert stats["cache_misses"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_mget_disconnected_returns_nones(self, redis_service_instance):
+        """
+        Given: Sin cliente Redis
+        When: Se ejecuta mget(keys)
+        Then: Una lista de None del mismo tamaño
+        """
+        redis_service_instance._client = None
+        assert await redis_service_instance.mget(["k1", "k2"]) == [None, None]
+    
+    @pytest.mark.asyncio
+    async def test_mset_with_ttl_uses_pipeline(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Un mapping de dos claves y un TTL
+        When: Se ejecuta mset_with_ttl
+        Then: Se encolan SETEX en un pipeline sin transacción y se ejecuta una vez
+        """
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[True, True])
+        mock_client = mock_optimized_client.return_value
+        mock_client.pipeline = MagicMock(return_value=pipe)
+        
+        result = await redis_service_instance.mset_with_ttl({"k1": "v1", "k2": "v2"}, ttl=60)
+        
+        assert result is True
+        mock_client.pipeline.assert_called_once_with(transaction=False)
+        pipe.setex.assert_has_calls([call("k1", 60, "v1"), call("k2", 60, "v2")])
+        pipe.execute.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_delete_many_single_command(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Tres claves a eliminar
+        When: Se ejecuta delete_many
+        Then: Un solo DEL con todas las claves
+        """
+        mock_client = mock_optimized_client.return_value
+        mock_client.delete = AsyncMock(return_value=2)
+        
+        assert await redis_service_instance.delete_many(["k1", "k2", "k3"]) == 2
+        mock_client.delete.assert_awaited_once_with("k1", "k2", "k3")
+        assert await redis_service_instance.delete_many([]) == 0
+    
+    @pytest.mark.asyncio
+    async def test_pipeline_context_manager(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Comandos heterogéneos encolados en el bloque
+        When: Se sale del bloque
+        Then: Se ejecutan en un único pipeline y se exponen los resultados
+        """
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[True, 1])
+        mock_client = mock_optimized_client.return_value
+        mock_client.pipeline = MagicMock(return_value=pipe)
+        
+        async with redis_service_instance.pipeline(transaction=True) as batch:
+            batch.setex("k1", 60, "v1")
+            batch.sadd("index", "k1")
+        
+        assert batch.succeeded is True
+        assert batch.results == [True, 1]
+        mock_client.pipeline.assert_called_once_with(transaction=True)
+        pipe.setex.assert_called_once_with("k1", 60, "v1")
+        pipe.sadd.assert_called_once_with("index", "k1")
+    
+    @pytest.mark.asyncio
+    async def test_pipeline_rejects_unknown_commands(self, redis_service_instance):
+        """
+        Given: Un nombre de comando mal escrito
+        When: Se encola en el pipeline
+        Then: Lanza AttributeError en lugar de fallar en silencio
+        """
+        async with redis_service_instance.pipeline() as batch:
+            with pytest.raises(AttributeError):
+                batch.setx("k1", 60, "v1")
+            batch.setex("k1", 60, "v1")
+        
+        assert [command for command, _, _ in batch.commands] == ["setex"]
+    
+    @pytest.mark.asyncio
+    async def test_pipeline_degrades_when_disconnected(self, redis_service_instance):
+        """
+        Given: Sin cliente Redis
+        When: Se ejecuta un pipeline
+        Then: No lanza excepción y succeeded es False
+        """
+        redis_service_instance._client = None
+        
+        async with redis_service_instance.pipeline() as batch:
+            batch.set("k1", "v1")
+        
+        assert batch.succeeded is False
+        assert batch.results == [None]
+        assert redis_service_instance.get_stats()["operations_failed"] >= 1
+    
+    @pytest.mark.asyncio
+    async def test_delete_pattern_uses_scan_batches(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Cinco claves que coinciden con el patrón
+        When: Se ejecuta delete_pattern con batch_size=2
+        Then: Se recorre con SCAN (nunca KEYS) y se borra en lotes
+        """
+        async def scan_iter(match=None, count=None):
+            for i in range(5):
+                yield f"user:{i}"
+        
+        mock_client = mock_optimized_client.return_value
+        mock_client.scan_iter = scan_iter
+        mock_client.delete = AsyncMock(side_effect=lambda *keys: len(keys))
+        
+        assert await redis_service_instance.delete_pattern("user:*", batch_size=2) == 5
+        assert [c.args for c in mock_client.delete.await_args_list] == [
+            ("user:0", "user:1"), ("user:2", "user:3"), ("user:4",)
+        ]
+        mock_client.keys.assert_not_called()
+
+
+# ============================================================================
+# TEST CLASS 9: CONNECTION MANAGEMENT
+# ============================================================================
+
+class TestRedisServiceConnectionManagement:
+    """
+    Tests de gestión de conexión sin PING por comando.
+    
+    Verifica:
+    - Un comando = un round-trip
+    - Reconexión tras error, limitada en el tiempo y por el circuit breaker
+    - Sonda de salud en segundo plano
+    - Histogramas de latencia en get_stats()
+    """
+    
+    @pytest.mark.asyncio
+    async def test_commands_do_not_ping(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Un RedisService conectado
+        When: Se ejecutan GET, SET y DELETE
+        Then: No se envía ningún PING
+        """
+        mock_client = mock_optimized_client.return_value
+        mock_client.ping.reset_mock()
+        
+        await redis_service_instance.get("k")
+        await redis_service_instance.set("k", "v", ttl=10)
+        await redis_service_instance.delete("k")
+        
+        mock_client.ping.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_reconnects_after_command_error(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Un comando falla y marca la conexión como caída
+        When: Se ejecuta el siguiente comando
+        Then: Se reconecta con un PING y el comando se ejecuta
+        """
+        mock_client = mock_optimized_client.return_value
+        mock_client.get = AsyncMock(side_effect=[RedisConnectionError("Connection reset"), "value"])
+        mock_client.ping.reset_mock()
+        redis_service_instance._last_connection_attempt = 0
+        
+        assert await redis_service_instance.get("k") is None
+        assert redis_service_instance._connected is False
+        
+        assert await redis_service_instance.get("k") == "value"
+        mock_client.ping.assert_awaited_once()
+        assert redis_service_instance._connected is True
+    
+    @pytest.mark.asyncio
+    async def test_reconnect_throttled(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Un intento de reconexión reciente
+        When: Se ejecuta un comando con la conexión caída
+        Then: Falla rápido sin PING
+        """
+        mock_client = mock_optimized_client.return_value
+        mock_client.ping.reset_mock()
+        redis_service_instance._connected = False
+        redis_service_instance._last_connection_attempt = time.time()
+        
+        assert await redis_service_instance.get("k") is None
+        mock_client.ping.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_reconnect_respects_service_factory_breaker(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: El circuit breaker de ServiceFactory está abierto
+        When: Se intenta reconectar
+        Then: No se envía PING
+        """
+        from src.api.factories.service_factory import ServiceFactory
+        
+        mock_client = mock_optimized_client.return_value
+        mock_client.ping.reset_mock()
+        redis_service_instance._connected = False
+        redis_service_instance._last_connection_attempt = 0
+        
+        original = ServiceFactory._redis_circuit_breaker
+        ServiceFactory._redis_circuit_breaker = {
+            "failures": 3, "last_failure": time.time(), "circuit_open": True
+        }
+        try:
+            assert await redis_service_instance._ensure_connection() is False
+            mock_client.ping.assert_not_called()
+        finally:
+            ServiceFactory._redis_circuit_breaker = original
+    
+    @pytest.mark.asyncio
+    async def test_health_probe_detects_outage(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Redis deja de responder
+        When: Se ejecuta la sonda
+        Then: La conexión se marca caída y se registra el resultado
+        """
+        mock_client = mock_optimized_client.return_value
+        mock_client.ping = AsyncMock(side_effect=Exception("timeout"))
+        
+        assert await redis_service_instance._probe_once() is False
+        assert redis_service_instance._connected is False
+        assert redis_service_instance.get_stats()["health_probe"]["last_probe"]["ok"] is False
+    
+    @pytest.mark.asyncio
+    async def test_health_probe_lifecycle(self, redis_service_instance):
+        """
+        Given: Un RedisService
+        When: Se inicia y se detiene la sonda
+        Then: get_stats() refleja su estado
+        """
+        redis_service_instance.start_health_probe(interval=60)
+        assert redis_service_instance.get_stats()["health_probe"]["running"] is True
+        
+        await redis_service_instance.stop_health_probe()
+        assert redis_service_instance.get_stats()["health_probe"]["running"] is False
+    
+    @pytest.mark.asyncio
+    async def test_latency_histograms_in_stats(self, redis_service_instance):
+        """
+        Given: Varias operaciones GET y SET
+        When: Se llama get_stats()
+        Then: Hay un histograma por comando con conteos y percentiles
+        """
+        redis_service_instance.reset_stats()
+        await redis_service_instance.get("k")
+        await redis_service_instance.get("k")
+        await redis_service_instance.set("k", "v")
+        
+        latency = redis_service_instance.get_stats()["latency_ms"]
+        assert latency["get"]["count"] == 2
+        assert latency["set"]["count"] == 1
+        assert latency["get"]["buckets"]["le_inf"] == 2
+        assert latency["get"]["p95_ms"] is not None
+    
+    def test_histogram_percentiles(self):
+        """
+        Given: Observaciones conocidas
+        When: Se calculan percentiles
+        Then: Se devuelve el límite superior del bucket correspondiente
+        """
+        histogram = LatencyHistogram()
+        for elapsed_ms in [0.3] * 90 + [20] * 10:
+            histogram.observe(elapsed_ms)
+        
+        assert histogram.percentile(0.5) == 0.5
+        assert histogram.percentile(0.95) == 25.0
+        assert histogram.snapshot()["max_ms"] == 20
+
+
+# ============================================================================
+# TEST CLASS 10: SECONDARY INDEXES
+# ============================================================================
+
+class TestRedisServiceSecondaryIndexes:
+    """
+    Tests de índices secundarios (sorted sets) para listar e invalidar sin KEYS.
+    
+    Verifica:
+    - Registro en el índice en el mismo pipeline que la escritura
+    - Listado con purga de expirados
+    - Invalidación por índice y fallback a SCAN para claves sin indexar
+    """
+    
+    @staticmethod
+    def _mock_pipeline(mock_optimized_client, results):
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=results)
+        mock_optimized_client.return_value.pipeline = MagicMock(return_value=pipe)
+        return pipe
+    
+    def test_index_key_namespace(self):
+        """El índice vive fuera del namespace que indexa."""
+        assert index_key("product:") == "idx:product:"
+    
+    @pytest.mark.asyncio
+    async def test_set_with_indexes_single_pipeline(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Un SET con TTL e índice
+        When: Se ejecuta set(..., indexes=[...])
+        Then: SETEX, purga y ZADD van en el mismo pipeline con score = expiración
+        """
+        pipe = self._mock_pipeline(mock_optimized_client, [True, 0, 1])
+        
+        before = time.time()
+        assert await redis_service_instance.set("product:1", "{}", ttl=60, indexes=["idx:product:"]) is True
+        
+        pipe.setex.assert_called_once_with("product:1", 60, "{}")
+        pipe.zremrangebyscore.assert_called_once()
+        index, members = pipe.zadd.call_args.args
+        assert index == "idx:product:"
+        assert before + 60 <= members["product:1"] <= time.time() + 60
+        pipe.execute.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_index_members_decodes_and_prunes(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Un índice con miembros en bytes
+        When: Se listan sus miembros
+        Then: Se purgan expirados y se devuelven como str
+        """
+        pipe = self._mock_pipeline(mock_optimized_client, [1, [(b"product:1", 1e12), ("product:2", 1e12)]])
+        
+        assert await redis_service_instance.index_members("idx:product:") == ["product:1", "product:2"]
+        pipe.zremrangebyscore.assert_called_once()
+        pipe.zrange.assert_called_once_with("idx:product:", 0, -1, withscores=True)
+    
+    @pytest.mark.asyncio
+    async def test_index_members_sweeps_missing_persistent_keys(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Miembros sin TTL (score infinito), uno ya borrado
+        When: Se listan los miembros
+        Then: El borrado se retira del índice, una sola vez por intervalo
+        """
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(side_effect=[
+            [0, [("k:live", float("inf")), ("k:gone", float("inf")), ("k:ttl", 1e12)]],
+            [1, 0],
+            [1],
+            [0, [("k:live", float("inf")), ("k:ttl", 1e12)]],
+        ])
+        mock_optimized_client.return_value.pipeline = MagicMock(return_value=pipe)
+        
+        assert await redis_service_instance.index_members("idx:k:") == ["k:live", "k:ttl"]
+        assert [c.args for c in pipe.exists.call_args_list] == [("k:live",), ("k:gone",)]
+        pipe.zrem.assert_called_once_with("idx:k:", "k:gone")
+        
+        assert await redis_service_instance.index_members("idx:k:") == ["k:live", "k:ttl"]
+        assert pipe.exists.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_delete_indexed_deletes_members_and_index(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Un índice con dos claves
+        When: Se ejecuta delete_indexed
+        Then: Se borran las claves y el índice sin SCAN
+        """
+        redis_service_instance.index_members = AsyncMock(return_value=["u:1:a", "u:1:b"])
+        redis_service_instance._scan_and_delete = AsyncMock(return_value=0)
+        mock_optimized_client.return_value.get = AsyncMock(return_value="1")
+        pipe = self._mock_pipeline(mock_optimized_client, [2, 1])
+        
+        assert await redis_service_instance.delete_indexed("idx:u:1", fallback_pattern="u:1:*") == 2
+        assert pipe.delete.call_args_list == [call("u:1:a", "u:1:b"), call("idx:u:1")]
+        redis_service_instance._scan_and_delete.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_delete_indexed_falls_back_to_scan(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Un índice con claves nuevas y claves legacy sin indexar
+        When: Se ejecuta delete_indexed con patrón de respaldo sin marcador
+        Then: Se borran ambas y se guarda el marcador de migración
+        """
+        redis_service_instance.index_members = AsyncMock(return_value=["u:1:new"])
+        redis_service_instance._scan_and_delete = AsyncMock(return_value=3)
+        mock_client = mock_optimized_client.return_value
+        mock_client.get = AsyncMock(return_value=None)
+        mock_client.setex = AsyncMock(return_value=True)
+        self._mock_pipeline(mock_optimized_client, [1, 1])
+        
+        assert await redis_service_instance.delete_indexed("idx:u:1", fallback_pattern="u:1:*") == 4
+        redis_service_instance._scan_and_delete.assert_awaited_once_with("u:1:*", 500)
+        mock_client.setex.assert_awaited_once_with(
+            "idx:u:1#migrated", RedisService.INDEX_MIGRATION_MARKER_TTL, "1"
+        )
+    
+    @pytest.mark.asyncio
+    async def test_delete_indexed_incomplete_scan_keeps_retrying(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Un SCAN de respaldo que no llega al final
+        When: Se ejecuta delete_indexed
+        Then: No se guarda el marcador, así que el siguiente intento vuelve a recorrer
+        """
+        redis_service_instance.index_members = AsyncMock(return_value=[])
+        redis_service_instance._scan_and_delete = AsyncMock(return_value=None)
+        mock_client = mock_optimized_client.return_value
+        mock_client.get = AsyncMock(return_value=None)
+        mock_client.setex = AsyncMock(return_value=True)
+        
+        assert await redis_service_instance.delete_indexed("idx:u:1", fallback_pattern="u:1:*") == 0
+        mock_client.setex.assert_not_called()
+
+    
+    @pytest.mark.asyncio
+    async def test_adopt_unindexed_registers_legacy_keys_and_marks(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Un namespace sin marcador con claves legacy (con TTL, sin TTL y ya borradas)
+        When: Se ejecuta adopt_unindexed tras un SCAN completo
+        Then: Se registran en el índice con su expiración y se guarda el marcador
+        """
+        async def scan_iter(match, count):
+            for key in [b"p:1", b"p:2", b"p:stats_x", b"p:gone"]:
+                yield key
+        
+        mock_client = mock_optimized_client.return_value
+        mock_client.get = AsyncMock(return_value=None)
+        mock_client.setex = AsyncMock(return_value=True)
+        mock_client.scan_iter = scan_iter
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(side_effect=[[60, -1, -2], [2]])
+        mock_client.pipeline = MagicMock(return_value=pipe)
+        
+        before = time.time()
+        keys = await redis_service_instance.adopt_unindexed(
+            "idx:p:", "p:*", key_filter=lambda key: "stats_" not in key
+        )
+        
+        assert keys == ["p:1", "p:2", "p:gone"]
+        index, members = pipe.zadd.call_args.args
+        assert index == "idx:p:" and set(members) == {"p:1", "p:2"}
+        assert before + 60 <= members["p:1"] <= time.time() + 60
+        assert members["p:2"] == float("inf")
+        mock_client.setex.assert_awaited_once_with("idx:p:#migrated", RedisService.INDEX_MIGRATION_MARKER_TTL, "1")
+    
+    @pytest.mark.asyncio
+    async def test_adopt_unindexed_skips_migrated_and_retries_incomplete_scan(
+        self, redis_service_instance, mock_optimized_client
+    ):
+        """
+        Given: Un namespace ya marcado, y después uno cuyo SCAN falla a mitad
+        When: Se ejecuta adopt_unindexed
+        Then: El marcado no se recorre; el incompleto no se marca ni se indexa
+        """
+        async def failing_scan(match, count):
+            yield "p:1"
+            raise RedisConnectionError("down")
+        
+        mock_client = mock_optimized_client.return_value
+        mock_client.scan_iter = MagicMock(side_effect=failing_scan)
+        mock_client.setex = AsyncMock(return_value=True)
+        
+        mock_client.get = AsyncMock(return_value="1")
+        assert await redis_service_instance.adopt_unindexed("idx:p:", "p:*") == []
+        mock_client.scan_iter.assert_not_called()
+        
+        mock_client.get = AsyncMock(return_value=None)
+        assert await redis_service_instance.adopt_unindexed("idx:p:", "p:*") == ["p:1"]
+        mock_client.setex.assert_not_called()
+
+
+# ============================================================================
+# TEST CLASS 11: SHORT LOCKS
+# ============================================================================
+
+class TestRedisServiceLocks:
+    """
+    Tests de locks cortos (SET NX PX + compare-and-delete).
+    """
+    
+    @pytest.mark.asyncio
+    async def test_acquire_lock_returns_token_or_none(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Un lock libre y luego ocupado
+        When: Se ejecuta acquire_lock
+        Then: Devuelve un token con SET NX PX, y None si ya existe
+        """
+        mock_client = mock_optimized_client.return_value
+        mock_client.set = AsyncMock(side_effect=[True, None])
+        
+        token = await redis_service_instance.acquire_lock("lock:k", 5000)
+        assert token
+        mock_client.set.assert_awaited_with("lock:k", token, nx=True, px=5000)
+        
+        assert await redis_service_instance.acquire_lock("lock:k", 5000) is None
+    
+    @pytest.mark.asyncio
+    async def test_acquire_lock_raises_when_unavailable(self, redis_service_instance):
+        """
+        Given: Sin cliente Redis
+        When: Se ejecuta acquire_lock
+        Then: RedisServiceError (el llamador decide continuar sin lock)
+        """
+        redis_service_instance._client = None
+        redis_service_instance._connected = False
+        redis_service_instance._reconnect = AsyncMock(return_value=False)
+        
+        with pytest.raises(RedisServiceError):
+            await redis_service_instance.acquire_lock("lock:k", 5000)
+    
+    @pytest.mark.asyncio
+    async def test_release_lock_compares_token(self, redis_service_instance, mock_optimized_client):
+        """
+        Given: Un lock tomado
+        When: Se ejecuta release_lock
+        Then: Un único EVAL con el token como argumento
+        """
+        mock_client = mock_optimized_client.return_value
+        mock_client.eval = AsyncMock(return_value=1)
+        
+        assert await redis_service_instance.release_lock("lock:k", "token-1")
+        assert mock_client.eval.await_args.args[1:] == (1, "lock:k", "token-1")
+
+
 # ============================================================================
 # RUNNER CONFIGURATION
 # ============================================================================
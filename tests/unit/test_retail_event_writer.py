@@ -0,0 +1,178 @@
+"""
+Test Suite for RetailEventWriter
+================================
+
+Tests para src/recommenders/retail_event_writer.py validando:
+- Escritura en segundo plano fuera del event loop
+- Import en bloque cuando la cola es profunda
+- Reintentos con backoff y descarte tras max_retries
+- Cola acotada y métricas de profundidad/lag
+- record_user_event de RetailAPIRecommender sin latencia de Retail API
+
+Author: Senior Architecture Team
+Version: 1.0.0
+"""
+
+import asyncio
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from google.cloud import retail_v2
+
+from src.recommenders.retail_event_writer import RetailEventWriter
+
+
+class FakeUserEventClient:
+    """UserEventServiceClient síncrono con latencia y fallos configurables."""
+
+    def __init__(self, latency=0.0, failures=0):
+        self.latency = latency
+        self.failures = failures
+        self.written = []
+        self.imported = []
+        self.threads = set()
+
+    def write_user_event(self, request):
+        self.threads.add(threading.current_thread().name)
+        threading.Event().wait(self.latency)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("retail unavailable")
+        self.written.append(request.user_event.visitor_id)
+        return request.user_event
+
+    def import_user_events(self, request):
+        self.threads.add(threading.current_thread().name)
+        events = request.input_config.user_event_inline_source.user_events
+        self.imported.append([event.visitor_id for event in events])
+        operation = MagicMock()
+        operation.result.return_value = None
+        return operation
+
+
+def _event(visitor_id):
+    return retail_v2.UserEvent(event_type="detail-page-view", visitor_id=visitor_id)
+
+
+async def _drain(writer, timeout=2.0):
+    async def wait():
+        while True:
+            await writer._queue.join()
+            if not writer.get_stats()["pending_retries"]:
+                return
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(wait(), timeout=timeout)
+
+
+# ============================================================================
+# TEST CLASS: WRITER
+# ============================================================================
+
+class TestRetailEventWriter:
+    """Tests del writer en segundo plano."""
+
+    async def test_submit_returns_before_write(self):
+        """submit no espera a Retail API; la escritura ocurre en el thread pool."""
+        client = FakeUserEventClient(latency=0.2)
+        writer = RetailEventWriter(client, parent="projects/p/locations/global/catalogs/c")
+
+        loop_start = asyncio.get_running_loop().time()
+        assert writer.submit(_event("u1"))
+        assert asyncio.get_running_loop().time() - loop_start < 0.05
+        assert client.written == []
+
+        await _drain(writer)
+        assert client.written == ["u1"]
+        assert all(name.startswith("retail-events") for name in client.threads)
+        stats = writer.get_stats()
+        assert stats["written"] == 1
+        assert stats["last_lag_ms"] >= 200
+        await writer.stop()
+
+    async def test_deep_queue_uses_import(self):
+        """Con la cola por encima del umbral se envía un único import_user_events."""
+        client = FakeUserEventClient()
+        writer = RetailEventWriter(client, parent="p", batch_threshold=5)
+
+        for i in range(8):
+            writer.submit(_event(f"u{i}"))
+        await _drain(writer)
+
+        assert client.imported == [[f"u{i}" for i in range(8)]]
+        assert client.written == []
+        assert writer.get_stats()["imported"] == 8
+        await writer.stop()
+
+    async def test_failures_retried_with_backoff(self):
+        """Un fallo transitorio se reintenta hasta escribir el evento."""
+        client = FakeUserEventClient(failures=2)
+        writer = RetailEventWriter(client, parent="p", base_backoff_seconds=0.01)
+
+        writer.submit(_event("u1"))
+        await _drain(writer)
+
+        assert client.written == ["u1"]
+        stats = writer.get_stats()
+        assert stats["retries"] == 2
+        assert stats["failed"] == 0
+        await writer.stop()
+
+    async def test_event_dropped_after_max_retries(self):
+        """Tras max_retries el evento se descarta y se contabiliza."""
+        client = FakeUserEventClient(failures=10)
+        writer = RetailEventWriter(client, parent="p", max_retries=2, base_backoff_seconds=0.01)
+
+        writer.submit(_event("u1"))
+        await _drain(writer)
+
+        stats = writer.get_stats()
+        assert stats["failed"] == 1
+        assert stats["last_error"] == "retail unavailable"
+        assert client.written == []
+        await writer.stop()
+
+    async def test_bounded_queue_rejects_when_full(self):
+        """Con la cola llena submit devuelve False en lugar de bloquear."""
+        client = FakeUserEventClient(latency=0.1)
+        writer = RetailEventWriter(client, parent="p", max_queue_size=2, max_batch_size=1)
+
+        results = [writer.submit(_event(f"u{i}")) for i in range(3)]
+
+        assert results == [True, True, False]
+        assert writer.get_stats()["dropped"] == 1
+        assert writer.get_stats()["queue_depth"] == 2
+        await writer.stop(drain_timeout=1.0)
+
+
+# ============================================================================
+# TEST CLASS: RECOMMENDER INTEGRATION
+# ============================================================================
+
+class TestRetailRecommenderEvents:
+    """Tests de record_user_event con el writer."""
+
+    @pytest.fixture
+    def recommender(self):
+        with patch("src.recommenders.retail_api.PredictionServiceClient"), \
+             patch("src.recommenders.retail_api.ProductServiceClient"), \
+             patch("src.recommenders.retail_api.UserEventServiceClient", return_value=FakeUserEventClient(latency=0.3)), \
+             patch("src.recommenders.retail_api.CATALOG_MANAGER_AVAILABLE", False):
+            from src.recommenders.retail_api import RetailAPIRecommender
+            yield RetailAPIRecommender(project_number="123", location="global")
+
+    async def test_record_user_event_does_not_wait_for_retail(self, recommender):
+        """El evento se encola y la respuesta no incluye la latencia de Retail API."""
+        start = asyncio.get_running_loop().time()
+        result = await recommender.record_user_event(
+            user_id="user-1", event_type="purchase", product_id="p1", purchase_amount=20.0, currency_code="USD"
+        )
+
+        assert asyncio.get_running_loop().time() - start < 0.1
+        assert result["status"] == "success"
+        assert result["queued"] is True
+        assert result["currency_used"] == "USD"
+
+        await recommender.close()
+        assert recommender.user_event_client.written == ["user-1"]
+        assert recommender.get_event_writer_stats()["written"] == 1
@@ -0,0 +1,226 @@
+"""
+Test Suite for SemanticQueryIndex
+=================================
+
+Tests para src/api/core/semantic_query_index.py y el near-duplicate lookup de
+IntelligentPersonalizationCache validando:
+- Similitud coseno con el vectorizador TF-IDF del catálogo
+- Índice por mercado acotado y revectorización tras reentrenar
+- Reutilización de paráfrasis del mismo usuario sin romper diversificación
+- Fallback de mercado entre usuarios con ajuste ligero
+
+Author: Senior Architecture Team
+Version: 1.0.0
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.api.core.diversity_aware_cache import DiversityAwareCache
+from src.api.core.intelligent_personalization_cache import IntelligentPersonalizationCache
+from src.api.core.semantic_query_index import IndexedQuery, SemanticQueryIndex
+from src.recommenders.tfidf_recommender import create_vectorizer
+
+PRODUCT_TEXTS = [
+    "Gold earrings. Categoría: Joyeria",
+    "Silver earrings. Categoría: Joyeria",
+    "Gold necklace. Categoría: Joyeria",
+    "Silver necklace. Categoría: Joyeria",
+    "Running shoes. Categoría: Calzado",
+    "Trail running shoes. Categoría: Calzado",
+]
+
+
+def fitted_vectorizer(texts=PRODUCT_TEXTS):
+    vectorizer = create_vectorizer()
+    vectorizer.fit(texts)
+    return vectorizer
+
+
+class FakeRedis:
+    """Redis mínimo con get/setex"""
+
+    def __init__(self):
+        self.storage = {}
+
+    async def get(self, key):
+        return self.storage.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.storage[key] = value
+
+
+def _entry(key, query, user_id="u1", market_id="US", turn=1, excluded="no_exclusions", ttl=300):
+    return IndexedQuery(
+        cache_key=key, user_id=user_id, market_id=market_id, query=query, intent="initial_general",
+        turn_number=turn, excluded_hash=excluded, expires_at=time.time() + ttl
+    )
+
+
+# ============================================================================
+# TEST CLASS: INDEX
+# ============================================================================
+
+class TestSemanticQueryIndex:
+    """Tests del índice vectorial por mercado."""
+
+    def test_paraphrase_matches_above_threshold(self):
+        """Paráfrasis con los mismos términos del catálogo superan el umbral."""
+        vectorizer = fitted_vectorizer()
+        index = SemanticQueryIndex(lambda: vectorizer)
+
+        assert index.add(_entry("k1", "show me earrings"))
+        assert index.add(_entry("k2", "running shoes"))
+
+        matches = index.search("earrings please", "US", threshold=0.8)
+        assert [entry.cache_key for _, entry in matches] == ["k1"]
+        assert matches[0][0] == pytest.approx(1.0)
+
+        assert index.search("gold necklace", "US", threshold=0.8) == []
+        assert index.search("earrings please", "MX", threshold=0.8) == []
+
+    def test_queries_without_catalog_terms_are_not_indexed(self):
+        """Sin términos del vocabulario no hay vector (ni falsos positivos)."""
+        vectorizer = fitted_vectorizer()
+        index = SemanticQueryIndex(lambda: vectorizer)
+
+        assert not index.add(_entry("k1", "hello there"))
+        assert index.search("hello there", "US", threshold=0.5) == []
+
+    def test_market_index_is_bounded_and_skips_expired(self):
+        """Cada mercado conserva solo las entradas recientes y vigentes."""
+        vectorizer = fitted_vectorizer()
+        index = SemanticQueryIndex(lambda: vectorizer, max_entries_per_market=2)
+
+        index.add(_entry("expired", "earrings", ttl=-1))
+        for i in range(3):
+            index.add(_entry(f"k{i}", "gold earrings"))
+
+        keys = [entry.cache_key for _, entry in index.search("gold earrings", "US", threshold=0.5, limit=10)]
+        assert sorted(keys) == ["k1", "k2"]
+        assert index.get_stats()["entries"] == 2
+
+    def test_filtered_top_matches_widen_selection(self):
+        """Si las mejores entradas se filtran, la selección parcial se amplía hasta completar limit."""
+        vectorizer = fitted_vectorizer()
+        index = SemanticQueryIndex(lambda: vectorizer)
+        for i in range(4):
+            index.add(_entry(f"exact{i}", "gold earrings", user_id="other"))
+        index.add(_entry("close", "gold earrings necklace"))
+        index.add(_entry("unrelated", "running shoes"))
+
+        matches = index.search(
+            "gold earrings", "US", threshold=0.5, limit=1,
+            predicate=lambda entry: entry.user_id == "u1"
+        )
+
+        assert [entry.cache_key for _, entry in matches] == ["close"]
+        assert matches[0][0] < 1.0
+
+    def test_revectorizes_when_model_is_retrained(self):
+        """Un vectorizador nuevo revectoriza las huellas existentes."""
+        current = {"vectorizer": fitted_vectorizer()}
+        index = SemanticQueryIndex(lambda: current["vectorizer"])
+        index.add(_entry("k1", "gold earrings"))
+
+        current["vectorizer"] = fitted_vectorizer(PRODUCT_TEXTS + ["Gold bracelet", "Silver bracelet"])
+        matches = index.search("gold earrings", "US", threshold=0.9)
+
+        assert [entry.cache_key for _, entry in matches] == ["k1"]
+        assert index.get_stats()["revectorized"] == 1
+
+    def test_no_vectorizer_disables_index(self):
+        """Sin modelo TF-IDF cargado el índice no opera."""
+        index = SemanticQueryIndex(lambda: None)
+
+        assert not index.add(_entry("k1", "earrings"))
+        assert index.search("earrings", "US", threshold=0.1) == []
+
+
+# ============================================================================
+# TEST CLASS: PERSONALIZATION CACHE
+# ============================================================================
+
+class TestPersonalizationNearDuplicates:
+    """Tests del near-duplicate lookup en IntelligentPersonalizationCache."""
+
+    @pytest.fixture
+    def cache(self):
+        catalog = SimpleNamespace(product_data=[], vectorizer=fitted_vectorizer())
+        diversity_cache = DiversityAwareCache(redis_service=FakeRedis(), local_catalog=catalog)
+        return IntelligentPersonalizationCache(diversity_cache=diversity_cache)
+
+    @staticmethod
+    def _response(text="Earrings for you"):
+        return {
+            "personalized_response": text,
+            "personalized_recommendations": [{"id": "p1", "title": "Gold earrings"}, {"id": "p2", "title": "Silver earrings"}],
+            "personalization_metadata": {"strategy_used": "hybrid", "personalization_score": 0.9}
+        }
+
+    async def test_same_user_paraphrase_is_served_from_cache(self, cache):
+        """Una paráfrasis del mismo usuario reutiliza la respuesta cacheada."""
+        context = {"market_id": "US", "turn_number": 1, "shown_products": []}
+        await cache.cache_personalization_response("u1", "show me earrings", context, self._response(), ttl=300)
+
+        hit = await cache.get_cached_personalization("u1", "earrings please", context)
+
+        assert hit["_semantic_hit"] is True
+        assert hit["response"]["personalized_response"] == "Earrings for you"
+        stats = await cache.get_cache_stats()
+        assert stats["semantic_hits"] == 1
+        assert stats["total_hits"] == 1
+
+    async def test_different_turn_context_is_not_reused(self, cache):
+        """Otro turn o set de productos mostrados no reutiliza la entrada."""
+        await cache.cache_personalization_response(
+            "u1", "show me earrings", {"market_id": "US", "turn_number": 1, "shown_products": []}, self._response(), ttl=300
+        )
+
+        miss = await cache.get_cached_personalization(
+            "u1", "earrings please", {"market_id": "US", "turn_number": 2, "shown_products": ["p1"]}
+        )
+
+        assert miss is None
+        assert cache.stats["cache_misses"] == 1
+
+    async def test_market_fallback_adapts_response_for_other_user(self, cache):
+        """En el primer turno se reutiliza la respuesta de otro usuario del mercado."""
+        context = {"market_id": "US", "turn_number": 1, "shown_products": []}
+        await cache.cache_personalization_response("u1", "gold earrings", context, self._response(), ttl=300)
+
+        hit = await cache.get_cached_personalization("u2", "earrings gold", context)
+
+        assert hit["_adapted_from_market"] is True
+        assert hit["user_id"] == "u2"
+        metadata = hit["response"]["personalization_metadata"]
+        assert metadata["adapted_from_market"] is True
+        assert metadata["adaptation_user"] == "u2"
+        assert cache.stats["market_fallback_hits"] == 1
+
+        other_market = await cache.get_cached_personalization("u3", "gold earrings", {**context, "market_id": "MX"})
+        assert other_market is None
+
+    async def test_invalidation_removes_user_fingerprints(self, cache):
+        """Invalidar el cache de un usuario elimina sus huellas del índice."""
+        context = {"market_id": "US", "turn_number": 1, "shown_products": []}
+        await cache.cache_personalization_response("u1", "show me earrings", context, self._response(), ttl=300)
+        cache.diversity_cache.invalidate_user_cache = _async_return(1)
+
+        await cache.invalidate_user_cache("u1")
+
+        assert cache.query_index.get_stats()["entries"] == 0
+
+    async def test_disabled_without_catalog_vectorizer(self):
+        """Sin vectorizador en el catálogo no se crea índice semántico."""
+        cache = IntelligentPersonalizationCache(diversity_cache=DiversityAwareCache(redis_service=FakeRedis()))
+
+        assert cache.query_index is None
+
+
+def _async_return(value):
+    async def inner(*args, **kwargs):
+        return value
+    return inner
@@ -618,6 +618,58 @@ class TestShutdownAndCleanup:
         assert ServiceFactory._tfidf_lock is None
 
 
+# ============================================================================
+# TEST CLASS: EVENT PIPELINE STATS
+# ============================================================================
+
+class TestEventPipelineStats:
+    """
+    Tests de las métricas de ingesta de eventos expuestas en /v1/metrics.
+    """
+    
+    @pytest.mark.asyncio
+    async def test_reports_writer_stream_and_group_lag(self, monkeypatch):
+        """
+        Incluye el writer de Retail API, el stream, el lag por grupo y los consumidores.
+        """
+        retail = MagicMock()
+        retail.get_event_writer_stats = MagicMock(return_value={"enabled": True, "queue_depth": 3})
+        stream = MagicMock()
+        stream.get_stats = MagicMock(return_value={"appended": 10})
+        stream.get_group_lag = AsyncMock(side_effect=lambda group: {"group": group, "pending": 2})
+        consumer = MagicMock()
+        consumer.get_stats = MagicMock(return_value={"group": "retail", "acked": 8})
+        
+        ServiceFactory._retail_recommender = retail
+        monkeypatch.setattr(ServiceFactory, "_event_stream", stream)
+        monkeypatch.setattr(ServiceFactory, "_event_consumers", [consumer])
+        
+        stats = await ServiceFactory.get_event_pipeline_stats()
+        
+        assert stats["retail_event_writer"]["queue_depth"] == 3
+        assert stats["event_stream"]["appended"] == 10
+        assert set(stats["groups"]) == {"profile", "analytics", "retail"}
+        assert stats["groups"]["retail"]["pending"] == 2
+        assert stats["consumers"] == [{"group": "retail", "acked": 8}]
+    
+    @pytest.mark.asyncio
+    async def test_without_stream_or_writer(self, monkeypatch):
+        """
+        Sin stream ni recommender inicializados devuelve secciones vacías.
+        """
+        monkeypatch.setattr(ServiceFactory, "_event_stream", None)
+        monkeypatch.setattr(ServiceFactory, "_event_consumers", [])
+        
+        stats = await ServiceFactory.get_event_pipeline_stats()
+        
+        assert stats == {
+            "retail_event_writer": {"enabled": False},
+            "event_stream": None,
+            "groups": {},
+            "consumers": []
+        }
+
+
 # ============================================================================
 # RUNNER CONFIGURATION
 # ============================================================================
@@ -0,0 +1,261 @@
+"""
+Test Suite for SingleFlight
+===========================
+
+Tests para src/api/core/single_flight.py validando:
+- Una sola carga en vuelo por clave dentro del worker
+- Excepciones compartidas y cancelación del líder
+- Coalescencia entre workers con lock en Redis y recheck
+- Aplicación en ProductCache, InventoryService y personalización
+
+Author: Senior Architecture Team
+Version: 1.0.0
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from src.api.core.redis_service import RedisServiceError
+from src.api.core.single_flight import SingleFlight
+
+
+class FakeLockService:
+    """RedisService mínimo con acquire_lock/release_lock compartido entre 'workers'."""
+
+    def __init__(self):
+        self.locks = {}
+        self.unavailable = False
+
+    async def acquire_lock(self, key, ttl_ms):
+        if self.unavailable:
+            raise RedisServiceError("redis down")
+        if key in self.locks:
+            return None
+        self.locks[key] = f"token-{len(self.locks)}"
+        return self.locks[key]
+
+    async def release_lock(self, key, token):
+        if self.locks.get(key) == token:
+            del self.locks[key]
+            return True
+        return False
+
+
+def slow_loader(calls, value="value", delay=0.05):
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return value
+    return load
+
+
+# ============================================================================
+# TEST CLASS: IN-PROCESS
+# ============================================================================
+
+class TestSingleFlightInProcess:
+    """Tests de coalescencia dentro del worker."""
+
+    async def test_concurrent_calls_share_one_load(self):
+        """N llamadas concurrentes a la misma clave ejecutan el loader una vez."""
+        flight = SingleFlight("test")
+        calls = []
+
+        results = await asyncio.gather(*[flight.do("k", slow_loader(calls)) for _ in range(10)])
+
+        assert results == ["value"] * 10
+        assert len(calls) == 1
+        assert flight.get_stats()["coalesced"] == 9
+        assert flight.get_stats()["inflight"] == 0
+
+    async def test_different_keys_load_independently(self):
+        """Claves distintas no se coalescen."""
+        flight = SingleFlight("test")
+        calls = []
+
+        await asyncio.gather(flight.do("a", slow_loader(calls)), flight.do("b", slow_loader(calls)))
+
+        assert len(calls) == 2
+
+    async def test_exception_is_shared_and_next_call_retries(self):
+        """Si la carga falla todas las llamadas reciben el error; la siguiente reintenta."""
+        flight = SingleFlight("test")
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ConnectionError("shopify down")
+
+        results = await asyncio.gather(flight.do("k", failing), flight.do("k", failing), return_exceptions=True)
+        assert all(isinstance(r, ConnectionError) for r in results)
+
+        calls = []
+        assert await flight.do("k", slow_loader(calls, delay=0)) == "value"
+        assert len(calls) == 1
+
+    async def test_leader_cancellation_does_not_cancel_followers(self):
+        """Cancelar al primer llamador no cancela la carga compartida."""
+        flight = SingleFlight("test")
+        calls = []
+        leader = asyncio.create_task(flight.do("k", slow_loader(calls, delay=0.05)))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", slow_loader(calls)))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+
+        assert await follower == "value"
+        assert len(calls) == 1
+
+
+# ============================================================================
+# TEST CLASS: CROSS-WORKER
+# ============================================================================
+
+class TestSingleFlightCrossWorker:
+    """Tests de coalescencia entre workers con lock en Redis."""
+
+    async def test_waiting_worker_reads_published_value(self):
+        """El worker sin lock devuelve el valor publicado por el líder vía recheck."""
+        locks = FakeLockService()
+        published = {}
+        worker_a = SingleFlight("test", redis_service=locks, poll_interval=0.01)
+        worker_b = SingleFlight("test", redis_service=locks, poll_interval=0.01)
+        calls = []
+
+        async def load_and_publish():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            published["k"] = "value"
+            return "value"
+
+        async def recheck():
+            return published.get("k")
+
+        results = await asyncio.gather(
+            worker_a.do("k", load_and_publish, recheck=recheck),
+            worker_b.do("k", load_and_publish, recheck=recheck)
+        )
+
+        assert results == ["value", "value"]
+        assert len(calls) == 1
+        assert worker_b.get_stats()["remote_coalesced"] == 1
+        assert locks.locks == {}
+
+    async def test_wait_timeout_loads_without_lock(self):
+        """Si el lock no se libera a tiempo el worker carga por su cuenta."""
+        locks = FakeLockService()
+        locks.locks["singleflight:test:k"] = "other-worker"
+        flight = SingleFlight("test", redis_service=locks, wait_timeout=0.05, poll_interval=0.01)
+        calls = []
+
+        assert await flight.do("k", slow_loader(calls, delay=0), recheck=AsyncMock(return_value=None)) == "value"
+        assert len(calls) == 1
+        assert flight.get_stats()["lock_timeouts"] == 1
+
+    async def test_redis_unavailable_loads_directly(self):
+        """Sin Redis se sigue coalesciendo en proceso y se carga sin lock."""
+        locks = FakeLockService()
+        locks.unavailable = True
+        flight = SingleFlight("test", redis_service=locks)
+        calls = []
+
+        assert await flight.do("k", slow_loader(calls, delay=0)) == "value"
+        assert flight.get_stats()["lock_errors"] == 1
+
+
+# ============================================================================
+# TEST CLASS: CACHES
+# ============================================================================
+
+class TestSingleFlightInCaches:
+    """Coalescencia aplicada a producto, inventario y personalización."""
+
+    async def test_product_cache_single_shopify_call(self):
+        """Misses concurrentes del mismo producto hacen una sola llamada a Shopify."""
+        from src.api.core.product_cache import ProductCache
+
+        redis_service = AsyncMock()
+        redis_service._connected = True
+        redis_service.get = AsyncMock(return_value=None)
+        redis_service.set = AsyncMock(return_value=True)
+        shopify = MagicMock()
+
+        async def get_product_async(pid):
+            await asyncio.sleep(0.05)
+            return {"id": pid, "title": "Shopify"}
+
+        shopify.get_product_async = AsyncMock(side_effect=get_product_async)
+        cache = ProductCache(redis_service=redis_service, shopify_client=shopify, l1_max_size=0)
+
+        products = await asyncio.gather(*[cache.get_product("42") for _ in range(5)])
+
+        assert all(p["title"] == "Shopify" for p in products)
+        shopify.get_product_async.assert_awaited_once()
+        assert cache.stats["shopify_hits"] == 1
+        assert cache.get_stats()["single_flight"]["coalesced"] == 4
+
+    async def test_product_refresh_coalesced_with_batch_is_cached(self):
+        """Un get_product coalescido con un get_products deja el producto escrito en Redis."""
+        from src.api.core.product_cache import ProductCache
+
+        redis_service = AsyncMock()
+        redis_service._connected = True
+        redis_service.get = AsyncMock(return_value=None)
+        redis_service.mget = AsyncMock(return_value=[None])
+        redis_service.set = AsyncMock(return_value=True)
+        shopify = MagicMock()
+
+        async def get_product_async(pid):
+            await asyncio.sleep(0.05)
+            return {"id": pid, "title": "Shopify"}
+
+        shopify.get_product_async = AsyncMock(side_effect=get_product_async)
+        cache = ProductCache(redis_service=redis_service, shopify_client=shopify, l1_max_size=0)
+
+        batch, single = await asyncio.gather(cache.get_products(["42"]), cache.get_product("42"))
+
+        assert batch[0] == single == {"id": "42", "title": "Shopify"}
+        shopify.get_product_async.assert_awaited_once()
+        assert [c.args[0] for c in redis_service.set.call_args_list] == ["product:42"]
+
+    async def test_inventory_single_shopify_call(self):
+        """Checks concurrentes del mismo producto/mercado comparten la consulta."""
+        from src.api.inventory.inventory_service import InventoryService
+
+        service = InventoryService(redis_service=None)
+        calls = []
+
+        async def shopify_inventory(product_id):
+            calls.append(product_id)
+            await asyncio.sleep(0.05)
+            return {"quantity": 20}
+
+        service._get_shopify_inventory = shopify_inventory
+
+        results = await asyncio.gather(
+            *[service.check_product_availability("42", "US") for _ in range(5)],
+            service.check_product_availability("42", "ES")
+        )
+
+        assert calls == ["42", "42"]  # una por mercado
+        assert all(r.product_id == "42" for r in results)
+        assert (await service.get_stats())["single_flight"]["coalesced"] == 4
+
+    async def test_personalization_single_claude_call(self):
+        """Requests idénticas concurrentes comparten una sola personalización."""
+        from src.api.core.diversity_aware_cache import DiversityAwareCache
+        from src.api.core.intelligent_personalization_cache import IntelligentPersonalizationCache
+
+        cache = IntelligentPersonalizationCache(diversity_cache=DiversityAwareCache(redis_service=None))
+        context = {"market_id": "US", "turn_number": 1, "shown_products": []}
+        calls = []
+        loader = slow_loader(calls, value={"personalized_response": "hola"})
+
+        results = await asyncio.gather(*[
+            cache.coalesce_personalization("u1", "show me earrings", context, loader) for _ in range(3)
+        ])
+        await cache.coalesce_personalization("u2", "show me earrings", context, loader)
+
+        assert results == [{"personalized_response": "hola"}] * 3
+        assert len(calls) == 2  # una por usuario
+        assert (await cache.get_cache_stats())["coalesced_requests"] == 2
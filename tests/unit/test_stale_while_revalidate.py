@@ -0,0 +1,201 @@
+"""
+Test Suite for StaleWhileRevalidate
+===================================
+
+Tests para src/api/core/stale_while_revalidate.py validando:
+- Entradas frescas no disparan refresco
+- Entradas obsoletas se sirven y se refrescan una sola vez por clave
+- TTL hard en Redis para ProductCache e InventoryService
+- Estadísticas de refrescos y edad de obsolescencia
+
+Author: Senior Architecture Team
+Version: 1.0.0
+"""
+
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.api.core.product_cache import CACHED_AT_FIELD, ProductCache
+from src.api.core.stale_while_revalidate import StaleWhileRevalidate
+from src.api.inventory.inventory_service import InventoryService
+
+
+class FakeRedis:
+    """Redis mínimo en memoria que registra el TTL de cada escritura."""
+
+    def __init__(self):
+        self._connected = True
+        self.storage = {}
+        self.ttls = {}
+
+    async def get(self, key, raw=False):
+        return self.storage.get(key)
+
+    async def set(self, key, value, ttl=None, indexes=None):
+        self.storage[key] = value
+        self.ttls[key] = ttl
+        return True
+
+
+async def _wait_refreshes(revalidation):
+    while revalidation.get_stats()["refreshes_inflight"]:
+        await asyncio.sleep(0.01)
+
+
+# ============================================================================
+# TEST CLASS: HELPER
+# ============================================================================
+
+class TestStaleWhileRevalidate:
+    """Tests del detector de obsolescencia y sus refrescos."""
+
+    async def test_fresh_entry_is_not_refreshed(self):
+        """Una entrada dentro del TTL soft no programa refresco."""
+        revalidation = StaleWhileRevalidate("test", soft_ttl_seconds=60, stale_ttl_seconds=30)
+        refresh = MagicMock()
+
+        assert not revalidation.revalidate_if_stale("k", time.time() - 10, refresh)
+        refresh.assert_not_called()
+        assert revalidation.hard_ttl_seconds == 90
+
+    async def test_stale_entry_refreshed_once_per_key(self):
+        """Lecturas obsoletas concurrentes comparten un único refresco."""
+        revalidation = StaleWhileRevalidate("test", soft_ttl_seconds=60, stale_ttl_seconds=30)
+        calls = []
+
+        async def refresh():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return "fresh"
+
+        cached_at = time.time() - 70
+        for _ in range(5):
+            assert revalidation.revalidate_if_stale("k", cached_at, refresh)
+        await _wait_refreshes(revalidation)
+
+        stats = revalidation.get_stats()
+        assert len(calls) == 1
+        assert stats["stale_hits"] == 5
+        assert stats["refreshes_scheduled"] == 1
+        assert stats["refreshes_deduplicated"] == 4
+        assert stats["refreshes_completed"] == 1
+        assert stats["avg_stale_age_seconds"] == pytest.approx(10, abs=1)
+
+    async def test_failed_refresh_is_counted(self):
+        """Un refresco que falla se cuenta y la entrada sigue sirviéndose."""
+        revalidation = StaleWhileRevalidate("test", soft_ttl_seconds=60, stale_ttl_seconds=30)
+
+        async def refresh():
+            raise ConnectionError("shopify down")
+
+        revalidation.revalidate_if_stale("k", time.time() - 70, refresh)
+        await _wait_refreshes(revalidation)
+
+        assert revalidation.get_stats()["refreshes_failed"] == 1
+
+    async def test_bulk_refresh_single_call_for_stale_keys(self):
+        """Las claves obsoletas de un lote se refrescan juntas; las que ya están en curso se deduplican."""
+        revalidation = StaleWhileRevalidate("test", soft_ttl_seconds=60, stale_ttl_seconds=30)
+        calls = []
+
+        async def refresh(keys):
+            calls.append(sorted(keys))
+            await asyncio.sleep(0.02)
+            return "fresh"
+
+        now = time.time()
+        revalidation.revalidate_if_stale("a", now - 70, refresh=lambda: refresh(["a"]))
+        stale = revalidation.revalidate_many_if_stale(
+            {"a": now - 70, "b": now - 70, "c": now - 70, "fresh": now - 10}, refresh
+        )
+        await _wait_refreshes(revalidation)
+
+        stats = revalidation.get_stats()
+        assert sorted(stale) == ["a", "b", "c"]
+        assert calls == [["a"], ["b", "c"]]
+        assert stats["refreshes_scheduled"] == 3
+        assert stats["refreshes_deduplicated"] == 1
+        assert stats["refreshes_completed"] == 3
+
+    async def test_disabled_without_stale_window(self):
+        """Con ventana 0 no hay obsolescencia ni refrescos (comportamiento anterior)."""
+        revalidation = StaleWhileRevalidate("test", soft_ttl_seconds=60)
+
+        assert not revalidation.revalidate_if_stale("k", time.time() - 1000, MagicMock())
+        assert revalidation.hard_ttl_seconds == 60
+
+
+# ============================================================================
+# TEST CLASS: SERVICES
+# ============================================================================
+
+class TestStaleWhileRevalidateInServices:
+    """Stale-while-revalidate aplicado a ProductCache e InventoryService."""
+
+    async def test_product_cache_serves_stale_and_refreshes(self):
+        """Un producto pasado el TTL soft se sirve al instante y se refresca en Redis."""
+        redis = FakeRedis()
+        shopify = MagicMock()
+        shopify.get_product_async = MagicMock(side_effect=lambda pid: _async_value({"id": pid, "title": "Nuevo"}))
+        cache = ProductCache(
+            redis_service=redis, shopify_client=shopify, l1_max_size=0,
+            ttl_seconds=60, stale_while_revalidate_seconds=30
+        )
+        await cache._save_to_redis("42", {"id": "42", "title": "Viejo"})
+        assert redis.ttls["product:42"] == 90
+
+        stale_payload = cache.codec.decode(redis.storage["product:42"])
+        stale_payload[CACHED_AT_FIELD] -= 70
+        redis.storage["product:42"] = cache.codec.encode(stale_payload)
+
+        product = await cache.get_product("42")
+        assert product == {"id": "42", "title": "Viejo"}
+
+        await _wait_refreshes(cache._revalidation)
+        assert (await cache.get_product("42"))["title"] == "Nuevo"
+
+        stats = cache.get_stats()["stale_while_revalidate"]
+        assert stats["stale_hits"] == 1
+        assert stats["refreshes_completed"] == 1
+
+    async def test_product_cache_without_window_keeps_plain_payload(self):
+        """Sin stale-while-revalidate el producto se guarda tal cual con ttl_seconds."""
+        redis = FakeRedis()
+        cache = ProductCache(redis_service=redis, l1_max_size=0, ttl_seconds=60)
+
+        await cache._save_to_redis("42", {"id": "42"})
+
+        assert redis.ttls["product:42"] == 60
+        assert cache.codec.decode(redis.storage["product:42"]) == {"id": "42"}
+
+    async def test_inventory_serves_stale_and_refreshes(self):
+        """Inventario pasado CACHE_TTL se sirve y se vuelve a consultar en segundo plano."""
+        redis = FakeRedis()
+        service = InventoryService(redis_service=redis, stale_while_revalidate_seconds=120)
+        quantities = iter([20, 40])
+
+        async def shopify_inventory(product_id):
+            return {"quantity": next(quantities)}
+
+        service._get_shopify_inventory = shopify_inventory
+
+        first = await service.check_product_availability("42", "US")
+        assert redis.ttls["inventory:product:42:US"] == service.CACHE_TTL + 120
+
+        first.last_updated -= service.CACHE_TTL + 5
+        await service._cache_inventory_info(first, "US")
+
+        stale = await service.check_product_availability("42", "US")
+        assert stale.quantity == 20
+
+        await _wait_refreshes(service._revalidation)
+        refreshed = await service.check_product_availability("42", "US")
+        assert refreshed.quantity == 40
+        assert (await service.get_stats())["stale_while_revalidate"]["refreshes_completed"] == 1
+
+
+async def _async_value(value):
+    return value
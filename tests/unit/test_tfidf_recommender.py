@@ -0,0 +1,502 @@
+"""
+Test Suite for TFIDFRecommender
+===============================
+
+Tests para src/recommenders/tfidf_recommender.py validando:
+- Índice id → fila (búsquedas O(1))
+- Reconstrucción del índice al cargar el modelo
+- Sincronización del índice al refrescar el catálogo
+- Tabla top-K de vecinos precalculada (construcción, persistencia, fallback)
+- Recomendaciones batch para múltiples semillas
+- Artefacto mmap sin pickle y migración desde pickle legacy
+- Actualizaciones incrementales del catálogo y deriva de vocabulario
+
+Author: Senior Architecture Team
+Version: 1.0.0
+"""
+
+import json
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from src.recommenders.tfidf_recommender import TFIDFRecommender, build_product_text
+from src.recommenders.model_artifacts import (
+    ARTIFACT_FORMAT_VERSION,
+    ProductColumns,
+    artifact_dir_for,
+    load_embedding_artifact,
+    resolve_artifact_dir,
+    save_embedding_artifact,
+)
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def sample_catalog():
+    """Catálogo pequeño con vocabulario compartido (min_df=2)."""
+    return [
+        {"id": "101", "title": "Red silk dress", "body_html": "Elegant silk dress for evening", "product_type": "Dresses"},
+        {"id": "102", "title": "Blue silk dress", "body_html": "Casual silk dress for summer", "product_type": "Dresses"},
+        {"id": "103", "title": "Black leather boots", "body_html": "Leather boots for winter", "product_type": "Shoes"},
+        {"id": "104", "title": "Brown leather boots", "body_html": "Leather boots for hiking", "product_type": "Shoes"},
+        {"id": "105", "title": "Gold earrings", "body_html": "Gold earrings with silk pouch", "product_type": "Jewelry"},
+        {"id": "106", "title": "Silver earrings", "body_html": "Silver earrings for evening", "product_type": "Jewelry"},
+    ]
+
+
+@pytest.fixture
+async def fitted_recommender(sample_catalog, tmp_path):
+    """Recomendador entrenado y guardado en un directorio temporal."""
+    recommender = TFIDFRecommender(model_path=str(tmp_path / "tfidf_model.pkl"))
+    assert await recommender.fit(sample_catalog)
+    # Esperar la construcción en segundo plano de la tabla top-K
+    await recommender._neighbor_task
+    return recommender
+
+
+# ============================================================================
+# TEST CLASS: ID INDEX
+# ============================================================================
+
+class TestTFIDFIdIndex:
+    """Tests del índice id → fila."""
+
+    async def test_fit_builds_index(self, fitted_recommender, sample_catalog):
+        """fit() construye un índice consistente con product_ids."""
+        assert len(fitted_recommender.id_to_index) == len(sample_catalog)
+        for i, product in enumerate(sample_catalog):
+            assert fitted_recommender.id_to_index[product["id"]] == i
+
+    async def test_get_product_by_id_uses_index(self, fitted_recommender):
+        """get_product_by_id resuelve vía índice, aceptando IDs no string."""
+        assert fitted_recommender.get_product_by_id("103")["title"] == "Black leather boots"
+        assert fitted_recommender.get_product_by_id(103)["title"] == "Black leather boots"
+        assert fitted_recommender.get_product_by_id("999") is None
+
+    async def test_get_recommendations_unknown_id(self, fitted_recommender):
+        """Un ID desconocido devuelve lista vacía sin error."""
+        assert await fitted_recommender.get_recommendations("999") == []
+
+    async def test_get_recommendations_excludes_query(self, fitted_recommender):
+        """Las recomendaciones no incluyen el producto consultado."""
+        recs = await fitted_recommender.get_recommendations("101", n=3)
+        assert recs
+        assert "101" not in [r["id"] for r in recs]
+
+    async def test_index_rebuilt_on_load(self, fitted_recommender):
+        """load() reconstruye el mismo índice a partir de product_ids."""
+        loaded = TFIDFRecommender(model_path=fitted_recommender.model_path)
+        assert await loaded.load()
+        assert loaded.id_to_index == fitted_recommender.id_to_index
+        assert loaded.get_product_by_id("106")["title"] == "Silver earrings"
+
+    async def test_index_resyncs_on_catalog_refresh(self, fitted_recommender):
+        """Reemplazar product_ids/product_data reconstruye el índice."""
+        fitted_recommender.product_data = [{"id": "201", "title": "New product"}]
+        fitted_recommender.product_ids = ["201"]
+
+        assert fitted_recommender.get_product_by_id("201")["title"] == "New product"
+        assert fitted_recommender.get_product_by_id("101") is None
+
+    async def test_duplicate_ids_keep_first_row(self):
+        """Con IDs duplicados se conserva la primera fila (como list.index)."""
+        recommender = TFIDFRecommender()
+        recommender.product_ids = ["1", "2", "1"]
+        assert recommender.get_product_index("1") == 0
+
+
+# ============================================================================
+# TEST CLASS: NEIGHBOR TABLE
+# ============================================================================
+
+class TestTFIDFNeighborTable:
+    """Tests de la tabla top-K precalculada."""
+
+    async def test_table_built_after_fit(self, fitted_recommender, sample_catalog):
+        """fit() construye la tabla y la persiste junto al modelo."""
+        assert fitted_recommender._neighbor_table_ready()
+        assert fitted_recommender.neighbor_indices.shape == (len(sample_catalog), fitted_recommender.neighbor_k)
+        assert os.path.exists(fitted_recommender._neighbor_table_path())
+
+    async def test_precomputed_matches_live_scoring(self, fitted_recommender):
+        """La tabla devuelve el mismo ranking que el scoring en vivo."""
+        precomputed = await fitted_recommender.get_recommendations("103", n=5)
+
+        fitted_recommender.neighbor_indices = None
+        live = await fitted_recommender.get_recommendations("103", n=5)
+
+        assert [r["id"] for r in precomputed] == [r["id"] for r in live]
+        for p, l in zip(precomputed, live):
+            assert p["similarity_score"] == pytest.approx(l["similarity_score"], abs=1e-6)
+
+    async def test_padding_for_small_catalog(self, fitted_recommender, sample_catalog):
+        """Con N - 1 < K la fila se rellena con -1 y solo hay N - 1 vecinos."""
+        recs = await fitted_recommender.get_recommendations("101", n=20)
+        assert len(recs) == len(sample_catalog) - 1
+        assert (fitted_recommender.neighbor_indices[0, len(sample_catalog) - 1:] == -1).all()
+
+    async def test_load_reuses_persisted_table(self, fitted_recommender):
+        """load() reutiliza la tabla guardada sin recalcular."""
+        loaded = TFIDFRecommender(model_path=fitted_recommender.model_path)
+        assert await loaded.load()
+        assert loaded._neighbor_task is None
+        assert loaded._neighbor_table_ready()
+        np.testing.assert_array_equal(loaded.neighbor_indices, fitted_recommender.neighbor_indices)
+
+    async def test_stale_table_falls_back_to_live(self, fitted_recommender):
+        """Si el catálogo cambia la tabla deja de usarse."""
+        fitted_recommender.product_ids = list(fitted_recommender.product_ids)
+        assert not fitted_recommender._neighbor_table_ready()
+        recs = await fitted_recommender.get_recommendations("101", n=2)
+        assert len(recs) == 2
+
+
+# ============================================================================
+# TEST CLASS: BATCH RECOMMENDATIONS
+# ============================================================================
+
+class TestTFIDFBatchRecommendations:
+    """Tests de get_recommendations_batch."""
+
+    async def test_single_seed_matches_get_recommendations(self, fitted_recommender):
+        """Con una semilla el ranking coincide con get_recommendations."""
+        batch = await fitted_recommender.get_recommendations_batch(["101"], n=3)
+        single = await fitted_recommender.get_recommendations("101", n=3)
+        assert [r["id"] for r in batch] == [r["id"] for r in single]
+
+    async def test_excludes_seeds_and_exclude_ids(self, fitted_recommender):
+        """Las semillas y los IDs excluidos nunca aparecen en el resultado."""
+        recs = await fitted_recommender.get_recommendations_batch(
+            ["101", "103"], n=10, exclude_ids=["102"]
+        )
+        ids = [r["id"] for r in recs]
+        assert not {"101", "103", "102"} & set(ids)
+        assert set(ids) == {"104", "105", "106"}
+
+    async def test_max_aggregation_surfaces_each_seed_neighbor(self, fitted_recommender):
+        """Con "max" el vecino más cercano de cada semilla encabeza la lista."""
+        recs = await fitted_recommender.get_recommendations_batch(["101", "103"], n=2)
+        assert {r["id"] for r in recs} == {"102", "104"}
+
+    async def test_unknown_seeds_ignored(self, fitted_recommender):
+        """Semillas desconocidas se ignoran; sin semillas válidas → lista vacía."""
+        assert await fitted_recommender.get_recommendations_batch(["999"], n=3) == []
+        recs = await fitted_recommender.get_recommendations_batch(["999", "105"], n=1)
+        assert [r["id"] for r in recs] == ["106"]
+
+    async def test_invalid_aggregation(self, fitted_recommender):
+        """Una agregación desconocida es un error del llamador."""
+        with pytest.raises(ValueError):
+            await fitted_recommender.get_recommendations_batch(["101"], aggregation="sum")
+
+
+# ============================================================================
+# TEST CLASS: MODEL ARTIFACTS
+# ============================================================================
+
+class TestTFIDFModelArtifacts:
+    """Tests del formato de artefacto memory-mapped."""
+
+    async def test_fit_writes_artifact_not_pickle(self, fitted_recommender):
+        """fit() escribe el artefacto versionado y no el pickle."""
+        artifact_dir = resolve_artifact_dir(artifact_dir_for(fitted_recommender.model_path))
+        assert os.path.exists(os.path.join(artifact_dir, "manifest.json"))
+        assert not os.path.exists(fitted_recommender.model_path)
+        assert fitted_recommender.has_saved_model()
+
+    async def test_load_is_memory_mapped_and_equivalent(self, fitted_recommender):
+        """load() abre las matrices con mmap y reproduce vectores y búsquedas."""
+        loaded = TFIDFRecommender(model_path=fitted_recommender.model_path)
+        assert await loaded.load()
+
+        # Vista de solo lectura sobre el fichero mapeado (páginas compartidas)
+        assert not loaded.product_vectors.data.flags.writeable
+        assert (loaded.product_vectors != fitted_recommender.product_vectors).nnz == 0
+        assert loaded.product_data == fitted_recommender.product_data
+
+        query = "silk dress"
+        np.testing.assert_allclose(
+            loaded.vectorizer.transform([query]).toarray(),
+            fitted_recommender.vectorizer.transform([query]).toarray()
+        )
+
+        loaded.neighbor_indices = None
+        live = await loaded.get_recommendations("101", n=3)
+        expected = await fitted_recommender.get_recommendations("101", n=3)
+        assert [r["id"] for r in live] == [r["id"] for r in expected]
+
+    async def test_legacy_pickle_loaded_and_migrated(self, fitted_recommender, tmp_path):
+        """Un pickle legacy se carga y se migra al formato de artefacto."""
+        legacy_path = str(tmp_path / "legacy" / "tfidf_model.pkl")
+        os.makedirs(os.path.dirname(legacy_path))
+        with open(legacy_path, "wb") as f:
+            pickle.dump({
+                "vectorizer": fitted_recommender.vectorizer,
+                "product_vectors": fitted_recommender.product_vectors,
+                "product_data": fitted_recommender.product_data,
+                "product_ids": fitted_recommender.product_ids
+            }, f)
+
+        legacy = TFIDFRecommender(model_path=legacy_path, precompute_neighbors=False)
+        assert await legacy.load()
+        assert os.path.exists(os.path.join(resolve_artifact_dir(artifact_dir_for(legacy_path)), "manifest.json"))
+        assert legacy.get_product_by_id("104")["title"] == "Brown leather boots"
+
+    async def test_regenerated_legacy_pickle_not_shadowed(self, fitted_recommender, tmp_path):
+        """Un pickle legacy posterior al artefacto migrado se vuelve a cargar."""
+        legacy_path = str(tmp_path / "legacy" / "tfidf_model.pkl")
+        os.makedirs(os.path.dirname(legacy_path))
+
+        def write_legacy(product_data):
+            with open(legacy_path, "wb") as f:
+                pickle.dump({
+                    "vectorizer": fitted_recommender.vectorizer,
+                    "product_vectors": fitted_recommender.product_vectors,
+                    "product_data": product_data,
+                    "product_ids": fitted_recommender.product_ids
+                }, f)
+
+        write_legacy(fitted_recommender.product_data)
+        assert await TFIDFRecommender(model_path=legacy_path, precompute_neighbors=False).load()
+
+        regenerated = [dict(p) for p in fitted_recommender.product_data]
+        regenerated[0]["title"] = "Regenerated dress"
+        write_legacy(regenerated)
+        manifest = os.path.join(resolve_artifact_dir(artifact_dir_for(legacy_path)), "manifest.json")
+        os.utime(legacy_path, (os.path.getmtime(manifest) + 10,) * 2)
+
+        reloaded = TFIDFRecommender(model_path=legacy_path, precompute_neighbors=False)
+        assert await reloaded.load()
+        assert reloaded.get_product_by_id("101")["title"] == "Regenerated dress"
+
+    async def test_rewrite_publishes_new_version(self, fitted_recommender):
+        """Reescribir el artefacto mueve CURRENT y conserva la versión anterior."""
+        artifact_dir = artifact_dir_for(fitted_recommender.model_path)
+        first_version = resolve_artifact_dir(artifact_dir)
+
+        assert await fitted_recommender.fit(fitted_recommender.product_data)
+        second_version = resolve_artifact_dir(artifact_dir)
+        assert second_version != first_version
+        assert os.path.exists(os.path.join(first_version, "manifest.json"))
+
+        assert await fitted_recommender.fit(fitted_recommender.product_data)
+        assert not os.path.exists(first_version)
+        assert os.path.exists(os.path.join(second_version, "manifest.json"))
+
+    async def test_unversioned_layout_read_and_upgraded(self, fitted_recommender):
+        """Un artefacto sin CURRENT se lee y la siguiente escritura lo versiona."""
+        artifact_dir = artifact_dir_for(fitted_recommender.model_path)
+        version_dir = resolve_artifact_dir(artifact_dir)
+        for name in os.listdir(version_dir):
+            os.replace(os.path.join(version_dir, name), os.path.join(artifact_dir, name))
+        os.rmdir(version_dir)
+        os.remove(os.path.join(artifact_dir, "CURRENT"))
+
+        loaded = TFIDFRecommender(model_path=fitted_recommender.model_path, precompute_neighbors=False)
+        assert await loaded.load()
+
+        assert await fitted_recommender.fit(fitted_recommender.product_data)
+        assert resolve_artifact_dir(artifact_dir) != artifact_dir
+        assert not os.path.exists(os.path.join(artifact_dir, "manifest.json"))
+
+    async def test_products_stored_as_mapped_columns(self, tmp_path):
+        """Los productos se leen de columnas mmap y se decodifican por fila."""
+        products = [
+            {"id": "1", "title": "Vestido", "tags": ["seda"], "price": 10.5},
+            {"id": "2", "title": "Botas", "vendor": None},
+            {"id": "3"},
+        ]
+        artifact_dir = str(tmp_path / "embeddings.artifacts")
+        save_embedding_artifact(artifact_dir, np.zeros((3, 2)), products, ["1", "2", "3"])
+
+        loaded = load_embedding_artifact(artifact_dir)["product_data"]
+        assert isinstance(loaded, ProductColumns)
+        assert not loaded.columns[0][0].flags.writeable
+        assert loaded == products
+        assert loaded[-1] == {"id": "3"} and "vendor" not in loaded[0]
+        assert loaded[1:] == products[1:]
+
+        # Cada acceso devuelve un dict nuevo: mutarlo no altera el catálogo
+        loaded[0]["title"] = "Otro"
+        assert loaded[0]["title"] == "Vestido"
+
+    async def test_loaded_category_index_is_row_views(self, fitted_recommender):
+        """Tras load(), category_index son vistas de filas equivalentes a los dicts."""
+        loaded = TFIDFRecommender(model_path=fitted_recommender.model_path, precompute_neighbors=False)
+        assert await loaded.load()
+
+        assert all(isinstance(view, ProductColumns) for view in loaded.category_index.values())
+        assert {c: list(v) for c, v in loaded.category_index.items()} == fitted_recommender.category_index
+
+        await loaded.update_products(
+            upserts=[{"id": "108", "title": "Black boots", "body_html": "Boots", "product_type": "Shoes"}]
+        )
+        assert [p["id"] for p in loaded.category_index["SHOES"]] == ["103", "104", "108"]
+
+    async def test_v1_jsonl_products_still_read(self, fitted_recommender):
+        """Un artefacto v1 con products.jsonl se sigue cargando."""
+        version_dir = resolve_artifact_dir(artifact_dir_for(fitted_recommender.model_path))
+        with open(os.path.join(version_dir, "products.jsonl"), "w", encoding="utf-8") as f:
+            for product in fitted_recommender.product_data:
+                f.write(json.dumps(product) + "\n")
+        os.remove(os.path.join(version_dir, "product_fields.json"))
+        manifest_path = os.path.join(version_dir, "manifest.json")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest["format_version"] = 1
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+
+        loaded = TFIDFRecommender(model_path=fitted_recommender.model_path, precompute_neighbors=False)
+        assert await loaded.load()
+        assert loaded.product_data == fitted_recommender.product_data
+
+    async def test_unsupported_version_rejected(self, fitted_recommender):
+        """Una versión de formato desconocida no se carga."""
+        manifest_path = os.path.join(resolve_artifact_dir(artifact_dir_for(fitted_recommender.model_path)), "manifest.json")
+        with open(manifest_path) as f:
+            manifest = f.read()
+        with open(manifest_path, "w") as f:
+            f.write(manifest.replace(f'"format_version":{ARTIFACT_FORMAT_VERSION}', '"format_version":99'))
+
+        loaded = TFIDFRecommender(model_path=fitted_recommender.model_path)
+        assert not await loaded.load()
+
+
+# ============================================================================
+# TEST CLASS: INCREMENTAL UPDATES
+# ============================================================================
+
+class TestTFIDFIncrementalUpdates:
+    """Tests de update_products (catálogo incremental sin refit)."""
+
+    async def test_add_update_remove(self, fitted_recommender):
+        """Añadir, modificar y eliminar parchea matriz, índice y datos."""
+        summary = await fitted_recommender.update_products(
+            upserts=[
+                {"id": "107", "title": "Green silk dress", "body_html": "Silk dress for evening", "product_type": "Dresses"},
+                {"id": "105", "title": "Gold boots", "body_html": "Leather boots in gold", "product_type": "Shoes"},
+            ],
+            removed_ids=["102"]
+        )
+
+        assert summary["applied"]
+        assert (summary["added"], summary["updated"], summary["removed"]) == (1, 1, 1)
+        assert fitted_recommender.product_vectors.shape[0] == len(fitted_recommender.product_ids) == 6
+        assert fitted_recommender.get_product_by_id("102") is None
+        assert fitted_recommender.get_product_by_id("107")["title"] == "Green silk dress"
+        assert fitted_recommender.get_product_by_id("105")["title"] == "Gold boots"
+
+        recs = await fitted_recommender.get_recommendations("107", n=1)
+        assert [r["id"] for r in recs] == ["101"]
+
+    async def test_patched_rows_match_vectorizer(self, fitted_recommender):
+        """Cada fila de la matriz corresponde al texto actual de su producto."""
+        await fitted_recommender.update_products(
+            upserts=[{"id": "103", "title": "Silver earrings", "body_html": "Earrings for evening", "product_type": "Jewelry"}],
+            removed_ids=["101"]
+        )
+        expected = fitted_recommender.vectorizer.transform(
+            [build_product_text(p) for p in fitted_recommender.product_data]
+        )
+        assert (fitted_recommender.product_vectors != expected).nnz == 0
+
+    async def test_catalog_listeners_notified(self, fitted_recommender):
+        """Cada delta publicado avisa a los listeners del catálogo."""
+        calls = []
+        fitted_recommender.add_catalog_listener(lambda: calls.append(fitted_recommender.product_data))
+
+        await fitted_recommender.update_products(removed_ids=["101"])
+
+        assert calls == [fitted_recommender.product_data]
+
+    async def test_category_index_patched(self, fitted_recommender):
+        """category_index refleja el cambio de categoría y las eliminaciones."""
+        await fitted_recommender.update_products(
+            upserts=[{"id": "103", "title": "Leather dress", "body_html": "Leather dress", "product_type": "Dresses"}],
+            removed_ids=["105", "106"]
+        )
+        index = fitted_recommender.category_index
+        assert "JEWELRY" not in index
+        assert [p["id"] for p in index["SHOES"]] == ["104"]
+        assert {p["id"] for p in index["DRESSES"]} == {"101", "102", "103"}
+
+    async def test_update_persisted_after_debounce(self, fitted_recommender):
+        """El artefacto se reescribe una sola vez tras el retardo de persistencia."""
+        fitted_recommender.persist_debounce_seconds = 0
+        await fitted_recommender.update_products(
+            upserts=[{"id": "108", "title": "Grey leather boots", "body_html": "Leather boots", "product_type": "Shoes"}]
+        )
+        await fitted_recommender.update_products(removed_ids=["106"])
+        await fitted_recommender._persist_task
+
+        loaded = TFIDFRecommender(model_path=fitted_recommender.model_path, precompute_neighbors=False)
+        assert await loaded.load()
+        assert loaded.get_product_by_id("108")["title"] == "Grey leather boots"
+        assert loaded.get_product_by_id("106") is None
+
+    async def test_neighbor_table_patched_in_place(self, fitted_recommender):
+        """La tabla top-K parcheada sigue lista y coincide con un recálculo completo."""
+        await fitted_recommender.update_products(
+            upserts=[
+                {"id": "108", "title": "Grey leather boots", "body_html": "Leather boots", "product_type": "Shoes"},
+                {"id": "101", "title": "Red silk scarf", "body_html": "Silk scarf for evening", "product_type": "Accessories"},
+            ],
+            removed_ids=["104"]
+        )
+        assert fitted_recommender._neighbor_task.done()
+        assert fitted_recommender._neighbor_table_ready()
+
+        _, expected_scores = TFIDFRecommender._compute_neighbor_table(
+            fitted_recommender.product_vectors, fitted_recommender.neighbor_k
+        )
+        np.testing.assert_allclose(fitted_recommender.neighbor_scores, expected_scores, atol=1e-6)
+
+    async def test_large_delta_rebuilds_neighbor_table(self, fitted_recommender, monkeypatch):
+        """Si el delta toca demasiadas filas se reconstruye la tabla completa."""
+        monkeypatch.setattr(TFIDFRecommender, "NEIGHBOR_BATCH_SIZE", 1)
+        monkeypatch.setattr(TFIDFRecommender, "NEIGHBOR_PATCH_MAX_FRACTION", 0.0)
+        await fitted_recommender.update_products(
+            upserts=[{"id": "108", "title": "Grey leather boots", "body_html": "Leather boots", "product_type": "Shoes"},
+                     {"id": "109", "title": "Gold dress", "body_html": "Gold silk dress", "product_type": "Dresses"}]
+        )
+        assert not fitted_recommender._neighbor_table_ready()
+        await fitted_recommender._neighbor_task
+        assert fitted_recommender._neighbor_table_ready()
+
+    async def test_deltas_during_refit_are_reapplied(self, fitted_recommender):
+        """Los deltas aplicados mientras se reentrena sobreviven al intercambio."""
+        assert fitted_recommender._schedule_refit()
+        await fitted_recommender.update_products(
+            upserts=[{"id": "108", "title": "Grey leather boots", "body_html": "Leather boots", "product_type": "Shoes"}],
+            removed_ids=["101"]
+        )
+
+        assert await fitted_recommender._refit_task
+        assert fitted_recommender._refit_journal is None
+        assert fitted_recommender.get_product_by_id("108")["title"] == "Grey leather boots"
+        assert fitted_recommender.get_product_by_id("101") is None
+        assert fitted_recommender.product_vectors.shape[0] == len(fitted_recommender.product_ids)
+
+    async def test_drift_schedules_refit(self, fitted_recommender, monkeypatch):
+        """Vocabulario nuevo por encima del umbral programa un refit completo."""
+        monkeypatch.setattr(TFIDFRecommender, "REFIT_MIN_TERMS", 1)
+        scheduled = []
+        monkeypatch.setattr(fitted_recommender, "_schedule_refit", lambda: scheduled.append(True) or True)
+
+        summary = await fitted_recommender.update_products(
+            upserts=[{"id": "109", "title": "Quantum widget", "body_html": "Flux capacitor gizmo", "product_type": "Gadgets"}]
+        )
+        assert summary["vocabulary_drift"] > fitted_recommender.refit_drift_threshold
+        assert summary["refit_scheduled"] and scheduled
+
+    async def test_not_loaded_is_noop(self):
+        """Sin modelo cargado la actualización no se aplica."""
+        summary = await TFIDFRecommender().update_products(upserts=[{"id": "1", "title": "x"}])
+        assert summary == {"applied": False, "reason": "not_loaded"}
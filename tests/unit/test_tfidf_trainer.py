@@ -0,0 +1,138 @@
+"""
+Test Suite for TFIDFTrainer
+===========================
+
+Tests para src/recommenders/tfidf_trainer.py validando:
+- Entrenamiento en proceso separado con escritura del artefacto
+- Intercambio atómico del modelo en el recomendador activo
+- El modelo anterior sigue sirviendo mientras se entrena
+- Reporte de progreso al StartupManager
+- Entrenamientos concurrentes serializados por recomendador
+
+Author: Senior Architecture Team
+Version: 1.0.0
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from src.api.startup_helper import StartupManager
+from src.recommenders.model_artifacts import artifact_dir_for, resolve_artifact_dir
+from src.recommenders.tfidf_recommender import TFIDFRecommender
+from src.recommenders.tfidf_trainer import TFIDFTrainer
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def old_catalog():
+    """Catálogo inicial servido antes del reentrenamiento."""
+    return [
+        {"id": "101", "title": "Red silk dress", "body_html": "Elegant silk dress for evening", "product_type": "Dresses"},
+        {"id": "102", "title": "Blue silk dress", "body_html": "Casual silk dress for summer", "product_type": "Dresses"},
+        {"id": "103", "title": "Black leather boots", "body_html": "Leather boots for winter", "product_type": "Shoes"},
+    ]
+
+
+@pytest.fixture
+def new_catalog():
+    """Catálogo nuevo que el entrenador debe activar."""
+    return [
+        {"id": "201", "title": "Gold earrings", "body_html": "Gold earrings with pouch", "product_type": "Jewelry"},
+        {"id": "202", "title": "Silver earrings", "body_html": "Silver earrings for evening", "product_type": "Jewelry"},
+        {"id": "203", "title": "Gold necklace", "body_html": "Gold necklace for evening", "product_type": "Jewelry"},
+    ]
+
+
+# ============================================================================
+# TEST CLASS: TRAINING AND SWAP
+# ============================================================================
+
+class TestTFIDFTrainer:
+    """Tests del entrenamiento en proceso separado."""
+
+    async def test_train_writes_artifact_and_swaps(self, old_catalog, new_catalog, tmp_path):
+        """El modelo nuevo se escribe en disco y reemplaza al activo."""
+        recommender = TFIDFRecommender(model_path=str(tmp_path / "tfidf_model.pkl"))
+        assert await recommender.fit(old_catalog)
+        assert recommender.get_product_by_id("101") is not None
+
+        trainer = TFIDFTrainer(recommender)
+        assert await trainer.train(new_catalog)
+
+        assert os.path.exists(os.path.join(resolve_artifact_dir(artifact_dir_for(recommender.model_path)), "manifest.json"))
+        assert recommender.get_product_by_id("101") is None
+        assert recommender.get_product_by_id("202")["title"] == "Silver earrings"
+        assert "JEWELRY" in recommender.category_index
+
+        recs = await recommender.get_recommendations("201", n=2)
+        assert {r["id"] for r in recs} == {"202", "203"}
+        assert trainer.last_result["products"] == len(new_catalog)
+
+    async def test_old_model_serves_during_training(self, old_catalog, new_catalog):
+        """Mientras el hijo vectoriza, el event loop sigue sirviendo el modelo anterior."""
+        recommender = TFIDFRecommender()
+        assert await recommender.fit(old_catalog)
+
+        trainer = TFIDFTrainer(recommender)
+        task = asyncio.create_task(trainer.train(new_catalog))
+        await asyncio.sleep(0)
+
+        recs = await recommender.get_recommendations("101", n=1)
+        assert [r["id"] for r in recs] == ["102"]
+
+        assert await task
+        assert recommender.get_product_by_id("203") is not None
+
+    async def test_progress_reported_to_startup_manager(self, new_catalog):
+        """Las etapas del entrenamiento aparecen en get_status."""
+        manager = StartupManager()
+        manager.register_component("recommender", loader=None)
+        stages = []
+        original_report = manager.report_progress
+
+        def record(name, stage, progress=None, message=None):
+            stages.append(stage)
+            original_report(name, stage, progress, message)
+
+        manager.report_progress = record
+
+        trainer = TFIDFTrainer(TFIDFRecommender(), startup_manager=manager)
+        assert await trainer.train(new_catalog)
+
+        assert stages == ["queued", "vectorizing", "loading_artifact", "swapping", "done"]
+        component = manager.get_status()["components"]["recommender"]
+        assert component["stage"] == "done"
+        assert component["progress"] == 1.0
+
+    async def test_empty_catalog_keeps_current_model(self, old_catalog):
+        """Sin productos no se entrena y el modelo actual se conserva."""
+        recommender = TFIDFRecommender()
+        assert await recommender.fit(old_catalog)
+
+        assert not await TFIDFTrainer(recommender).train([])
+        assert recommender.get_product_by_id("101") is not None
+
+    async def test_concurrent_trainers_are_serialized(self, old_catalog, new_catalog):
+        """Dos entrenadores distintos sobre el mismo recomendador no se solapan."""
+        recommender = TFIDFRecommender()
+        assert await recommender.fit(old_catalog)
+        events = []
+
+        def make_trainer(name):
+            trainer = TFIDFTrainer(recommender)
+            trainer._report = lambda stage, progress=None, message=None: events.append((name, stage))
+            return trainer
+
+        results = await asyncio.gather(
+            make_trainer("first").train(old_catalog),
+            make_trainer("second").train(new_catalog)
+        )
+
+        assert all(results)
+        assert [name for name, _ in events] == ["first"] * 5 + ["second"] * 5
+        assert recommender.get_product_by_id("203") is not None
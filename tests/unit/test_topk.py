@@ -0,0 +1,62 @@
+"""
+Test Suite for select_top_k
+===========================
+
+Tests para src/recommenders/topk.py validando:
+- Equivalencia con el orden completo (argsort)
+- Exclusión explícita del producto consultado
+- Desempate estable por índice
+- Máscara de exclusión y NaN
+
+Author: Senior Architecture Team
+Version: 1.0.0
+"""
+
+import numpy as np
+import pytest
+
+from src.recommenders.topk import select_top_k
+
+
+class TestSelectTopK:
+    """Tests de la selección top-K parcial."""
+
+    def test_matches_full_sort_without_ties(self):
+        """Sin empates coincide con argsort descendente."""
+        scores = np.random.default_rng(0).random(1000)
+        expected = scores.argsort()[::-1][:10]
+        np.testing.assert_array_equal(select_top_k(scores, 10), expected)
+
+    def test_excludes_query_even_when_not_rank_zero(self):
+        """El producto consultado se excluye aunque no sea el de mayor score."""
+        scores = np.array([0.5, 1.0, 1.0, 0.2])
+        result = select_top_k(scores, 2, exclude_index=2)
+        assert 2 not in result
+        np.testing.assert_array_equal(result, [1, 0])
+
+    def test_stable_tie_breaking(self):
+        """A igual score gana el índice menor, también en el corte K."""
+        scores = np.array([0.3, 0.9, 0.3, 0.9, 0.3])
+        np.testing.assert_array_equal(select_top_k(scores, 3), [1, 3, 0])
+
+    def test_exclude_mask(self):
+        """La máscara descarta productos ya vistos."""
+        scores = np.array([0.9, 0.8, 0.7, 0.6])
+        mask = np.array([True, False, True, False])
+        np.testing.assert_array_equal(select_top_k(scores, 3, exclude_mask=mask), [1, 3])
+
+    def test_fewer_candidates_than_k(self):
+        """Con menos candidatos válidos que K se devuelven solo los válidos."""
+        scores = np.array([0.1, np.nan, 0.4])
+        np.testing.assert_array_equal(select_top_k(scores, 5, exclude_index=0), [2])
+
+    @pytest.mark.parametrize("k", [0, -1])
+    def test_non_positive_k(self, k):
+        """K no positivo devuelve un array vacío."""
+        assert select_top_k(np.array([0.1, 0.2]), k).size == 0
+
+    def test_does_not_modify_input(self):
+        """Los scores del llamador no se alteran."""
+        scores = np.array([0.1, 0.2, 0.3])
+        select_top_k(scores, 2, exclude_index=2)
+        np.testing.assert_array_equal(scores, [0.1, 0.2, 0.3])